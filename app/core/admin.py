@@ -1,9 +1,20 @@
 from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.core.paginator import Paginator
+from django.db.models import Count
+from django.db.models.functions import Coalesce
+from django.shortcuts import get_object_or_404
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
 from django.utils.html import format_html
+from app.core.utils import login_throttle
+from app.core.utils.admin_paginacion import PaginacionKeysetMixin
 from .models import (
     Nino, Profesional, ReporteIA, ValidacionProfesional, Cita,
-    ConsentimientoGDPR, ConsentimientoTutor, AuditoriaAcceso, PoliticaRetencionDatos, LoginAttempt
+    ConsentimientoGDPR, ConsentimientoTutor, AuditoriaAcceso, PoliticaRetencionDatos, LoginAttempt,
+    EmailOutbox, ExportacionDatos, PurgaCuenta, SegmentoAuditoria
 )
+from app.core.utils.consultas import subconsulta_agregada
 
 
 @admin.register(Nino)
@@ -17,8 +28,9 @@ class NinoAdmin(admin.ModelAdmin):
         'idioma_nativo',
         'profesional_display',
         'fecha_nacimiento',
-        'total_evaluaciones',
+        'total_evaluaciones_display',
         'ultima_evaluacion',
+        'ultimo_nivel_riesgo',
         'activo',
         'fecha_registro'
     ]
@@ -28,6 +40,7 @@ class NinoAdmin(admin.ModelAdmin):
         'idioma_nativo',
         'profesional',
         'activo',
+        'ultimo_nivel_riesgo',
         'fecha_registro'
     ]
     search_fields = ['nombres', 'apellidos', 'idioma_nativo', 'profesional__nombres', 'profesional__apellidos']
@@ -47,13 +60,20 @@ class NinoAdmin(admin.ModelAdmin):
         ('Estado', {
             'fields': ('activo',)
         }),
+        ('Resumen de Evaluaciones', {
+            'fields': ('total_evaluaciones', 'fecha_ultima_evaluacion', 'ultimo_nivel_riesgo', 'ultima_precision'),
+            'classes': ('collapse',)
+        }),
         ('Fechas del Sistema', {
             'fields': ('fecha_registro',),
             'classes': ('collapse',)
         }),
     )
     
-    readonly_fields = ['fecha_registro']
+    readonly_fields = [
+        'fecha_registro', 'total_evaluaciones', 'fecha_ultima_evaluacion',
+        'ultimo_nivel_riesgo', 'ultima_precision'
+    ]
     
     def nombre_completo_display(self, obj):
         """Muestra el nombre completo con formato"""
@@ -75,9 +95,9 @@ class NinoAdmin(admin.ModelAdmin):
         )
     profesional_display.short_description = 'Profesional'
     
-    def total_evaluaciones(self, obj):
+    def total_evaluaciones_display(self, obj):
         """Muestra el total de evaluaciones del niño"""
-        count = obj.evaluaciones.count()
+        count = obj.total_evaluaciones
         if count > 0:
             return format_html(
                 '<span style="color: #28a745; font-weight: bold;">{}</span>',
@@ -86,24 +106,25 @@ class NinoAdmin(admin.ModelAdmin):
         return format_html(
             '<span style="color: #6c757d;">0</span>'
         )
-    total_evaluaciones.short_description = 'Total Evaluaciones'
+    total_evaluaciones_display.short_description = 'Total Evaluaciones'
+    total_evaluaciones_display.admin_order_field = 'total_evaluaciones'
     
     def ultima_evaluacion(self, obj):
         """Muestra la fecha de la última evaluación"""
-        ultima = obj.evaluaciones.first()  # Ya está ordenado por -fecha_hora_inicio
-        if ultima:
+        if obj.fecha_ultima_evaluacion:
             return format_html(
                 '<span style="color: #007bff;">{}</span>',
-                ultima.fecha_hora_inicio.strftime('%d/%m/%Y')
+                obj.fecha_ultima_evaluacion.strftime('%d/%m/%Y')
             )
         return format_html(
             '<span style="color: #6c757d;">Sin evaluaciones</span>'
         )
     ultima_evaluacion.short_description = 'Última Evaluación'
+    ultima_evaluacion.admin_order_field = 'fecha_ultima_evaluacion'
     
     def get_queryset(self, request):
-        """Optimizar consultas con prefetch_related"""
-        return super().get_queryset(request).select_related('profesional').prefetch_related('evaluaciones')
+        """El resumen de evaluaciones ya está en la tabla de niños"""
+        return super().get_queryset(request).select_related('profesional')
 
 
 @admin.register(Profesional)
@@ -164,7 +185,7 @@ class ProfesionalAdmin(admin.ModelAdmin):
     
     def total_ninos(self, obj):
         """Muestra el total de niños asignados"""
-        count = obj.ninos.count()
+        count = obj._total_ninos
         if count > 0:
             return format_html(
                 '<span style="color: #17a2b8; font-weight: bold;">{}</span>',
@@ -174,19 +195,27 @@ class ProfesionalAdmin(admin.ModelAdmin):
             '<span style="color: #6c757d;">0</span>'
         )
     total_ninos.short_description = 'Niños Asignados'
+    total_ninos.admin_order_field = '_total_ninos'
     
     def total_validaciones(self, obj):
         """Muestra el total de validaciones realizadas"""
-        count = obj.validaciones.count()
         return format_html(
             '<span style="color: #28a745; font-weight: bold;">{}</span>',
-            count
+            obj._total_validaciones
         )
     total_validaciones.short_description = 'Validaciones'
+    total_validaciones.admin_order_field = '_total_validaciones'
     
     def get_queryset(self, request):
-        """Optimizar consultas con prefetch_related"""
-        return super().get_queryset(request).prefetch_related('ninos', 'validaciones')
+        """Totales por subconsulta: una sola consulta para toda la página"""
+        return super().get_queryset(request).annotate(
+            _total_ninos=Coalesce(
+                subconsulta_agregada(Nino.objects.all(), 'profesional', Count('pk')), 0
+            ),
+            _total_validaciones=Coalesce(
+                subconsulta_agregada(ValidacionProfesional.objects.all(), 'profesional', Count('pk')), 0
+            ),
+        )
 
 
 @admin.register(ReporteIA)
@@ -541,9 +570,16 @@ class ConsentimientoTutorAdmin(admin.ModelAdmin):
 
 
 @admin.register(AuditoriaAcceso)
-class AuditoriaAccesoAdmin(admin.ModelAdmin):
-    """Administrador para Auditorías de Acceso"""
+class AuditoriaAccesoAdmin(PaginacionKeysetMixin, admin.ModelAdmin):
+    """Administrador para Auditorías de Acceso
+    
+    Sólo muestra los meses recientes; los anteriores están en el archivo
+    de auditoría (SegmentoAuditoriaAdmin), enlazado desde el listado.
+    """
     
+    change_list_template = 'admin/core/auditoriaacceso/change_list.html'
+    campo_keyset = 'timestamp'
+    list_select_related = ['usuario']
     list_display = [
         'timestamp',
         'usuario_display',
@@ -635,6 +671,122 @@ class AuditoriaAccesoAdmin(admin.ModelAdmin):
             return format_html('<span style="color: #28a745;">✓</span>')
         return format_html('<span style="color: #dc3545;">✗</span>')
     exitoso_display.short_description = 'Éxito'
+    
+    def changelist_view(self, request, extra_context=None):
+        extra_context = extra_context or {}
+        extra_context['segmentos_archivados'] = SegmentoAuditoria.objects.count()
+        return super().changelist_view(request, extra_context=extra_context)
+
+
+@admin.register(SegmentoAuditoria)
+class SegmentoAuditoriaAdmin(admin.ModelAdmin):
+    """Administrador del Archivo de Auditoría (meses fuera de la tabla)"""
+    
+    list_display = [
+        'mes_display',
+        'registros',
+        'usuarios_display',
+        'fecha_min',
+        'fecha_max',
+        'tamano_display',
+        'ver_registros',
+    ]
+    ordering = ['-mes', '-id_max']
+    date_hierarchy = 'mes'
+    readonly_fields = [
+        'mes', 'archivo', 'registros', 'id_min', 'id_max', 'fecha_min', 'fecha_max',
+        'usuarios', 'tamano_bytes', 'fecha_archivado',
+    ]
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        # El archivo sólo se elimina con las políticas de retención
+        return False
+    
+    def mes_display(self, obj):
+        return obj.mes.strftime('%m/%Y')
+    mes_display.short_description = 'Mes'
+    mes_display.admin_order_field = 'mes'
+    
+    def usuarios_display(self, obj):
+        return len(obj.usuarios)
+    usuarios_display.short_description = 'Usuarios'
+    
+    def tamano_display(self, obj):
+        return f'{obj.tamano_bytes / 1024:.1f} KB'
+    tamano_display.short_description = 'Tamaño'
+    
+    def ver_registros(self, obj):
+        return format_html(
+            '<a href="{}">Ver registros</a>',
+            reverse('admin:core_segmentoauditoria_registros', args=[obj.pk])
+        )
+    ver_registros.short_description = 'Registros'
+    
+    def get_urls(self):
+        urls = [
+            path(
+                '<int:pk>/registros/',
+                self.admin_site.admin_view(self.registros_view),
+                name='core_segmentoauditoria_registros'
+            ),
+        ]
+        return urls + super().get_urls()
+    
+    def registros_view(self, request, pk):
+        """Registros de un segmento, con los mismos filtros básicos que el listado"""
+        from app.core.models import Profesional
+        from app.core.utils import auditoria_archivo
+        
+        # admin_view sólo exige is_staff: el archivo de auditoría requiere el permiso de lectura
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        segmento = get_object_or_404(SegmentoAuditoria, pk=pk)
+        usuario = request.GET.get('usuario', '').strip()
+        accion = request.GET.get('accion', '')
+        texto = request.GET.get('q', '').strip()
+        
+        usuario_id = None
+        if usuario:
+            usuario_id = Profesional.objects.filter(username=usuario).values_list('pk', flat=True).first()
+            if usuario_id is None and usuario.isdigit():
+                usuario_id = int(usuario)
+            usuario_id = usuario_id if usuario_id is not None else -1
+        
+        por_pagina = 100
+        try:
+            numero = max(int(request.GET.get('p', 1)), 1)
+        except ValueError:
+            numero = 1
+        total, filas = auditoria_archivo.buscar(
+            segmento,
+            usuario_id=usuario_id,
+            accion=accion or None,
+            texto=texto or None,
+            desde=(numero - 1) * por_pagina,
+            cantidad=por_pagina,
+        )
+        pagina = Paginator(range(total), por_pagina).get_page(numero)
+        
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': f'Auditoría archivada de {segmento.mes.strftime("%m/%Y")}',
+            'segmento': segmento,
+            'registros': auditoria_archivo.instancias(filas),
+            'total': total,
+            'pagina': pagina,
+            'acciones': AuditoriaAcceso.ACCION_CHOICES,
+            'filtro_usuario': usuario,
+            'filtro_accion': accion,
+            'filtro_texto': texto,
+        }
+        return TemplateResponse(request, 'admin/core/segmentoauditoria/registros.html', context)
 
 
 @admin.register(PoliticaRetencionDatos)
@@ -684,9 +836,10 @@ class PoliticaRetencionDatosAdmin(admin.ModelAdmin):
 
 
 @admin.register(LoginAttempt)
-class LoginAttemptAdmin(admin.ModelAdmin):
+class LoginAttemptAdmin(PaginacionKeysetMixin, admin.ModelAdmin):
     """Administrador para Intentos de Login"""
     
+    campo_keyset = 'timestamp'
     list_display = [
         'timestamp',
         'username',
@@ -734,7 +887,7 @@ class LoginAttemptAdmin(admin.ModelAdmin):
     
     def intentos_recientes(self, obj):
         """Muestra intentos recientes del usuario"""
-        count = LoginAttempt.obtener_intentos_recientes(obj.username)
+        count = login_throttle.intentos_recientes(obj.username)
         if count >= 5:
             return format_html(
                 '<span style="color: #dc3545; font-weight: bold;">🔒 {} (BLOQUEADO)</span>',
@@ -747,3 +900,173 @@ class LoginAttemptAdmin(admin.ModelAdmin):
             )
         return format_html('<span style="color: #28a745;">{}</span>', count)
     intentos_recientes.short_description = 'Intentos (30 min)'
+
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    """Administrador de la Bandeja de Salida de Correos"""
+    
+    list_display = [
+        'fecha_creacion',
+        'asunto',
+        'destinatarios_display',
+        'estado_display',
+        'intentos',
+        'proximo_intento',
+        'fecha_envio',
+    ]
+    list_filter = [
+        'estado',
+        'fecha_creacion',
+    ]
+    search_fields = ['asunto', 'destinatarios', 'ultimo_error']
+    ordering = ['-fecha_creacion']
+    list_per_page = 50
+    actions = ['reintentar_envio']
+    readonly_fields = [
+        'asunto',
+        'remitente',
+        'destinatarios',
+        'cuerpo_texto',
+        'cuerpo_html',
+        'cita',
+        'estado',
+        'intentos',
+        'max_intentos',
+        'proximo_intento',
+        'bloqueado_desde',
+        'ultimo_error',
+        'fecha_creacion',
+        'fecha_envio',
+    ]
+    
+    fieldsets = (
+        ('Mensaje', {
+            'fields': ('asunto', 'remitente', 'destinatarios', 'cita')
+        }),
+        ('Contenido', {
+            'fields': ('cuerpo_texto', 'cuerpo_html'),
+            'classes': ('collapse',)
+        }),
+        ('Envío', {
+            'fields': (
+                'estado', 'intentos', 'max_intentos', 'proximo_intento',
+                'bloqueado_desde', 'ultimo_error', 'fecha_creacion', 'fecha_envio'
+            )
+        }),
+    )
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def destinatarios_display(self, obj):
+        return ', '.join(obj.destinatarios)
+    destinatarios_display.short_description = 'Destinatarios'
+    
+    def estado_display(self, obj):
+        colores = {
+            'pendiente': '#ffc107',
+            'enviando': '#17a2b8',
+            'enviado': '#28a745',
+            'fallido': '#dc3545',
+        }
+        return format_html(
+            '<span style="color: {}; font-weight: bold;">{}</span>',
+            colores.get(obj.estado, '#6c757d'),
+            obj.get_estado_display()
+        )
+    estado_display.short_description = 'Estado'
+    
+    def reintentar_envio(self, request, queryset):
+        """Devuelve a la cola los correos fallidos seleccionados"""
+        from django.utils import timezone
+        from app.core.utils.email_outbox import despertar_envio
+        
+        actualizados = queryset.filter(estado='fallido').update(
+            estado='pendiente',
+            intentos=0,
+            proximo_intento=timezone.now(),
+            ultimo_error='',
+        )
+        if actualizados:
+            despertar_envio()
+        self.message_user(request, f'{actualizados} correo(s) devueltos a la cola de envío.')
+    reintentar_envio.short_description = 'Reintentar envío de los correos fallidos'
+
+
+@admin.register(ExportacionDatos)
+class ExportacionDatosAdmin(admin.ModelAdmin):
+    """Administrador de las Exportaciones de Datos (ZIP)"""
+    
+    list_display = [
+        'fecha_solicitud',
+        'usuario',
+        'estado_display',
+        'progreso',
+        'incluir_pdfs',
+        'tamano_bytes',
+        'descargada',
+        'fecha_fin',
+    ]
+    list_filter = ['estado', 'descargada', 'fecha_solicitud']
+    search_fields = ['usuario__username', 'usuario__email', 'error']
+    ordering = ['-fecha_solicitud']
+    list_select_related = ['usuario']
+    list_per_page = 50
+    actions = ['reintentar_exportacion']
+    readonly_fields = [
+        'usuario', 'estado', 'progreso', 'paso_actual', 'archivo', 'tamano_bytes',
+        'error', 'descargada', 'fecha_solicitud', 'fecha_inicio', 'fecha_fin',
+    ]
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def estado_display(self, obj):
+        colores = {
+            'pendiente': '#ffc107',
+            'procesando': '#17a2b8',
+            'completada': '#28a745',
+            'fallida': '#dc3545',
+        }
+        return format_html(
+            '<span style="color: {}; font-weight: bold;">{}</span>',
+            colores.get(obj.estado, '#6c757d'),
+            obj.get_estado_display()
+        )
+    estado_display.short_description = 'Estado'
+    
+    def reintentar_exportacion(self, request, queryset):
+        """Devuelve a la cola las exportaciones fallidas seleccionadas"""
+        actualizadas = queryset.filter(estado='fallida').update(estado='pendiente', progreso=0, error='')
+        self.message_user(request, f'{actualizadas} exportación(es) devueltas a la cola.')
+    reintentar_exportacion.short_description = 'Reintentar las exportaciones fallidas'
+
+
+@admin.register(PurgaCuenta)
+class PurgaCuentaAdmin(admin.ModelAdmin):
+    """Administrador de las Eliminaciones de Cuentas (sólo lectura)"""
+    
+    list_display = ['fecha_solicitud', 'username', 'usuario_id', 'estado', 'porcentaje_display', 'fecha_fin']
+    list_filter = ['estado', 'fecha_solicitud']
+    search_fields = ['username']
+    ordering = ['-fecha_solicitud']
+    list_per_page = 50
+    actions = ['reintentar_purga']
+    readonly_fields = [
+        'usuario_id', 'username', 'estado', 'conteos', 'progreso', 'error',
+        'fecha_solicitud', 'fecha_inicio', 'fecha_fin',
+    ]
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def porcentaje_display(self, obj):
+        return f'{obj.porcentaje}%'
+    porcentaje_display.short_description = 'Progreso'
+    
+    def reintentar_purga(self, request, queryset):
+        """Devuelve a la cola las eliminaciones fallidas (retoman su avance)"""
+        actualizadas = queryset.filter(estado='fallida').update(estado='pendiente', error='')
+        self.message_user(request, f'{actualizadas} eliminación(es) devueltas a la cola.')
+    reintentar_purga.short_description = 'Reintentar las eliminaciones fallidas'
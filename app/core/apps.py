@@ -6,5 +6,8 @@ class CoreConfig(AppConfig):
     name = 'app.core'
     
     def ready(self):
-        """Importa las señales cuando la aplicación está lista"""
+        """Importa las señales y las comprobaciones y precarga las plantillas de correo"""
         import app.core.signals
+        import app.core.checks
+        from app.core.utils.email_utils import precargar_plantillas
+        precargar_plantillas()
@@ -0,0 +1,51 @@
+"""
+Comprobaciones de sistema (python manage.py check) de la app core.
+"""
+from django.conf import settings
+from django.core.checks import Error, register
+
+from app.core.utils.cache_compartida import es_base_de_datos, es_compartida
+
+
+@register()
+def comprobar_cache_compartida(app_configs, **kwargs):
+    """
+    Con varios procesos web (PROCESOS_WEB), el límite de intentos de login
+    y el de peticiones de las APIs de juego necesitan una caché común a
+    todos ellos que no sea la base de datos.
+    """
+    if getattr(settings, 'PROCESOS_WEB', 1) <= 1 or (es_compartida() and not es_base_de_datos()):
+        return []
+    usos = ['el límite de intentos de login']
+    if getattr(settings, 'GAME_RATE_LIMIT_ENABLED', True):
+        usos.append('el límite de peticiones de las APIs de juego')
+    return [Error(
+        f"Con {settings.PROCESOS_WEB} procesos web, {' y '.join(usos)} "
+        f"necesita{'n' if len(usos) > 1 else ''} una caché compartida entre procesos.",
+        hint=(
+            'CACHES["default"] no es Redis: con LocMem cada worker tendría sus '
+            'propios contadores, y con la base de datos cada operación sería otra '
+            'consulta. Configura REDIS_URL (ver CACHES en config/settings.py).'
+        ),
+        id='core.E001',
+    )]
+
+
+@register()
+def comprobar_cache_limite_tasa(app_configs, **kwargs):
+    """
+    El límite de peticiones de las APIs de juego cuenta con cache.incr, que
+    sólo es atómico (y barato) fuera de la caché de base de datos.
+    """
+    if not getattr(settings, 'GAME_RATE_LIMIT_ENABLED', True) or not es_base_de_datos():
+        return []
+    return [Error(
+        'El límite de peticiones de las APIs de juego no puede usar la caché '
+        'de base de datos.',
+        hint=(
+            'Con DatabaseCache cada incremento es una lectura y una escritura no '
+            'atómicas y cada petición limitada varias consultas. Usa REDIS_URL o '
+            'desactiva GAME_RATE_LIMIT_ENABLED.'
+        ),
+        id='core.E002',
+    )]
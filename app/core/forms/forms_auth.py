@@ -147,11 +147,8 @@ class ProfesionalRegistrationForm(UserCreationForm):
                 from django.conf import settings
                 
                 # Obtener IP del usuario
-                x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-                if x_forwarded_for:
-                    ip_address = x_forwarded_for.split(',')[0]
-                else:
-                    ip_address = request.META.get('REMOTE_ADDR', '0.0.0.0')
+                from app.core.middleware.audit_middleware import get_client_ip
+                ip_address = get_client_ip(request)
                 
                 ConsentimientoGDPR.objects.create(
                     usuario=user,
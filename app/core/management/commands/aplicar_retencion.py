@@ -0,0 +1,89 @@
+"""
+Comando para aplicar las políticas de retención de datos GDPR.
+
+Procesa cada PoliticaRetencionDatos activa por lotes (ver
+app/core/utils/retencion.py). Si se interrumpe, la siguiente ejecución
+continúa desde el último lote confirmado.
+
+Uso:
+    python manage.py aplicar_retencion --dry-run
+    python manage.py aplicar_retencion
+    python manage.py aplicar_retencion --tipo cita --tipo auditoria --lote 1000 --pausa 0.2
+
+Programación recomendada (cron, diario a las 03:30):
+    30 3 * * * cd /ruta/al/proyecto && python manage.py aplicar_retencion
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app.core.models import PoliticaRetencionDatos
+from app.core.utils import retencion
+
+
+class Command(BaseCommand):
+    help = 'Elimina o anonimiza por lotes los datos que superan su política de retención'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo cuenta los registros afectados, sin modificar nada'
+        )
+        parser.add_argument(
+            '--tipo',
+            action='append',
+            choices=[tipo for tipo, _ in PoliticaRetencionDatos.TIPO_DATO_CHOICES],
+            help='Aplica solo la política de este tipo de dato (se puede repetir)'
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=getattr(settings, 'RETENCION_TAMANO_LOTE', retencion.TAMANO_LOTE),
+            help='Registros por lote/transacción'
+        )
+        parser.add_argument(
+            '--pausa',
+            type=float,
+            default=getattr(settings, 'RETENCION_PAUSA_SEGUNDOS', retencion.PAUSA_SEGUNDOS),
+            help='Segundos de espera entre lotes para liberar bloqueos'
+        )
+        parser.add_argument(
+            '--reiniciar',
+            action='store_true',
+            help='Ignora el progreso guardado de ejecuciones interrumpidas'
+        )
+
+    def handle(self, *args, **options):
+        politicas = PoliticaRetencionDatos.objects.filter(activa=True).order_by('tipo_dato')
+        if options['tipo']:
+            politicas = politicas.filter(tipo_dato__in=options['tipo'])
+
+        if not politicas.exists():
+            self.stdout.write(self.style.WARNING(
+                '⚠️ No hay políticas activas. Ejecuta primero: python manage.py init_gdpr_policies'
+            ))
+            return
+
+        for politica in politicas:
+            self.stdout.write(f"\n🗄️ {politica}")
+
+            if options['dry_run']:
+                for etiqueta, total in retencion.contar_vencidos(politica).items():
+                    self.stdout.write(f"   · {etiqueta}: {total} registros a {politica.accion_al_vencer}")
+                continue
+
+            if politica.progreso and not options['reiniciar']:
+                self.stdout.write(f"   ↪️ Retomando desde {politica.progreso}")
+
+            resumen = retencion.aplicar_politica(
+                politica,
+                lote=options['lote'],
+                pausa=options['pausa'],
+                reiniciar=options['reiniciar'],
+                stdout=self.stdout,
+            )
+            total = sum(resumen.values())
+            self.stdout.write(self.style.SUCCESS(f"   ✅ {total} registros procesados"))
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('\n🔍 Dry-run: no se modificó ningún dato'))
@@ -0,0 +1,71 @@
+"""
+Comando que mueve los meses cerrados de AuditoriaAcceso al archivo
+comprimido (ver app/core/utils/auditoria_archivo.py).
+
+Uso:
+    python manage.py archivar_auditoria                  # deja 3 meses en la tabla
+    python manage.py archivar_auditoria --meses 6
+    python manage.py archivar_auditoria --dry-run
+
+Pensado para ejecutarse una vez al mes desde cron:
+    0 4 1 * * cd /ruta/al/proyecto && python manage.py archivar_auditoria
+"""
+from django.core.management.base import BaseCommand
+
+from app.core.models import AuditoriaAcceso
+from app.core.utils import auditoria_archivo
+
+
+class Command(BaseCommand):
+    help = 'Archiva en ficheros comprimidos los meses cerrados de la auditoría de accesos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--meses',
+            type=int,
+            default=auditoria_archivo.MESES_ACTIVOS,
+            help=f'Meses que se conservan en la tabla, incluido el actual (por defecto: {auditoria_archivo.MESES_ACTIVOS})'
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=auditoria_archivo.TAMANO_LOTE,
+            help=f'Filas por lote al leer y borrar (por defecto: {auditoria_archivo.TAMANO_LOTE})'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Muestra los meses que se archivarían sin mover nada'
+        )
+
+    def handle(self, *args, **options):
+        meses = auditoria_archivo.meses_cerrados(max(options['meses'], 1))
+        if not meses:
+            self.stdout.write(self.style.SUCCESS('✅ No hay meses cerrados pendientes de archivar'))
+            return
+
+        self.stdout.write(f"🗄️ Archivo de auditoría en {auditoria_archivo.directorio()}")
+
+        if options['dry_run']:
+            for mes in meses:
+                desde, hasta = auditoria_archivo.limites_mes(mes)
+                total = AuditoriaAcceso.objects.filter(timestamp__gte=desde, timestamp__lt=hasta).count()
+                self.stdout.write(f"   · {mes:%m/%Y}: {total} registros")
+            self.stdout.write(self.style.WARNING('⚠️ Dry-run: no se ha archivado nada'))
+            return
+
+        total = 0
+        for mes in meses:
+            segmento = auditoria_archivo.archivar_mes(mes, lote=options['lote'])
+            if segmento is None:
+                continue
+            total += segmento.registros
+            self.stdout.write(
+                f"   · {mes:%m/%Y}: {segmento.registros} registros → {segmento.archivo} "
+                f"({segmento.tamano_bytes / 1024:.1f} KB)"
+            )
+
+        restantes = AuditoriaAcceso.objects.count()
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {total} registros archivados. Quedan {restantes} en la tabla de auditoría"
+        ))
@@ -0,0 +1,95 @@
+"""
+Comando que resume las trazas más lentas de TRAZAS_ARCHIVO y, con
+--salida, las exporta en formato Trace Event para abrirlas en Perfetto
+(https://ui.perfetto.dev) o chrome://tracing (ver app/core/utils/trazas.py).
+
+Uso:
+    python manage.py exportar_trazas                      # las 20 más lentas
+    python manage.py exportar_trazas --min-ms 2000 --vista finish
+    python manage.py exportar_trazas --traza 9f2c... --salida traza.json
+"""
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.core.utils import trazas
+
+
+class Command(BaseCommand):
+    help = 'Resume las trazas más lentas y las exporta para un visor de trazas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--archivo',
+            default=None,
+            help='Archivo JSONL de trazas (por defecto: TRAZAS_ARCHIVO)'
+        )
+        parser.add_argument(
+            '--min-ms',
+            type=float,
+            default=0,
+            help='Sólo trazas cuya raíz dure al menos estos milisegundos'
+        )
+        parser.add_argument(
+            '--vista',
+            default='',
+            help='Sólo trazas cuya raíz contenga este texto (p. ej. el nombre de URL)'
+        )
+        parser.add_argument(
+            '--traza',
+            action='append',
+            help='ID de traza concreto (cabecera X-Traza-Id; se puede repetir)'
+        )
+        parser.add_argument(
+            '--limite',
+            type=int,
+            default=20,
+            help='Número máximo de trazas, de la más lenta a la más rápida (por defecto: 20)'
+        )
+        parser.add_argument(
+            '--salida',
+            default=None,
+            help='Escribe las trazas seleccionadas en un JSON para Perfetto / chrome://tracing'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            todas = trazas.leer_trazas(options['archivo'])
+        except FileNotFoundError as e:
+            raise CommandError(f'No hay archivo de trazas: {e.filename}')
+
+        seleccion = []
+        for traza_id, eventos in todas.items():
+            raiz = trazas.raiz(eventos)
+            if raiz is None:
+                continue
+            if options['traza'] and traza_id not in options['traza']:
+                continue
+            if raiz['dur'] < options['min_ms'] * 1000 or options['vista'] not in raiz['name']:
+                continue
+            seleccion.append((raiz, eventos))
+        seleccion.sort(key=lambda par: par[0]['dur'], reverse=True)
+        seleccion = seleccion[:max(options['limite'], 1)]
+
+        if not seleccion:
+            self.stdout.write(self.style.WARNING('⚠️ Ninguna traza cumple los filtros'))
+            return
+
+        for raiz, eventos in seleccion:
+            por_categoria = trazas.tiempo_propio_por_categoria(eventos)
+            reparto = ' · '.join(
+                f'{categoria} {dur * 100 / max(raiz["dur"], 1):.0f}%'
+                for categoria, dur in sorted(por_categoria.items(), key=lambda par: par[1], reverse=True)
+            )
+            self.stdout.write(
+                f'🐢 {raiz["dur"] / 1000:9.1f} ms  {raiz["name"]}  '
+                f'[{raiz["args"]["traza"]}, {len(eventos)} spans]  {reparto}'
+            )
+
+        if options['salida']:
+            eventos = [evento for _, eventos_traza in seleccion for evento in eventos_traza]
+            with open(options['salida'], 'w', encoding='utf-8') as f:
+                json.dump({'traceEvents': eventos, 'displayTimeUnit': 'ms'}, f, ensure_ascii=False)
+            self.stdout.write(self.style.SUCCESS(
+                f'✅ {len(seleccion)} trazas exportadas a {options["salida"]}'
+            ))
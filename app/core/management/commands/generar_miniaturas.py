@@ -0,0 +1,94 @@
+"""
+Comando para generar las miniaturas (derivados WebP/JPEG) de las imágenes.
+
+Rellena los derivados de las imágenes ya subidas (niños, profesionales,
+citas y juegos), guarda su hash en cada fila para que las plantillas
+construyan la URL sin consultas y, con --static, los de las imágenes estáticas de los
+juegos junto con su manifiesto. Los derivados estáticos viven dentro de
+app/games/static, así que `collectstatic` los recoge como cualquier otro
+archivo: ejecutar este comando antes de `collectstatic` al desplegar.
+
+Uso:
+    python manage.py generar_miniaturas
+    python manage.py generar_miniaturas --static
+    python manage.py generar_miniaturas --static --solo-static
+"""
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app.core.models import Nino, Profesional, Cita
+from app.core.utils.thumbnails import (
+    TAMANOS_MINIATURA,
+    guardar_hash,
+    procesar_imagen,
+    generar_miniaturas_estaticas,
+)
+from app.games.models import Juego
+
+
+# Modelo -> campo de imagen
+MODELOS_CON_IMAGEN = [
+    (Nino, 'imagen'),
+    (Profesional, 'imagen'),
+    (Cita, 'foto_paciente'),
+    (Juego, 'imagen'),
+]
+
+# Las imágenes de los juegos se muestran como máximo a ~200px
+TAMANOS_ESTATICOS = ['md']
+
+
+class Command(BaseCommand):
+    help = 'Genera miniaturas WebP/JPEG de las imágenes subidas y estáticas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--static',
+            action='store_true',
+            help='Genera también las miniaturas de app/games/static/img y su manifiesto'
+        )
+        parser.add_argument(
+            '--solo-static',
+            action='store_true',
+            help='Omite las imágenes subidas por los usuarios'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('\n🖼️ Generando miniaturas...\n'))
+
+        if not options['solo_static']:
+            for modelo, campo in MODELOS_CON_IMAGEN:
+                procesadas = 0
+                errores = 0
+                nombres = (
+                    modelo.objects.exclude(**{f'{campo}__isnull': True})
+                    .exclude(**{campo: ''})
+                    .values_list(campo, flat=True)
+                    .distinct()
+                    .iterator()
+                )
+                storage = modelo._meta.get_field(campo).storage
+                for nombre in nombres:
+                    hash_archivo = procesar_imagen(storage, nombre)
+                    if hash_archivo:
+                        guardar_hash(modelo, campo, nombre, hash_archivo)
+                        procesadas += 1
+                    else:
+                        errores += 1
+
+                self.stdout.write(
+                    f"  ✓ {modelo._meta.verbose_name_plural}: {procesadas} imágenes"
+                    + (f" ({errores} con error)" if errores else '')
+                )
+
+        if options['static'] or options['solo_static']:
+            directorio_static = os.path.join(settings.BASE_DIR, 'app', 'games', 'static')
+            manifiesto = generar_miniaturas_estaticas(
+                directorio_static,
+                tamanos={t: TAMANOS_MINIATURA[t] for t in TAMANOS_ESTATICOS},
+            )
+            self.stdout.write(f"  ✓ Imágenes estáticas de juegos: {len(manifiesto)}")
+
+        self.stdout.write(self.style.SUCCESS('\n✅ Miniaturas generadas correctamente'))
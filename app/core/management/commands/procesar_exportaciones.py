@@ -0,0 +1,62 @@
+"""
+Comando que genera en segundo plano las exportaciones ZIP solicitadas por
+los profesionales (datos.json + reportes PDF).
+
+Uso:
+    python manage.py procesar_exportaciones              # una pasada (cron)
+    python manage.py procesar_exportaciones --loop       # proceso permanente
+    python manage.py procesar_exportaciones --loop --intervalo 30
+
+Los ZIP con más de GDPR_EXPORT_DIAS_VALIDEZ días se borran en cada pasada.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.core.models import ExportacionDatos
+from app.core.utils import gdpr_archive
+
+
+class Command(BaseCommand):
+    help = 'Genera los archivos ZIP de las exportaciones de datos pendientes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Sigue ejecutándose y revisa la cola cada --intervalo segundos'
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=int,
+            default=30,
+            help='Segundos entre revisiones en modo --loop (por defecto: 30)'
+        )
+
+    def handle(self, *args, **options):
+        if not options['loop']:
+            self._pasada()
+            return
+
+        self.stdout.write(f"🔄 Procesando exportaciones cada {options['intervalo']}s (Ctrl+C para salir)")
+        try:
+            while True:
+                self._pasada(silencioso=True)
+                time.sleep(options['intervalo'])
+        except KeyboardInterrupt:
+            self.stdout.write('\n👋 Procesamiento detenido')
+
+    def _pasada(self, silencioso=False):
+        borradas = gdpr_archive.limpiar_caducadas()
+        if borradas:
+            self.stdout.write(f"🗑️ {borradas} archivos de exportación caducados eliminados")
+
+        procesadas = gdpr_archive.procesar_pendientes()
+        if silencioso and not procesadas:
+            return
+
+        fallidas = ExportacionDatos.objects.filter(estado='fallida').count()
+        self.stdout.write(self.style.SUCCESS(f"📦 {procesadas} exportaciones procesadas"))
+        if not silencioso:
+            pendientes = ExportacionDatos.objects.filter(estado='pendiente').count()
+            self.stdout.write(f"📬 En cola: {pendientes} | ❌ Fallidas: {fallidas}")
@@ -0,0 +1,67 @@
+"""
+Comando para enviar los correos pendientes de la bandeja de salida.
+
+Uso:
+    python manage.py procesar_outbox                 # una pasada (cron)
+    python manage.py procesar_outbox --loop          # proceso permanente
+    python manage.py procesar_outbox --loop --intervalo 15 --lote 100
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.core.models import EmailOutbox
+from app.core.utils import email_outbox
+
+
+class Command(BaseCommand):
+    help = 'Envía por lotes los correos pendientes de la bandeja de salida'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Sigue ejecutándose y revisa la bandeja cada --intervalo segundos'
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=int,
+            default=10,
+            help='Segundos entre revisiones en modo --loop (por defecto: 10)'
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=email_outbox.TAMANO_LOTE,
+            help=f'Correos por conexión SMTP (por defecto: {email_outbox.TAMANO_LOTE})'
+        )
+
+    def handle(self, *args, **options):
+        lote = options['lote']
+
+        if not options['loop']:
+            self._pasada(lote)
+            return
+
+        self.stdout.write(f"🔄 Procesando la bandeja de salida cada {options['intervalo']}s (Ctrl+C para salir)")
+        try:
+            while True:
+                self._pasada(lote, silencioso=True)
+                time.sleep(options['intervalo'])
+        except KeyboardInterrupt:
+            self.stdout.write('\n👋 Procesamiento detenido')
+
+    def _pasada(self, lote, silencioso=False):
+        total = email_outbox.procesar_outbox(limite=lote)
+
+        if silencioso and not any(total.values()):
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f"📧 {total['enviados']} enviados, {total['reintentos']} reprogramados, "
+            f"{total['fallidos']} fallidos"
+        ))
+        if not silencioso:
+            pendientes = EmailOutbox.objects.filter(estado='pendiente').count()
+            fallidos = EmailOutbox.objects.filter(estado='fallido').count()
+            self.stdout.write(f"📬 En cola: {pendientes} | ❌ Fallidos sin reintentos: {fallidos}")
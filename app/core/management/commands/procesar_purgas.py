@@ -0,0 +1,64 @@
+"""
+Comando que elimina las cuentas cuya baja está pendiente (PurgaCuenta).
+
+Normalmente la purga la hace un hilo del servidor web tras solicitarla;
+este comando recoge las que quedaron pendientes (PURGA_HILO desactivado,
+reinicio del servidor o error) y retoma el avance guardado.
+
+Uso:
+    python manage.py procesar_purgas                 # una pasada (cron)
+    python manage.py procesar_purgas --loop          # proceso permanente
+    python manage.py procesar_purgas --lote 5000
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.core.models import PurgaCuenta
+from app.core.utils import purga
+
+
+class Command(BaseCommand):
+    help = 'Elimina por lotes los datos de las cuentas dadas de baja'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Sigue ejecutándose y revisa la cola cada --intervalo segundos'
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=int,
+            default=60,
+            help='Segundos entre revisiones en modo --loop (por defecto: 60)'
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=purga.TAMANO_LOTE,
+            help=f'Registros por sentencia DELETE (por defecto: {purga.TAMANO_LOTE})'
+        )
+
+    def handle(self, *args, **options):
+        if not options['loop']:
+            self._pasada(options['lote'])
+            return
+
+        self.stdout.write(f"🔄 Procesando eliminaciones de cuentas cada {options['intervalo']}s (Ctrl+C para salir)")
+        try:
+            while True:
+                self._pasada(options['lote'], silencioso=True)
+                time.sleep(options['intervalo'])
+        except KeyboardInterrupt:
+            self.stdout.write('\n👋 Procesamiento detenido')
+
+    def _pasada(self, lote, silencioso=False):
+        procesadas = purga.procesar_pendientes(lote=lote)
+        if silencioso and not procesadas:
+            return
+
+        self.stdout.write(self.style.SUCCESS(f"🗑️ {procesadas} cuentas eliminadas"))
+        if not silencioso:
+            fallidas = PurgaCuenta.objects.filter(estado='fallida').count()
+            self.stdout.write(f"❌ Eliminaciones fallidas: {fallidas}")
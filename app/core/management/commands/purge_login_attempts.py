@@ -0,0 +1,38 @@
+"""
+Comando para eliminar los registros antiguos de intentos de login.
+
+Los LoginAttempt sólo se guardan para análisis forense (el bloqueo se
+calcula en caché), así que se purgan en bloque en lugar de borrarlos
+usuario a usuario en cada login.
+
+Uso:
+    python manage.py purge_login_attempts
+    python manage.py purge_login_attempts --dias 90 --lote 10000
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app.core.models import LoginAttempt
+
+
+class Command(BaseCommand):
+    help = 'Elimina en bloque los intentos de login más antiguos que la retención configurada'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=getattr(settings, 'LOGIN_ATTEMPTS_RETENCION_DIAS', 30),
+            help='Antigüedad mínima en días de los registros a eliminar'
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=5000,
+            help='Registros eliminados por consulta (por defecto: 5000)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"🧹 Eliminando intentos de login de más de {options['dias']} días...")
+        eliminados = LoginAttempt.purgar_antiguos(dias=options['dias'], lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(f'✅ {eliminados} intentos de login eliminados'))
@@ -0,0 +1,44 @@
+"""
+Comando que reconstruye el resumen de evaluaciones guardado en cada niño
+(total, fecha de la última, último nivel de riesgo y última precisión).
+
+El resumen se mantiene solo al guardar evaluaciones y reportes; este
+comando lo rehace tras migrar los campos, cargar datos con bulk_create o
+ante cualquier sospecha de desajuste.
+
+Uso:
+    python manage.py recompute_nino_resumen
+    python manage.py recompute_nino_resumen --nino 42
+    python manage.py recompute_nino_resumen --lote 5000
+"""
+from django.core.management.base import BaseCommand
+
+from app.core.models import Nino
+from app.core.utils import resumen_nino
+
+
+class Command(BaseCommand):
+    help = 'Recalcula en bloque el resumen de evaluaciones de los niños'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--nino',
+            type=int,
+            action='append',
+            help='ID del niño a recalcular (se puede repetir). Por defecto, todos'
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=resumen_nino.TAMANO_LOTE,
+            help=f'Niños por sentencia UPDATE (por defecto: {resumen_nino.TAMANO_LOTE})'
+        )
+
+    def handle(self, *args, **options):
+        queryset = Nino.objects.all()
+        if options['nino']:
+            queryset = queryset.filter(pk__in=options['nino'])
+
+        self.stdout.write('🔄 Recalculando resumen de evaluaciones...')
+        actualizados = resumen_nino.recalcular(queryset, lote=max(options['lote'], 1))
+        self.stdout.write(self.style.SUCCESS(f'✅ Resumen actualizado en {actualizados} niños'))
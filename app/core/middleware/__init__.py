@@ -1,5 +1,8 @@
 # Middleware package
 from .audit_middleware import AuditMiddleware, LoginAuditMiddleware
 from .session_timeout import SessionTimeoutMiddleware
+from .presupuesto_consultas import PresupuestoConsultasMiddleware
+from .metricas import MetricasMiddleware
+from .trazas import TrazasMiddleware
 
-__all__ = ['AuditMiddleware', 'LoginAuditMiddleware', 'SessionTimeoutMiddleware']
+__all__ = ['AuditMiddleware', 'LoginAuditMiddleware', 'SessionTimeoutMiddleware', 'PresupuestoConsultasMiddleware', 'MetricasMiddleware', 'TrazasMiddleware']
@@ -2,20 +2,55 @@
 Middleware para auditoría de accesos GDPR
 Registra automáticamente acciones sobre datos personales
 """
+import ipaddress
 import logging
+from functools import lru_cache
+
+from django.conf import settings
 from django.utils.deprecation import MiddlewareMixin
 from app.core.models import AuditoriaAcceso
+from app.core.utils.trazas import span
 
 logger = logging.getLogger('audit')
 
 
+@lru_cache(maxsize=8)
+def _redes_confiables(proxies):
+    return tuple(ipaddress.ip_network(proxy.strip(), strict=False) for proxy in proxies if proxy.strip())
+
+
+def _es_confiable(ip, redes):
+    try:
+        direccion = ipaddress.ip_address(ip)
+    except ValueError:
+        return False
+    return any(direccion in red for red in redes)
+
+
 def get_client_ip(request):
-    """Obtiene la IP real del cliente considerando proxies"""
-    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-    if x_forwarded_for:
-        ip = x_forwarded_for.split(',')[0]
-    else:
-        ip = request.META.get('REMOTE_ADDR', '0.0.0.0')
+    """
+    Obtiene la IP real del cliente.
+
+    X-Forwarded-For sólo se tiene en cuenta si la conexión viene de un proxy
+    de PROXIES_CONFIABLES: se recorre de derecha a izquierda saltando esos
+    proxies y la primera IP que no lo es es la del cliente. Sin proxies
+    confiables (o si la petición llega directa) se usa REMOTE_ADDR, porque
+    cualquiera puede enviar la cabecera con la IP que quiera.
+    """
+    ip = request.META.get('REMOTE_ADDR') or '0.0.0.0'
+    redes = _redes_confiables(tuple(getattr(settings, 'PROXIES_CONFIABLES', ())))
+    if not redes or not _es_confiable(ip, redes):
+        return ip
+
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR', '')
+    for salto in reversed([parte.strip() for parte in x_forwarded_for.split(',') if parte.strip()]):
+        try:
+            ipaddress.ip_address(salto)
+        except ValueError:
+            break  # Cabecera malformada: quedarse con el último salto válido
+        ip = salto
+        if not _es_confiable(salto, redes):
+            break
     return ip
 
 
@@ -75,19 +110,20 @@ class AuditMiddleware(MiddlewareMixin):
             
             # Registrar la auditoría de manera asíncrona (no bloquear la request)
             try:
-                AuditoriaAcceso.registrar(
-                    usuario=request.user,
-                    accion=accion,
-                    tabla_afectada=tabla_afectada,
-                    registro_id=registro_id,
-                    ip_address=request.client_ip,
-                    detalles={
-                        'path': path,
-                        'method': request.method,
-                        'view': view_func.__name__,
-                    },
-                    user_agent=request.user_agent
-                )
+                with span('auditoria.registrar', 'auditoria', accion=accion):
+                    AuditoriaAcceso.registrar(
+                        usuario=request.user,
+                        accion=accion,
+                        tabla_afectada=tabla_afectada,
+                        registro_id=registro_id,
+                        ip_address=request.client_ip,
+                        detalles={
+                            'path': path,
+                            'method': request.method,
+                            'view': view_func.__name__,
+                        },
+                        user_agent=request.user_agent
+                    )
                 
                 # Log adicional en archivo
                 logger.info(
@@ -162,30 +198,22 @@ class LoginAuditMiddleware(MiddlewareMixin):
             accion = 'LOGIN' if exitoso else 'LOGIN_FAILED'
             
             try:
-                from django.contrib.auth import get_user_model
-                User = get_user_model()
-                
-                # Intentar obtener el usuario
-                usuario = None
-                if exitoso and request.user.is_authenticated:
-                    usuario = request.user
-                else:
-                    # Para fallos, intentar obtener el usuario por username
-                    try:
-                        usuario = User.objects.get(username=attempt['username'])
-                    except User.DoesNotExist:
-                        pass
+                # En los fallos no se busca el usuario en la BD (evita una
+                # consulta por intento durante ataques de fuerza bruta); el
+                # nombre intentado queda en `detalles`
+                usuario = request.user if exitoso and request.user.is_authenticated else None
                 
-                AuditoriaAcceso.registrar(
-                    usuario=usuario,
-                    accion=accion,
-                    tabla_afectada='Auth',
-                    ip_address=attempt['ip_address'],
-                    exitoso=exitoso,
-                    mensaje_error='' if exitoso else 'Credenciales inválidas',
-                    user_agent=attempt['user_agent'],
-                    detalles={'username_attempt': attempt['username']}
-                )
+                with span('auditoria.registrar', 'auditoria', accion=accion):
+                    AuditoriaAcceso.registrar(
+                        usuario=usuario,
+                        accion=accion,
+                        tabla_afectada='Auth',
+                        ip_address=attempt['ip_address'],
+                        exitoso=exitoso,
+                        mensaje_error='' if exitoso else 'Credenciales inválidas',
+                        user_agent=attempt['user_agent'],
+                        detalles={'username_attempt': attempt['username']}
+                    )
                 
                 logger.info(
                     f"AUTH: {'SUCCESS' if exitoso else 'FAILED'} - "
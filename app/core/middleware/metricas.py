@@ -0,0 +1,62 @@
+"""
+Middleware de métricas de peticiones (ver app/core/utils/metricas.py).
+"""
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from app.core.utils.metricas import CONSULTAS_PETICION, DURACION_CONSULTAS, PETICIONES
+
+
+class _ContadorConsultas:
+    """execute_wrapper mínimo: número de consultas y tiempo de BD."""
+
+    def __init__(self):
+        self.total = 0
+        self.tiempo = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.tiempo += time.perf_counter() - inicio
+            self.total += 1
+
+
+class MetricasMiddleware:
+    """
+    Observa la latencia de cada petición por nombre de URL, método y clase
+    de código de estado, y sus consultas y tiempo de BD. Las rutas sin
+    nombre se agrupan para no disparar la cardinalidad. Se desactiva con
+    METRICAS_ACTIVAS = False.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICAS_ACTIVAS', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        consultas = _ContadorConsultas()
+        inicio = time.perf_counter()
+        with ExitStack() as pila:
+            for conexion in connections.all():
+                pila.enter_context(conexion.execute_wrapper(consultas))
+            response = self.get_response(request)
+        duracion = time.perf_counter() - inicio
+
+        coincidencia = request.resolver_match
+        if coincidencia is None:
+            vista = 'sin_ruta'
+        else:
+            vista = coincidencia.view_name or 'sin_nombre'
+
+        PETICIONES.observar(duracion, vista=vista, metodo=request.method, codigo=f'{response.status_code // 100}xx')
+        CONSULTAS_PETICION.observar(consultas.total, vista=vista)
+        DURACION_CONSULTAS.observar(consultas.tiempo, vista=vista)
+        return response
+
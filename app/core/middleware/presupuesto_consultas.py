@@ -0,0 +1,38 @@
+"""
+Middleware opcional de presupuesto de consultas (ver
+app/core/utils/presupuesto_consultas.py).
+"""
+import logging
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from app.core.utils.presupuesto_consultas import RegistroConsultas
+
+logger = logging.getLogger(__name__)
+
+
+class PresupuestoConsultasMiddleware:
+    """
+    Cuenta las consultas y el tiempo de BD de cada petición, avisa en el log
+    de los presupuestos superados y de los posibles N+1 y, en DEBUG, añade
+    la cabecera Server-Timing. Sólo se activa con PRESUPUESTO_CONSULTAS_ACTIVO.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PRESUPUESTO_CONSULTAS_ACTIVO', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        registro = RegistroConsultas()
+        with registro.vigilar():
+            response = self.get_response(request)
+
+        vista = request.resolver_match.view_name if request.resolver_match else request.path
+        for problema in registro.revisar(vista):
+            logger.warning(f"⚠️ {problema}")
+
+        if settings.DEBUG:
+            response['Server-Timing'] = registro.server_timing()
+        return response
@@ -2,6 +2,8 @@
 Middleware de seguridad para timeout de sesión
 """
 import logging
+from django.conf import settings
+from django.core.cache import cache
 from django.utils import timezone
 from django.contrib.auth import logout
 from django.shortcuts import redirect
@@ -9,6 +11,8 @@ from django.urls import reverse
 from django.contrib import messages
 from django.utils.deprecation import MiddlewareMixin
 
+from app.core.utils.cache_compartida import es_base_de_datos
+
 logger = logging.getLogger(__name__)
 
 
@@ -16,23 +20,48 @@ class SessionTimeoutMiddleware(MiddlewareMixin):
     """
     Middleware para cerrar sesión automáticamente después de 30 minutos de inactividad.
     
-    Funciona registrando la última actividad del usuario en la sesión y comparándola
-    con el tiempo actual. Si han pasado más de 30 minutos, cierra la sesión.
+    Funciona registrando la última actividad del usuario y comparándola con el
+    tiempo actual. Si han pasado más de 30 minutos, cierra la sesión.
+    
+    Para no guardar la sesión en cada petición (llamadas de los juegos,
+    sondeo de notificaciones...), la última actividad se lleva en la caché y
+    sólo se persiste en `request.session['last_activity']` cuando el valor
+    guardado tiene más de SESSION_ACTIVITY_GRANULARITY segundos. Si la caché
+    no tiene el dato (expiró, se vació) se usa el de la sesión, que como
+    mucho va retrasado esa granularidad. Con la caché en BD no se usa: cada
+    lectura y escritura sería otra consulta por petición, y la sesión sola
+    ya da la precisión de la granularidad.
     """
     
     # Timeout en segundos (30 minutos = 1800 segundos)
-    TIMEOUT = 1800
+    TIMEOUT = getattr(settings, 'SESSION_INACTIVITY_TIMEOUT', 1800)
+    # Cada cuánto se persiste la actividad en la sesión (segundos)
+    GRANULARIDAD = getattr(settings, 'SESSION_ACTIVITY_GRANULARITY', 60)
+    
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.usar_cache = not es_base_de_datos()
+    
+    def _clave_cache(self, request):
+        if not self.usar_cache:
+            return None
+        session_key = request.session.session_key
+        return f'sesion_actividad:{session_key}' if session_key else None
     
     def process_request(self, request):
         """Verifica la inactividad del usuario"""
         # Solo aplicar a usuarios autenticados
         if request.user.is_authenticated:
-            # Obtener el timestamp de última actividad
-            last_activity = request.session.get('last_activity')
+            now = timezone.now().timestamp()
+            clave = self._clave_cache(request)
+            
+            # Última actividad: la más reciente entre la caché y la sesión
+            last_activity_sesion = request.session.get('last_activity')
+            last_activity_cache = cache.get(clave) if clave else None
+            last_activity = max(filter(None, [last_activity_sesion, last_activity_cache]), default=None)
             
             if last_activity:
                 # Calcular tiempo transcurrido
-                now = timezone.now().timestamp()
                 elapsed_time = now - last_activity
                 
                 # Si han pasado más de 30 minutos, cerrar sesión
@@ -45,13 +74,20 @@ class SessionTimeoutMiddleware(MiddlewareMixin):
                         '⏱️ Tu sesión ha expirado por inactividad (30 minutos). Por favor, inicia sesión nuevamente.'
                     )
                     
+                    if clave:
+                        cache.delete(clave)
+                    
                     # Cerrar sesión
                     logout(request)
                     
                     # Redirigir al login
                     return redirect(reverse('core:login'))
             
-            # Actualizar timestamp de última actividad
-            request.session['last_activity'] = timezone.now().timestamp()
+            # Actualizar la última actividad: siempre en caché, en la sesión
+            # (escritura en BD) sólo cuando el valor guardado ya es antiguo
+            if clave:
+                cache.set(clave, now, self.TIMEOUT)
+            if not last_activity_sesion or now - last_activity_sesion >= self.GRANULARIDAD:
+                request.session['last_activity'] = now
         
         return None
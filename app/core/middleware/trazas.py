@@ -0,0 +1,37 @@
+"""
+Middleware de trazas por petición (ver app/core/utils/trazas.py).
+"""
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from app.core.utils.trazas import consulta_trazada, span
+
+
+class TrazasMiddleware:
+    """
+    Abre el span raíz de cada petición (renombrado con el nombre de URL al
+    resolverse) y traza sus consultas a la BD. Añade la cabecera X-Traza-Id
+    para localizar la traza en TRAZAS_ARCHIVO. Sólo con TRAZAS_ACTIVAS.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'TRAZAS_ACTIVAS', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with span(f'{request.method} {request.path}', 'vista', metodo=request.method, ruta=request.path) as raiz:
+            with ExitStack() as pila:
+                for conexion in connections.all():
+                    pila.enter_context(conexion.execute_wrapper(consulta_trazada))
+                response = self.get_response(request)
+
+            if request.resolver_match and request.resolver_match.view_name:
+                raiz.nombre = f'{request.method} {request.resolver_match.view_name}'
+            raiz.fijar(estado=response.status_code)
+
+        response['X-Traza-Id'] = raiz.traza.id
+        return response
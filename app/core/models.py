@@ -6,6 +6,8 @@ from django.conf import settings
 from django.utils import timezone
 import json
 
+from .utils.thumbnails import url_miniatura
+
 # Importar constantes
 from .constants import (
     GENERO_CHOICES,
@@ -38,6 +40,14 @@ class Nino(models.Model):
         null=True,
         blank=True
         )
+    imagen_hash = models.CharField(
+        max_length=40,
+        blank=True,
+        default='',
+        editable=False,
+        verbose_name="Hash de la imagen",
+        help_text="SHA-1 de la imagen, nombra sus miniaturas (ver utils.thumbnails)"
+    )
     genero = models.CharField(
         max_length=20, 
         choices=GENERO_CHOICES,
@@ -54,6 +64,34 @@ class Nino(models.Model):
     )
     fecha_registro = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Registro")
     activo = models.BooleanField(default=DEFAULTS['nino_activo'], verbose_name="Activo")
+
+    # Resumen desnormalizado de sus evaluaciones (ver utils/resumen_nino.py)
+    total_evaluaciones = models.PositiveIntegerField(
+        default=0,
+        db_index=True,
+        verbose_name="Total de Evaluaciones"
+    )
+    fecha_ultima_evaluacion = models.DateTimeField(
+        null=True,
+        blank=True,
+        db_index=True,
+        verbose_name="Última Evaluación"
+    )
+    ultimo_nivel_riesgo = models.CharField(
+        max_length=20,
+        choices=CLASIFICACION_RIESGO_CHOICES,
+        blank=True,
+        db_index=True,
+        verbose_name="Último Nivel de Riesgo"
+    )
+    ultima_precision = models.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        db_index=True,
+        verbose_name="Última Precisión (%)"
+    )
     
     class Meta:
         verbose_name = "Niño"
@@ -68,8 +106,13 @@ class Nino(models.Model):
         return f"{self.nombres} {self.apellidos}"
 
     def cantidad_juegos(self):
-        """Retorna la cantidad de juegos asociados a este niño"""
-        return self.juego_set.count()
+        """Retorna la cantidad de sesiones de juego de todas sus evaluaciones"""
+        from app.games.models import SesionJuego
+        return SesionJuego.objects.filter(evaluacion__nino=self).count()
+
+    def thumbnail_url(self, size='sm', formato='webp'):
+        """URL de la miniatura de la imagen del niño (ver utils.thumbnails)"""
+        return url_miniatura(self.imagen, size, formato)
 
 # Modelo de usuario personalizado usando AbstractUser de Django
 class Profesional(AbstractUser):
@@ -85,6 +128,14 @@ class Profesional(AbstractUser):
         null=True,
         blank=True
     )
+    imagen_hash = models.CharField(
+        max_length=40,
+        blank=True,
+        default='',
+        editable=False,
+        verbose_name="Hash de la imagen",
+        help_text="SHA-1 de la imagen, nombra sus miniaturas (ver utils.thumbnails)"
+    )
     especialidad = models.CharField(max_length=100, verbose_name="Especialidad", blank=True)
     numero_licencia = models.CharField(max_length=100, unique=True, verbose_name="Número de Licencia", null=True, blank=True)
     rol = models.CharField(
@@ -119,6 +170,10 @@ class Profesional(AbstractUser):
             return f"{self.first_name} {self.last_name}"
         return self.username
 
+    def thumbnail_url(self, size='sm', formato='webp'):
+        """URL de la miniatura de la imagen del profesional (ver utils.thumbnails)"""
+        return url_miniatura(self.imagen, size, formato)
+
 class ReporteIA(models.Model):
     """Modelo para almacenar reportes generados por IA"""
     
@@ -154,7 +209,7 @@ class ReporteIA(models.Model):
         verbose_name="Métricas Relevantes",
         help_text="Métricas clave del análisis"
     )
-    fecha_generacion = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Generación")
+    fecha_generacion = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="Fecha de Generación")
     
     class Meta:
         verbose_name = "Reporte IA"
@@ -208,6 +263,7 @@ class Cita(models.Model):
     nombre_paciente = models.CharField(max_length=200, verbose_name="Nombre del Paciente")
     email_padres = models.EmailField(max_length=254, null=True, blank=True, verbose_name="Email de los Padres")
     foto_paciente = models.ImageField(upload_to='pacientes/', null=True, blank=True, verbose_name="Foto del Paciente")
+    foto_paciente_hash = models.CharField(max_length=40, blank=True, default='', editable=False, verbose_name="Hash de la foto")
     fecha = models.DateField(verbose_name="Fecha de la Cita")
     hora = models.TimeField(verbose_name="Hora de la Cita")
     notas = models.TextField(blank=True, null=True, verbose_name="Notas adicionales")
@@ -219,10 +275,18 @@ class Cita(models.Model):
         verbose_name = "Cita"
         verbose_name_plural = "Citas"
         ordering = ['fecha', 'hora']
+        indexes = [
+            # Agenda y notificaciones de un profesional
+            models.Index(fields=['usuario', 'fecha', 'completada']),
+        ]
 
     def __str__(self):
         return f"{self.nombre_paciente} - {self.fecha} {self.hora}"
 
+    def thumbnail_url(self, size='sm', formato='webp'):
+        """URL de la miniatura de la foto del paciente (ver utils.thumbnails)"""
+        return url_miniatura(self.foto_paciente, size, formato)
+
 
 # ============================================
 # MODELOS PARA CUMPLIMIENTO GDPR
@@ -490,7 +554,7 @@ class AuditoriaAcceso(models.Model):
     )
     
     # Contexto de la acción
-    timestamp = models.DateTimeField(auto_now_add=True, verbose_name="Fecha y Hora")
+    timestamp = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="Fecha y Hora")
     ip_address = models.GenericIPAddressField(verbose_name="Dirección IP")
     user_agent = models.TextField(blank=True, verbose_name="User Agent")
     
@@ -553,6 +617,37 @@ class AuditoriaAcceso(models.Model):
         )
 
 
+
+class SegmentoAuditoria(models.Model):
+    """
+    Segmento del archivo de auditoría: registros de AuditoriaAcceso de un
+    mes ya cerrado, movidos a un fichero JSONL comprimido bajo
+    AUDITORIA_ARCHIVO_DIR (ver app/core/utils/auditoria_archivo.py).
+    La tabla caliente sólo conserva los meses recientes.
+    """
+    mes = models.DateField(db_index=True, verbose_name="Mes", help_text="Primer día del mes archivado")
+    archivo = models.CharField(max_length=255, verbose_name="Archivo", help_text="Ruta relativa a AUDITORIA_ARCHIVO_DIR")
+    registros = models.PositiveIntegerField(default=0, verbose_name="Registros")
+    id_min = models.PositiveBigIntegerField(default=0, verbose_name="ID Mínimo")
+    id_max = models.PositiveBigIntegerField(default=0, verbose_name="ID Máximo")
+    fecha_min = models.DateTimeField(null=True, blank=True, verbose_name="Primer Registro")
+    fecha_max = models.DateTimeField(null=True, blank=True, verbose_name="Último Registro")
+    usuarios = models.JSONField(
+        default=list,
+        verbose_name="Usuarios",
+        help_text="IDs de los usuarios con registros en el segmento"
+    )
+    tamano_bytes = models.PositiveBigIntegerField(default=0, verbose_name="Tamaño (bytes)")
+    fecha_archivado = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Archivado")
+
+    class Meta:
+        verbose_name = "Segmento de Auditoría Archivado"
+        verbose_name_plural = "Segmentos de Auditoría Archivados"
+        ordering = ['-mes', '-id_max']
+
+    def __str__(self):
+        return f"Auditoría {self.mes.strftime('%m/%Y')} ({self.registros} registros)"
+
 class PoliticaRetencionDatos(models.Model):
     """
     Modelo para definir políticas de retención de datos
@@ -584,6 +679,17 @@ class PoliticaRetencionDatos(models.Model):
         verbose_name="Acción al Vencer"
     )
     activa = models.BooleanField(default=True, verbose_name="Política Activa")
+    progreso = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name="Progreso de Aplicación",
+        help_text="Último ID procesado por modelo en una ejecución interrumpida de aplicar_retencion"
+    )
+    fecha_ultima_aplicacion = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Última Aplicación Completa"
+    )
     fecha_creacion = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Creación")
     fecha_actualizacion = models.DateTimeField(auto_now=True, verbose_name="Fecha de Actualización")
     
@@ -639,7 +745,9 @@ class LoginAttempt(models.Model):
     @classmethod
     def obtener_intentos_recientes(cls, username, minutos=30):
         """
-        Obtiene el número de intentos fallidos en los últimos X minutos
+        Obtiene el número de intentos fallidos en los últimos X minutos.
+        Consulta la tabla: usar sólo para análisis; el login usa
+        app/core/utils/login_throttle.py.
         """
         desde = timezone.now() - timezone.timedelta(minutes=minutos)
         return cls.objects.filter(
@@ -649,38 +757,239 @@ class LoginAttempt(models.Model):
         ).count()
     
     @classmethod
-    def esta_bloqueado(cls, username, max_intentos=5, minutos=30):
+    def esta_bloqueado(cls, username, ip_address=''):
         """
         Verifica si una cuenta está bloqueada por múltiples intentos fallidos
+        (consulta la caché, no la tabla)
         """
-        intentos = cls.obtener_intentos_recientes(username, minutos)
-        return intentos >= max_intentos
+        from .utils.login_throttle import esta_bloqueado
+        return esta_bloqueado(username, ip_address)
     
     @classmethod
-    def obtener_tiempo_restante_bloqueo(cls, username, minutos=30):
+    def obtener_tiempo_restante_bloqueo(cls, username, ip_address=''):
         """
-        Obtiene el tiempo restante de bloqueo en minutos
+        Obtiene el tiempo restante de bloqueo en minutos (desde la caché)
         """
-        desde = timezone.now() - timezone.timedelta(minutes=minutos)
-        primer_intento_fallido = cls.objects.filter(
-            username=username,
-            exitoso=False,
-            timestamp__gte=desde
-        ).order_by('timestamp').first()
-        
-        if primer_intento_fallido:
-            tiempo_transcurrido = timezone.now() - primer_intento_fallido.timestamp
-            tiempo_restante = timezone.timedelta(minutes=minutos) - tiempo_transcurrido
-            return max(0, int(tiempo_restante.total_seconds() / 60))
-        return 0
+        from .utils.login_throttle import tiempo_restante_bloqueo
+        segundos = tiempo_restante_bloqueo(username, ip_address)
+        return -(-segundos // 60)
     
     @classmethod
-    def limpiar_intentos_antiguos(cls, username):
+    def purgar_antiguos(cls, dias=30, lote=5000):
         """
-        Limpia intentos fallidos antiguos (más de 30 minutos)
+        Elimina en bloques los intentos con más de `dias` días.
+        
+        Returns:
+            int: número de registros eliminados
         """
-        desde = timezone.now() - timezone.timedelta(minutes=30)
-        cls.objects.filter(
-            username=username,
-            timestamp__lt=desde
-        ).delete()
+        limite = timezone.now() - timezone.timedelta(days=dias)
+        total = 0
+        while True:
+            ids = list(
+                cls.objects.filter(timestamp__lt=limite)
+                .order_by('id')
+                .values_list('id', flat=True)[:lote]
+            )
+            if not ids:
+                return total
+            total += cls.objects.filter(id__in=ids).delete()[0]
+            if len(ids) < lote:
+                return total
+
+
+class EmailOutbox(models.Model):
+    """
+    Bandeja de salida transaccional de correos.
+
+    Las vistas encolan los correos dentro de la misma transacción que el
+    registro que los origina (p. ej. la Cita) y un proceso en segundo plano
+    los envía por lotes reutilizando una sola conexión SMTP
+    (ver app/core/utils/email_outbox.py).
+    """
+
+    ESTADO_CHOICES = [
+        ('pendiente', 'Pendiente'),
+        ('enviando', 'Enviando'),
+        ('enviado', 'Enviado'),
+        ('fallido', 'Fallido (sin más reintentos)'),
+    ]
+
+    asunto = models.CharField(max_length=255, verbose_name="Asunto")
+    remitente = models.CharField(max_length=254, verbose_name="Remitente")
+    destinatarios = models.JSONField(default=list, verbose_name="Destinatarios")
+    cuerpo_texto = models.TextField(verbose_name="Cuerpo (texto plano)")
+    cuerpo_html = models.TextField(blank=True, verbose_name="Cuerpo (HTML)")
+
+    cita = models.ForeignKey(
+        Cita,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='correos',
+        verbose_name="Cita"
+    )
+
+    estado = models.CharField(
+        max_length=20,
+        choices=ESTADO_CHOICES,
+        default='pendiente',
+        verbose_name="Estado"
+    )
+    intentos = models.PositiveIntegerField(default=0, verbose_name="Intentos")
+    max_intentos = models.PositiveIntegerField(default=5, verbose_name="Máximo de Intentos")
+    proximo_intento = models.DateTimeField(default=timezone.now, verbose_name="Próximo Intento")
+    bloqueado_desde = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Bloqueado Desde",
+        help_text="Momento en que un proceso reclamó el correo para enviarlo"
+    )
+    token_reclamo = models.CharField(
+        max_length=32,
+        blank=True,
+        editable=False,
+        verbose_name="Token de Reclamo",
+        help_text="Identifica el lote del proceso que reclamó el correo"
+    )
+    ultimo_error = models.TextField(blank=True, verbose_name="Último Error")
+
+    fecha_creacion = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Creación")
+    fecha_envio = models.DateTimeField(null=True, blank=True, verbose_name="Fecha de Envío")
+
+    class Meta:
+        verbose_name = "Correo en Bandeja de Salida"
+        verbose_name_plural = "Bandeja de Salida de Correos"
+        ordering = ['-fecha_creacion']
+        indexes = [
+            models.Index(fields=['estado', 'proximo_intento']),
+        ]
+
+    def __str__(self):
+        return f"{self.asunto} → {', '.join(self.destinatarios)} ({self.get_estado_display()})"
+
+    @classmethod
+    def encolar(cls, asunto, destinatarios, cuerpo_texto, cuerpo_html='', cita=None, remitente=None):
+        """
+        Encola un correo para envío en segundo plano.
+        Debe llamarse dentro de la transacción del registro que lo origina.
+        """
+        return cls.objects.create(
+            asunto=asunto,
+            remitente=remitente or settings.DEFAULT_FROM_EMAIL,
+            destinatarios=list(destinatarios),
+            cuerpo_texto=cuerpo_texto,
+            cuerpo_html=cuerpo_html,
+            cita=cita,
+        )
+
+
+class ExportacionDatos(models.Model):
+    """
+    Exportación completa (Artículo 20 GDPR) en un archivo ZIP: datos en JSON
+    más los PDF de los reportes. Se genera fuera del servidor web con
+    `python manage.py procesar_exportaciones` (ver app/core/utils/gdpr_archive.py).
+    """
+
+    ESTADO_CHOICES = [
+        ('pendiente', 'Pendiente'),
+        ('procesando', 'Procesando'),
+        ('completada', 'Completada'),
+        ('fallida', 'Fallida'),
+    ]
+
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='exportaciones',
+        verbose_name="Usuario"
+    )
+    estado = models.CharField(
+        max_length=20,
+        choices=ESTADO_CHOICES,
+        default='pendiente',
+        verbose_name="Estado"
+    )
+    incluir_sesiones = models.BooleanField(default=True, verbose_name="Incluir Sesiones de Juego")
+    incluir_pruebas = models.BooleanField(default=True, verbose_name="Incluir Pruebas Cognitivas")
+    incluir_pdfs = models.BooleanField(default=True, verbose_name="Incluir PDF de Reportes")
+
+    progreso = models.PositiveSmallIntegerField(default=0, verbose_name="Progreso (%)")
+    paso_actual = models.CharField(max_length=200, blank=True, verbose_name="Paso Actual")
+    archivo = models.FileField(
+        upload_to='exportaciones/',
+        null=True,
+        blank=True,
+        verbose_name="Archivo ZIP"
+    )
+    tamano_bytes = models.PositiveBigIntegerField(default=0, verbose_name="Tamaño (bytes)")
+    error = models.TextField(blank=True, verbose_name="Error")
+    descargada = models.BooleanField(default=False, verbose_name="Descargada")
+
+    fecha_solicitud = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Solicitud")
+    fecha_inicio = models.DateTimeField(null=True, blank=True, verbose_name="Fecha de Inicio")
+    fecha_fin = models.DateTimeField(null=True, blank=True, verbose_name="Fecha de Finalización")
+
+    class Meta:
+        verbose_name = "Exportación de Datos"
+        verbose_name_plural = "Exportaciones de Datos"
+        ordering = ['-fecha_solicitud']
+        indexes = [
+            models.Index(fields=['usuario', 'estado']),
+        ]
+
+    def __str__(self):
+        return f"Exportación {self.id} - {self.usuario} ({self.get_estado_display()})"
+
+    @property
+    def en_curso(self):
+        return self.estado in ('pendiente', 'procesando')
+
+
+class PurgaCuenta(models.Model):
+    """
+    Eliminación en segundo plano de una cuenta y todos sus datos.
+
+    La cuenta se desactiva al solicitarla y los datos se borran por lotes,
+    tabla a tabla empezando por las hojas (ver app/core/utils/purga.py).
+    Guarda el ID y el nombre de usuario en lugar de una FK porque el
+    profesional deja de existir al terminar.
+    """
+
+    ESTADO_CHOICES = [
+        ('pendiente', 'Pendiente'),
+        ('procesando', 'Procesando'),
+        ('completada', 'Completada'),
+        ('fallida', 'Fallida'),
+    ]
+
+    usuario_id = models.PositiveIntegerField(db_index=True, verbose_name="ID del Profesional")
+    username = models.CharField(max_length=150, verbose_name="Nombre de Usuario")
+    estado = models.CharField(
+        max_length=20,
+        choices=ESTADO_CHOICES,
+        default='pendiente',
+        verbose_name="Estado"
+    )
+    conteos = models.JSONField(default=dict, verbose_name="Registros a Eliminar")
+    progreso = models.JSONField(default=dict, verbose_name="Registros Eliminados")
+    error = models.TextField(blank=True, verbose_name="Error")
+
+    fecha_solicitud = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Solicitud")
+    fecha_inicio = models.DateTimeField(null=True, blank=True, verbose_name="Fecha de Inicio")
+    fecha_fin = models.DateTimeField(null=True, blank=True, verbose_name="Fecha de Finalización")
+
+    class Meta:
+        verbose_name = "Eliminación de Cuenta"
+        verbose_name_plural = "Eliminaciones de Cuentas"
+        ordering = ['-fecha_solicitud']
+
+    def __str__(self):
+        return f"Eliminación de {self.username} ({self.get_estado_display()})"
+
+    @property
+    def porcentaje(self):
+        # Los conteos son previos y algunos pasos se solapan (validaciones)
+        if self.estado == 'completada':
+            return 100
+        total = sum(self.conteos.values())
+        return min(99, sum(self.progreso.values()) * 100 // total) if total else 0
@@ -1,4 +1,5 @@
-from django.db.models.signals import post_migrate
+from django.db import transaction
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_save
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
 from datetime import date
@@ -101,3 +102,103 @@ def crear_nino_ejemplo(sender, **kwargs):
     except Exception as e:
         print(f"❌ Error creando niño de ejemplo: {e}")
         print("🔧 Verifica que las migraciones se hayan ejecutado correctamente")
+
+
+def _olvidar_hash_si_cambia(campo):
+    """Una imagen nueva o borrada invalida el hash (y las miniaturas) de la fila"""
+    from .utils.thumbnails import campo_hash
+
+    if not campo or not campo._committed:
+        setattr(campo.instance, campo_hash(campo), '')
+
+
+def _programar_miniaturas_al_guardar(campo):
+    """Genera las miniaturas de una imagen subida cuando se confirma la transacción"""
+    from .utils.thumbnails import programar_miniaturas
+
+    if campo:
+        transaction.on_commit(lambda: programar_miniaturas(campo))
+
+
+@receiver(pre_save, sender='core.Nino')
+@receiver(pre_save, sender='core.Profesional')
+@receiver(pre_save, sender='games.Juego')
+def hash_imagen(sender, instance, **kwargs):
+    _olvidar_hash_si_cambia(instance.imagen)
+
+
+@receiver(pre_save, sender='core.Cita')
+def hash_foto_cita(sender, instance, **kwargs):
+    _olvidar_hash_si_cambia(instance.foto_paciente)
+
+
+@receiver(post_save, sender='core.Nino')
+def miniaturas_nino(sender, instance, **kwargs):
+    _programar_miniaturas_al_guardar(instance.imagen)
+
+
+@receiver(post_save, sender='core.Profesional')
+def miniaturas_profesional(sender, instance, **kwargs):
+    _programar_miniaturas_al_guardar(instance.imagen)
+
+
+@receiver(post_save, sender='core.Cita')
+def miniaturas_cita(sender, instance, **kwargs):
+    _programar_miniaturas_al_guardar(instance.foto_paciente)
+
+
+@receiver(post_save, sender='games.Juego')
+def miniaturas_juego(sender, instance, **kwargs):
+    _programar_miniaturas_al_guardar(instance.imagen)
+
+
+@receiver(post_save, sender='games.Evaluacion')
+@receiver(post_delete, sender='games.Evaluacion')
+def resumen_nino_evaluacion(sender, instance, **kwargs):
+    """Recalcula el resumen del niño en la misma transacción que la evaluación"""
+    from .utils.resumen_nino import actualizar_resumen
+
+    actualizar_resumen(instance.nino_id)
+
+
+def _eliminar_pdfs_cache_al_confirmar(reporte_ids):
+    """Borra los PDF en caché de exportaciones cuando se confirma la transacción"""
+    from .utils.gdpr_archive import eliminar_pdfs_cache
+
+    reporte_ids = list(reporte_ids)
+    if reporte_ids:
+        transaction.on_commit(lambda: eliminar_pdfs_cache(reporte_ids))
+
+
+@receiver(post_save, sender='core.ReporteIA')
+@receiver(post_delete, sender='core.ReporteIA')
+def pdf_cache_reporte(sender, instance, **kwargs):
+    _eliminar_pdfs_cache_al_confirmar([instance.pk])
+
+
+@receiver(post_save, sender='core.ValidacionProfesional')
+@receiver(post_delete, sender='core.ValidacionProfesional')
+def pdf_cache_validacion(sender, instance, **kwargs):
+    _eliminar_pdfs_cache_al_confirmar([instance.ReporteIA_id])
+
+
+@receiver(post_save, sender='core.Nino')
+def pdf_cache_nino(sender, instance, created, **kwargs):
+    """El nombre y los datos del niño aparecen en sus reportes"""
+    from .models import ReporteIA
+
+    if not created:
+        _eliminar_pdfs_cache_al_confirmar(
+            ReporteIA.objects.filter(evaluacion__nino=instance).values_list('pk', flat=True)
+        )
+
+
+@receiver(post_save, sender='core.ReporteIA')
+@receiver(post_delete, sender='core.ReporteIA')
+def resumen_nino_reporte(sender, instance, **kwargs):
+    """Recalcula el último nivel de riesgo del niño al guardar o borrar un reporte"""
+    from app.games.models import Evaluacion
+    from .utils.resumen_nino import actualizar_resumen
+
+    nino_id = Evaluacion.objects.filter(pk=instance.evaluacion_id).values_list('nino_id', flat=True).first()
+    actualizar_resumen(nino_id)
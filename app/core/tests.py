@@ -1,3 +1,383 @@
-from django.test import TestCase
+import datetime
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from smtplib import SMTPException
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail
+from django.db import transaction
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from app.core import checks
+from app.core.middleware.audit_middleware import get_client_ip
+from app.core.models import Cita, EmailOutbox, Nino, Profesional, ReporteIA
+from app.core.utils import email_outbox, gdpr_archive, metricas, trazas
+from app.core.utils.purga import purgar_evaluacion
+from app.core.utils.email_utils import encolar_correo_cita_padres
+from app.core.utils.presupuesto_consultas import PresupuestoExcedido, presupuesto_consultas
+from app.games.models import Evaluacion, Juego, PruebaCognitiva, SesionJuego
+
+
+class PresupuestoConsultasTests(TestCase):
+    """Las vistas con presupuesto en PRESUPUESTO_CONSULTAS no lo superan ni hacen N+1."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.profesional = Profesional.objects.create_user('presupuesto', 'presupuesto@example.com', 'x')
+        juegos = list(Juego.objects.all()[:3]) or [
+            Juego.objects.create(nombre=f'Juego {i}', descripcion='-', categoria='visual') for i in range(3)
+        ]
+        for i in range(8):
+            nino = Nino.objects.create(
+                profesional=cls.profesional, nombres=f'Niño {i}', apellidos='Prueba',
+                fecha_nacimiento=datetime.date(2016, 1, 1), edad=9, genero='M', idioma_nativo='es'
+            )
+            for _ in range(2):
+                evaluacion = Evaluacion.objects.create(nino=nino, fecha_hora_inicio=timezone.now())
+                for juego in juegos:
+                    SesionJuego.crear_nueva_sesion(evaluacion, juego)
+                    for numero in range(1, 6):
+                        PruebaCognitiva.objects.create(
+                            evaluacion=evaluacion, juego=juego, numero_prueba=numero,
+                            clics=2, aciertos=1, errores=1, puntaje=10, tiempo_respuesta_ms=900
+                        )
+        cls.nino = nino
+        cls.evaluacion = evaluacion
+
+    def setUp(self):
+        self.client.force_login(self.profesional)
+
+    def get(self, url):
+        response = self.client.get(url, secure=True)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_lista_ninos(self):
+        with presupuesto_consultas('core:lista_ninos'):
+            self.get('/es/lista-ninos/')
+
+    def test_lista_ninos_con_imagenes(self):
+        # Miniaturas generadas (hash en la fila) y pendientes: ninguna consulta por fila
+        for i, nino in enumerate(Nino.objects.filter(profesional=self.profesional).order_by('pk')):
+            Nino.objects.filter(pk=nino.pk).update(
+                imagen=f'ninos/nino-{i}.jpg', imagen_hash='ab' * 20 if i % 2 else ''
+            )
+        with presupuesto_consultas('core:lista_ninos'):
+            response = self.get('/es/lista-ninos/')
+        self.assertContains(response, f"miniaturas/ab/{'ab' * 20}-sm.webp")
+        self.assertContains(response, 'ninos/nino-0.jpg')
+
+    def test_historico_nino(self):
+        with presupuesto_consultas('core:historico_nino'):
+            self.get(f'/es/nino/{self.nino.pk}/historico/')
+
+    def test_lista_sesiones(self):
+        with presupuesto_consultas('games:session_list'):
+            self.get('/es/games/session-list/')
+
+    def test_resultados_evaluacion(self):
+        with presupuesto_consultas('games:sequential_results'):
+            self.get(f'/es/games/results/{self.evaluacion.pk}/')
+
+    def test_detecta_n_mas_1(self):
+        with self.assertRaises(PresupuestoExcedido):
+            with presupuesto_consultas():
+                [nino.profesional for nino in Nino.objects.all()]
+
+
+class MetricasTests(TestCase):
+    """/metrics: acceso sólo para staff y agregación de los ficheros de cada proceso."""
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajustes = override_settings(METRICAS_DIR=directorio.name, METRICAS_TOKEN='secreto')
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.directorio = directorio.name
+
+    def get(self, **cabeceras):
+        return self.client.get('/metrics', secure=True, headers=cabeceras)
+
+    def test_solo_staff_o_token(self):
+        self.assertEqual(self.get().status_code, 403)
+        self.client.force_login(Profesional.objects.create_user('sin_staff', 'a@example.com', 'x'))
+        self.assertEqual(self.get().status_code, 403)
+        self.assertEqual(self.get(Authorization='Bearer otro').status_code, 403)
+        self.assertEqual(self.get(Authorization='Bearer secreto').status_code, 200)
+
+        self.client.force_login(Profesional.objects.create_user('staff', 'b@example.com', 'x', is_staff=True))
+        self.client.get('/es/lista-ninos/', secure=True)
+        texto = self.get().content.decode()
+        self.assertIn('# TYPE dislexia_peticion_duracion_segundos histogram', texto)
+        self.assertIn(
+            'dislexia_peticion_duracion_segundos_bucket{vista="core:lista_ninos",metodo="GET",codigo="2xx",le="+Inf"}',
+            texto
+        )
+        self.assertIn('dislexia_cola_pendiente{cola="correos"} 0', texto)
+
+    def test_agrega_procesos(self):
+        proceso = subprocess.Popen([sys.executable, '-c', 'pass'])
+        proceso.wait()  # PID de un proceso ya terminado
+        for pid, indicador in ((os.getpid() + 1_000_000, None), (proceso.pid, 1)):
+            datos = {'dislexia_prediccion_errores_total': [[[], 2]]}
+            if indicador is not None:
+                datos['dislexia_modelo_cargado'] = [[[], indicador]]
+            with open(os.path.join(self.directorio, f'metricas-{pid}-abcd1234.json'), 'w') as f:
+                json.dump(datos, f)
+
+        metricas.ERRORES_PREDICCION.inc()
+        totales = metricas.agregar()
+        propios = metricas.ERRORES_PREDICCION._valores[()]
+        self.assertEqual(totales['dislexia_prediccion_errores_total'][()], propios + 4)
+        # Los indicadores de procesos terminados no cuentan
+        self.assertNotIn((), totales['dislexia_modelo_cargado'])
+
+        # Los ficheros de los procesos terminados se fusionan una sola vez
+        self.assertEqual(
+            set(os.listdir(self.directorio)),
+            {metricas.ARCHIVO_ACUMULADO, os.path.basename(metricas._ruta_proceso())}
+        )
+        totales = metricas.agregar()
+        self.assertEqual(totales['dislexia_prediccion_errores_total'][()], propios + 4)
+
+    def test_histograma_acumulado(self):
+        histograma = metricas.Histograma('prueba_segundos', 'Prueba', buckets=(0.1, 1))
+        self.addCleanup(metricas._METRICAS.pop, 'prueba_segundos')
+        for valor in (0.05, 0.1, 0.5, 3):
+            histograma.observar(valor)
+        lineas = metricas._lineas_metrica(histograma, {(): histograma._valores[()]})
+        self.assertEqual(lineas[2:], [
+            'prueba_segundos_bucket{le="0.1"} 2',
+            'prueba_segundos_bucket{le="1.0"} 3',
+            'prueba_segundos_bucket{le="+Inf"} 4',
+            'prueba_segundos_sum 3.65',
+            'prueba_segundos_count 4',
+        ])
+
+
+class TrazasTests(TestCase):
+    """Spans anidados por contextvars y muestreo por cabeza o por latencia."""
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.archivo = os.path.join(directorio.name, 'trazas.jsonl')
+        self.ajustes(TRAZAS_MUESTREO=1)
+
+    def ajustes(self, **valores):
+        ajustes = override_settings(TRAZAS_ACTIVAS=True, TRAZAS_ARCHIVO=self.archivo, **valores)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def eventos(self):
+        if not os.path.exists(self.archivo):
+            return []
+        return [evento for eventos in trazas.leer_trazas(self.archivo).values() for evento in eventos]
+
+    def test_spans_anidados(self):
+        with trazas.span('raiz') as raiz:
+            with trazas.span('hijo', 'db', filas=3):
+                pass
+            with self.assertRaises(ValueError):
+                with trazas.span('fallo'):
+                    raise ValueError
+        self.assertIsNone(trazas.span_actual())
+
+        eventos = {evento['name']: evento for evento in self.eventos()}
+        self.assertEqual(set(eventos), {'raiz', 'hijo', 'fallo'})
+        self.assertEqual(eventos['hijo']['args']['padre'], raiz.id)
+        self.assertEqual(eventos['hijo']['args']['filas'], 3)
+        self.assertEqual(eventos['fallo']['args']['error'], 'ValueError')
+        self.assertEqual(eventos['raiz']['args']['motivo'], 'muestreo')
+        self.assertEqual(sum(trazas.tiempo_propio_por_categoria(list(eventos.values())).values()),
+                         eventos['raiz']['dur'])
+
+    def test_muestreo_y_cola(self):
+        self.ajustes(TRAZAS_MUESTREO=0, TRAZAS_UMBRAL_MS=0)
+        with trazas.span('descartada'):
+            pass
+        self.assertEqual(self.eventos(), [])
+
+        self.ajustes(TRAZAS_MUESTREO=0, TRAZAS_UMBRAL_MS=1)
+        with trazas.span('lenta'):
+            time.sleep(0.002)
+        self.assertEqual([evento['args']['motivo'] for evento in self.eventos()], ['lenta'])
+
+    def test_peticion(self):
+        self.client.force_login(Profesional.objects.create_user('trazas', 'c@example.com', 'x'))
+        response = self.client.get('/es/lista-ninos/', secure=True)
+
+        eventos = trazas.leer_trazas(self.archivo)[response['X-Traza-Id']]
+        self.assertEqual(trazas.raiz(eventos)['name'], 'GET core:lista_ninos')
+        self.assertTrue(any(evento['cat'] == 'db' for evento in eventos))
+
+
+class EmailOutboxTests(TestCase):
+    """Bandeja de salida: encolado transaccional, reclamo por lotes, reintentos y fallidos."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.profesional = Profesional.objects.create_user('outbox', 'outbox@example.com', 'x')
+
+    def crear_cita(self):
+        return Cita.objects.create(
+            usuario=self.profesional, nombre_paciente='Paciente', email_padres='padres@example.com',
+            fecha=datetime.date(2025, 1, 15), hora=datetime.time(10, 0)
+        )
+
+    def test_rollback_descarta_cita_y_correos(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                cita = self.crear_cita()
+                encolar_correo_cita_padres(cita.email_padres, cita, self.profesional)
+                raise RuntimeError
+        self.assertFalse(Cita.objects.exists())
+        self.assertFalse(EmailOutbox.objects.exists())
+
+    def test_crear_cita_encola_y_envia_tras_commit(self):
+        self.client.force_login(self.profesional)
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post('/es/citas/crear/', {
+                'nombre_paciente': 'Paciente', 'email_padres': 'padres@example.com',
+                'fecha': '2025-01-15', 'hora': '10:00',
+            }, secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(callbacks, [email_outbox.despertar_envio])
+        self.assertEqual(EmailOutbox.objects.filter(estado='pendiente').count(), 2)
+        self.assertEqual(mail.outbox, [])
+
+        self.assertEqual(email_outbox.procesar_outbox(), {'enviados': 2, 'reintentos': 0, 'fallidos': 0})
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(EmailOutbox.objects.filter(estado='enviado').count(), 2)
+
+    def test_reclamo_unico(self):
+        cita = self.crear_cita()
+        encolar_correo_cita_padres(cita.email_padres, cita, self.profesional)
+        reclamados = email_outbox.reclamar_lote()
+        self.assertEqual(len(reclamados), 1)
+        self.assertTrue(reclamados[0].token_reclamo)
+        self.assertEqual(email_outbox.reclamar_lote(), [])
+
+    def test_reintento_con_backoff_y_fallido(self):
+        cita = self.crear_cita()
+        correo = encolar_correo_cita_padres(cita.email_padres, cita, self.profesional)
+        EmailOutbox.objects.filter(pk=correo.pk).update(max_intentos=2)
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=SMTPException):
+            self.assertEqual(email_outbox.enviar_lote()['reintentos'], 1)
+            correo.refresh_from_db()
+            self.assertEqual(correo.estado, 'pendiente')
+            self.assertGreater(correo.proximo_intento, timezone.now())
+
+            EmailOutbox.objects.filter(pk=correo.pk).update(proximo_intento=timezone.now())
+            self.assertEqual(email_outbox.enviar_lote()['fallidos'], 1)
+        correo.refresh_from_db()
+        self.assertEqual(correo.estado, 'fallido')
+        self.assertEqual(correo.intentos, 2)
+        self.assertEqual(mail.outbox, [])
+
+
+class ClientIpTests(TestCase):
+    """IP del cliente con y sin proxies confiables."""
+
+    def _peticion(self, remote_addr, xff=None):
+        extra = {'REMOTE_ADDR': remote_addr}
+        if xff is not None:
+            extra['HTTP_X_FORWARDED_FOR'] = xff
+        return RequestFactory().get('/', **extra)
+
+    @override_settings(PROXIES_CONFIABLES=[])
+    def test_sin_proxies_ignora_x_forwarded_for(self):
+        peticion = self._peticion('203.0.113.7', xff='1.2.3.4')
+        self.assertEqual(get_client_ip(peticion), '203.0.113.7')
+
+    @override_settings(PROXIES_CONFIABLES=['10.0.0.0/8'])
+    def test_proxy_confiable_usa_el_primer_salto_no_confiable(self):
+        # El cliente antepone una IP falsa; el proxy añade la real al final
+        peticion = self._peticion('10.0.0.2', xff='1.2.3.4, 198.51.100.9, 10.0.0.5')
+        self.assertEqual(get_client_ip(peticion), '198.51.100.9')
+
+    @override_settings(PROXIES_CONFIABLES=['10.0.0.0/8'])
+    def test_conexion_directa_no_confia_en_la_cabecera(self):
+        peticion = self._peticion('198.51.100.9', xff='1.2.3.4')
+        self.assertEqual(get_client_ip(peticion), '198.51.100.9')
+
+
+class CacheCompartidaCheckTests(TestCase):
+    """core.E001: con varios procesos web la caché tiene que ser Redis."""
+
+    def ids(self):
+        return [error.id for error in checks.comprobar_cache_compartida(None)]
+
+    @override_settings(PROCESOS_WEB=1)
+    def test_un_proceso_admite_locmem(self):
+        self.assertEqual(self.ids(), [])
+
+    @override_settings(PROCESOS_WEB=4)
+    def test_varios_procesos_exigen_redis(self):
+        self.assertEqual(self.ids(), ['core.E001'])
+
+    @override_settings(PROCESOS_WEB=4, CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'django_cache',
+    }})
+    def test_la_base_de_datos_no_sirve(self):
+        self.assertEqual(self.ids(), ['core.E001'])
+
+
+class CachePdfReportesTests(TestCase):
+    """Los PDF en caché de las exportaciones no sobreviven a cambios ni borrados."""
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajustes = override_settings(MEDIA_ROOT=directorio.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        os.makedirs(os.path.join(directorio.name, gdpr_archive.DIRECTORIO_CACHE_PDF))
+
+        profesional = Profesional.objects.create_user('pdfcache', 'pdfcache@example.com', 'x')
+        self.nino = Nino.objects.create(
+            profesional=profesional, nombres='Niño', apellidos='Prueba',
+            fecha_nacimiento=datetime.date(2016, 1, 1), edad=9, genero='M', idioma_nativo='es'
+        )
+        self.evaluacion = Evaluacion.objects.create(nino=self.nino, fecha_hora_inicio=timezone.now())
+        self.reporte = ReporteIA.objects.create(
+            evaluacion=self.evaluacion, indice_riesgo=40, clasificacion_riesgo='Bajo',
+            confianza_prediccion=80, caracteristicas_json={}, recomendaciones='-', metricas_relevantes={}
+        )
+        self.ruta = gdpr_archive._ruta_cache_pdf(self.reporte.pk)
+        with open(self.ruta, 'wb') as f:
+            f.write(b'%PDF')
+
+    def test_guardar_reporte_invalida_el_pdf(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.reporte.recomendaciones = 'Nuevas recomendaciones'
+            self.reporte.save()
+        self.assertFalse(os.path.exists(self.ruta))
+
+    def test_cambiar_nino_invalida_el_pdf(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.nino.nombres = 'Otro'
+            self.nino.save()
+        self.assertFalse(os.path.exists(self.ruta))
+
+    def test_purgar_evaluacion_borra_el_pdf(self):
+        purgar_evaluacion(self.evaluacion.pk)
+        self.assertFalse(ReporteIA.objects.filter(pk=self.reporte.pk).exists())
+        self.assertFalse(os.path.exists(self.ruta))
+
+
+class SegmentoAuditoriaAdminTests(TestCase):
+    """La vista de registros archivados exige el permiso de lectura, no sólo is_staff."""
+
+    def test_staff_sin_permiso_recibe_403(self):
+        staff = Profesional.objects.create_user('staffsinpermiso', 'staff@example.com', 'x', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get('/es/admin/core/segmentoauditoria/1/registros/', secure=True)
+        self.assertEqual(response.status_code, 403)
@@ -95,6 +95,8 @@ urlpatterns = [
     
     # Derechos del usuario GDPR
     path('exportar-datos/', views_gdpr.exportar_datos_usuario, name='exportar_datos'),
+    path('exportar-datos/zip/', views_gdpr.solicitar_exportacion_zip, name='solicitar_exportacion_zip'),
+    path('exportar-datos/zip/<int:pk>/', views_gdpr.descargar_exportacion, name='descargar_exportacion'),
     path('consentimientos/', views_gdpr.vista_consentimientos, name='consentimientos'),
     path('consentimientos/revocar/', views_gdpr.revocar_consentimiento, name='revocar_consentimiento'),
     path('historial-auditoria/', views_gdpr.historial_auditoria_usuario, name='historial_auditoria'),
@@ -0,0 +1,163 @@
+"""
+Paginación del admin para tablas muy grandes.
+
+El paginador por defecto ejecuta un COUNT(*) completo en cada carga del
+listado y pagina con OFFSET, que empeora cuanto más atrás se navega.
+Para AuditoriaAcceso, LoginAttempt, Evaluacion y PruebaCognitiva:
+
+- `PaginadorEstimado` toma el total de las estadísticas del motor
+  (sys.dm_db_partition_stats en SQL Server, sqlite_stat1 en SQLite,
+  pg_class en PostgreSQL) cuando el listado no está filtrado, y si no
+  cuenta como mucho LIMITE_CONTEO filas;
+- `ChangeListKeyset` navega con "más recientes / más antiguos" sobre el
+  índice de fecha (`campo_keyset`), con un cursor (fecha, id) en lugar de
+  OFFSET, mientras se use el orden por defecto.
+
+Uso:
+    class AuditoriaAccesoAdmin(PaginacionKeysetMixin, admin.ModelAdmin):
+        campo_keyset = 'timestamp'
+
+y una plantilla admin/<app>/<modelo>/pagination.html que incluya
+admin/paginacion_keyset.html.
+"""
+import logging
+from datetime import datetime
+
+from django.contrib.admin.views.main import ALL_VAR, ORDER_VAR, ChangeList
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections, transaction
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+logger = logging.getLogger('app.core')
+
+LIMITE_CONTEO = 10000
+CURSOR_VAR = 'cursor'
+
+
+def estimar_filas(modelo, alias='default'):
+    """Filas de la tabla según las estadísticas del motor, o None si no hay."""
+    conexion = connections[alias]
+    tabla = modelo._meta.db_table
+
+    if conexion.vendor == 'microsoft':
+        sql = (
+            'SELECT SUM(row_count) FROM sys.dm_db_partition_stats '
+            'WHERE object_id = OBJECT_ID(%s) AND index_id IN (0, 1)'
+        )
+    elif conexion.vendor == 'sqlite':
+        # Sólo existe tras un ANALYZE; la primera cifra es el nº de filas
+        sql = 'SELECT stat FROM sqlite_stat1 WHERE tbl = %s'
+    elif conexion.vendor == 'postgresql':
+        sql = 'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass'
+    else:
+        return None
+
+    try:
+        with transaction.atomic(using=alias), conexion.cursor() as cursor:
+            cursor.execute(sql, [tabla])
+            fila = cursor.fetchone()
+    except DatabaseError:
+        return None
+
+    if not fila or fila[0] is None:
+        return None
+    valor = int(str(fila[0]).split()[0])
+    return valor if valor >= 0 else None
+
+
+class PaginadorEstimado(Paginator):
+    """Paginador que no hace COUNT(*) completos sobre tablas grandes."""
+
+    @cached_property
+    def count(self):
+        qs = self.object_list
+        if not qs.query.where:
+            estimado = estimar_filas(qs.model, qs.db)
+            if estimado is not None and estimado >= LIMITE_CONTEO:
+                return estimado
+        # Con filtros, o tabla pequeña: conteo exacto hasta el límite
+        return qs.order_by()[:LIMITE_CONTEO].count()
+
+
+class ChangeListKeyset(ChangeList):
+    """
+    ChangeList con navegación por cursor sobre `model_admin.campo_keyset`.
+    El cursor es 'a|<fecha>|<id>' (más antiguos que) o 'd|<fecha>|<id>'
+    (más recientes que).
+    """
+
+    def __init__(self, request, *args, **kwargs):
+        self.cursor = request.GET.get(CURSOR_VAR, '')
+        self.enlace_recientes = None
+        self.enlace_antiguos = None
+        super().__init__(request, *args, **kwargs)
+        # Que los enlaces de filtros y columnas no arrastren el cursor
+        self.params.pop(CURSOR_VAR, None)
+        self.filter_params.pop(CURSOR_VAR, None)
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    @property
+    def keyset_activo(self):
+        return bool(self.model_admin.campo_keyset) and ORDER_VAR not in self.params and ALL_VAR not in self.params
+
+    def _leer_cursor(self):
+        try:
+            direccion, valor, pk = self.cursor.split('|')
+            return direccion, datetime.fromisoformat(valor), int(pk)
+        except ValueError:
+            return 'a', None, None
+
+    def _enlace(self, direccion, obj):
+        valor = getattr(obj, self.model_admin.campo_keyset)
+        return self.get_query_string({CURSOR_VAR: f'{direccion}|{valor.isoformat()}|{obj.pk}'})
+
+    def get_results(self, request):
+        if not self.keyset_activo:
+            return super().get_results(request)
+
+        campo = self.model_admin.campo_keyset
+        por_pagina = self.list_per_page
+        direccion, valor, pk = self._leer_cursor()
+        qs = self.queryset
+
+        if direccion == 'd' and valor is not None:
+            qs = qs.filter(Q(**{f'{campo}__gt': valor}) | Q(**{campo: valor, 'pk__gt': pk}))
+            filas = list(qs.order_by(campo, 'pk')[:por_pagina + 1])
+            hay_recientes, hay_antiguos = len(filas) > por_pagina, True
+            filas = filas[:por_pagina][::-1]
+        else:
+            if valor is not None:
+                qs = qs.filter(Q(**{f'{campo}__lt': valor}) | Q(**{campo: valor, 'pk__lt': pk}))
+            filas = list(qs.order_by(f'-{campo}', '-pk')[:por_pagina + 1])
+            hay_recientes, hay_antiguos = valor is not None, len(filas) > por_pagina
+            filas = filas[:por_pagina]
+
+        paginator = self.model_admin.get_paginator(request, self.queryset, por_pagina)
+        self.result_count = paginator.count
+        self.full_result_count = None
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.result_list = filas
+        self.can_show_all = False
+        self.multi_page = hay_recientes or hay_antiguos
+        self.paginator = paginator
+
+        if filas:
+            self.enlace_recientes = self._enlace('d', filas[0]) if hay_recientes else None
+            self.enlace_antiguos = self._enlace('a', filas[-1]) if hay_antiguos else None
+
+
+class PaginacionKeysetMixin:
+    """Mixin de ModelAdmin: total estimado y navegación por cursor."""
+
+    paginator = PaginadorEstimado
+    show_full_result_count = False
+    campo_keyset = None
+
+    def get_changelist(self, request, **kwargs):
+        return ChangeListKeyset
@@ -0,0 +1,274 @@
+"""
+Archivo por meses de AuditoriaAcceso.
+
+La tabla de auditoría es la que más crece: cada petición auditada inserta
+una fila y mantiene tres índices compuestos. Para que la tabla caliente
+(y sus índices) siga siendo pequeña, los meses ya cerrados se mueven a
+segmentos JSONL comprimidos con gzip bajo AUDITORIA_ARCHIVO_DIR:
+
+    <AUDITORIA_ARCHIVO_DIR>/2025/auditoria-2025-01-<id>.jsonl.gz
+
+Cada segmento queda indexado en SegmentoAuditoria (mes, rango de IDs,
+usuarios presentes), de modo que las consultas sólo abren los segmentos
+que pueden contener resultados. `historial_usuario` y la vista de
+archivo del admin combinan tabla caliente y segmentos.
+
+El archivado es reanudable: el fichero se escribe completo antes de
+registrar el segmento, y las filas ya cubiertas por un segmento se borran
+de la tabla caliente por lotes (también al reintentar tras un fallo).
+"""
+import gzip
+import json
+import logging
+import os
+import uuid
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Min
+from django.utils import timezone
+
+from app.core.models import AuditoriaAcceso, SegmentoAuditoria
+
+logger = logging.getLogger('app.core')
+
+CAMPOS = [
+    'id', 'usuario_id', 'accion', 'tabla_afectada', 'registro_id', 'timestamp',
+    'ip_address', 'user_agent', 'detalles', 'exitoso', 'mensaje_error',
+]
+MESES_ACTIVOS = getattr(settings, 'AUDITORIA_MESES_ACTIVOS', 3)
+TAMANO_LOTE = getattr(settings, 'AUDITORIA_ARCHIVO_LOTE', 5000)
+
+
+def directorio():
+    return str(getattr(settings, 'AUDITORIA_ARCHIVO_DIR', os.path.join(settings.BASE_DIR, 'auditoria_archivo')))
+
+
+def _ruta(segmento):
+    return os.path.join(directorio(), segmento.archivo)
+
+
+def _mes_siguiente(mes):
+    return (mes.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def limites_mes(mes):
+    """Inicio y fin (exclusivo) de un mes como datetimes con zona horaria."""
+    desde = timezone.make_aware(datetime.combine(mes, time.min))
+    hasta = timezone.make_aware(datetime.combine(_mes_siguiente(mes), time.min))
+    return desde, hasta
+
+
+def meses_cerrados(meses_activos=MESES_ACTIVOS):
+    """
+    Meses con registros en la tabla caliente anteriores a los
+    `meses_activos` más recientes (el mes en curso cuenta como uno).
+    """
+    corte = timezone.localdate().replace(day=1)
+    for _ in range(max(meses_activos - 1, 0)):
+        corte = (corte - timedelta(days=1)).replace(day=1)
+
+    limite, _ = limites_mes(corte)
+    primero = AuditoriaAcceso.objects.filter(timestamp__lt=limite).aggregate(primero=Min('timestamp'))['primero']
+    if primero is None:
+        return []
+
+    meses = []
+    mes = timezone.localtime(primero).date().replace(day=1)
+    while mes < corte:
+        meses.append(mes)
+        mes = _mes_siguiente(mes)
+    return meses
+
+
+def _borrar_archivados(mes, lote):
+    """Borra de la tabla caliente las filas del mes ya guardadas en segmentos."""
+    desde, hasta = limites_mes(mes)
+    borrados = 0
+    for segmento in SegmentoAuditoria.objects.filter(mes=mes):
+        cubiertos = AuditoriaAcceso.objects.filter(
+            timestamp__gte=desde, timestamp__lt=hasta,
+            pk__gte=segmento.id_min, pk__lte=segmento.id_max,
+        )
+        while True:
+            ids = list(cubiertos.values_list('pk', flat=True)[:lote])
+            if not ids:
+                break
+            borrados += AuditoriaAcceso.objects.filter(pk__in=ids).delete()[0]
+    return borrados
+
+
+def archivar_mes(mes, lote=TAMANO_LOTE):
+    """
+    Mueve los registros de un mes cerrado a un segmento comprimido.
+
+    Returns:
+        SegmentoAuditoria creado, o None si no quedaba nada por archivar
+    """
+    _borrar_archivados(mes, lote)
+
+    desde, hasta = limites_mes(mes)
+    filas = AuditoriaAcceso.objects.filter(timestamp__gte=desde, timestamp__lt=hasta)
+    if not filas.exists():
+        return None
+
+    relativo = os.path.join(f'{mes:%Y}', f'auditoria-{mes:%Y-%m}-{uuid.uuid4().hex[:8]}.jsonl.gz')
+    ruta = os.path.join(directorio(), relativo)
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+
+    registros = 0
+    id_min = id_max = None
+    fecha_min = fecha_max = None
+    usuarios = set()
+
+    temporal = ruta + '.tmp'
+    with gzip.open(temporal, 'wt', encoding='utf-8') as f:
+        for fila in filas.order_by('pk').values(*CAMPOS).iterator(chunk_size=lote):
+            f.write(json.dumps(fila, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n')
+            registros += 1
+            id_min = fila['id'] if id_min is None else id_min
+            id_max = fila['id']
+            fecha_min = min(fecha_min or fila['timestamp'], fila['timestamp'])
+            fecha_max = max(fecha_max or fila['timestamp'], fila['timestamp'])
+            if fila['usuario_id'] is not None:
+                usuarios.add(fila['usuario_id'])
+    os.replace(temporal, ruta)
+
+    segmento = SegmentoAuditoria.objects.create(
+        mes=mes,
+        archivo=relativo,
+        registros=registros,
+        id_min=id_min,
+        id_max=id_max,
+        fecha_min=fecha_min,
+        fecha_max=fecha_max,
+        usuarios=sorted(usuarios),
+        tamano_bytes=os.path.getsize(ruta),
+    )
+    borrados = _borrar_archivados(mes, lote)
+    logger.info(f"🗄️ Auditoría {mes:%m/%Y} archivada: {registros} registros en {relativo} ({borrados} borrados de la tabla)")
+    return segmento
+
+
+def leer_segmento(segmento):
+    """Filas (dict) de un segmento, en orden de ID."""
+    with gzip.open(_ruta(segmento), 'rt', encoding='utf-8') as f:
+        for linea in f:
+            fila = json.loads(linea)
+            fila['timestamp'] = datetime.fromisoformat(fila['timestamp'])
+            yield fila
+
+
+def instancias(filas, usuarios=None):
+    """
+    Convierte filas archivadas en objetos AuditoriaAcceso (sin guardar),
+    con el usuario ya resuelto. Los usuarios que ya no existen quedan en
+    None, como haría SET_NULL en la tabla caliente.
+    """
+    filas = list(filas)
+    if usuarios is None:
+        from app.core.models import Profesional
+        ids = {fila['usuario_id'] for fila in filas if fila['usuario_id'] is not None}
+        usuarios = Profesional.objects.in_bulk(ids) if ids else {}
+
+    objetos = []
+    for fila in filas:
+        usuario = usuarios.get(fila['usuario_id'])
+        obj = AuditoriaAcceso(**{**fila, 'usuario_id': usuario.pk if usuario else None})
+        obj.usuario = usuario
+        obj.archivado = True
+        objetos.append(obj)
+    return objetos
+
+
+def historial_usuario(usuario, limite=50):
+    """
+    Últimos `limite` registros del usuario, de la tabla caliente y, si no
+    bastan, de los segmentos archivados donde aparece (del más reciente al
+    más antiguo).
+    """
+    resultado = list(
+        AuditoriaAcceso.objects.filter(usuario=usuario).order_by('-timestamp')[:limite]
+    )
+    if len(resultado) >= limite:
+        return resultado
+
+    segmentos = SegmentoAuditoria.objects.only('id', 'archivo', 'usuarios').order_by('-mes', '-id_max')
+    for segmento in segmentos:
+        if usuario.pk not in segmento.usuarios:
+            continue
+        filas = [fila for fila in leer_segmento(segmento) if fila['usuario_id'] == usuario.pk]
+        filas.reverse()
+        resultado += instancias(filas[:limite - len(resultado)], usuarios={usuario.pk: usuario})
+        if len(resultado) >= limite:
+            break
+    return resultado
+
+
+def buscar(segmento, usuario_id=None, accion=None, texto=None, desde=0, cantidad=100):
+    """
+    Filtra un segmento en una sola pasada.
+
+    Returns:
+        (total de coincidencias, filas desde `desde` hasta `desde + cantidad`)
+    """
+    total = 0
+    pagina = []
+    for fila in leer_segmento(segmento):
+        if usuario_id is not None and fila['usuario_id'] != usuario_id:
+            continue
+        if accion and fila['accion'] != accion:
+            continue
+        if texto and texto not in fila['tabla_afectada'] and texto != fila['ip_address'] and texto != str(fila['registro_id']):
+            continue
+        if desde <= total < desde + cantidad:
+            pagina.append(fila)
+        total += 1
+    return total, pagina
+
+
+def _segmentos_vencidos(politica):
+    limite = timezone.now() - timedelta(days=politica.dias_retencion)
+    segmentos = SegmentoAuditoria.objects.filter(fecha_max__lt=limite)
+    if politica.accion_al_vencer == 'anonimizar':
+        # Los ya anonimizados no conservan usuarios
+        segmentos = segmentos.exclude(usuarios=[])
+    return segmentos
+
+
+def contar_vencidos_archivo(politica):
+    """Registros archivados pendientes de la política (dry-run)."""
+    return sum(_segmentos_vencidos(politica).values_list('registros', flat=True))
+
+
+def aplicar_politica_archivo(politica):
+    """
+    Aplica la política de retención de auditorías a los segmentos cuyos
+    registros han vencido por completo. Devuelve los registros afectados.
+    """
+    procesados = 0
+    for segmento in _segmentos_vencidos(politica):
+        if politica.accion_al_vencer == 'eliminar':
+            if os.path.exists(_ruta(segmento)):
+                os.remove(_ruta(segmento))
+            segmento.delete()
+        else:
+            _anonimizar_segmento(segmento)
+        procesados += segmento.registros
+    return procesados
+
+
+def _anonimizar_segmento(segmento):
+    """Reescribe el segmento sin datos personales (mismos criterios que retencion.py)."""
+    ruta = _ruta(segmento)
+    temporal = ruta + '.tmp'
+    with gzip.open(temporal, 'wt', encoding='utf-8') as f:
+        for fila in leer_segmento(segmento):
+            fila.update(usuario_id=None, ip_address='0.0.0.0', user_agent='', detalles=None)
+            f.write(json.dumps(fila, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n')
+    os.replace(temporal, ruta)
+
+    segmento.usuarios = []
+    segmento.tamano_bytes = os.path.getsize(ruta)
+    segmento.save(update_fields=['usuarios', 'tamano_bytes'])
@@ -0,0 +1,21 @@
+"""
+Comprobaciones sobre la caché configurada en CACHES.
+
+Los límites de login y de tasa guardan sus contadores en la caché: con
+varios procesos web sólo son correctos si todos comparten la misma (Redis),
+no con LocMem, que es por proceso.
+"""
+from django.core.cache import caches
+from django.core.cache.backends.db import DatabaseCache
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+
+def es_compartida(alias='default'):
+    """La caché la ven todos los procesos (no es LocMem ni Dummy)."""
+    return not isinstance(caches[alias], (LocMemCache, DummyCache))
+
+
+def es_base_de_datos(alias='default'):
+    """La caché es la tabla de BD: cada operación es una consulta."""
+    return isinstance(caches[alias], DatabaseCache)
@@ -0,0 +1,26 @@
+"""
+Utilidades de consultas compartidas por vistas y admin.
+"""
+from django.db.models import OuterRef, Subquery
+
+
+def subconsulta_agregada(queryset, campo_fk, agregado):
+    """
+    Subconsulta correlacionada con un agregado de `queryset` por `campo_fk`.
+
+    Permite anotar totales de relaciones inversas sin GROUP BY en la
+    consulta principal: no multiplica filas al anotar varias relaciones y
+    evita agrupar por columnas de texto largas (no admitido en SQL Server).
+
+    Ejemplo:
+        Nino.objects.annotate(
+            total=subconsulta_agregada(Evaluacion.objects.all(), 'nino', Count('pk'))
+        )
+    """
+    return Subquery(
+        queryset.filter(**{campo_fk: OuterRef('pk')})
+        .order_by()
+        .values(campo_fk)
+        .annotate(valor=agregado)
+        .values('valor')[:1]
+    )
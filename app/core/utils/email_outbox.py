@@ -0,0 +1,211 @@
+"""
+Envío en segundo plano de la bandeja de salida de correos (EmailOutbox).
+
+- Los correos pendientes se reclaman por lotes (estado 'enviando') para que
+  varios procesos no envíen el mismo correo.
+- Cada lote abre UNA conexión con `get_connection()` y la reutiliza para
+  todos sus mensajes con `send_messages`.
+- Un fallo reprograma el correo con backoff exponencial; al agotar los
+  intentos queda en estado 'fallido' (dead letter) para revisión manual.
+
+Se ejecuta con `python manage.py procesar_outbox` (cron o --loop) y, si
+EMAIL_OUTBOX_HILO está activo, también en un hilo del propio proceso web
+justo después de encolar.
+"""
+import logging
+import random
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import connections, transaction
+from django.utils import timezone
+
+from app.core.utils.metricas import DURACION_CORREO
+from app.core.utils.trazas import span
+
+logger = logging.getLogger('app.core')
+
+TAMANO_LOTE = getattr(settings, 'EMAIL_OUTBOX_LOTE', 50)
+BACKOFF_BASE_SEGUNDOS = getattr(settings, 'EMAIL_OUTBOX_BACKOFF_BASE', 30)
+BACKOFF_MAX_SEGUNDOS = getattr(settings, 'EMAIL_OUTBOX_BACKOFF_MAX', 3600)
+# Un correo 'enviando' más tiempo que esto se considera abandonado (proceso caído)
+BLOQUEO_EXPIRA_MINUTOS = getattr(settings, 'EMAIL_OUTBOX_BLOQUEO_MINUTOS', 10)
+
+_hilo_lock = threading.Lock()
+_hilo_activo = None
+_hay_trabajo_nuevo = False
+
+
+def calcular_backoff(intentos):
+    """Espera antes del siguiente intento: exponencial con jitter y tope."""
+    espera = min(BACKOFF_BASE_SEGUNDOS * (2 ** max(intentos - 1, 0)), BACKOFF_MAX_SEGUNDOS)
+    return timedelta(seconds=espera * random.uniform(0.8, 1.2))
+
+
+def reclamar_lote(limite=TAMANO_LOTE):
+    """
+    Marca como 'enviando' un lote de correos listos para enviar y lo devuelve.
+    El UPDATE condicionado al estado garantiza que cada correo lo reclama
+    un único proceso; el lote se identifica por un token único (no por la
+    fecha, que algunos backends truncan).
+    """
+    from app.core.models import EmailOutbox
+
+    ahora = timezone.now()
+    expirado = ahora - timedelta(minutes=BLOQUEO_EXPIRA_MINUTOS)
+
+    # Recuperar correos de procesos que murieron a mitad de envío
+    EmailOutbox.objects.filter(estado='enviando', bloqueado_desde__lt=expirado).update(
+        estado='pendiente', bloqueado_desde=None
+    )
+
+    candidatos = list(
+        EmailOutbox.objects.filter(estado='pendiente', proximo_intento__lte=ahora)
+        .order_by('proximo_intento', 'id')
+        .values_list('id', flat=True)[:limite]
+    )
+    if not candidatos:
+        return []
+
+    token = uuid.uuid4().hex
+    with transaction.atomic():
+        EmailOutbox.objects.filter(id__in=candidatos, estado='pendiente').update(
+            estado='enviando', bloqueado_desde=ahora, token_reclamo=token
+        )
+    return list(EmailOutbox.objects.filter(id__in=candidatos, token_reclamo=token, estado='enviando'))
+
+
+def _construir_mensaje(correo, connection):
+    mensaje = EmailMultiAlternatives(
+        subject=correo.asunto,
+        body=correo.cuerpo_texto,
+        from_email=correo.remitente,
+        to=correo.destinatarios,
+        connection=connection,
+    )
+    if correo.cuerpo_html:
+        mensaje.attach_alternative(correo.cuerpo_html, 'text/html')
+    return mensaje
+
+
+def _registrar_fallo(correo, error):
+    correo.intentos += 1
+    correo.ultimo_error = str(error)[:2000]
+    correo.bloqueado_desde = None
+    if correo.intentos >= correo.max_intentos:
+        correo.estado = 'fallido'
+        logger.error(f"❌ Correo {correo.id} movido a fallidos tras {correo.intentos} intentos: {error}")
+    else:
+        correo.estado = 'pendiente'
+        correo.proximo_intento = timezone.now() + calcular_backoff(correo.intentos)
+        logger.warning(f"⚠️ Correo {correo.id} reprogramado (intento {correo.intentos}): {error}")
+    correo.save(update_fields=['intentos', 'ultimo_error', 'bloqueado_desde', 'estado', 'proximo_intento'])
+
+
+@span('correo.enviar_lote', 'correo')
+def enviar_lote(limite=TAMANO_LOTE):
+    """
+    Envía un lote de correos pendientes reutilizando una única conexión.
+
+    Returns:
+        dict con contadores {'enviados', 'reintentos', 'fallidos'}
+    """
+    correos = reclamar_lote(limite)
+    resumen = {'enviados': 0, 'reintentos': 0, 'fallidos': 0}
+    if not correos:
+        return resumen
+
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        # Servidor caído: todo el lote se reprograma sin gastar más tiempo
+        for correo in correos:
+            _registrar_fallo(correo, e)
+            resumen['fallidos' if correo.estado == 'fallido' else 'reintentos'] += 1
+        return resumen
+
+    try:
+        for correo in correos:
+            inicio = time.perf_counter()
+            try:
+                with span('correo.enviar', 'correo', correo=correo.pk):
+                    connection.send_messages([_construir_mensaje(correo, connection)])
+            except Exception as e:
+                DURACION_CORREO.observar(time.perf_counter() - inicio, resultado='error')
+                _registrar_fallo(correo, e)
+                resumen['fallidos' if correo.estado == 'fallido' else 'reintentos'] += 1
+                continue
+            DURACION_CORREO.observar(time.perf_counter() - inicio, resultado='ok')
+
+            correo.estado = 'enviado'
+            correo.intentos += 1
+            correo.fecha_envio = timezone.now()
+            correo.bloqueado_desde = None
+            correo.ultimo_error = ''
+            correo.save(update_fields=['estado', 'intentos', 'fecha_envio', 'bloqueado_desde', 'ultimo_error'])
+            resumen['enviados'] += 1
+    finally:
+        connection.close()
+
+    logger.info(
+        f"📧 Lote de correos: {resumen['enviados']} enviados, "
+        f"{resumen['reintentos']} reprogramados, {resumen['fallidos']} fallidos"
+    )
+    return resumen
+
+
+def procesar_outbox(max_lotes=None, limite=TAMANO_LOTE):
+    """Envía lotes hasta vaciar los correos listos (o hasta `max_lotes`)."""
+    total = {'enviados': 0, 'reintentos': 0, 'fallidos': 0}
+    lotes = 0
+    while max_lotes is None or lotes < max_lotes:
+        resumen = enviar_lote(limite)
+        lotes += 1
+        for clave in total:
+            total[clave] += resumen[clave]
+        if not any(resumen.values()):
+            break
+    return total
+
+
+def _ejecutar_en_hilo():
+    global _hilo_activo, _hay_trabajo_nuevo
+    try:
+        while True:
+            procesar_outbox()
+            # Si se encoló algo mientras se enviaba, dar otra pasada
+            with _hilo_lock:
+                if not _hay_trabajo_nuevo:
+                    _hilo_activo = None
+                    return
+                _hay_trabajo_nuevo = False
+    except Exception as e:
+        logger.exception(f"❌ Error en el envío de correos en segundo plano: {e}")
+        with _hilo_lock:
+            _hilo_activo = None
+    finally:
+        # Las conexiones a BD son por hilo: cerrar las de este hilo
+        connections.close_all()
+
+
+def despertar_envio():
+    """
+    Lanza (si no está ya en marcha) un hilo que vacía la bandeja de salida.
+    Pensado para `transaction.on_commit` tras encolar correos.
+    """
+    global _hilo_activo, _hay_trabajo_nuevo
+    if not getattr(settings, 'EMAIL_OUTBOX_HILO', True):
+        return
+
+    with _hilo_lock:
+        if _hilo_activo is not None:
+            _hay_trabajo_nuevo = True
+            return
+        _hay_trabajo_nuevo = False
+        _hilo_activo = threading.Thread(target=_ejecutar_en_hilo, name='email-outbox', daemon=True)
+        _hilo_activo.start()
@@ -0,0 +1,252 @@
+"""
+Generación en segundo plano de las exportaciones completas (ExportacionDatos).
+
+El archivo ZIP se construye bajo MEDIA_ROOT/exportaciones/ con:
+- datos.json: la misma exportación que `exportar_datos_usuario`, escrita en
+  streaming dentro del ZIP (ver gdpr_export.py);
+- reportes/: el PDF de cada ReporteIA. Los PDF ya generados se reutilizan
+  desde MEDIA_ROOT/reportes_pdf/<id>.pdf; los que faltan se generan por
+  lotes con un único navegador y concurrencia limitada.
+
+El PDF en caché de un reporte se borra cuando cambia o desaparece algo que
+aparece en él: al guardar o borrar el reporte, su validación o el niño
+(señales en signals.py) y en las anonimizaciones y purgas por lotes, que no
+emiten señales (retencion.py, purga.py). Ver `eliminar_pdfs_cache`.
+
+Nunca se ejecuta en el servidor web: lo procesa
+`python manage.py procesar_exportaciones` (cron o --loop). El progreso se
+guarda en la propia exportación y el profesional recibe el aviso en
+`get_notificaciones` cuando el archivo está listo.
+"""
+import asyncio
+import logging
+import os
+import uuid
+import zipfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from app.core.models import AuditoriaAcceso, ExportacionDatos, ReporteIA
+from app.core.utils.gdpr_export import generar_json, secciones_exportacion
+
+logger = logging.getLogger('app.core')
+
+DIRECTORIO_EXPORTACIONES = 'exportaciones'
+DIRECTORIO_CACHE_PDF = 'reportes_pdf'
+CONCURRENCIA_PDF = getattr(settings, 'GDPR_EXPORT_PDF_CONCURRENCIA', 3)
+LOTE_PDF = getattr(settings, 'GDPR_EXPORT_PDF_LOTE', 20)
+DIAS_VALIDEZ = getattr(settings, 'GDPR_EXPORT_DIAS_VALIDEZ', 7)
+# Una exportación 'procesando' más tiempo que esto se considera abandonada
+BLOQUEO_EXPIRA_HORAS = 6
+
+TAMANO_BUFFER = 64 * 1024
+
+
+def _actualizar_progreso(exportacion, progreso, paso):
+    exportacion.progreso = progreso
+    exportacion.paso_actual = paso
+    ExportacionDatos.objects.filter(pk=exportacion.pk).update(progreso=progreso, paso_actual=paso)
+
+
+def reclamar_siguiente():
+    """Marca como 'procesando' la exportación pendiente más antigua y la devuelve."""
+    expirado = timezone.now() - timedelta(hours=BLOQUEO_EXPIRA_HORAS)
+    ExportacionDatos.objects.filter(estado='procesando', fecha_inicio__lt=expirado).update(estado='pendiente')
+
+    for pk in ExportacionDatos.objects.filter(estado='pendiente').order_by('fecha_solicitud').values_list('pk', flat=True)[:5]:
+        reclamada = ExportacionDatos.objects.filter(pk=pk, estado='pendiente').update(
+            estado='procesando', fecha_inicio=timezone.now(), progreso=0
+        )
+        if reclamada:
+            return ExportacionDatos.objects.select_related('usuario').get(pk=pk)
+    return None
+
+
+def _escribir_json(zf, exportacion):
+    secciones = secciones_exportacion(
+        exportacion.usuario,
+        incluir_sesiones=exportacion.incluir_sesiones,
+        incluir_pruebas=exportacion.incluir_pruebas,
+    )
+    with zf.open('datos.json', 'w', force_zip64=True) as destino:
+        buffer = []
+        tamano = 0
+        for trozo in generar_json(secciones):
+            datos = trozo.encode('utf-8')
+            buffer.append(datos)
+            tamano += len(datos)
+            if tamano >= TAMANO_BUFFER:
+                destino.write(b''.join(buffer))
+                buffer, tamano = [], 0
+        destino.write(b''.join(buffer))
+
+
+def _ruta_cache_pdf(reporte_id):
+    return os.path.join(settings.MEDIA_ROOT, DIRECTORIO_CACHE_PDF, f'{reporte_id}.pdf')
+
+
+def eliminar_pdfs_cache(reporte_ids):
+    """Borra los PDF en caché de esos reportes (los que no existan se ignoran)."""
+    for reporte_id in reporte_ids:
+        try:
+            os.remove(_ruta_cache_pdf(reporte_id))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"⚠️ No se pudo borrar el PDF en caché del reporte {reporte_id}: {e}")
+
+
+def _escribir_pdfs(zf, exportacion, progreso_inicial=30, progreso_final=95):
+    try:
+        from app.core.utils import pdf_utils
+    except ImportError as e:
+        # Playwright no instalado en este servidor
+        logger.warning(f"⚠️ Exportación {exportacion.pk} sin PDF: {e}")
+        zf.writestr('reportes/NO_DISPONIBLE.txt', 'Los PDF de los reportes no pudieron generarse en este servidor.\n')
+        return
+
+    reportes = (
+        ReporteIA.objects.filter(evaluacion__nino__profesional=exportacion.usuario)
+        .select_related('evaluacion__nino', 'validacion_profesional')
+        .order_by('pk')
+    )
+    total = reportes.count()
+    if not total:
+        return
+
+    os.makedirs(os.path.join(settings.MEDIA_ROOT, DIRECTORIO_CACHE_PDF), exist_ok=True)
+    procesados = 0
+    fallidos = []
+
+    def al_terminar(reporte, pdf_data):
+        if not pdf_data:
+            fallidos.append(reporte.pk)
+            return
+        ruta = _ruta_cache_pdf(reporte.pk)
+        with open(ruta, 'wb') as f:
+            f.write(pdf_data)
+        zf.writestr(_nombre_en_zip(reporte, pdf_utils), pdf_data)
+
+    lote = []
+    for reporte in reportes.iterator(chunk_size=LOTE_PDF):
+        lote.append(reporte)
+        if len(lote) >= LOTE_PDF:
+            _procesar_lote_pdf(zf, lote, pdf_utils, al_terminar)
+            procesados += len(lote)
+            lote = []
+            _actualizar_progreso(
+                exportacion,
+                progreso_inicial + (progreso_final - progreso_inicial) * procesados // total,
+                f'Reportes PDF: {procesados} de {total}'
+            )
+    if lote:
+        _procesar_lote_pdf(zf, lote, pdf_utils, al_terminar)
+
+    if fallidos:
+        zf.writestr(
+            'reportes/ERRORES.txt',
+            'No se pudo generar el PDF de los reportes: ' + ', '.join(map(str, fallidos)) + '\n'
+        )
+
+
+def _nombre_en_zip(reporte, pdf_utils):
+    return 'reportes/' + pdf_utils.nombre_archivo_reporte(reporte.evaluacion.nino, reporte.evaluacion)
+
+
+def _procesar_lote_pdf(zf, lote, pdf_utils, al_terminar):
+    """Copia los PDF en caché y genera en paralelo los que faltan."""
+    trabajos = []
+    for reporte in lote:
+        ruta = _ruta_cache_pdf(reporte.pk)
+        if os.path.exists(ruta):
+            zf.write(ruta, _nombre_en_zip(reporte, pdf_utils))
+            continue
+        html = pdf_utils.construir_html_data_uri(
+            'report/reporte_pdf_template.html', pdf_utils.contexto_reporte_pdf(reporte)
+        )
+        trabajos.append((reporte, html))
+
+    if trabajos:
+        asyncio.run(pdf_utils.generate_pdfs_async(trabajos, al_terminar, max_concurrencia=CONCURRENCIA_PDF))
+
+
+def construir_archivo(exportacion):
+    """Genera el ZIP de una exportación y devuelve su ruta relativa a MEDIA_ROOT."""
+    relativo = f'{DIRECTORIO_EXPORTACIONES}/{uuid.uuid4().hex}.zip'
+    ruta = os.path.join(settings.MEDIA_ROOT, relativo)
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+
+    try:
+        with zipfile.ZipFile(ruta, 'w', compression=zipfile.ZIP_DEFLATED, allowZip64=True) as zf:
+            _actualizar_progreso(exportacion, 5, 'Exportando datos personales')
+            _escribir_json(zf, exportacion)
+            _actualizar_progreso(exportacion, 30, 'Datos exportados')
+
+            if exportacion.incluir_pdfs:
+                _actualizar_progreso(exportacion, 30, 'Generando reportes PDF')
+                _escribir_pdfs(zf, exportacion)
+    except Exception:
+        if os.path.exists(ruta):
+            os.remove(ruta)
+        raise
+
+    return relativo
+
+
+def procesar_exportacion(exportacion):
+    """Construye el ZIP y deja la exportación 'completada' o 'fallida'."""
+    try:
+        relativo = construir_archivo(exportacion)
+    except Exception as e:
+        logger.exception(f"❌ Error en la exportación {exportacion.pk}: {e}")
+        exportacion.estado = 'fallida'
+        exportacion.error = str(e)[:2000]
+        exportacion.fecha_fin = timezone.now()
+        exportacion.save(update_fields=['estado', 'error', 'fecha_fin'])
+        return False
+
+    exportacion.archivo.name = relativo
+    exportacion.tamano_bytes = os.path.getsize(os.path.join(settings.MEDIA_ROOT, relativo))
+    exportacion.estado = 'completada'
+    exportacion.progreso = 100
+    exportacion.paso_actual = 'Listo para descargar'
+    exportacion.fecha_fin = timezone.now()
+    exportacion.save(update_fields=[
+        'archivo', 'tamano_bytes', 'estado', 'progreso', 'paso_actual', 'fecha_fin'
+    ])
+
+    AuditoriaAcceso.registrar(
+        usuario=exportacion.usuario,
+        accion='EXPORT',
+        tabla_afectada='ExportacionCompleta',
+        registro_id=exportacion.pk,
+        detalles={'tipo_exportacion': 'archivo_zip', 'tamano_bytes': exportacion.tamano_bytes},
+    )
+    logger.info(f"📦 Exportación {exportacion.pk} lista ({exportacion.tamano_bytes} bytes)")
+    return True
+
+
+def procesar_pendientes(max_trabajos=None):
+    """Procesa exportaciones pendientes una a una. Devuelve cuántas se procesaron."""
+    procesadas = 0
+    while max_trabajos is None or procesadas < max_trabajos:
+        exportacion = reclamar_siguiente()
+        if exportacion is None:
+            break
+        procesar_exportacion(exportacion)
+        procesadas += 1
+    return procesadas
+
+
+def limpiar_caducadas():
+    """Borra los ZIP con más de DIAS_VALIDEZ días. Devuelve cuántos se borraron."""
+    limite = timezone.now() - timedelta(days=DIAS_VALIDEZ)
+    borradas = 0
+    for exportacion in ExportacionDatos.objects.filter(fecha_fin__lt=limite).exclude(archivo='').exclude(archivo=None):
+        exportacion.archivo.delete(save=False)
+        exportacion.tamano_bytes = 0
+        exportacion.save(update_fields=['archivo', 'tamano_bytes'])
+        borradas += 1
+    return borradas
@@ -0,0 +1,230 @@
+"""
+Exportación de datos personales (Artículo 20 GDPR) en streaming.
+
+El JSON se genera por trozos a partir de querysets recorridos con
+`.iterator(chunk_size=...)` y `select_related`, de modo que la memoria no
+crece con el tamaño de la cuenta: nunca se construye el documento completo.
+
+`secciones_exportacion()` describe el contenido (clave -> dict o iterable
+de dicts) y `generar_json()` lo serializa incrementalmente. Los usa la
+vista `exportar_datos_usuario` (StreamingHttpResponse) y el generador de
+archivos ZIP en segundo plano.
+"""
+import json
+from datetime import datetime
+
+from app.core.models import Cita, Nino, ValidacionProfesional
+from app.games.models import Evaluacion, PruebaCognitiva, SesionJuego
+from app.games.utils.compactacion import pruebas_de_sesion, sesiones_compactadas
+
+CHUNK_SIZE = 500
+VERSION_EXPORTACION = '1.0'
+
+
+def _fecha(valor):
+    return valor.isoformat() if valor else None
+
+
+def _ninos(usuario, chunk_size):
+    for nino in Nino.objects.filter(profesional=usuario).order_by('id').iterator(chunk_size=chunk_size):
+        yield {
+            'id': nino.id,
+            'nombres': nino.nombres,
+            'apellidos': nino.apellidos,
+            'edad': nino.edad,
+            'genero': nino.genero,
+            'fecha_registro': _fecha(nino.fecha_registro),
+        }
+
+
+def _evaluaciones(usuario, chunk_size):
+    evaluaciones = (
+        Evaluacion.objects.filter(nino__profesional=usuario)
+        .select_related('nino')
+        .order_by('id')
+    )
+    for evaluacion in evaluaciones.iterator(chunk_size=chunk_size):
+        yield {
+            'id': evaluacion.id,
+            'nino': evaluacion.nino.nombre_completo,
+            'fecha_inicio': _fecha(evaluacion.fecha_hora_inicio),
+            'fecha_fin': _fecha(evaluacion.fecha_hora_fin),
+            'estado': evaluacion.estado,
+            'precision_promedio': float(evaluacion.precision_promedio),
+            'total_aciertos': evaluacion.total_aciertos,
+            'total_errores': evaluacion.total_errores,
+        }
+
+
+def _sesiones(usuario, chunk_size):
+    sesiones = (
+        SesionJuego.objects.filter(evaluacion__nino__profesional=usuario)
+        .select_related('juego')
+        .order_by('id')
+    )
+    for sesion in sesiones.iterator(chunk_size=chunk_size):
+        yield {
+            'id': sesion.id,
+            'evaluacion_id': sesion.evaluacion_id,
+            'juego': sesion.juego.nombre,
+            'nivel': sesion.nivel_seleccionado,
+            'estado': sesion.estado,
+            'fecha_inicio': _fecha(sesion.fecha_inicio),
+            'fecha_fin': _fecha(sesion.fecha_fin),
+            'puntaje_total': sesion.puntaje_total,
+            'preguntas_respondidas': sesion.preguntas_respondidas,
+            'tiempo_total_segundos': sesion.tiempo_total_segundos,
+            'clicks_total': sesion.clicks_total,
+            'hits_total': sesion.hits_total,
+            'misses_total': sesion.misses_total,
+            'accuracy_percent': float(sesion.accuracy_percent),
+        }
+
+
+def _prueba(prueba):
+    return {
+        'id': prueba.id,
+        'evaluacion_id': prueba.evaluacion_id,
+        'juego': prueba.juego.nombre,
+        'numero_prueba': prueba.numero_prueba,
+        'clics': prueba.clics,
+        'aciertos': prueba.aciertos,
+        'errores': prueba.errores,
+        'puntaje': prueba.puntaje,
+        'precision': float(prueba.precision),
+        'tiempo_respuesta_ms': prueba.tiempo_respuesta_ms,
+        'fecha_ejecucion': _fecha(prueba.fecha_ejecucion),
+    }
+
+
+def _pruebas(usuario, chunk_size):
+    pruebas = (
+        PruebaCognitiva.objects.filter(evaluacion__nino__profesional=usuario)
+        .select_related('juego')
+        .order_by('id')
+    )
+    for prueba in pruebas.iterator(chunk_size=chunk_size):
+        yield _prueba(prueba)
+
+    # Pruebas compactadas en sus sesiones (sin id propio)
+    sesiones = sesiones_compactadas(evaluacion__nino__profesional=usuario)
+    for sesion in sesiones.iterator(chunk_size=chunk_size):
+        for prueba in pruebas_de_sesion(sesion):
+            yield _prueba(prueba)
+
+
+def _validaciones(usuario, chunk_size):
+    validaciones = ValidacionProfesional.objects.filter(profesional=usuario).order_by('id')
+    for validacion in validaciones.iterator(chunk_size=chunk_size):
+        yield {
+            'id': validacion.id,
+            'fecha': _fecha(validacion.fecha_validacion),
+            'riesgo_confirmado': validacion.riesgo_confirmado,
+            'indice_ajustado': float(validacion.indice_ajustado),
+            'diagnostico_final': validacion.diagnostico_final,
+        }
+
+
+def _citas(usuario, chunk_size):
+    for cita in Cita.objects.filter(usuario=usuario).order_by('id').iterator(chunk_size=chunk_size):
+        yield {
+            'id': cita.id,
+            'nombre_paciente': cita.nombre_paciente,
+            'fecha': _fecha(cita.fecha),
+            'hora': _fecha(cita.hora),
+            'completada': cita.completada,
+        }
+
+
+def _consentimientos(usuario):
+    for consentimiento in usuario.consentimientos_gdpr.all():
+        yield {
+            'fecha': _fecha(consentimiento.fecha_consentimiento),
+            'acepta_terminos': consentimiento.acepta_terminos,
+            'acepta_privacidad': consentimiento.acepta_privacidad,
+            'acepta_tratamiento_datos': consentimiento.acepta_tratamiento_datos,
+            'version_terminos': consentimiento.version_terminos,
+            'consentimiento_activo': consentimiento.consentimiento_activo,
+        }
+
+
+def _auditoria(usuario, limite=100):
+    # Incluye los meses ya movidos al archivo de auditoría
+    from app.core.utils.auditoria_archivo import historial_usuario
+
+    for auditoria in historial_usuario(usuario, limite=limite):
+        yield {
+            'fecha': _fecha(auditoria.timestamp),
+            'accion': auditoria.get_accion_display(),
+            'tabla': auditoria.tabla_afectada,
+            'ip': auditoria.ip_address,
+            'exitoso': auditoria.exitoso,
+        }
+
+
+def secciones_exportacion(usuario, incluir_sesiones=False, incluir_pruebas=False, chunk_size=CHUNK_SIZE):
+    """
+    Secciones de la exportación, en orden. Los valores que son generadores
+    se serializan como listas en streaming.
+    """
+    secciones = [
+        ('informacion_exportacion', {
+            'fecha_exportacion': datetime.now().isoformat(),
+            'version_gdpr': VERSION_EXPORTACION,
+            'formato': 'JSON',
+            'usuario_id': usuario.id,
+            'incluye_sesiones': incluir_sesiones,
+            'incluye_pruebas_cognitivas': incluir_pruebas,
+        }),
+        ('datos_personales', {
+            'username': usuario.username,
+            'email': usuario.email,
+            'nombres': usuario.nombres,
+            'apellidos': usuario.apellidos,
+            'especialidad': usuario.especialidad,
+            'numero_licencia': usuario.numero_licencia,
+            'rol': usuario.rol,
+            'fecha_registro': _fecha(usuario.fecha_registro),
+            'ultimo_acceso': _fecha(usuario.ultimo_acceso),
+        }),
+        ('ninos_asignados', _ninos(usuario, chunk_size)),
+        ('evaluaciones_realizadas', _evaluaciones(usuario, chunk_size)),
+    ]
+    if incluir_sesiones:
+        secciones.append(('sesiones_juego', _sesiones(usuario, chunk_size)))
+    if incluir_pruebas:
+        secciones.append(('pruebas_cognitivas', _pruebas(usuario, chunk_size)))
+    secciones += [
+        ('validaciones_profesionales', _validaciones(usuario, chunk_size)),
+        ('citas', _citas(usuario, chunk_size)),
+        ('consentimientos', _consentimientos(usuario)),
+        ('historial_auditoria', _auditoria(usuario)),
+    ]
+    return secciones
+
+
+def _dumps(valor, nivel):
+    """JSON indentado (2 espacios) para un valor anidado `nivel` niveles."""
+    texto = json.dumps(valor, indent=2, ensure_ascii=False)
+    return texto.replace('\n', '\n' + '  ' * nivel)
+
+
+def generar_json(secciones):
+    """
+    Serializa las secciones como un objeto JSON, trozo a trozo.
+    Cada elemento de una lista se emite en cuanto se obtiene del queryset.
+    """
+    yield '{'
+    for i, (clave, valor) in enumerate(secciones):
+        yield (',' if i else '') + f'\n  {json.dumps(clave)}: '
+
+        if isinstance(valor, dict):
+            yield _dumps(valor, 1)
+            continue
+
+        vacio = True
+        for elemento in valor:
+            yield ('[\n    ' if vacio else ',\n    ') + _dumps(elemento, 2)
+            vacio = False
+        yield '[]' if vacio else '\n  ]'
+    yield '\n}\n'
@@ -0,0 +1,152 @@
+"""
+Limitador de intentos de login basado en la caché.
+
+Sustituye las consultas COUNT / ORDER BY sobre LoginAttempt que se hacían
+en cada intento: durante un ataque de fuerza bruta la base de datos ya no
+recibe carga extra por comprobar bloqueos.
+
+- Ventana deslizante aproximada con dos contadores de ventana fija (la
+  actual y la anterior, ponderada por el tiempo que aún solapa), cada uno
+  con TTL. Comprobar y registrar un fallo es O(1).
+- Se cuenta por nombre de usuario y por IP: una IP que prueba muchos
+  usuarios distintos también se bloquea.
+- Al alcanzar el límite se crea una clave de bloqueo que guarda cuándo
+  expira, para informar del tiempo restante.
+- Los registros de LoginAttempt se escriben en un hilo de fondo y sólo
+  sirven para análisis forense (ver `purge_login_attempts`).
+"""
+import hashlib
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+logger = logging.getLogger('app.core')
+
+VENTANA_SEGUNDOS = getattr(settings, 'LOGIN_THROTTLE_VENTANA', 30 * 60)
+MAX_FALLOS_USUARIO = getattr(settings, 'LOGIN_THROTTLE_MAX_USUARIO', 5)
+MAX_FALLOS_IP = getattr(settings, 'LOGIN_THROTTLE_MAX_IP', 20)
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='login-attempts')
+
+
+def _sufijo(tipo, valor):
+    # Hash para que nombres de usuario arbitrarios sean claves de caché válidas
+    return f'{tipo}:{hashlib.sha1(valor.lower().encode("utf-8")).hexdigest()}'
+
+
+def _clave_contador(sufijo, indice):
+    return f'login_fallos:{sufijo}:{indice}'
+
+
+def _clave_bloqueo(sufijo):
+    return f'login_bloqueo:{sufijo}'
+
+
+def _contar(sufijo, ahora=None):
+    """Fallos en la ventana deslizante que termina en `ahora`."""
+    ahora = ahora or time.time()
+    indice, resto = divmod(ahora, VENTANA_SEGUNDOS)
+    indice = int(indice)
+    valores = cache.get_many([_clave_contador(sufijo, indice), _clave_contador(sufijo, indice - 1)])
+    actual = valores.get(_clave_contador(sufijo, indice), 0)
+    anterior = valores.get(_clave_contador(sufijo, indice - 1), 0)
+    return int(actual + anterior * (1 - resto / VENTANA_SEGUNDOS))
+
+
+def _incrementar(sufijo, ahora):
+    clave = _clave_contador(sufijo, int(ahora // VENTANA_SEGUNDOS))
+    # Dos ventanas de vida: la siguiente ventana aún la pondera
+    if not cache.add(clave, 1, VENTANA_SEGUNDOS * 2):
+        try:
+            cache.incr(clave)
+        except ValueError:
+            # Expiró entre add() e incr()
+            cache.set(clave, 1, VENTANA_SEGUNDOS * 2)
+
+
+def _bloquear(sufijo, ahora):
+    cache.set(_clave_bloqueo(sufijo), ahora + VENTANA_SEGUNDOS, VENTANA_SEGUNDOS)
+
+
+def _sufijos(username, ip_address):
+    sufijos = []
+    if username:
+        sufijos.append((_sufijo('u', username), MAX_FALLOS_USUARIO))
+    if ip_address:
+        sufijos.append((_sufijo('ip', ip_address), MAX_FALLOS_IP))
+    return sufijos
+
+
+def tiempo_restante_bloqueo(username='', ip_address=''):
+    """
+    Segundos que quedan de bloqueo para el usuario o la IP (0 si no hay).
+    """
+    ahora = time.time()
+    claves = [_clave_bloqueo(sufijo) for sufijo, _ in _sufijos(username, ip_address)]
+    expiraciones = cache.get_many(claves).values()
+    return max([0] + [int(expira - ahora) for expira in expiraciones])
+
+
+def esta_bloqueado(username='', ip_address=''):
+    """Indica si el usuario o la IP están bloqueados temporalmente."""
+    return tiempo_restante_bloqueo(username, ip_address) > 0
+
+
+def intentos_recientes(username):
+    """Fallos del usuario en la ventana actual."""
+    return _contar(_sufijo('u', username)) if username else 0
+
+
+def registrar_fallo(username='', ip_address=''):
+    """
+    Cuenta un intento fallido y bloquea al usuario o la IP si superan su
+    límite.
+
+    Returns:
+        int: fallos del usuario en la ventana (incluido este)
+    """
+    ahora = time.time()
+    intentos_usuario = 0
+    for sufijo, limite in _sufijos(username, ip_address):
+        _incrementar(sufijo, ahora)
+        intentos = _contar(sufijo, ahora)
+        if sufijo.startswith('u:'):
+            intentos_usuario = intentos
+        if intentos >= limite:
+            _bloquear(sufijo, ahora)
+    return intentos_usuario
+
+
+def limpiar_usuario(username):
+    """Reinicia los contadores del usuario tras un login correcto."""
+    sufijo = _sufijo('u', username)
+    indice = int(time.time() // VENTANA_SEGUNDOS)
+    cache.delete_many([
+        _clave_contador(sufijo, indice),
+        _clave_contador(sufijo, indice - 1),
+        _clave_bloqueo(sufijo),
+    ])
+
+
+def _crear_intento(datos):
+    from app.core.models import LoginAttempt
+    try:
+        LoginAttempt.objects.create(**datos)
+    except Exception as e:
+        logger.error(f"❌ No se pudo registrar el intento de login de {datos.get('username')}: {e}")
+    finally:
+        connections.close_all()
+
+
+def registrar_intento_async(username, ip_address, exitoso, user_agent=''):
+    """Guarda un LoginAttempt en segundo plano (sólo para análisis forense)."""
+    _executor.submit(_crear_intento, {
+        'username': username[:150],
+        'ip_address': ip_address or '0.0.0.0',
+        'exitoso': exitoso,
+        'user_agent': user_agent[:500],
+    })
@@ -0,0 +1,502 @@
+"""
+Métricas de la aplicación en formato de texto de Prometheus, sin dependencias.
+
+Tres tipos de métrica, con etiquetas:
+
+- `Contador`: sólo sube (peticiones, errores...);
+- `Indicador`: valor que sube y baja (p. ej. procesos con el modelo cargado);
+- `Histograma`: observaciones en buckets fijos, más su suma y su número.
+
+Cada proceso (worker de gunicorn, comando...) acumula en memoria y vuelca
+sus valores como mínimo cada METRICAS_INTERVALO_SEGUNDOS en un JSON propio,
+METRICAS_DIR/metricas-<pid>-<token>.json (escritura atómica con
+os.replace), y al salir. El token aleatorio evita que un proceso nuevo
+que reutiliza un PID sobrescriba el fichero de otro ya terminado.
+`exponer()` suma los ficheros de todos los procesos: los contadores y los
+histogramas de los procesos ya terminados se conservan, fusionados en
+METRICAS_DIR/metricas-acumulado.json, y los indicadores sólo cuentan si el
+proceso sigue vivo. Conviene vaciar METRICAS_DIR al desplegar.
+
+Las colas (correos, exportaciones, purgas y auditoría pendiente de archivar)
+se calculan al servir /metrics (`IndicadorCalculado`), por lo que no
+dependen de ningún proceso.
+
+Uso:
+
+    with cronometrar(DURACION_INFERENCIA):
+        ...
+    PETICIONES.observar(0.12, vista='core:lista_ninos', metodo='GET', codigo='2xx')
+"""
+import atexit
+import glob
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from django.conf import settings
+
+logger = logging.getLogger('app.core')
+
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_LENTOS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+BUCKETS_CONSULTAS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+_LOCK = threading.Lock()
+_METRICAS = {}
+_CALCULADAS = []
+_ultimo_volcado = 0.0
+
+
+def directorio():
+    return str(getattr(settings, 'METRICAS_DIR', os.path.join(tempfile.gettempdir(), 'dislexia_metricas')))
+
+
+def _intervalo():
+    return getattr(settings, 'METRICAS_INTERVALO_SEGUNDOS', 5)
+
+
+class _Metrica:
+    tipo = None
+
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._valores = {}
+        _METRICAS[nombre] = self
+
+    def _clave(self, etiquetas):
+        return tuple(str(etiquetas.get(e, '')) for e in self.etiquetas)
+
+
+class Contador(_Metrica):
+    tipo = 'counter'
+
+    def inc(self, cantidad=1, **etiquetas):
+        clave = self._clave(etiquetas)
+        with _LOCK:
+            self._valores[clave] = self._valores.get(clave, 0) + cantidad
+        _quizas_volcar()
+
+
+class Indicador(_Metrica):
+    tipo = 'gauge'
+
+    def fijar(self, valor, **etiquetas):
+        clave = self._clave(etiquetas)
+        with _LOCK:
+            self._valores[clave] = valor
+        _quizas_volcar()
+
+    def inc(self, cantidad=1, **etiquetas):
+        clave = self._clave(etiquetas)
+        with _LOCK:
+            self._valores[clave] = self._valores.get(clave, 0) + cantidad
+        _quizas_volcar()
+
+
+class Histograma(_Metrica):
+    """Cada serie es [cuenta por bucket..., cuenta de +Inf, suma] (no acumulado)."""
+    tipo = 'histogram'
+
+    def __init__(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS_SEGUNDOS):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.buckets = tuple(sorted(buckets))
+
+    def observar(self, valor, **etiquetas):
+        clave = self._clave(etiquetas)
+        posicion = bisect_left(self.buckets, valor)  # primer bucket con le >= valor
+        with _LOCK:
+            serie = self._valores.get(clave)
+            if serie is None:
+                serie = self._valores[clave] = [0] * (len(self.buckets) + 1) + [0.0]
+            serie[posicion] += 1
+            serie[-1] += valor
+        _quizas_volcar()
+
+
+class IndicadorCalculado:
+    """Indicador cuyo valor se calcula al servir /metrics: funcion() -> {clave: valor}."""
+    tipo = 'gauge'
+
+    def __init__(self, nombre, ayuda, etiquetas, funcion, tipo=None):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self.funcion = funcion
+        if tipo:
+            self.tipo = tipo
+        _CALCULADAS.append(self)
+
+
+@contextmanager
+def cronometrar(histograma, **etiquetas):
+    """Observa en `histograma` los segundos que tarda el bloque."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        histograma.observar(time.perf_counter() - inicio, **etiquetas)
+
+
+# ---------------------------------------------------------------------------
+# Persistencia por proceso
+# ---------------------------------------------------------------------------
+
+ARCHIVO_ACUMULADO = 'metricas-acumulado.json'
+ARCHIVO_BLOQUEO = 'metricas-fusion.lock'
+# Un bloqueo de fusión más antiguo que esto se considera abandonado
+BLOQUEO_EXPIRA_SEGUNDOS = 60
+
+# Distingue este proceso de uno anterior con el mismo PID
+_token = os.urandom(4).hex()
+
+
+def _reiniciar_tras_fork():
+    """
+    El hijo de un fork (gunicorn --preload) hereda los valores del padre:
+    empieza de cero y con su propio token para no contarlos dos veces.
+    """
+    global _LOCK, _token, _ultimo_volcado
+    _LOCK = threading.Lock()
+    _token = os.urandom(4).hex()
+    _ultimo_volcado = 0.0
+    for metrica in _METRICAS.values():
+        metrica._valores = {}
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reiniciar_tras_fork)
+
+
+def _ruta_proceso():
+    return os.path.join(directorio(), f'metricas-{os.getpid()}-{_token}.json')
+
+
+def _escribir_json(ruta, datos):
+    """Escritura atómica: quien lee nunca ve un fichero a medias."""
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    temporal = f'{ruta}.tmp'
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(datos, f)
+    os.replace(temporal, ruta)
+
+
+def _serializar(valores_por_metrica):
+    return {
+        nombre: [[list(clave), valor] for clave, valor in valores.items()]
+        for nombre, valores in valores_por_metrica.items() if valores
+    }
+
+
+def volcar():
+    """Escribe los valores de este proceso en su fichero."""
+    global _ultimo_volcado
+    with _LOCK:
+        datos = _serializar({nombre: metrica._valores for nombre, metrica in _METRICAS.items()})
+        _ultimo_volcado = time.monotonic()
+    if not datos:
+        return
+
+    ruta = _ruta_proceso()
+    try:
+        _escribir_json(ruta, datos)
+    except OSError as e:
+        logger.warning(f"⚠️ No se pudieron volcar las métricas en {ruta}: {e}")
+
+
+def _quizas_volcar():
+    if time.monotonic() - _ultimo_volcado >= _intervalo():
+        volcar()
+
+
+atexit.register(volcar)
+
+
+def _proceso_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _leer_procesos():
+    """[(ruta, pid, datos)] de los ficheros de proceso de METRICAS_DIR."""
+    procesos = []
+    for ruta in glob.glob(os.path.join(directorio(), 'metricas-*-*.json')):
+        try:
+            pid = int(os.path.basename(ruta)[len('metricas-'):].split('-', 1)[0])
+            with open(ruta, encoding='utf-8') as f:
+                procesos.append((ruta, pid, json.load(f)))
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Fichero de métricas ilegible {ruta}: {e}")
+    return procesos
+
+
+def _leer_acumulado():
+    """(ficheros ya fusionados, datos) de ARCHIVO_ACUMULADO."""
+    try:
+        with open(os.path.join(directorio(), ARCHIVO_ACUMULADO), encoding='utf-8') as f:
+            contenido = json.load(f)
+        return contenido.get('fusionados', []), contenido.get('metricas', {})
+    except FileNotFoundError:
+        return [], {}
+    except (OSError, ValueError) as e:
+        logger.warning(f"⚠️ Métricas acumuladas ilegibles: {e}")
+        return [], {}
+
+
+def _sumar(totales, datos, indicadores=True):
+    """Suma en `totales` ({nombre: {clave: valor}}) los datos de un fichero."""
+    for nombre, series in datos.items():
+        metrica = _METRICAS.get(nombre)
+        if metrica is None or (metrica.tipo == 'gauge' and not indicadores):
+            continue
+        acumulado = totales.setdefault(nombre, {})
+        for clave, valor in series:
+            clave = tuple(clave)
+            if metrica.tipo == 'histogram':
+                previo = acumulado.get(clave)
+                if previo is None or len(previo) != len(valor):
+                    acumulado[clave] = list(valor)
+                else:
+                    acumulado[clave] = [a + b for a, b in zip(previo, valor)]
+            else:
+                acumulado[clave] = acumulado.get(clave, 0) + valor
+
+
+def _bloquear_fusion():
+    """Ruta del fichero de bloqueo si se consigue (O_EXCL), o None."""
+    ruta = os.path.join(directorio(), ARCHIVO_BLOQUEO)
+    for _ in range(20):
+        try:
+            os.close(os.open(ruta, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return ruta
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(ruta) > BLOQUEO_EXPIRA_SEGUNDOS:
+                    os.remove(ruta)
+                    continue
+            except OSError:
+                pass
+            time.sleep(0.05)
+        except OSError as e:
+            logger.warning(f"⚠️ No se pudo bloquear la fusión de métricas: {e}")
+            return None
+    return None
+
+
+def _borrar(ruta):
+    try:
+        os.remove(ruta)
+    except FileNotFoundError:
+        pass
+
+
+def _fusionar(fusionados, datos_acumulados, terminados):
+    """
+    Guarda en ARCHIVO_ACUMULADO los contadores e histogramas de los procesos
+    terminados y borra sus ficheros. Los nombres fusionados se anotan antes
+    de borrar: si el proceso muere entre medias no se suman dos veces.
+    """
+    suma = {}
+    _sumar(suma, datos_acumulados, indicadores=False)
+    for _, datos in terminados:
+        _sumar(suma, datos, indicadores=False)
+
+    pendientes = [nombre for nombre in fusionados if os.path.exists(os.path.join(directorio(), nombre))]
+    _escribir_json(os.path.join(directorio(), ARCHIVO_ACUMULADO), {
+        'fusionados': pendientes + [os.path.basename(ruta) for ruta, _ in terminados],
+        'metricas': _serializar(suma),
+    })
+    for ruta, _ in terminados:
+        _borrar(ruta)
+
+
+def agregar():
+    """
+    {nombre: {clave: valor}} sumando los valores de todos los procesos.
+
+    De paso fusiona los ficheros de los procesos terminados en
+    ARCHIVO_ACUMULADO, para que METRICAS_DIR no crezca con cada reinicio de
+    worker. Sólo un proceso fusiona a la vez (ARCHIVO_BLOQUEO); si no
+    consigue el bloqueo se limita a leer.
+    """
+    volcar()
+    totales = {nombre: {} for nombre in _METRICAS}
+    bloqueo = _bloquear_fusion()
+    try:
+        fusionados, datos_acumulados = _leer_acumulado()
+        ya_fusionados = set(fusionados)
+        terminados = []
+        for ruta, pid, datos in _leer_procesos():
+            if os.path.basename(ruta) in ya_fusionados:
+                if bloqueo:
+                    _borrar(ruta)
+                continue
+            vivo = _proceso_vivo(pid)
+            # Los indicadores sólo cuentan si el proceso sigue vivo
+            _sumar(totales, datos, indicadores=vivo)
+            if not vivo:
+                terminados.append((ruta, datos))
+        _sumar(totales, datos_acumulados, indicadores=False)
+
+        if bloqueo and terminados:
+            try:
+                _fusionar(fusionados, datos_acumulados, terminados)
+            except OSError as e:
+                logger.warning(f"⚠️ No se pudieron fusionar las métricas de procesos terminados: {e}")
+    finally:
+        if bloqueo:
+            _borrar(bloqueo)
+    return totales
+
+
+# ---------------------------------------------------------------------------
+# Formato de texto de Prometheus
+# ---------------------------------------------------------------------------
+
+def _escapar(valor):
+    return valor.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _etiquetas(nombres, clave, extra=None):
+    pares = [f'{n}="{_escapar(v)}"' for n, v in zip(nombres, clave)]
+    if extra:
+        pares.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pares) + '}' if pares else ''
+
+
+def _numero(valor):
+    if isinstance(valor, float):
+        if math.isinf(valor):
+            return '+Inf' if valor > 0 else '-Inf'
+        return repr(valor)
+    return str(valor)
+
+
+def _lineas_metrica(metrica, valores):
+    lineas = [f'# HELP {metrica.nombre} {metrica.ayuda}', f'# TYPE {metrica.nombre} {metrica.tipo}']
+    for clave in sorted(valores):
+        valor = valores[clave]
+        if metrica.tipo != 'histogram':
+            lineas.append(f'{metrica.nombre}{_etiquetas(metrica.etiquetas, clave)} {_numero(valor)}')
+            continue
+        acumulado = 0
+        for limite, cuenta in zip(metrica.buckets + (math.inf,), valor[:-1]):
+            acumulado += cuenta
+            le = ('le', _numero(float(limite)))
+            lineas.append(f'{metrica.nombre}_bucket{_etiquetas(metrica.etiquetas, clave, le)} {acumulado}')
+        lineas.append(f'{metrica.nombre}_sum{_etiquetas(metrica.etiquetas, clave)} {_numero(float(valor[-1]))}')
+        lineas.append(f'{metrica.nombre}_count{_etiquetas(metrica.etiquetas, clave)} {acumulado}')
+    return lineas
+
+
+def exponer():
+    """Texto de /metrics (formato de exposición 0.0.4 de Prometheus)."""
+    lineas = []
+    for nombre, valores in agregar().items():
+        lineas.extend(_lineas_metrica(_METRICAS[nombre], valores))
+    for metrica in _CALCULADAS:
+        try:
+            valores = metrica.funcion()
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo calcular la métrica {metrica.nombre}: {e}")
+            continue
+        lineas.extend(_lineas_metrica(metrica, valores))
+    return '\n'.join(lineas) + '\n'
+
+
+# ---------------------------------------------------------------------------
+# Métricas de la aplicación
+# ---------------------------------------------------------------------------
+
+PETICIONES = Histograma(
+    'dislexia_peticion_duracion_segundos',
+    'Latencia de las peticiones por nombre de URL',
+    ['vista', 'metodo', 'codigo'],
+)
+CONSULTAS_PETICION = Histograma(
+    'dislexia_peticion_consultas',
+    'Consultas a la base de datos por petición',
+    ['vista'],
+    buckets=BUCKETS_CONSULTAS,
+)
+DURACION_CONSULTAS = Histograma(
+    'dislexia_peticion_consultas_segundos',
+    'Tiempo de base de datos por petición',
+    ['vista'],
+)
+CARGA_MODELO = Histograma(
+    'dislexia_modelo_carga_segundos',
+    'Tiempo de carga del modelo, el scaler y las features',
+    ['resultado'],
+    buckets=BUCKETS_LENTOS,
+)
+MODELO_CARGADO = Indicador(
+    'dislexia_modelo_cargado',
+    'Procesos con el modelo cargado en memoria',
+)
+DURACION_INFERENCIA = Histograma(
+    'dislexia_modelo_inferencia_segundos',
+    'Tiempo de inferencia (scaler y Keras) por predicción',
+)
+ERRORES_PREDICCION = Contador(
+    'dislexia_prediccion_errores_total',
+    'Predicciones fallidas (el modelo lanzó una excepción)',
+)
+DURACION_FEATURES = Histograma(
+    'dislexia_features_segundos',
+    'Tiempo de preparación de las features de una evaluación',
+)
+DURACION_PDF = Histograma(
+    'dislexia_pdf_render_segundos',
+    'Tiempo de generación de un PDF con Playwright',
+    ['origen'],
+    buckets=BUCKETS_LENTOS,
+)
+DURACION_CORREO = Histograma(
+    'dislexia_correo_envio_segundos',
+    'Tiempo de envío de un correo de la bandeja de salida',
+    ['resultado'],
+)
+RECHAZOS_LIMITE = Contador(
+    'dislexia_rate_limit_rechazos_total',
+    'Peticiones rechazadas por el límite de peticiones de las APIs de juego',
+    ['vista', 'ambito'],
+)
+
+
+def _colas_pendientes():
+    from app.core.models import AuditoriaAcceso, EmailOutbox, ExportacionDatos, PurgaCuenta
+    from app.core.utils.auditoria_archivo import meses_cerrados, limites_mes
+
+    meses = meses_cerrados()
+    por_archivar = 0
+    if meses:
+        _, hasta = limites_mes(meses[-1])
+        por_archivar = AuditoriaAcceso.objects.filter(timestamp__lt=hasta).count()
+
+    return {
+        ('correos',): EmailOutbox.objects.filter(estado__in=['pendiente', 'enviando']).count(),
+        ('exportaciones',): ExportacionDatos.objects.filter(estado__in=['pendiente', 'procesando']).count(),
+        ('purgas',): PurgaCuenta.objects.filter(estado__in=['pendiente', 'procesando']).count(),
+        ('auditoria_por_archivar',): por_archivar,
+    }
+
+
+IndicadorCalculado(
+    'dislexia_cola_pendiente',
+    'Elementos pendientes en las colas de trabajo en segundo plano',
+    ['cola'],
+    _colas_pendientes,
+)
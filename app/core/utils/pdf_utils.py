@@ -3,11 +3,15 @@ import os
 import base64
 import urllib.parse
 import re # Importar re para sanitizar nombres
+import time
 from django.http import HttpResponse
 from django.conf import settings
 from django.template import Template, Context
 from playwright.async_api import async_playwright
 
+from app.core.utils.metricas import DURACION_PDF, cronometrar
+from app.core.utils.trazas import span
+
 async def generate_pdf_async(html_data_uri):
     """ Función asíncrona que lanza Playwright (sin cambios) """
     async with async_playwright() as p:
@@ -63,41 +67,119 @@ def sanitize_filename(name):
     name = re.sub(r'_+', '_', name)
     return name
 
+def construir_html_data_uri(template_src, context_dict):
+    """
+    Renderiza la plantilla del PDF (con logo y firma incrustados) y la
+    devuelve como Data URI lista para Playwright.
+    """
+    template_path = os.path.join(settings.BASE_DIR, 'app', 'core', 'templates', template_src)
+    logo_path_relative = os.path.join('img', 'favicon.ico')
+    logo_data_uri = get_image_data_uri(logo_path_relative)
+    
+    # Cargar firma electrónica
+    firma_path_relative = os.path.join('img', 'firma.png')
+    firma_data_uri = get_image_data_uri(firma_path_relative)
+
+    with open(template_path, 'r', encoding='utf-8') as f:
+        raw_html = f.read()
+
+    template = Template(raw_html)
+    context_dict['logo_data_uri'] = logo_data_uri
+    context_dict['firma_data_uri'] = firma_data_uri
+    context = Context(context_dict)
+    html_string = template.render(context)
+
+    html_bytes = html_string.encode('utf-8')
+    base64_html = base64.b64encode(html_bytes).decode('utf-8')
+    return f'data:text/html;base64,{base64_html}'
+
+
+async def generate_pdfs_async(trabajos, al_terminar, max_concurrencia=3):
+    """
+    Genera varios PDF con un único navegador y como mucho
+    `max_concurrencia` páginas abiertas a la vez.
+
+    Args:
+        trabajos: iterable de (clave, html_data_uri)
+        al_terminar: función (clave, pdf_bytes o None) llamada según terminan
+    """
+    semaforo = asyncio.Semaphore(max_concurrencia)
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(
+            args=['--no-sandbox', '--disable-setuid-sandbox']
+        )
+
+        async def generar(clave, html_data_uri):
+            async with semaforo:
+                page = None
+                pdf_data = None
+                inicio = time.perf_counter()
+                try:
+                    page = await browser.new_page()
+                    await page.goto(html_data_uri, wait_until='networkidle')
+                    pdf_data = await page.pdf(
+                        format='A4',
+                        print_background=True,
+                        margin={ 'top': '2.5cm', 'bottom': '1.5cm', 'left': '1.5cm', 'right': '1.5cm'},
+                        display_header_footer=True,
+                        header_template='<span></span>',
+                        footer_template='<span></span>'
+                    )
+                except Exception as e:
+                    print(f"Error al generar el PDF {clave} con Playwright: {e}")
+                finally:
+                    if page:
+                        await page.close()
+                DURACION_PDF.observar(time.perf_counter() - inicio, origen='lote')
+                al_terminar(clave, pdf_data)
+
+        try:
+            await asyncio.gather(*(generar(clave, uri) for clave, uri in trabajos))
+        finally:
+            await browser.close()
+
+
+def contexto_reporte_pdf(reporte):
+    """Contexto de la plantilla report/reporte_pdf_template.html para un ReporteIA."""
+    from app.games.utils.compactacion import estadisticas_por_juego, pruebas_de_evaluacion
+
+    main_session = reporte.evaluacion
+    # Agrupamos las PruebasCognitivas (filas o compactadas) por juego y calculamos los totales.
+    statistics = estadisticas_por_juego(pruebas_de_evaluacion(main_session))
+
+    return {
+        'reporte': reporte,
+        'game_session': main_session, # Pasamos la 'Evaluacion' como 'game_session'
+        'nino': main_session.nino,
+        'evaluations': statistics, # Pasamos las estadísticas agrupadas
+    }
+
+
+def nombre_archivo_reporte(nino, evaluacion):
+    """Nombre de archivo del PDF de un reporte"""
+    if nino and evaluacion:
+        return f"Reporte_{sanitize_filename(nino.nombre_completo)}_Eval_{evaluacion.id}.pdf"
+    return "Reporte_DislexIA.pdf"
+
+
+@span('pdf.render_to_pdf', 'pdf')
 def render_to_pdf(request, template_src, context_dict={}):
     """
     Carga plantilla, incrusta logo, codifica HTML, genera PDF
     y establece un nombre de archivo personalizado.
     """
-    html_string = ""
     try:
-        template_path = os.path.join(settings.BASE_DIR, 'app', 'core', 'templates', template_src)
-        logo_path_relative = os.path.join('img', 'favicon.ico')
-        logo_data_uri = get_image_data_uri(logo_path_relative)
-        
-        # Cargar firma electrónica
-        firma_path_relative = os.path.join('img', 'firma.png')
-        firma_data_uri = get_image_data_uri(firma_path_relative)
-
-        with open(template_path, 'r', encoding='utf-8') as f:
-            raw_html = f.read()
-
-        template = Template(raw_html)
         context_dict['request'] = request
-        context_dict['logo_data_uri'] = logo_data_uri
-        context_dict['firma_data_uri'] = firma_data_uri
-        context = Context(context_dict)
-        html_string = template.render(context)
-
-        html_bytes = html_string.encode('utf-8')
-        base64_html = base64.b64encode(html_bytes).decode('utf-8')
-        html_data_uri = f'data:text/html;base64,{base64_html}'
-
+        with span('pdf.plantilla', 'pdf', plantilla=template_src):
+            html_data_uri = construir_html_data_uri(template_src, context_dict)
     except Exception as e:
         import traceback
         print(traceback.format_exc())
         return HttpResponse(f"Error al cargar/renderizar/codificar la plantilla: {e}", status=500)
 
-    pdf_data = asyncio.run(generate_pdf_async(html_data_uri))
+    with cronometrar(DURACION_PDF, origen='vista'), span('pdf.playwright', 'pdf'):
+        pdf_data = asyncio.run(generate_pdf_async(html_data_uri))
 
     if pdf_data:
         response = HttpResponse(pdf_data, content_type='application/pdf')
@@ -108,15 +190,7 @@ def render_to_pdf(request, template_src, context_dict={}):
             nino = context_dict.get('nino')
             evaluacion = context_dict.get('game_session') # Recuerda que 'game_session' es el objeto Evaluacion
 
-            if nino and evaluacion:
-                # Sanitizar nombre del niño (quitar espacios, etc.)
-                nino_name_sanitized = sanitize_filename(nino.nombre_completo)
-                eval_id = evaluacion.id
-                # Construir el nombre del archivo
-                filename = f"Reporte_{nino_name_sanitized}_Eval_{eval_id}.pdf"
-            else:
-                # Nombre por defecto si falta información
-                filename = "Reporte_DislexIA.pdf"
+            filename = nombre_archivo_reporte(nino, evaluacion)
 
             # Establecer la cabecera Content-Disposition
             # 'inline' sugiere visualizar, 'attachment' fuerza descarga
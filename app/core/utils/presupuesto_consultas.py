@@ -0,0 +1,145 @@
+"""
+Presupuesto de consultas por petición y detección de N+1.
+
+`RegistroConsultas` se instala como execute_wrapper en las conexiones y
+anota, por cada consulta, su huella (el SQL sin literales y con las listas
+IN colapsadas), el punto del código de app/ que la lanzó y su duración.
+Con ello `revisar()` señala:
+
+- las vistas que superan su presupuesto (PRESUPUESTO_CONSULTAS, por
+  nombre de URL, p. ej. 'core:lista_ninos');
+- las huellas repetidas PRESUPUESTO_CONSULTAS_REPETICIONES veces o más,
+  que casi siempre son un bucle N+1, con el sitio de la llamada.
+
+Lo usan `PresupuestoConsultasMiddleware` (opcional, ver
+PRESUPUESTO_CONSULTAS_ACTIVO; en DEBUG añade la cabecera Server-Timing) y,
+en los tests, el gestor de contexto `presupuesto_consultas`:
+
+    with presupuesto_consultas('core:lista_ninos'):
+        self.client.get(url)
+"""
+import os
+import re
+import sys
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.template.base import Node
+
+REPETICIONES_POR_DEFECTO = 5
+_LITERALES = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_LISTAS = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_ESTE_ARCHIVO = os.path.abspath(__file__)
+_DIRECTORIO_APP = os.path.dirname(os.path.dirname(os.path.dirname(_ESTE_ARCHIVO)))
+# Marcos de app/ que no cuentan como sitio de la llamada
+_EXCLUIDOS = {
+    _ESTE_ARCHIVO,
+    os.path.join(_DIRECTORIO_APP, 'core', 'middleware', 'presupuesto_consultas.py'),
+}
+
+
+class PresupuestoExcedido(AssertionError):
+    """Una petición superó su presupuesto de consultas o repitió una consulta en bucle."""
+
+
+def huella(sql):
+    """Forma del SQL: sin literales ni parámetros y con las listas IN colapsadas."""
+    forma = _LITERALES.sub('?', sql.replace('%s', '?'))
+    forma = _LISTAS.sub('(...)', forma)
+    return ' '.join(forma.split())
+
+
+def _sitio_llamada():
+    """
+    Sitio más interno de la pila que lanzó la consulta: un marco de app/
+    ('ruta:línea en función') o, si antes aparece, el nodo de plantilla
+    que se estaba renderizando ('plantilla:línea').
+    """
+    marco = sys._getframe(2)
+    while marco is not None:
+        archivo = os.path.abspath(marco.f_code.co_filename)
+        if archivo.startswith(_DIRECTORIO_APP) and archivo not in _EXCLUIDOS:
+            ruta = os.path.relpath(archivo, os.path.dirname(_DIRECTORIO_APP))
+            return f'{ruta}:{marco.f_lineno} en {marco.f_code.co_name}'
+        nodo = marco.f_locals.get('self') if marco.f_code.co_name == 'render_annotated' else None
+        if isinstance(nodo, Node) and nodo.token is not None:
+            return f'{nodo.origin.template_name}:{nodo.token.lineno} (plantilla)'
+        marco = marco.f_back
+    return 'desconocido'
+
+
+def presupuesto_de(vista):
+    """Máximo de consultas declarado para la vista, o None."""
+    return getattr(settings, 'PRESUPUESTO_CONSULTAS', {}).get(vista)
+
+
+class RegistroConsultas:
+    """execute_wrapper que cuenta consultas, tiempo de BD y huellas repetidas."""
+
+    def __init__(self):
+        self.consultas = []
+        self.tiempo = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duracion = time.perf_counter() - inicio
+            self.tiempo += duracion
+            self.consultas.append((huella(sql), _sitio_llamada(), duracion))
+
+    @property
+    def total(self):
+        return len(self.consultas)
+
+    @contextmanager
+    def vigilar(self):
+        """Registra las consultas de todas las conexiones dentro del bloque."""
+        with ExitStack() as pila:
+            for conexion in connections.all():
+                pila.enter_context(conexion.execute_wrapper(self))
+            yield self
+
+    def repetidas(self, umbral):
+        """[(huella, veces, sitio)] de las huellas lanzadas `umbral` veces o más."""
+        veces = Counter(h for h, _, _ in self.consultas)
+        sitios = {}
+        for h, sitio, _ in self.consultas:
+            sitios.setdefault(h, sitio)
+        return [(h, n, sitios[h]) for h, n in veces.most_common() if n >= umbral]
+
+    def revisar(self, vista, maximo=None, repeticiones=None):
+        """Lista de problemas (texto) de la petición; vacía si todo está bien."""
+        if maximo is None:
+            maximo = presupuesto_de(vista)
+        if repeticiones is None:
+            repeticiones = getattr(settings, 'PRESUPUESTO_CONSULTAS_REPETICIONES', REPETICIONES_POR_DEFECTO)
+
+        problemas = []
+        if maximo is not None and self.total > maximo:
+            problemas.append(f'{vista}: {self.total} consultas (presupuesto {maximo})')
+        for forma, veces, sitio in self.repetidas(repeticiones):
+            problemas.append(f'{vista}: posible N+1, {veces}x desde {sitio}: {forma[:200]}')
+        return problemas
+
+    def server_timing(self):
+        """Valor de la cabecera Server-Timing con el tiempo de BD."""
+        return f'db;dur={self.tiempo * 1000:.1f};desc="{self.total} consultas"'
+
+
+@contextmanager
+def presupuesto_consultas(vista=None, maximo=None, repeticiones=None):
+    """
+    Para tests: falla con PresupuestoExcedido si el bloque supera el
+    presupuesto de `vista` (o `maximo`) o repite una consulta en bucle.
+    """
+    registro = RegistroConsultas()
+    with registro.vigilar():
+        yield registro
+    problemas = registro.revisar(vista or 'bloque', maximo, repeticiones)
+    if problemas:
+        raise PresupuestoExcedido('\n'.join(problemas))
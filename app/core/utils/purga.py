@@ -0,0 +1,269 @@
+"""
+Eliminación en bloque de cuentas y evaluaciones.
+
+`Model.delete()` hace que el Collector de Django cargue en memoria cada
+Nino, Evaluacion, SesionJuego, PruebaCognitiva, ReporteIA... antes de
+borrarlos, en una única transacción larga. Aquí, en cambio:
+
+- los conteos se obtienen con COUNT por tabla, sin recorrer objetos;
+- las tablas se vacían de las hojas a la raíz con sentencias por lotes
+  `DELETE ... WHERE id IN (subconsulta LIMIT n)`, cada lote en su propia
+  transacción;
+- las relaciones SET_NULL (AuditoriaAcceso.usuario, EmailOutbox.cita) se
+  respetan con `UPDATE ... SET campo = NULL` por lotes, antes de borrar
+  el registro padre.
+
+La eliminación de una cuenta se solicita con `solicitar_purga_cuenta` y se
+ejecuta en segundo plano (hilo tras el commit o
+`python manage.py procesar_purgas`), guardando el avance en PurgaCuenta.
+La de una evaluación, acotada por definición, se hace en la petición.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+logger = logging.getLogger('app.core')
+
+TAMANO_LOTE = getattr(settings, 'PURGA_TAMANO_LOTE', 1000)
+# Una purga 'procesando' más tiempo que esto se considera abandonada
+BLOQUEO_EXPIRA_HORAS = 2
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='purga-cuentas')
+
+
+class PasoPurga:
+    """Una tabla a vaciar: registros de `modelo` cuyo `lookup` apunta al objetivo."""
+
+    def __init__(self, clave, modelo, lookup, anular=None):
+        self.clave = clave
+        self.etiqueta = modelo
+        self.lookup = lookup
+        self.anular = anular
+
+    @property
+    def modelo(self):
+        return apps.get_model(self.etiqueta)
+
+    def queryset(self, objetivo_id):
+        return self.modelo._default_manager.filter(**{self.lookup: objetivo_id})
+
+
+# Orden de hojas a raíz: ningún paso deja filas huérfanas en pasos anteriores
+PASOS_EVALUACION = [
+    PasoPurga('eventos_cliente', 'games.EventoCliente', 'sesion__evaluacion'),
+    PasoPurga('pruebas_cognitivas', 'games.PruebaCognitiva', 'evaluacion'),
+    PasoPurga('sesiones_juego', 'games.SesionJuego', 'evaluacion'),
+    PasoPurga('validaciones', 'core.ValidacionProfesional', 'ReporteIA__evaluacion'),
+    PasoPurga('reportes_ia', 'core.ReporteIA', 'evaluacion'),
+    PasoPurga('evaluaciones', 'games.Evaluacion', 'pk'),
+]
+
+PASOS_CUENTA = [
+    PasoPurga('eventos_cliente', 'games.EventoCliente', 'sesion__evaluacion__nino__profesional'),
+    PasoPurga('pruebas_cognitivas', 'games.PruebaCognitiva', 'evaluacion__nino__profesional'),
+    PasoPurga('sesiones_juego', 'games.SesionJuego', 'evaluacion__nino__profesional'),
+    PasoPurga('validaciones_reportes', 'core.ValidacionProfesional', 'ReporteIA__evaluacion__nino__profesional'),
+    PasoPurga('reportes_ia', 'core.ReporteIA', 'evaluacion__nino__profesional'),
+    PasoPurga('evaluaciones', 'games.Evaluacion', 'nino__profesional'),
+    PasoPurga('consentimientos_tutor', 'core.ConsentimientoTutor', 'nino__profesional'),
+    PasoPurga('ninos', 'core.Nino', 'profesional'),
+    PasoPurga('validaciones', 'core.ValidacionProfesional', 'profesional'),
+    PasoPurga('correos_citas', 'core.EmailOutbox', 'cita__usuario', anular='cita'),
+    PasoPurga('citas', 'core.Cita', 'usuario'),
+    PasoPurga('consentimientos', 'core.ConsentimientoGDPR', 'usuario'),
+    PasoPurga('exportaciones', 'core.ExportacionDatos', 'usuario'),
+    PasoPurga('auditorias', 'core.AuditoriaAcceso', 'usuario', anular='usuario'),
+]
+
+
+def contar(pasos, objetivo_id):
+    """Registros afectados por cada paso (un COUNT por tabla)."""
+    return {paso.clave: paso.queryset(objetivo_id).count() for paso in pasos}
+
+
+def _ejecutar_lote(paso, objetivo_id, lote):
+    """
+    Borra (o pone a NULL) hasta `lote` registros del paso con una sola
+    sentencia. Devuelve el número de filas afectadas.
+    """
+    modelo = paso.modelo
+    alias = router.db_for_write(modelo)
+    conexion = connections[alias]
+    qn = conexion.ops.quote_name
+
+    ids = paso.queryset(objetivo_id).values('pk')[:lote]
+    subconsulta, params = ids.query.get_compiler(using=alias).as_sql()
+    tabla = qn(modelo._meta.db_table)
+    # La tabla derivada evita las restricciones de MySQL con LIMIT en IN
+    # y con subconsultas sobre la misma tabla que se modifica
+    filtro = f'{qn(modelo._meta.pk.column)} IN (SELECT * FROM ({subconsulta}) AS lote)'
+
+    if paso.anular:
+        columna = qn(modelo._meta.get_field(paso.anular).column)
+        sql = f'UPDATE {tabla} SET {columna} = NULL WHERE {filtro}'
+    else:
+        sql = f'DELETE FROM {tabla} WHERE {filtro}'
+
+    with conexion.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+def purgar(pasos, objetivo_id, lote=TAMANO_LOTE, progreso=None, al_avanzar=None):
+    """
+    Ejecuta los pasos por lotes, cada lote en su propia transacción.
+
+    Args:
+        progreso: dict {clave: filas} de una ejecución anterior (se actualiza)
+        al_avanzar: función (progreso) llamada tras cada lote
+
+    Returns:
+        dict {clave: filas afectadas}
+    """
+    progreso = progreso if progreso is not None else {}
+    for paso in pasos:
+        while True:
+            with transaction.atomic(using=router.db_for_write(paso.modelo)):
+                filas = _ejecutar_lote(paso, objetivo_id, lote)
+            if filas:
+                progreso[paso.clave] = progreso.get(paso.clave, 0) + filas
+                if al_avanzar:
+                    al_avanzar(progreso)
+            if filas < lote:
+                break
+    return progreso
+
+
+def purgar_evaluacion(evaluacion_id, lote=TAMANO_LOTE):
+    """Elimina una evaluación y todo lo que depende de ella."""
+    from app.core.utils.resumen_nino import actualizar_resumen
+
+    from app.core.utils.gdpr_archive import eliminar_pdfs_cache
+
+    nino_id = apps.get_model('games.Evaluacion').objects.filter(pk=evaluacion_id).values_list('nino_id', flat=True).first()
+    # Los DELETE por lotes tampoco borran el PDF en caché del reporte
+    eliminar_pdfs_cache(apps.get_model('core.ReporteIA').objects.filter(evaluacion_id=evaluacion_id).values_list('pk', flat=True))
+    progreso = purgar(PASOS_EVALUACION, evaluacion_id, lote=lote)
+    # Los DELETE por lotes no emiten señales: actualizar el resumen aquí
+    actualizar_resumen(nino_id)
+    return progreso
+
+
+def solicitar_purga_cuenta(usuario):
+    """
+    Desactiva la cuenta y encola su eliminación.
+
+    Returns:
+        PurgaCuenta
+    """
+    from app.core.models import PurgaCuenta
+
+    with transaction.atomic():
+        usuario.is_active = False
+        usuario.save(update_fields=['is_active'])
+        purga = PurgaCuenta.objects.create(
+            usuario_id=usuario.pk,
+            username=usuario.username,
+            conteos=contar(PASOS_CUENTA, usuario.pk),
+        )
+        transaction.on_commit(lambda: lanzar_purga(purga.pk))
+    return purga
+
+
+def reclamar(purga_id=None):
+    """
+    Marca como 'procesando' una purga pendiente (la indicada o la más
+    antigua) y la devuelve, o None si no hay ninguna libre.
+    """
+    from app.core.models import PurgaCuenta
+
+    expirado = timezone.now() - timedelta(hours=BLOQUEO_EXPIRA_HORAS)
+    PurgaCuenta.objects.filter(estado='procesando', fecha_inicio__lt=expirado).update(estado='pendiente')
+
+    candidatas = PurgaCuenta.objects.filter(estado='pendiente')
+    if purga_id is not None:
+        candidatas = candidatas.filter(pk=purga_id)
+    for pk in candidatas.order_by('fecha_solicitud').values_list('pk', flat=True)[:5]:
+        if PurgaCuenta.objects.filter(pk=pk, estado='pendiente').update(
+            estado='procesando', fecha_inicio=timezone.now()
+        ):
+            return PurgaCuenta.objects.get(pk=pk)
+    return None
+
+
+def procesar_purga(purga, lote=TAMANO_LOTE):
+    """Elimina los datos de la cuenta, retomando el avance guardado."""
+    from app.core.models import ExportacionDatos, Profesional, PurgaCuenta, ReporteIA
+    from app.core.utils.gdpr_archive import eliminar_pdfs_cache
+
+    def guardar_avance(progreso):
+        PurgaCuenta.objects.filter(pk=purga.pk).update(progreso=progreso)
+
+    try:
+        # Los ZIP de exportación contienen todos los datos: fuera del almacenamiento
+        archivos = ExportacionDatos.objects.filter(usuario_id=purga.usuario_id).exclude(archivo='')
+        for nombre in archivos.exclude(archivo=None).values_list('archivo', flat=True):
+            default_storage.delete(nombre)
+        # Y los PDF de sus reportes en caché, antes de perder los IDs
+        eliminar_pdfs_cache(
+            ReporteIA.objects.filter(evaluacion__nino__profesional_id=purga.usuario_id).values_list('pk', flat=True).iterator()
+        )
+
+        purgar(PASOS_CUENTA, purga.usuario_id, lote=lote, progreso=purga.progreso, al_avanzar=guardar_avance)
+
+        # Con las tablas grandes ya vacías, el Collector sólo resuelve lo
+        # que queda (permisos, grupos, LogEntry del admin)
+        Profesional.objects.filter(pk=purga.usuario_id).delete()
+    except Exception as e:
+        logger.exception(f"❌ Error eliminando la cuenta {purga.username}: {e}")
+        purga.estado = 'fallida'
+        purga.error = str(e)[:2000]
+        purga.fecha_fin = timezone.now()
+        purga.save(update_fields=['estado', 'error', 'fecha_fin'])
+        return False
+
+    purga.estado = 'completada'
+    purga.fecha_fin = timezone.now()
+    purga.save(update_fields=['estado', 'progreso', 'fecha_fin'])
+    logging.getLogger('audit').info(
+        f"CUENTA ELIMINADA EXITOSAMENTE - {purga.username} | Registros: {purga.progreso}"
+    )
+    return True
+
+
+def procesar_pendientes(lote=TAMANO_LOTE):
+    """Procesa las purgas pendientes una a una. Devuelve cuántas se procesaron."""
+    procesadas = 0
+    while True:
+        purga = reclamar()
+        if purga is None:
+            return procesadas
+        procesar_purga(purga, lote=lote)
+        procesadas += 1
+
+
+def _ejecutar_en_hilo(purga_id):
+    try:
+        purga = reclamar(purga_id)
+        if purga is not None:
+            procesar_purga(purga)
+    except Exception as e:
+        logger.exception(f"❌ Error en la eliminación de cuenta en segundo plano: {e}")
+    finally:
+        # Las conexiones a BD son por hilo: cerrar las de este hilo
+        connections.close_all()
+
+
+def lanzar_purga(purga_id):
+    """
+    Procesa la purga en un hilo de fondo del proceso web. Si PURGA_HILO
+    está desactivado la recoge `procesar_purgas`.
+    """
+    if getattr(settings, 'PURGA_HILO', True):
+        _executor.submit(_ejecutar_en_hilo, purga_id)
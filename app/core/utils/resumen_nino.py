@@ -0,0 +1,76 @@
+"""
+Resumen desnormalizado de cada niño.
+
+Los listados de niños (ListaNinosView, GestionNinosAdminView, NinoAdmin)
+muestran por niño el número de evaluaciones, la fecha de la última, el
+último nivel de riesgo y la última precisión. En lugar de derivarlos de
+Evaluacion y ReporteIA en cada carga, se guardan en columnas de Nino:
+
+- `actualizar_resumen` los recalcula con un único UPDATE (subconsultas
+  correlacionadas) dentro de la misma transacción que guarda o borra una
+  Evaluacion o un ReporteIA (ver signals.py y purga.purgar_evaluacion);
+- `recalcular` (comando recompute_nino_resumen) los reconstruye en bloque
+  tras cargas masivas con bulk_create u otros cambios que no emiten señales.
+
+Se recalcula desde las tablas de origen en vez de sumar y restar, así que
+dos actualizaciones concurrentes no pueden dejar el resumen descuadrado.
+"""
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from app.core.utils.consultas import subconsulta_agregada
+
+CAMPOS = ['total_evaluaciones', 'fecha_ultima_evaluacion', 'ultimo_nivel_riesgo', 'ultima_precision']
+TAMANO_LOTE = 1000
+
+
+def expresiones():
+    """Expresiones de UPDATE que recalculan los campos de resumen de cada niño."""
+    from app.core.models import ReporteIA
+    from app.games.models import Evaluacion
+
+    evaluaciones = Evaluacion.objects.filter(nino=OuterRef('pk')).order_by('-fecha_hora_inicio', '-pk')
+    reportes = ReporteIA.objects.filter(evaluacion__nino=OuterRef('pk')).order_by(
+        '-evaluacion__fecha_hora_inicio', '-evaluacion_id'
+    )
+    return {
+        'total_evaluaciones': Coalesce(
+            subconsulta_agregada(Evaluacion.objects.all(), 'nino', Count('pk')), 0
+        ),
+        'fecha_ultima_evaluacion': Subquery(evaluaciones.values('fecha_hora_inicio')[:1]),
+        'ultimo_nivel_riesgo': Coalesce(Subquery(reportes.values('clasificacion_riesgo')[:1]), Value('')),
+        'ultima_precision': Subquery(
+            evaluaciones.filter(estado='completada').values('precision_promedio')[:1]
+        ),
+    }
+
+
+def actualizar_resumen(nino_id):
+    """Recalcula el resumen de un niño. Devuelve las filas actualizadas (0 o 1)."""
+    from app.core.models import Nino
+
+    if nino_id is None:
+        return 0
+    return Nino.objects.filter(pk=nino_id).update(**expresiones())
+
+
+def recalcular(queryset=None, lote=TAMANO_LOTE):
+    """
+    Recalcula el resumen de los niños de `queryset` (todos por defecto) por
+    lotes de IDs, un UPDATE por lote.
+
+    Returns:
+        Número de niños actualizados
+    """
+    from app.core.models import Nino
+
+    queryset = Nino.objects.all() if queryset is None else queryset
+    ids = queryset.order_by('pk').values_list('pk', flat=True)
+    actualizados = 0
+    ultimo = 0
+    while True:
+        lote_ids = list(ids.filter(pk__gt=ultimo)[:lote])
+        if not lote_ids:
+            return actualizados
+        actualizados += Nino.objects.filter(pk__in=lote_ids).update(**expresiones())
+        ultimo = lote_ids[-1]
@@ -0,0 +1,287 @@
+"""
+Aplicación de las políticas de retención de datos (PoliticaRetencionDatos).
+
+Cada tipo de dato de la política se traduce en una o varias reglas
+(modelo + campo de fecha + cómo anonimizar). Los registros vencidos se
+procesan por lotes ordenados por clave primaria (keyset):
+
+- eliminar: DELETE por lotes; en SQL directo si el modelo no tiene
+  relaciones inversas, con `QuerySet.delete()` (cascadas) si las tiene;
+- anonimizar: se sobrescriben los campos personales con `bulk_update`,
+  saltando los registros ya anonimizados.
+
+Cada lote va en su propia transacción, con una pausa configurable entre
+lotes para no mantener bloqueos largos sobre tablas calientes, y deja un
+resumen en AuditoriaAcceso. El último ID procesado se guarda en
+`PoliticaRetencionDatos.progreso`, de modo que una ejecución interrumpida
+continúa donde se quedó.
+"""
+import logging
+import time
+
+from django.apps import apps
+from django.contrib.auth.hashers import make_password
+from django.db import connections, models, router, transaction
+from django.db.models import Q
+from django.db.models.fields.files import FieldFile
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+logger = logging.getLogger('app.core')
+
+TEXTO_ANONIMIZADO = '[Anonimizado]'
+TAMANO_LOTE = 500
+PAUSA_SEGUNDOS = 0.5
+ETIQUETA_ARCHIVO = 'archivo de auditoría'
+
+
+class ReglaRetencion:
+    """Cómo aplicar una política a un modelo concreto."""
+
+    def __init__(self, modelo, campo_fecha, anonimizar=None, ya_anonimizado=None, filtro=None):
+        self.etiqueta = modelo
+        self.campo_fecha = campo_fecha
+        self.anonimizar = anonimizar or {}
+        self.ya_anonimizado = ya_anonimizado
+        self.filtro = filtro
+
+    @property
+    def modelo(self):
+        return apps.get_model(self.etiqueta)
+
+    def vencidos(self, limite, accion):
+        """Queryset de registros vencidos pendientes de la acción."""
+        qs = self.modelo._default_manager.all()
+        if self.filtro is not None:
+            qs = qs.filter(self.filtro)
+
+        if isinstance(self.campo_fecha, str):
+            campo = self.modelo._meta.get_field(self.campo_fecha)
+            es_fecha = isinstance(campo, models.DateField) and not isinstance(campo, models.DateTimeField)
+            qs = qs.filter(**{f'{self.campo_fecha}__lt': limite.date() if es_fecha else limite})
+        else:
+            qs = qs.annotate(_fecha_retencion=self.campo_fecha).filter(_fecha_retencion__lt=limite)
+
+        if accion == 'anonimizar' and self.ya_anonimizado is not None:
+            qs = qs.exclude(self.ya_anonimizado)
+        return qs
+
+
+REGLAS = {
+    'evaluacion': [
+        ReglaRetencion(
+            'games.Evaluacion', 'fecha_hora_inicio',
+            anonimizar={'dispositivo': ''},
+            ya_anonimizado=Q(dispositivo=''),
+        ),
+    ],
+    'reporte_ia': [
+        ReglaRetencion(
+            'core.ReporteIA', 'fecha_generacion',
+            anonimizar={'recomendaciones': TEXTO_ANONIMIZADO},
+            ya_anonimizado=Q(recomendaciones=TEXTO_ANONIMIZADO),
+        ),
+    ],
+    'sesion_juego': [
+        # Las pruebas no contienen datos personales: sólo se eliminan
+        ReglaRetencion('games.PruebaCognitiva', 'fecha_ejecucion'),
+        ReglaRetencion(
+            'games.SesionJuego', 'fecha_inicio',
+            # La URL de sesión da acceso al juego: se invalida
+            # y se eliminan las pruebas compactadas (como las filas de arriba)
+            # y la línea de tiempo de respuestas
+            anonimizar={
+                'url_sesion': lambda obj: f'anonimizada-{obj.pk}',
+                'pruebas_empaquetadas': None,
+                'linea_tiempo': None,
+            },
+            ya_anonimizado=Q(url_sesion__startswith='anonimizada-'),
+        ),
+    ],
+    'cita': [
+        ReglaRetencion(
+            'core.Cita', 'fecha',
+            anonimizar={
+                'nombre_paciente': TEXTO_ANONIMIZADO,
+                'email_padres': None,
+                'notas': None,
+                'foto_paciente': None,
+            },
+            ya_anonimizado=Q(nombre_paciente=TEXTO_ANONIMIZADO),
+        ),
+    ],
+    'auditoria': [
+        ReglaRetencion(
+            'core.AuditoriaAcceso', 'timestamp',
+            anonimizar={
+                'usuario': None,
+                'ip_address': '0.0.0.0',
+                'user_agent': '',
+                'detalles': None,
+            },
+            ya_anonimizado=Q(usuario__isnull=True, ip_address='0.0.0.0', user_agent=''),
+        ),
+    ],
+    'usuario_inactivo': [
+        ReglaRetencion(
+            'core.Profesional', Coalesce('last_login', 'fecha_registro'),
+            filtro=Q(is_staff=False, is_superuser=False),
+            anonimizar={
+                'username': lambda obj: f'anonimo-{obj.pk}',
+                'email': '',
+                'first_name': '',
+                'last_name': '',
+                'nombres': '',
+                'apellidos': '',
+                'especialidad': '',
+                'numero_licencia': None,
+                'imagen': None,
+                'is_active': False,
+                'password': lambda obj: make_password(None),
+            },
+            ya_anonimizado=Q(username__startswith='anonimo-'),
+        ),
+    ],
+}
+
+
+def _eliminar(modelo, ids):
+    """Elimina un lote. SQL directo si nada depende del modelo."""
+    if not modelo._meta.related_objects:
+        alias = router.db_for_write(modelo)
+        tabla = connections[alias].ops.quote_name(modelo._meta.db_table)
+        columna = connections[alias].ops.quote_name(modelo._meta.pk.column)
+        marcadores = ', '.join(['%s'] * len(ids))
+        with connections[alias].cursor() as cursor:
+            cursor.execute(f'DELETE FROM {tabla} WHERE {columna} IN ({marcadores})', ids)
+            return cursor.rowcount
+    return modelo._default_manager.filter(pk__in=ids).delete()[0]
+
+
+def _anonimizar(regla, ids):
+    """Sobrescribe los campos personales de un lote con bulk_update."""
+    modelo = regla.modelo
+    campos = list(regla.anonimizar)
+    objetos = list(modelo._default_manager.filter(pk__in=ids).only('pk', *campos))
+
+    for obj in objetos:
+        for campo, valor in regla.anonimizar.items():
+            actual = getattr(obj, campo)
+            # Los archivos se borran del almacenamiento (tras el commit del lote)
+            if isinstance(actual, FieldFile) and actual.name:
+                transaction.on_commit(lambda f=actual.storage, n=actual.name: f.delete(n))
+            setattr(obj, campo, valor(obj) if callable(valor) else valor)
+
+    modelo._default_manager.bulk_update(objetos, campos)
+    _invalidar_pdfs(modelo, ids)
+    return len(objetos)
+
+
+def _invalidar_pdfs(modelo, ids):
+    """
+    bulk_update no emite señales: borra (tras el commit del lote) los PDF en
+    caché de los reportes afectados por la anonimización.
+    """
+    from app.core.models import ReporteIA
+    from app.core.utils.gdpr_archive import eliminar_pdfs_cache
+
+    if modelo._meta.label == 'core.ReporteIA':
+        reporte_ids = list(ids)
+    elif modelo._meta.label == 'games.Evaluacion':
+        reporte_ids = list(ReporteIA.objects.filter(evaluacion_id__in=ids).values_list('pk', flat=True))
+    else:
+        return
+    if reporte_ids:
+        transaction.on_commit(lambda: eliminar_pdfs_cache(reporte_ids))
+
+
+def _registrar_lote(politica, regla, ids, procesados):
+    from app.core.models import AuditoriaAcceso
+
+    AuditoriaAcceso.registrar(
+        usuario=None,
+        accion='DELETE' if politica.accion_al_vencer == 'eliminar' else 'DATA_ANONYMIZED',
+        tabla_afectada=regla.modelo.__name__,
+        detalles={
+            'origen': 'aplicar_retencion',
+            'politica': politica.tipo_dato,
+            'dias_retencion': politica.dias_retencion,
+            'registros': procesados,
+            'desde_id': ids[0],
+            'hasta_id': ids[-1],
+        },
+    )
+
+
+def contar_vencidos(politica):
+    """Registros pendientes por modelo para una política (dry-run)."""
+    limite = timezone.now() - timezone.timedelta(days=politica.dias_retencion)
+    conteo = {}
+    for regla in REGLAS.get(politica.tipo_dato, []):
+        if politica.accion_al_vencer == 'anonimizar' and not regla.anonimizar:
+            continue
+        conteo[regla.etiqueta] = regla.vencidos(limite, politica.accion_al_vencer).count()
+    if politica.tipo_dato == 'auditoria':
+        from app.core.utils.auditoria_archivo import contar_vencidos_archivo
+        conteo[ETIQUETA_ARCHIVO] = contar_vencidos_archivo(politica)
+    return conteo
+
+
+def aplicar_politica(politica, lote=TAMANO_LOTE, pausa=PAUSA_SEGUNDOS, reiniciar=False, stdout=None):
+    """
+    Aplica una política por lotes, retomando desde `politica.progreso`.
+
+    Returns:
+        dict {etiqueta_modelo: registros procesados}
+    """
+    accion = politica.accion_al_vencer
+    limite = timezone.now() - timezone.timedelta(days=politica.dias_retencion)
+    if reiniciar:
+        politica.progreso = {}
+
+    resumen = {}
+    for regla in REGLAS.get(politica.tipo_dato, []):
+        if accion == 'anonimizar' and not regla.anonimizar:
+            continue
+
+        qs = regla.vencidos(limite, accion)
+        cursor = politica.progreso.get(regla.etiqueta, 0)
+        total = 0
+
+        while True:
+            ids = list(qs.filter(pk__gt=cursor).order_by('pk').values_list('pk', flat=True)[:lote])
+            if not ids:
+                break
+
+            with transaction.atomic():
+                if accion == 'eliminar':
+                    procesados = _eliminar(regla.modelo, ids)
+                else:
+                    procesados = _anonimizar(regla, ids)
+                _registrar_lote(politica, regla, ids, procesados)
+
+                cursor = ids[-1]
+                politica.progreso[regla.etiqueta] = cursor
+                politica.save(update_fields=['progreso'])
+
+            total += procesados
+            if stdout:
+                stdout.write(f"   · {regla.etiqueta}: lote hasta ID {cursor} ({procesados} registros)")
+            if len(ids) < lote:
+                break
+            if pausa:
+                time.sleep(pausa)
+
+        resumen[regla.etiqueta] = total
+
+    # Los meses archivados fuera de la tabla (ver auditoria_archivo.py)
+    if politica.tipo_dato == 'auditoria':
+        from app.core.utils.auditoria_archivo import aplicar_politica_archivo
+        resumen[ETIQUETA_ARCHIVO] = aplicar_politica_archivo(politica)
+
+    # Ejecución completa: la próxima empieza desde el principio
+    politica.progreso = {}
+    politica.fecha_ultima_aplicacion = timezone.now()
+    politica.save(update_fields=['progreso', 'fecha_ultima_aplicacion'])
+    logger.info(f"🗄️ Retención '{politica.tipo_dato}' ({accion}): {resumen}")
+    return resumen
@@ -0,0 +1,256 @@
+"""
+Utilidades para generar miniaturas (derivados) de imágenes con Pillow.
+
+Cada imagen subida (niños, profesionales, citas, juegos) y cada imagen
+estática de los juegos se reduce a varios tamaños fijos en WebP y JPEG.
+Los derivados se guardan direccionados por contenido:
+
+    miniaturas/<hash[:2]>/<hash>-<tamaño>.<ext>
+
+donde <hash> es el SHA-1 del archivo original, de modo que dos subidas
+idénticas comparten derivados y un cambio de imagen nunca sirve una
+miniatura vieja desde la caché del navegador.
+
+El redimensionado se hace fuera del hilo de la petición: al guardar una
+imagen nueva se encola su generación en un hilo de fondo, que al terminar
+guarda el hash en la propia fila (`<campo>_hash`, p. ej. Nino.imagen_hash).
+`url_miniatura` construye la URL del derivado a partir de ese campo, sin
+consultar la caché ni el almacenamiento, y devuelve la URL original
+mientras el hash está vacío. `python manage.py generar_miniaturas` rellena
+el hash de las imágenes anteriores.
+"""
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections
+
+from PIL import Image, ImageOps
+
+logger = logging.getLogger('app.core')
+
+# Tamaños (lado mayor en píxeles) disponibles para las miniaturas
+TAMANOS_MINIATURA = getattr(settings, 'THUMBNAIL_SIZES', {
+    'xs': 64,
+    'sm': 128,
+    'md': 256,
+    'lg': 512,
+})
+
+FORMATOS_MINIATURA = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+DIRECTORIO_MINIATURAS = 'miniaturas'
+
+# Un solo hilo: las miniaturas no son urgentes y así no compiten con las peticiones
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='miniaturas')
+_pendientes = set()
+_pendientes_lock = threading.Lock()
+
+
+def hash_contenido(data):
+    """SHA-1 del contenido de un archivo (bytes)."""
+    return hashlib.sha1(data).hexdigest()
+
+
+def nombre_derivado(hash_archivo, tamano, formato='webp'):
+    """Ruta relativa, direccionada por contenido, de un derivado."""
+    extension = 'jpg' if formato == 'jpeg' else formato
+    return f"{DIRECTORIO_MINIATURAS}/{hash_archivo[:2]}/{hash_archivo}-{tamano}.{extension}"
+
+
+def renderizar_miniatura(data, lado, formato='webp'):
+    """
+    Redimensiona una imagen (bytes) para que su lado mayor mida como
+    máximo `lado` píxeles y la codifica en el formato indicado.
+
+    Returns:
+        bytes con la imagen codificada
+    """
+    formato_pil, opciones = FORMATOS_MINIATURA[formato]
+
+    with Image.open(io.BytesIO(data)) as imagen:
+        imagen = ImageOps.exif_transpose(imagen)
+        imagen.thumbnail((lado, lado), Image.Resampling.LANCZOS)
+
+        if formato == 'jpeg':
+            # JPEG no admite transparencia: componer sobre fondo blanco
+            if imagen.mode in ('RGBA', 'LA', 'P'):
+                imagen = imagen.convert('RGBA')
+                fondo = Image.new('RGB', imagen.size, (255, 255, 255))
+                fondo.paste(imagen, mask=imagen.split()[-1])
+                imagen = fondo
+            elif imagen.mode != 'RGB':
+                imagen = imagen.convert('RGB')
+        elif imagen.mode not in ('RGB', 'RGBA'):
+            imagen = imagen.convert('RGBA' if 'A' in imagen.getbands() else 'RGB')
+
+        salida = io.BytesIO()
+        imagen.save(salida, formato_pil, **opciones)
+        return salida.getvalue()
+
+
+def generar_derivados(data, storage, tamanos=None, formatos=None):
+    """
+    Genera (si no existen) los derivados de una imagen en `storage`.
+
+    Returns:
+        str con el hash de contenido de la imagen original
+    """
+    hash_archivo = hash_contenido(data)
+    for tamano, lado in (tamanos or TAMANOS_MINIATURA).items():
+        for formato in (formatos or FORMATOS_MINIATURA):
+            nombre = nombre_derivado(hash_archivo, tamano, formato)
+            if storage.exists(nombre):
+                continue
+            storage.save(nombre, ContentFile(renderizar_miniatura(data, lado, formato)))
+    return hash_archivo
+
+
+def campo_hash(campo):
+    """Nombre del campo del modelo que guarda el hash de la imagen `campo`."""
+    return f"{campo.field.name}_hash"
+
+
+def guardar_hash(modelo, nombre_campo, nombre, hash_archivo):
+    """Guarda el hash en todas las filas de `modelo` que usan la imagen `nombre`."""
+    modelo.objects.filter(**{nombre_campo: nombre}).update(**{f"{nombre_campo}_hash": hash_archivo})
+
+
+def procesar_imagen(storage, nombre):
+    """
+    Genera los derivados de la imagen `nombre` de `storage` de forma
+    síncrona. Usado por el hilo de fondo y por el comando `generar_miniaturas`.
+
+    Returns:
+        str con el hash de contenido, o None si no se pudo procesar
+    """
+    try:
+        with storage.open(nombre, 'rb') as archivo:
+            data = archivo.read()
+        hash_archivo = generar_derivados(data, storage)
+    except FileNotFoundError:
+        logger.warning(f"⚠️ Imagen no encontrada para miniaturas: {nombre}")
+        return None
+    except Exception as e:
+        logger.error(f"❌ Error generando miniaturas de {nombre}: {e}")
+        return None
+
+    return hash_archivo
+
+
+def _procesar_en_fondo(modelo, nombre_campo, storage, nombre):
+    try:
+        hash_archivo = procesar_imagen(storage, nombre)
+        if hash_archivo:
+            guardar_hash(modelo, nombre_campo, nombre, hash_archivo)
+    except Exception as e:
+        logger.error(f"❌ Error guardando el hash de miniaturas de {nombre}: {e}")
+    finally:
+        with _pendientes_lock:
+            _pendientes.discard(nombre)
+        # Las conexiones a BD son por hilo: cerrar las de este hilo
+        connections.close_all()
+
+
+def programar_miniaturas(campo):
+    """
+    Encola la generación de derivados de `campo` en el hilo de fondo.
+    No hace nada si la fila ya tiene el hash de la imagen.
+    """
+    if not campo or not campo.name or getattr(campo.instance, campo_hash(campo), ''):
+        return
+
+    with _pendientes_lock:
+        if campo.name in _pendientes:
+            return
+        _pendientes.add(campo.name)
+
+    _executor.submit(_procesar_en_fondo, type(campo.instance), campo.field.name, campo.storage, campo.name)
+
+
+def url_miniatura(campo, tamano='sm', formato='webp'):
+    """
+    URL de la miniatura de `campo` en el tamaño pedido.
+
+    Se construye con el hash guardado en la fila; si aún no está (los
+    derivados se están generando) devuelve la URL original.
+    """
+    if not campo or not campo.name:
+        return None
+
+    if tamano not in TAMANOS_MINIATURA:
+        raise ValueError(f"Tamaño de miniatura no válido: {tamano}")
+
+    hash_archivo = getattr(campo.instance, campo_hash(campo), '')
+    if hash_archivo:
+        return campo.storage.url(nombre_derivado(hash_archivo, tamano, formato))
+    return campo.url
+
+
+# ============================================
+# IMÁGENES ESTÁTICAS DE LOS JUEGOS
+# ============================================
+
+MANIFIESTO_ESTATICO = 'img/miniaturas/manifest.json'
+
+
+def generar_miniaturas_estaticas(directorio_static, tamanos=None):
+    """
+    Genera derivados de las imágenes en `<directorio_static>/img` dentro de
+    `<directorio_static>/img/miniaturas` y escribe un manifiesto que
+    relaciona cada ruta estática original con sus derivados.
+
+    Returns:
+        dict manifiesto {"/static/img/casa.jpg": {"md": {"webp": ..., "jpeg": ...}}}
+    """
+    from django.core.files.storage import FileSystemStorage
+
+    directorio_img = os.path.join(directorio_static, 'img')
+    storage = FileSystemStorage(location=directorio_img)
+    prefijo_url = f"/{settings.STATIC_URL.strip('/')}/img/"
+
+    manifiesto = {}
+    for nombre in sorted(os.listdir(directorio_img)):
+        ruta = os.path.join(directorio_img, nombre)
+        if not os.path.isfile(ruta) or not nombre.lower().endswith(('.jpg', '.jpeg', '.png', '.webp')):
+            continue
+
+        with open(ruta, 'rb') as f:
+            data = f.read()
+        hash_archivo = generar_derivados(data, storage, tamanos=tamanos)
+
+        manifiesto[prefijo_url + nombre] = {
+            tamano: {
+                formato: prefijo_url + nombre_derivado(hash_archivo, tamano, formato)
+                for formato in FORMATOS_MINIATURA
+            }
+            for tamano in (tamanos or TAMANOS_MINIATURA)
+        }
+
+    ruta_manifiesto = os.path.join(directorio_static, MANIFIESTO_ESTATICO)
+    os.makedirs(os.path.dirname(ruta_manifiesto), exist_ok=True)
+    with open(ruta_manifiesto, 'w', encoding='utf-8') as f:
+        json.dump(manifiesto, f, ensure_ascii=False, indent=2)
+
+    cargar_manifiesto_estatico.cache_clear()
+    return manifiesto
+
+
+@lru_cache(maxsize=None)
+def cargar_manifiesto_estatico(directorio_static):
+    """Manifiesto de miniaturas estáticas (cacheado por proceso)."""
+    try:
+        with open(os.path.join(directorio_static, MANIFIESTO_ESTATICO), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
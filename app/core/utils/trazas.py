@@ -0,0 +1,229 @@
+"""
+Trazas ligeras dentro del proceso, sin servicios externos.
+
+Un span mide un tramo de código y se anida con los que se abren dentro de
+él; el span actual viaja en una ContextVar, así que el anidamiento sigue
+a la petición aunque pase por asyncio (las tareas copian el contexto):
+
+    with span('predictor.keras', 'predictor', muestras=1):
+        ...
+
+    @span('predictor.predict', 'predictor')
+    def predict(self, features_dict):
+        ...
+
+El primer span de un contexto abre una traza (TrazasMiddleware lo hace por
+petición y envuelve las consultas con `consulta_trazada`). Los spans se
+acumulan en memoria hasta que se cierra la raíz y entonces se decide si se
+guarda la traza:
+
+- muestreo por cabeza: una fracción TRAZAS_MUESTREO de las trazas;
+- por cola: siempre que la raíz dure TRAZAS_UMBRAL_MS o más, para poder
+  diagnosticar la latencia de cola aunque el muestreo sea bajo.
+
+Cada span guardado es una línea JSON en TRAZAS_ARCHIVO con el formato de
+evento completo ("ph": "X") de Trace Event, el que leen Perfetto y
+chrome://tracing. `python manage.py exportar_trazas` resume las trazas más
+lentas y las convierte en un fichero que se abre directamente en el visor.
+Sin TRAZAS_ACTIVAS `span()` no hace nada.
+"""
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+logger = logging.getLogger('app.core')
+
+_ACTUAL = ContextVar('traza_span_actual', default=None)
+_LOCK_ARCHIVO = threading.Lock()
+
+
+def activas():
+    return getattr(settings, 'TRAZAS_ACTIVAS', False)
+
+
+def archivo():
+    return str(getattr(settings, 'TRAZAS_ARCHIVO', os.path.join(settings.BASE_DIR, 'logs', 'trazas.jsonl')))
+
+
+class _Traza:
+    """Spans ya cerrados de una traza, a la espera de que termine la raíz."""
+    __slots__ = ('id', 'muestreada', 'eventos', 'descartados')
+
+    def __init__(self):
+        self.id = os.urandom(8).hex()
+        self.muestreada = random.random() < getattr(settings, 'TRAZAS_MUESTREO', 0.01)
+        self.eventos = []
+        self.descartados = 0
+
+
+class Span:
+    __slots__ = ('traza', 'id', 'padre_id', 'nombre', 'categoria', 'atributos', 'inicio_us', '_inicio')
+
+    def __init__(self, traza, padre_id, nombre, categoria, atributos):
+        self.traza = traza
+        self.id = os.urandom(4).hex()
+        self.padre_id = padre_id
+        self.nombre = nombre
+        self.categoria = categoria
+        self.atributos = atributos
+        self.inicio_us = time.time_ns() // 1000
+        self._inicio = time.perf_counter_ns()
+
+    def fijar(self, **atributos):
+        """Añade atributos al span (aparecen en 'args' del evento)."""
+        self.atributos.update(atributos)
+
+    def _evento(self, duracion_us):
+        return {
+            'name': self.nombre,
+            'cat': self.categoria,
+            'ph': 'X',
+            'ts': self.inicio_us,
+            'dur': duracion_us,
+            'pid': os.getpid(),
+            'tid': threading.get_native_id(),
+            'args': {
+                'traza': self.traza.id,
+                'span': self.id,
+                'padre': self.padre_id,
+                **{clave: _serializable(valor) for clave, valor in self.atributos.items()},
+            },
+        }
+
+
+def _serializable(valor):
+    if valor is None or isinstance(valor, (bool, int, float, str)):
+        return valor
+    return str(valor)
+
+
+def span_actual():
+    """Span abierto en este contexto, o None."""
+    return _ACTUAL.get()
+
+
+@contextmanager
+def span(nombre, categoria='app', **atributos):
+    """
+    Mide el bloque como un span hijo del actual (o como raíz de una traza
+    nueva). Devuelve el Span, o None si las trazas están desactivadas.
+    """
+    padre = _ACTUAL.get()
+    if padre is None:
+        if not activas():
+            yield None
+            return
+        traza = _Traza()
+    else:
+        traza = padre.traza
+
+    actual = Span(traza, padre.id if padre else None, nombre, categoria, atributos)
+    token = _ACTUAL.set(actual)
+    try:
+        yield actual
+    except BaseException as e:
+        actual.atributos['error'] = type(e).__name__
+        raise
+    finally:
+        _ACTUAL.reset(token)
+        duracion_us = (time.perf_counter_ns() - actual._inicio) // 1000
+        if len(traza.eventos) < getattr(settings, 'TRAZAS_MAX_SPANS', 2000) or padre is None:
+            traza.eventos.append(actual._evento(duracion_us))
+        else:
+            traza.descartados += 1
+        if padre is None:
+            _terminar(traza, duracion_us)
+
+
+def _terminar(traza, duracion_us):
+    """Guarda la traza si salió en el muestreo o si la raíz fue lenta."""
+    umbral_ms = getattr(settings, 'TRAZAS_UMBRAL_MS', 1000)
+    lenta = bool(umbral_ms) and duracion_us >= umbral_ms * 1000
+    if not (traza.muestreada or lenta):
+        return
+
+    evento_raiz = traza.eventos[-1]
+    evento_raiz['args']['motivo'] = 'muestreo' if traza.muestreada else 'lenta'
+    if traza.descartados:
+        evento_raiz['args']['spans_descartados'] = traza.descartados
+    _escribir(traza.eventos)
+
+
+def _escribir(eventos):
+    ruta = archivo()
+    lineas = ''.join(json.dumps(evento, ensure_ascii=False) + '\n' for evento in eventos)
+    try:
+        with _LOCK_ARCHIVO:
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+            _rotar(ruta)
+            # Una sola escritura en modo append: las trazas de varios procesos no se mezclan
+            with open(ruta, 'a', encoding='utf-8') as f:
+                f.write(lineas)
+    except OSError as e:
+        logger.warning(f"⚠️ No se pudo escribir la traza en {ruta}: {e}")
+
+
+def _rotar(ruta):
+    """Mueve el archivo a <ruta>.1 al superar TRAZAS_MAX_MB."""
+    maximo = getattr(settings, 'TRAZAS_MAX_MB', 50) * 1024 * 1024
+    try:
+        if os.path.getsize(ruta) >= maximo:
+            os.replace(ruta, f'{ruta}.1')
+    except FileNotFoundError:
+        pass
+
+
+def consulta_trazada(execute, sql, params, many, context):
+    """execute_wrapper: cada consulta es un span 'db' con su SQL (sin parámetros)."""
+    if _ACTUAL.get() is None:
+        return execute(sql, params, many, context)
+    nombre = f"sql {sql.split(None, 1)[0].upper() if sql.strip() else ''}"
+    with span(nombre, 'db', sql=sql[:getattr(settings, 'TRAZAS_SQL_MAX', 300)], many=many):
+        return execute(sql, params, many, context)
+
+
+# ---------------------------------------------------------------------------
+# Lectura (python manage.py exportar_trazas)
+# ---------------------------------------------------------------------------
+
+def leer_trazas(ruta=None):
+    """{id de traza: [eventos]} de un archivo de trazas (ignora líneas corruptas)."""
+    trazas = {}
+    with open(ruta or archivo(), encoding='utf-8') as f:
+        for linea in f:
+            try:
+                evento = json.loads(linea)
+            except ValueError:
+                continue
+            trazas.setdefault(evento['args']['traza'], []).append(evento)
+    return trazas
+
+
+def raiz(eventos):
+    """Evento raíz de una traza (el que no tiene padre)."""
+    return next((e for e in eventos if e['args'].get('padre') is None), None)
+
+
+def tiempo_propio_por_categoria(eventos):
+    """
+    Microsegundos por categoría descontando a cada span el tiempo de sus
+    hijos, de modo que las categorías suman la duración de la raíz.
+    """
+    hijos = {}
+    for evento in eventos:
+        padre = evento['args'].get('padre')
+        if padre is not None:
+            hijos[padre] = hijos.get(padre, 0) + evento['dur']
+
+    por_categoria = {}
+    for evento in eventos:
+        propio = max(evento['dur'] - hijos.get(evento['args']['span'], 0), 0)
+        por_categoria[evento['cat']] = por_categoria.get(evento['cat'], 0) + propio
+    return por_categoria
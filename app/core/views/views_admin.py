@@ -134,9 +134,8 @@ class GestionNinosAdminView(ListView):
     
     def get_queryset(self):
         """Obtener todos los niños con información del profesional"""
-        queryset = Nino.objects.select_related('profesional').annotate(
-            total_evaluaciones=Count('evaluaciones', distinct=True)
-        ).order_by('-fecha_registro')
+        # total_evaluaciones es una columna de Nino (ver utils/resumen_nino.py)
+        queryset = Nino.objects.select_related('profesional').order_by('-fecha_registro')
         
         # Filtros
         search = self.request.GET.get('search', '')
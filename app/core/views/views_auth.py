@@ -8,7 +8,8 @@ from django.shortcuts import redirect
 from django.db.utils import OperationalError
 from django.utils import timezone
 from app.core.forms.forms_auth import ProfesionalLoginForm, ProfesionalRegistrationForm, ProfesionalPasswordResetForm, ProfesionalSetPasswordForm
-from app.core.models import LoginAttempt
+from app.core.middleware.audit_middleware import get_client_ip
+from app.core.utils import login_throttle
 
 logger = logging.getLogger(__name__)
 
@@ -19,13 +20,8 @@ class ProfesionalLoginView(LoginView):
     redirect_authenticated_user = True
     
     def _get_client_ip(self, request):
-        """Obtener la IP real del cliente"""
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR', '')
-        return ip
+        """Obtener la IP real del cliente (ver get_client_ip)"""
+        return get_client_ip(request)
     
     def get(self, request, *args, **kwargs):
         """Manejar GET request y verificar cookies"""
@@ -50,20 +46,44 @@ class ProfesionalLoginView(LoginView):
     def get_success_url(self):
         return reverse_lazy('dashboard')
     
+    def _mensaje_bloqueo(self, segundos):
+        minutos = max(1, -(-segundos // 60))
+        return (
+            f'🔒 Tu cuenta ha sido bloqueada temporalmente por múltiples intentos fallidos. '
+            f'Intenta nuevamente en {minutos} minutos.'
+        )
+    
+    def post(self, request, *args, **kwargs):
+        """Rechaza el intento sin comprobar la contraseña si el usuario o la IP están bloqueados"""
+        username = request.POST.get('username', '').strip()
+        ip = self._get_client_ip(request)
+        
+        tiempo_restante = login_throttle.tiempo_restante_bloqueo(username, ip)
+        if tiempo_restante:
+            messages.error(request, self._mensaje_bloqueo(tiempo_restante))
+            logger.warning(f"Intento de login en cuenta bloqueada: {username} desde IP {ip}")
+            login_throttle.registrar_intento_async(
+                username, ip, False, request.META.get('HTTP_USER_AGENT', '')
+            )
+            form = self.get_form_class()(request=request, initial={'username': username})
+            return self.render_to_response(self.get_context_data(form=form))
+        
+        return super().post(request, *args, **kwargs)
+    
     def form_valid(self, form):
         """Login exitoso - limpiar intentos fallidos y establecer sesión"""
         username = form.cleaned_data.get('username')
         
-        # Registrar intento exitoso
-        LoginAttempt.objects.create(
-            username=username,
-            ip_address=self._get_client_ip(self.request),
-            exitoso=True,
-            user_agent=self.request.META.get('HTTP_USER_AGENT', '')[:500]
+        # Registrar intento exitoso (en segundo plano, sólo forense)
+        login_throttle.registrar_intento_async(
+            username,
+            self._get_client_ip(self.request),
+            True,
+            self.request.META.get('HTTP_USER_AGENT', '')
         )
         
-        # Limpiar intentos fallidos antiguos
-        LoginAttempt.limpiar_intentos_antiguos(username)
+        # Limpiar intentos fallidos
+        login_throttle.limpiar_usuario(username)
         
         # Configurar duración de sesión
         remember_me = form.cleaned_data.get('remember_me')
@@ -80,39 +100,26 @@ class ProfesionalLoginView(LoginView):
     def form_invalid(self, form):
         """Login fallido - registrar intento y verificar bloqueo"""
         username = form.cleaned_data.get('username', '')
-        
-        # Verificar si la cuenta está bloqueada ANTES de procesar
-        if username and LoginAttempt.esta_bloqueado(username):
-            tiempo_restante = LoginAttempt.obtener_tiempo_restante_bloqueo(username)
-            messages.error(
-                self.request,
-                f'🔒 Tu cuenta ha sido bloqueada temporalmente por múltiples intentos fallidos. '
-                f'Intenta nuevamente en {tiempo_restante} minutos.'
-            )
-            logger.warning(f"Intento de login en cuenta bloqueada: {username} desde IP {self._get_client_ip(self.request)}")
-            return super().form_invalid(form)
+        ip = self._get_client_ip(self.request)
         
         # Registrar intento fallido
         if username:
-            LoginAttempt.objects.create(
-                username=username,
-                ip_address=self._get_client_ip(self.request),
-                exitoso=False,
-                user_agent=self.request.META.get('HTTP_USER_AGENT', '')[:500]
+            login_throttle.registrar_intento_async(
+                username, ip, False, self.request.META.get('HTTP_USER_AGENT', '')
             )
             
             # Verificar cuántos intentos lleva
-            intentos = LoginAttempt.obtener_intentos_recientes(username)
-            intentos_restantes = 5 - intentos
+            intentos = login_throttle.registrar_fallo(username, ip)
+            intentos_restantes = login_throttle.MAX_FALLOS_USUARIO - intentos
             
-            if intentos >= 5:
-                # Cuenta bloqueada
+            if login_throttle.esta_bloqueado(username, ip):
+                # Cuenta (o IP) bloqueada
                 messages.error(
                     self.request,
                     f'🔒 Has excedido el número máximo de intentos de login. '
                     f'Tu cuenta ha sido bloqueada temporalmente por 30 minutos.'
                 )
-                logger.warning(f"Cuenta bloqueada por intentos fallidos: {username} desde IP {self._get_client_ip(self.request)}")
+                logger.warning(f"Cuenta bloqueada por intentos fallidos: {username} desde IP {ip}")
             elif intentos >= 3:
                 # Advertencia
                 messages.warning(
@@ -126,6 +133,7 @@ class ProfesionalLoginView(LoginView):
                     'Usuario o contraseña incorrectos. Por favor, intenta de nuevo.'
                 )
         else:
+            login_throttle.registrar_fallo(ip_address=ip)
             messages.error(
                 self.request,
                 'Usuario o contraseña incorrectos. Por favor, intenta de nuevo.'
@@ -5,8 +5,10 @@ from django.utils.decorators import method_decorator
 from django.views.generic import TemplateView
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
+from django.db import transaction
 from app.core.models import Cita
-from app.core.utils.email_utils import enviar_correo_cita_doctor, enviar_correo_cita_padres
+from app.core.utils.email_utils import encolar_correo_cita_doctor, encolar_correo_cita_padres
+from app.core.utils.email_outbox import despertar_envio
 
 logger = logging.getLogger(__name__)
 
@@ -39,7 +41,7 @@ def get_citas_dia(request):
     citas_data = [{
         'id': cita.id,
         'nombre_paciente': cita.nombre_paciente,
-        'foto_paciente': cita.foto_paciente.url if cita.foto_paciente else None,
+        'foto_paciente': cita.thumbnail_url('sm'),
         'hora': cita.hora.strftime('%H:%M'),
         'fecha': cita.fecha.isoformat(),
         'completada': cita.completada,
@@ -85,29 +87,24 @@ def crear_cita(request):
                     'error': f'Formato de fecha u hora inválido: {str(e)}'
                 }, status=400)
             
-            # Crear la cita
-            cita = Cita.objects.create(
-                usuario=request.user,
-                nombre_paciente=nombre_paciente,
-                email_padres=email_padres,
-                fecha=fecha_obj,
-                hora=hora_obj,
-                notas=notas,
-                foto_paciente=foto_paciente
-            )
+            # Crear la cita y encolar los correos en la misma transacción:
+            # o se guardan la cita y sus confirmaciones, o nada
+            with transaction.atomic():
+                cita = Cita.objects.create(
+                    usuario=request.user,
+                    nombre_paciente=nombre_paciente,
+                    email_padres=email_padres,
+                    fecha=fecha_obj,
+                    hora=hora_obj,
+                    notas=notas,
+                    foto_paciente=foto_paciente
+                )
+                encolar_correo_cita_doctor(request.user, cita)
+                encolar_correo_cita_padres(email_padres, cita, request.user)
+                # El envío SMTP ocurre fuera de la petición
+                transaction.on_commit(despertar_envio)
             
-            # Enviar correos
-            email_doctor_enviado = enviar_correo_cita_doctor(request.user, cita)
-            email_padres_enviado = enviar_correo_cita_padres(email_padres, cita, request.user)
-            
-            # Mensaje de respuesta
-            mensaje = 'Cita agendada exitosamente'
-            if email_doctor_enviado and email_padres_enviado:
-                mensaje += '. Se han enviado las confirmaciones por correo.'
-            elif email_doctor_enviado or email_padres_enviado:
-                mensaje += '. Algunos correos no pudieron ser enviados.'
-            else:
-                mensaje += ', pero hubo un error al enviar las confirmaciones por correo.'
+            mensaje = 'Cita agendada exitosamente. Las confirmaciones se enviarán por correo en breve.'
             
             return JsonResponse({
                 'success': True,
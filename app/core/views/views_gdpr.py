@@ -2,20 +2,22 @@
 Vistas para cumplimiento GDPR
 Incluye exportación de datos, gestión de consentimientos y derechos del usuario
 """
-import json
 from datetime import datetime
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse, HttpResponse
-from django.shortcuts import render, redirect
+from django.http import JsonResponse, StreamingHttpResponse, FileResponse, Http404
+from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.views.decorators.http import require_http_methods
 from django.utils import timezone
 from app.core.models import (
     ConsentimientoGDPR, 
     AuditoriaAcceso,
+    ExportacionDatos,
     Nino
 )
-from app.games.models import Evaluacion, SesionJuego, PruebaCognitiva
+from app.core.utils.gdpr_export import secciones_exportacion, generar_json
+from app.core.utils.auditoria_archivo import historial_usuario
+from app.core.middleware.audit_middleware import get_client_ip
 
 
 @login_required
@@ -23,8 +25,15 @@ def exportar_datos_usuario(request):
     """
     Exporta todos los datos personales del usuario en formato JSON
     Cumplimiento: Artículo 20 GDPR (Derecho a la portabilidad de datos)
+    
+    El archivo se genera en streaming (ver app/core/utils/gdpr_export.py),
+    con memoria constante sea cual sea el tamaño de la cuenta.
+    Parámetros opcionales: ?sesiones=1 y ?pruebas=1 añaden el detalle de
+    sesiones de juego y pruebas cognitivas.
     """
     usuario = request.user
+    incluir_sesiones = request.GET.get('sesiones') == '1'
+    incluir_pruebas = request.GET.get('pruebas') == '1'
     
     # Registrar la exportación en auditoría
     AuditoriaAcceso.registrar(
@@ -32,107 +41,23 @@ def exportar_datos_usuario(request):
         accion='EXPORT',
         tabla_afectada='ExportacionCompleta',
         ip_address=request.META.get('REMOTE_ADDR', '0.0.0.0'),
-        detalles={'tipo_exportacion': 'datos_completos'},
+        detalles={
+            'tipo_exportacion': 'datos_completos',
+            'incluye_sesiones': incluir_sesiones,
+            'incluye_pruebas_cognitivas': incluir_pruebas,
+        },
         user_agent=request.META.get('HTTP_USER_AGENT', '')[:500]
     )
     
-    # Recopilar todos los datos del usuario
-    datos_exportacion = {
-        'informacion_exportacion': {
-            'fecha_exportacion': datetime.now().isoformat(),
-            'version_gdpr': '1.0',
-            'formato': 'JSON',
-            'usuario_id': usuario.id,
-        },
-        'datos_personales': {
-            'username': usuario.username,
-            'email': usuario.email,
-            'nombres': usuario.nombres,
-            'apellidos': usuario.apellidos,
-            'especialidad': usuario.especialidad,
-            'numero_licencia': usuario.numero_licencia,
-            'rol': usuario.rol,
-            'fecha_registro': usuario.fecha_registro.isoformat() if usuario.fecha_registro else None,
-            'ultimo_acceso': usuario.ultimo_acceso.isoformat() if usuario.ultimo_acceso else None,
-        },
-        'ninos_asignados': [],
-        'evaluaciones_realizadas': [],
-        'validaciones_profesionales': [],
-        'citas': [],
-        'consentimientos': [],
-        'historial_auditoria': []
-    }
+    secciones = secciones_exportacion(
+        usuario,
+        incluir_sesiones=incluir_sesiones,
+        incluir_pruebas=incluir_pruebas,
+    )
     
-    # Niños asignados
-    for nino in usuario.ninos.all():
-        datos_exportacion['ninos_asignados'].append({
-            'id': nino.id,
-            'nombres': nino.nombres,
-            'apellidos': nino.apellidos,
-            'edad': nino.edad,
-            'genero': nino.genero,
-            'fecha_registro': nino.fecha_registro.isoformat(),
-        })
-    
-    # Evaluaciones (a través de los niños asignados)
-    evaluaciones = Evaluacion.objects.filter(nino__profesional=usuario)
-    for evaluacion in evaluaciones:
-        eval_data = {
-            'id': evaluacion.id,
-            'nino': evaluacion.nino.nombre_completo,
-            'fecha_inicio': evaluacion.fecha_hora_inicio.isoformat(),
-            'fecha_fin': evaluacion.fecha_hora_fin.isoformat() if evaluacion.fecha_hora_fin else None,
-            'estado': evaluacion.estado,
-            'precision_promedio': float(evaluacion.precision_promedio),
-            'total_aciertos': evaluacion.total_aciertos,
-            'total_errores': evaluacion.total_errores,
-        }
-        datos_exportacion['evaluaciones_realizadas'].append(eval_data)
-    
-    # Validaciones profesionales
-    for validacion in usuario.validaciones.all():
-        datos_exportacion['validaciones_profesionales'].append({
-            'id': validacion.id,
-            'fecha': validacion.fecha_validacion.isoformat(),
-            'riesgo_confirmado': validacion.riesgo_confirmado,
-            'indice_ajustado': float(validacion.indice_ajustado),
-            'diagnostico_final': validacion.diagnostico_final,
-        })
-    
-    # Citas
-    for cita in usuario.citas.all():
-        datos_exportacion['citas'].append({
-            'id': cita.id,
-            'nombre_paciente': cita.nombre_paciente,
-            'fecha': cita.fecha.isoformat(),
-            'hora': cita.hora.isoformat(),
-            'completada': cita.completada,
-        })
-    
-    # Consentimientos
-    for consentimiento in usuario.consentimientos_gdpr.all():
-        datos_exportacion['consentimientos'].append({
-            'fecha': consentimiento.fecha_consentimiento.isoformat(),
-            'acepta_terminos': consentimiento.acepta_terminos,
-            'acepta_privacidad': consentimiento.acepta_privacidad,
-            'acepta_tratamiento_datos': consentimiento.acepta_tratamiento_datos,
-            'version_terminos': consentimiento.version_terminos,
-            'consentimiento_activo': consentimiento.consentimiento_activo,
-        })
-    
-    # Historial de auditoría (últimos 100 registros)
-    for auditoria in usuario.auditorias.all()[:100]:
-        datos_exportacion['historial_auditoria'].append({
-            'fecha': auditoria.timestamp.isoformat(),
-            'accion': auditoria.get_accion_display(),
-            'tabla': auditoria.tabla_afectada,
-            'ip': auditoria.ip_address,
-            'exitoso': auditoria.exitoso,
-        })
-    
-    # Crear respuesta JSON descargable
-    response = HttpResponse(
-        json.dumps(datos_exportacion, indent=2, ensure_ascii=False),
+    # Crear respuesta JSON descargable (se envía a medida que se genera)
+    response = StreamingHttpResponse(
+        generar_json(secciones),
         content_type='application/json; charset=utf-8'
     )
     filename = f'dislexia_datos_{usuario.username}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json'
@@ -146,6 +71,72 @@ def exportar_datos_usuario(request):
     return response
 
 
+@login_required
+@require_http_methods(["POST"])
+def solicitar_exportacion_zip(request):
+    """
+    Solicita la exportación completa en ZIP (datos.json + reportes PDF).
+    Cumplimiento: Artículo 20 GDPR (Derecho a la portabilidad de datos)
+    
+    El archivo lo genera `procesar_exportaciones` en segundo plano; el
+    profesional recibe una notificación cuando está listo para descargar.
+    """
+    en_curso = ExportacionDatos.objects.filter(
+        usuario=request.user,
+        estado__in=['pendiente', 'procesando']
+    ).exists()
+    
+    if en_curso:
+        messages.info(request, 'ℹ️ Ya hay una exportación en preparación. Le avisaremos cuando esté lista.')
+    else:
+        exportacion = ExportacionDatos.objects.create(
+            usuario=request.user,
+            incluir_pdfs=request.POST.get('pdfs', '1') == '1',
+        )
+        AuditoriaAcceso.registrar(
+            usuario=request.user,
+            accion='EXPORT',
+            tabla_afectada='ExportacionDatos',
+            registro_id=exportacion.id,
+            ip_address=obtener_ip_cliente(request),
+            detalles={'tipo_exportacion': 'solicitud_zip'},
+            user_agent=request.META.get('HTTP_USER_AGENT', '')[:500]
+        )
+        messages.success(
+            request,
+            '📦 Estamos preparando su exportación completa. Le avisaremos en las notificaciones cuando esté lista.'
+        )
+    
+    return redirect(request.META.get('HTTP_REFERER') or 'core:consentimientos')
+
+
+@login_required
+def descargar_exportacion(request, pk):
+    """
+    Descarga el ZIP de una exportación completada (sólo su propietario).
+    """
+    exportacion = get_object_or_404(
+        ExportacionDatos,
+        pk=pk,
+        usuario=request.user,
+        estado='completada'
+    )
+    if not exportacion.archivo:
+        raise Http404('La exportación ha caducado')
+    
+    try:
+        archivo = exportacion.archivo.open('rb')
+    except FileNotFoundError:
+        raise Http404('La exportación ha caducado')
+    
+    if not exportacion.descargada:
+        exportacion.descargada = True
+        exportacion.save(update_fields=['descargada'])
+    
+    filename = f'dislexia_exportacion_{request.user.username}_{exportacion.fecha_solicitud.strftime("%Y%m%d")}.zip'
+    return FileResponse(archivo, as_attachment=True, filename=filename, content_type='application/zip')
+
+
 @login_required
 def vista_consentimientos(request):
     """
@@ -215,10 +206,8 @@ def historial_auditoria_usuario(request):
     Muestra el historial de acceso del usuario a sus propios datos
     Cumplimiento: Transparencia GDPR
     """
-    # Obtener auditorías del usuario (paginado)
-    auditorias = AuditoriaAcceso.objects.filter(
-        usuario=request.user
-    ).order_by('-timestamp')[:50]  # Últimas 50
+    # Últimas 50 auditorías del usuario (tabla actual y meses archivados)
+    auditorias = historial_usuario(request.user, limite=50)
     
     context = {
         'auditorias': auditorias,
@@ -228,10 +217,5 @@ def historial_auditoria_usuario(request):
 
 
 def obtener_ip_cliente(request):
-    """Función helper para obtener la IP real del cliente"""
-    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-    if x_forwarded_for:
-        ip = x_forwarded_for.split(',')[0]
-    else:
-        ip = request.META.get('REMOTE_ADDR', '0.0.0.0')
-    return ip
+    """Función helper para obtener la IP real del cliente (ver get_client_ip)"""
+    return get_client_ip(request)
@@ -3,8 +3,15 @@ import logging
 from django.contrib.auth.decorators import login_required
 from django.utils.decorators import method_decorator
 from django.views.generic import TemplateView
-from django.http import JsonResponse
-from app.core.models import Cita, Nino
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_GET
+from django.urls import reverse
+from django.utils import timezone
+from app.core.models import Cita, ExportacionDatos, Nino
+from app.core.utils.metricas import exponer
 
 logger = logging.getLogger(__name__)
 
@@ -107,7 +114,7 @@ def get_notificaciones(request):
                     'fecha': cita.fecha.isoformat(),
                     'hora': cita.hora.strftime('%H:%M'),
                     'paciente': cita.nombre_paciente,
-                    'foto': cita.foto_paciente.url if cita.foto_paciente else None,
+                    'foto': cita.thumbnail_url('sm'),
                     'icono': 'fa-clock',
                     'tiempo': f"{horas_restantes}h"
                 })
@@ -130,6 +137,35 @@ def get_notificaciones(request):
                 'accion': 'ver_calendario'
             })
         
+        # Exportaciones de datos (ZIP) de la última semana aún no descargadas
+        exportaciones = ExportacionDatos.objects.filter(
+            usuario=request.user,
+            fecha_solicitud__gte=timezone.now() - timedelta(days=7),
+            descargada=False
+        ).only('id', 'estado', 'progreso', 'archivo').order_by('-fecha_solicitud')[:3]
+        
+        for exportacion in exportaciones:
+            if exportacion.estado == 'completada' and exportacion.archivo:
+                notificaciones.append({
+                    'tipo': 'success',
+                    'mensaje': 'Tu exportación de datos está lista para descargar',
+                    'icono': 'fa-file-archive',
+                    'accion': 'descargar_exportacion',
+                    'url': reverse('core:descargar_exportacion', args=[exportacion.id])
+                })
+            elif exportacion.estado == 'fallida':
+                notificaciones.append({
+                    'tipo': 'error',
+                    'mensaje': 'No se pudo generar tu exportación de datos. Inténtalo de nuevo',
+                    'icono': 'fa-file-archive'
+                })
+            elif exportacion.en_curso:
+                notificaciones.append({
+                    'tipo': 'info',
+                    'mensaje': f'Preparando tu exportación de datos ({exportacion.progreso}%)',
+                    'icono': 'fa-file-archive'
+                })
+        
         # Notificación de bienvenida si es nuevo usuario
         if total_pacientes == 0:
             notificaciones.append({
@@ -152,3 +188,21 @@ def get_notificaciones(request):
             'success': False,
             'error': str(e)
         }, status=500)
+
+
+@never_cache
+@require_GET
+def metricas(request):
+    """
+    Métricas en formato de texto de Prometheus. Sólo para staff con sesión
+    o, para el scraper, con la cabecera 'Authorization: Bearer <METRICAS_TOKEN>'.
+    """
+    token = getattr(settings, 'METRICAS_TOKEN', '')
+    es_staff = request.user.is_authenticated and request.user.is_staff
+    con_token = bool(token) and constant_time_compare(
+        request.headers.get('Authorization', ''), f'Bearer {token}'
+    )
+    if not (es_staff or con_token):
+        return HttpResponseForbidden('Acceso restringido al personal.')
+
+    return HttpResponse(exponer(), content_type='text/plain; version=0.0.4; charset=utf-8')
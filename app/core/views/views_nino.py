@@ -8,9 +8,13 @@ from django.views import View
 from django.views.generic import UpdateView, ListView, DeleteView
 from django.views.decorators.http import require_http_methods
 from django.contrib.admin.views.decorators import staff_member_required
+from decimal import Decimal
+from django.db.models import Avg, Case, Count, DecimalField, F, Q, Value, When
+from django.db.models.functions import Coalesce
 from app.core.models import Nino
 from app.core.forms.forms_profile import NinoForm
-from app.games.models import Evaluacion
+from app.core.utils.consultas import subconsulta_agregada
+from app.games.models import Evaluacion, SesionJuego
 import logging
 
 logger = logging.getLogger(__name__)
@@ -60,7 +64,7 @@ class ObtenerDatosNinoView(View):
                     'edad': nino.edad,
                     'genero': nino.genero,
                     'idioma_nativo': nino.idioma_nativo,
-                    'imagen': nino.imagen.url if nino.imagen else None,
+                    'imagen': nino.thumbnail_url(),
                 }
             })
         except Nino.DoesNotExist:
@@ -73,15 +77,25 @@ class ListaNinosView(ListView):
     template_name = 'nino/lista_ninos.html'
     context_object_name = 'ninos'
     
+    # Órdenes admitidos (?orden=), todos sobre columnas indexadas de Nino
+    ORDENES = {
+        'recientes': ('-fecha_registro',),
+        'ultima_evaluacion': (F('fecha_ultima_evaluacion').desc(nulls_last=True), '-fecha_registro'),
+        'evaluaciones': ('-total_evaluaciones', '-fecha_registro'),
+        'precision': (F('ultima_precision').desc(nulls_last=True), '-fecha_registro'),
+    }
+    
     def get_queryset(self):
         """Filtrar solo los niños del profesional actual"""
-        return Nino.objects.filter(profesional=self.request.user).order_by('-fecha_registro')
+        orden = self.ORDENES.get(self.request.GET.get('orden'), self.ORDENES['recientes'])
+        return Nino.objects.filter(profesional=self.request.user).order_by(*orden)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context.update({
             'page_title': 'Lista de Niños - DislexIA',
             'active_section': 'lista_ninos',
+            'orden_actual': self.request.GET.get('orden') if self.request.GET.get('orden') in self.ORDENES else 'recientes',
         })
         return context
 
@@ -138,7 +152,7 @@ def agregar_nino_ajax(request):
                     'genero': nino.genero,
                     'idioma_nativo': nino.idioma_nativo,
                     'fecha_nacimiento_formatted': fecha_formatted,
-                    'imagen_url': nino.imagen.url if nino.imagen else None
+                    'imagen_url': nino.thumbnail_url()
                 }
             })
         else:
@@ -191,15 +205,28 @@ class HistorialNinoView(ListView):
     paginate_by = 10
     
     def get_queryset(self):
-        """Obtener evaluaciones del niño específico"""
+        """Obtener evaluaciones del niño específico, con el resumen de sesiones anotado"""
         self.nino = get_object_or_404(
             Nino, 
             pk=self.kwargs['pk'], 
             profesional=self.request.user
         )
+        sesiones = SesionJuego.objects.all()
         return Evaluacion.objects.filter(
             nino=self.nino
-        ).prefetch_related('sesiones_juego', 'sesiones_juego__juego').order_by('-fecha_hora_inicio')
+        ).annotate(
+            num_sesiones=Coalesce(subconsulta_agregada(sesiones, 'evaluacion', Count('pk')), 0),
+            # Las evaluaciones sin completar aún no tienen precision_promedio:
+            # se muestra la precisión media de sus sesiones
+            precision_actual=Case(
+                When(estado='completada', then=F('precision_promedio')),
+                default=Coalesce(
+                    subconsulta_agregada(sesiones, 'evaluacion', Avg('accuracy_percent')),
+                    Value(Decimal('0')),
+                ),
+                output_field=DecimalField(max_digits=5, decimal_places=2),
+            ),
+        ).order_by('-fecha_hora_inicio')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -207,20 +234,17 @@ class HistorialNinoView(ListView):
         context['page_title'] = f'Historial de {self.nino.nombre_completo} - DislexIA'
         context['active_section'] = 'lista_ninos'
         
-        # Estadísticas del niño
-        evaluaciones = self.get_queryset()
-        context['total_evaluaciones'] = evaluaciones.count()
-        context['evaluaciones_completadas'] = evaluaciones.filter(estado='completada').count()
-        context['evaluaciones_en_proceso'] = evaluaciones.filter(estado='en_proceso').count()
-        
-        # Calcular promedios
-        evaluaciones_completadas = evaluaciones.filter(estado='completada')
-        if evaluaciones_completadas.exists():
-            from django.db.models import Avg
-            context['precision_promedio'] = evaluaciones_completadas.aggregate(
-                avg=Avg('precision_promedio')
-            )['avg'] or 0
-        else:
-            context['precision_promedio'] = 0
+        # Estadísticas del niño en un único agregado condicional
+        completada = Q(estado='completada')
+        estadisticas = Evaluacion.objects.filter(nino=self.nino).aggregate(
+            total=Count('pk'),
+            completadas=Count('pk', filter=completada),
+            en_proceso=Count('pk', filter=Q(estado='en_proceso')),
+            precision=Avg('precision_promedio', filter=completada),
+        )
+        context['total_evaluaciones'] = estadisticas['total']
+        context['evaluaciones_completadas'] = estadisticas['completadas']
+        context['evaluaciones_en_proceso'] = estadisticas['en_proceso']
+        context['precision_promedio'] = estadisticas['precision'] or 0
         
         return context
\ No newline at end of file
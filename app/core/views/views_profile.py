@@ -42,15 +42,15 @@ class ProfileUpdateView(UpdateView):
 class DeleteAccountView(TemplateView):
     """Vista para eliminar la cuenta del usuario permanentemente
     
-    Esta vista elimina:
-    - La cuenta del profesional
-    - Todos los niños vinculados (CASCADE)
-    - Todas las evaluaciones de esos niños (CASCADE desde games.Evaluacion)
-    - Todos los reportes IA (CASCADE)
-    - Todas las validaciones profesionales (CASCADE)
-    - Todas las citas (CASCADE)
-    - Todos los consentimientos GDPR (CASCADE)
-    - Todas las auditorías donde el usuario es NULL (SET_NULL en AuditoriaAcceso)
+    La cuenta se desactiva en el acto y sus datos se eliminan en segundo
+    plano, por lotes y de las tablas hoja a la raíz (ver app/core/utils/purga.py):
+    - Eventos, pruebas cognitivas y sesiones de juego
+    - Validaciones profesionales y reportes IA
+    - Evaluaciones, consentimientos de tutores y niños vinculados
+    - Citas (los correos encolados conservan el registro, sin la cita)
+    - Consentimientos GDPR y exportaciones de datos
+    - Las auditorías se conservan sin usuario (SET_NULL en AuditoriaAcceso)
+    - Finalmente, la cuenta del profesional
     """
     
     def post(self, request, *args, **kwargs):
@@ -60,57 +60,30 @@ class DeleteAccountView(TemplateView):
         email = user.email
         
         try:
-            # Importar modelos necesarios para contar
-            from app.core.models import Nino, Cita, ConsentimientoGDPR, ValidacionProfesional
-            from app.games.models import Evaluacion
+            from app.core.utils.purga import solicitar_purga_cuenta
             
-            # Contar elementos antes de eliminar (para logging/auditoría)
-            ninos_count = Nino.objects.filter(profesional=user).count()
-            citas_count = Cita.objects.filter(usuario=user).count()
-            consentimientos_count = ConsentimientoGDPR.objects.filter(usuario=user).count()
-            validaciones_count = ValidacionProfesional.objects.filter(profesional=user).count()
-            
-            # Contar evaluaciones de los niños del profesional
-            evaluaciones_count = 0
-            for nino in Nino.objects.filter(profesional=user):
-                evaluaciones_count += Evaluacion.objects.filter(nino=nino).count()
+            # Desactiva la cuenta, cuenta los registros (COUNT por tabla) y encola la purga
+            purga = solicitar_purga_cuenta(user)
+            conteos = purga.conteos
             
             # Logging de la operación
             import logging
             logger = logging.getLogger('audit')
             logger.info(
                 f"ELIMINACIÓN DE CUENTA - Usuario: {username} ({email}) | "
-                f"Niños: {ninos_count} | Evaluaciones: {evaluaciones_count} | "
-                f"Citas: {citas_count} | Consentimientos: {consentimientos_count} | "
-                f"Validaciones: {validaciones_count}"
+                f"Niños: {conteos['ninos']} | Evaluaciones: {conteos['evaluaciones']} | "
+                f"Citas: {conteos['citas']} | Consentimientos: {conteos['consentimientos']} | "
+                f"Validaciones: {conteos['validaciones']}"
             )
             
-            # Cerrar sesión del usuario ANTES de eliminar
+            # Cerrar sesión del usuario
             from django.contrib.auth import logout
             logout(request)
             
-            # ELIMINACIÓN EN CASCADA:
-            # Al eliminar el usuario (Profesional), Django automáticamente eliminará:
-            # 1. Niños (profesional FK con CASCADE)
-            # 2. Evaluaciones (nino FK con CASCADE en games.Evaluacion)
-            # 3. SesionJuego (evaluacion FK con CASCADE)
-            # 4. PruebaCognitiva (evaluacion FK con CASCADE)
-            # 5. ReporteIA (evaluacion FK con CASCADE)
-            # 6. ValidacionProfesional (profesional FK con CASCADE)
-            # 7. Citas (usuario FK con CASCADE)
-            # 8. ConsentimientoGDPR (usuario FK con CASCADE)
-            # 9. ConsentimientoTutor (nino FK con CASCADE)
-            # 10. AuditoriaAcceso (usuario FK con SET_NULL - se mantiene pero sin usuario)
-            
-            user.delete()
-            
-            # Log final
-            logger.info(f"CUENTA ELIMINADA EXITOSAMENTE - {username} ({email})")
-            
             # Mensaje de confirmación (se guarda en cookie para mostrarlo después del redirect)
             messages.success(
                 request, 
-                f'✅ Tu cuenta y todos los datos asociados han sido eliminados permanentemente. '
+                f'✅ Tu cuenta ha sido desactivada y todos los datos asociados se están eliminando permanentemente. '
                 f'Gracias por usar DislexIA.'
             )
             
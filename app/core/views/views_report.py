@@ -7,11 +7,11 @@ from django.urls import reverse_lazy
 from app.core.models import ValidacionProfesional, ReporteIA
 from app.core.forms.forms_report import ValidacionProfesionalForm
 try:
-    from ..utils.pdf_utils import render_to_pdf # <-- Importar la nueva utilidad
+    from ..utils.pdf_utils import render_to_pdf, contexto_reporte_pdf # <-- Importar la nueva utilidad
 except ImportError:
     render_to_pdf = None  # Temporal para permitir migraciones
+    contexto_reporte_pdf = None
 from app.games.models import Evaluacion # <-- Importar Evaluation
-from django.db.models import Avg, Sum, Count # ¡Importa Avg, Sum, Count!
 
 @method_decorator(login_required, name='dispatch')
 class ReporteIADetailView(TemplateView):
@@ -98,34 +98,8 @@ def generar_reporte_pdf(request, pk):
         evaluacion__nino__profesional=request.user
     )
     
-    # 2. Obtener los objetos relacionados
-    main_session = reporte.evaluacion 
-    nino = main_session.nino
-    
-    # --- PASO 3: OBTENER ESTADÍSTICAS (¡CONSULTA ACTUALIZADA!) ---
-    # Agrupamos las PruebasCognitivas por juego y calculamos los totales.
-    statistics = main_session.pruebas_cognitivas.all() \
-        .values(
-            'juego__nombre', 
-            'juego__dificultad', 
-            'juego__color_tema'  # Para el color del header de la tarjeta
-        ) \
-        .annotate(
-            total_aciertos=Sum('aciertos'),
-            total_errores=Sum('errores'),
-            total_puntaje=Sum('puntaje'),
-            total_clics=Sum('clics'),
-            avg_precision=Avg('precision'),
-            veces_jugado=Count('id')  # Contar cuántas pruebas de este juego se hicieron
-        ).order_by('juego__nombre')
-    
-    # 4. Preparar el contexto para la plantilla PDF
-    context = {
-        'reporte': reporte,
-        'game_session': main_session, # Pasamos la 'Evaluacion' como 'game_session'
-        'nino': nino,
-        'evaluations': statistics, # Pasamos las estadísticas agrupadas
-    }
+    # 2. Contexto de la plantilla PDF (reporte, niño y estadísticas por juego)
+    context = contexto_reporte_pdf(reporte)
 
     # Verificar que el nombre de la plantilla sea una cadena válida
     if not isinstance('report/reporte_pdf_template.html', str):
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Juego, Evaluacion, PruebaCognitiva
+from app.core.utils.admin_paginacion import PaginacionKeysetMixin
+from .models import Juego, Evaluacion, PruebaCognitiva, EventoCliente
 
 @admin.register(Juego)
 class JuegoAdmin(admin.ModelAdmin):
@@ -76,9 +77,11 @@ class JuegoAdmin(admin.ModelAdmin):
         super().save_model(request, obj, form, change)
 
 @admin.register(Evaluacion)
-class EvaluacionAdmin(admin.ModelAdmin):
+class EvaluacionAdmin(PaginacionKeysetMixin, admin.ModelAdmin):
     """Administrador para el modelo Evaluacion - solo lectura"""
     
+    campo_keyset = 'fecha_hora_inicio'
+    list_select_related = ['nino']
     list_display = [
         'id',
         'nino',
@@ -90,7 +93,7 @@ class EvaluacionAdmin(admin.ModelAdmin):
         'total_aciertos',
         'total_errores'
     ]
-    list_filter = ['estado', 'fecha_hora_inicio', 'dispositivo']
+    list_filter = ['estado', 'prediccion_estado', 'fecha_hora_inicio', 'dispositivo']
     search_fields = ['nino__nombres', 'nino__apellidos']
     ordering = ['-fecha_hora_inicio']
     
@@ -109,9 +112,11 @@ class EvaluacionAdmin(admin.ModelAdmin):
         return [field.name for field in self.model._meta.fields]
 
 @admin.register(PruebaCognitiva)
-class PruebaCognitivaAdmin(admin.ModelAdmin):
+class PruebaCognitivaAdmin(PaginacionKeysetMixin, admin.ModelAdmin):
     """Administrador para el modelo PruebaCognitiva - solo lectura"""
     
+    campo_keyset = 'fecha_ejecucion'
+    list_select_related = ['evaluacion__nino', 'juego']
     list_display = [
         'id',
         'evaluacion',
@@ -151,4 +156,27 @@ class PruebaCognitivaAdmin(admin.ModelAdmin):
     def tiempo_respuesta_segundos_formatted(self, obj):
         """Muestra el tiempo de respuesta en segundos formateado"""
         return f"{obj.tiempo_respuesta_segundos:.2f}s"
-    tiempo_respuesta_segundos_formatted.short_description = 'Tiempo Respuesta'
\ No newline at end of file
+    tiempo_respuesta_segundos_formatted.short_description = 'Tiempo Respuesta'
+
+@admin.register(EventoCliente)
+class EventoClienteAdmin(admin.ModelAdmin):
+    """Administrador para el modelo EventoCliente - solo lectura"""
+    
+    list_display = ['id', 'sesion', 'tipo', 'question_id', 'client_seq', 'codigo_estado', 'fecha_recepcion']
+    list_filter = ['tipo', 'codigo_estado', 'fecha_recepcion']
+    search_fields = ['sesion__url_sesion']
+    ordering = ['-fecha_recepcion']
+    list_select_related = ['sesion']
+    
+    # Solo lectura - no se puede agregar, cambiar o eliminar
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+    
+    def get_readonly_fields(self, request, obj=None):
+        return [field.name for field in self.model._meta.fields]
@@ -32,3 +32,12 @@ PUNTUACION_MIN = 1.0
 PUNTUACION_MAX = 5.0
 PRECISION_MIN = 0.00
 PRECISION_MAX = 100.00
+
+# Estado de la predicción de IA de una evaluación (ver games/utils/prediccion.py)
+PREDICCION_ESTADO_CHOICES = [
+    ('', 'Sin predicción'),
+    ('pendiente', 'Pendiente'),
+    ('procesando', 'Procesando'),
+    ('completada', 'Completada'),
+    ('fallida', 'Fallida'),
+]
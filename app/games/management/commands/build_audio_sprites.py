@@ -0,0 +1,321 @@
+"""
+Comando para empaquetar los audios de un juego en sprites de audio.
+
+Concatena los clips MP3 referenciados por la configuración JSON del juego
+en uno o pocos archivos "sprite" y genera un mapa JSON con el offset y la
+duración de cada palabra, referenciado desde la clave "audio_sprite" de la
+configuración del juego. El cliente decodifica el sprite una sola vez con
+Web Audio y reproduce cada palabra como un segmento del buffer.
+
+El frame Xing/Info de cada clip no se copia al sprite (en medio del flujo
+sería un frame más), pero su etiqueta LAME dice cuántas muestras de
+retardo del codificador hay al principio y de relleno al final. Un
+decodificador sólo las recorta al inicio de un archivo, así que en el
+sprite se compensan en los offsets: cada clip empieza tras su retardo más
+el del decodificador (RETARDO_DECODIFICADOR) y dura sus muestras reales.
+
+Uso:
+    python manage.py build_audio_sprites
+    python manage.py build_audio_sprites --juego palabra-que-escuches --gap-frames 4
+"""
+import hashlib
+import json
+import os
+import unicodedata
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+GAMES_STATIC_DIR = Path(settings.BASE_DIR) / 'app' / 'games' / 'static'
+
+# Tablas de la cabecera MPEG Audio (solo Layer III)
+_BITRATES_KBPS = {
+    'mpeg1': [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 0],
+    'mpeg2': [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160, 0],
+}
+_SAMPLE_RATES = {
+    3: [44100, 48000, 32000],  # MPEG 1
+    2: [22050, 24000, 16000],  # MPEG 2
+    0: [11025, 12000, 8000],   # MPEG 2.5
+}
+
+# Muestras que el banco de síntesis de Layer III retrasa la salida (528 + 1),
+# igual que suponen LAME y ffmpeg al aplicar el retardo de la etiqueta
+RETARDO_DECODIFICADOR = 529
+
+
+def _normalizar_nombre(nombre):
+    """Quita acentos y pasa a minúsculas ('teléfono.mp3' -> 'telefono.mp3')."""
+    sin_acentos = unicodedata.normalize('NFKD', nombre).encode('ascii', 'ignore').decode('ascii')
+    return sin_acentos.lower()
+
+
+def _parsear_cabecera(data, pos):
+    """
+    Interpreta la cabecera de un frame MPEG Layer III en `pos`.
+
+    Returns:
+        dict con tamaño del frame, muestras, sample rate y canales,
+        o None si no hay una cabecera válida.
+    """
+    if pos + 4 > len(data):
+        return None
+    b1, b2, b3 = data[pos + 1], data[pos + 2], data[pos + 3]
+    if data[pos] != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+
+    version = (b1 >> 3) & 0x03
+    layer = (b1 >> 1) & 0x03
+    bitrate_idx = (b2 >> 4) & 0x0F
+    rate_idx = (b2 >> 2) & 0x03
+    if version == 1 or layer != 1 or bitrate_idx in (0, 15) or rate_idx == 3:
+        return None
+
+    mpeg1 = version == 3
+    bitrate = _BITRATES_KBPS['mpeg1' if mpeg1 else 'mpeg2'][bitrate_idx] * 1000
+    sample_rate = _SAMPLE_RATES[version][rate_idx]
+    padding = (b2 >> 1) & 0x01
+    mono = ((b3 >> 6) & 0x03) == 3
+    muestras = 1152 if mpeg1 else 576
+    tamano = (muestras // 8) * bitrate // sample_rate + padding
+
+    # Offset de la información lateral: detrás de la cabecera (y del CRC si lo hay)
+    side_info = 4 + (0 if (b1 & 0x01) else 2)
+    if mpeg1:
+        side_len = 17 if mono else 32
+    else:
+        side_len = 9 if mono else 17
+
+    return {
+        'tamano': tamano,
+        'muestras': muestras,
+        'sample_rate': sample_rate,
+        'canales': 1 if mono else 2,
+        'side_info': side_info,
+        'side_len': side_len,
+    }
+
+
+def leer_etiqueta_lame(frame, inicio_tag):
+    """
+    Retardo del codificador y relleno final (en muestras) de la etiqueta
+    LAME que sigue a la cabecera Xing/Info del frame. (0, 0) si no la hay.
+    """
+    flags = int.from_bytes(frame[inicio_tag + 4:inicio_tag + 8], 'big')
+    pos = inicio_tag + 8
+    pos += 4 if flags & 0x01 else 0    # Número de frames
+    pos += 4 if flags & 0x02 else 0    # Número de bytes
+    pos += 100 if flags & 0x04 else 0  # Tabla TOC
+    pos += 4 if flags & 0x08 else 0    # Calidad
+
+    # 9 bytes de versión del codificador ("LAME3.100", "Lavc58.13"...) y el
+    # retardo/relleno como dos enteros de 12 bits en los bytes 21-23
+    if frame[pos:pos + 4] not in (b'LAME', b'Lavf', b'Lavc') or len(frame) < pos + 24:
+        return 0, 0
+    valor = int.from_bytes(frame[pos + 21:pos + 24], 'big')
+    return valor >> 12, valor & 0x0FFF
+
+
+def leer_frames_mp3(ruta):
+    """
+    Extrae los frames de audio de un MP3 descartando etiquetas ID3 y el
+    frame informativo Xing/Info (que en medio de un sprite sonaría como
+    un frame vacío y confunde a algunos decodificadores), del que sólo se
+    conserva el retardo y el relleno de la etiqueta LAME.
+
+    Returns:
+        tuple (frames: list[bytes], muestras_totales, sample_rate, canales,
+        retardo, relleno)
+    """
+    data = Path(ruta).read_bytes()
+    pos = 0
+
+    # ID3v2 al inicio: tamaño codificado en 4 bytes "syncsafe"
+    if data[:3] == b'ID3' and len(data) >= 10:
+        tamano_tag = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        pos = 10 + tamano_tag + (10 if data[5] & 0x10 else 0)
+
+    fin = len(data)
+    if fin >= 128 and data[-128:-125] == b'TAG':
+        fin -= 128
+
+    frames = []
+    muestras_totales = 0
+    formato = None
+    retardo, relleno = 0, 0
+    while pos < fin:
+        cabecera = _parsear_cabecera(data, pos)
+        if cabecera is None or pos + cabecera['tamano'] > fin:
+            # Resincronizar con el siguiente byte de sincronía
+            pos += 1
+            continue
+
+        frame = data[pos:pos + cabecera['tamano']]
+        pos += cabecera['tamano']
+
+        if not frames and formato is None:
+            inicio_tag = cabecera['side_info'] + cabecera['side_len']
+            if frame[inicio_tag:inicio_tag + 4] in (b'Xing', b'Info'):
+                formato = (cabecera['sample_rate'], cabecera['canales'])
+                retardo, relleno = leer_etiqueta_lame(frame, inicio_tag)
+                continue
+
+        formato = formato or (cabecera['sample_rate'], cabecera['canales'])
+        frames.append(frame)
+        muestras_totales += cabecera['muestras']
+
+    if not frames:
+        raise CommandError(f"No se encontraron frames MP3 válidos en {ruta}")
+
+    return frames, muestras_totales, formato[0], formato[1], retardo, relleno
+
+
+def frame_silencio(frame_referencia):
+    """
+    Construye un frame de silencio con el mismo formato que `frame_referencia`:
+    cabecera sin CRC ni padding e información lateral a cero (part2_3_length = 0).
+    """
+    cabecera = bytearray(frame_referencia[:4])
+    cabecera[1] |= 0x01   # Sin CRC
+    cabecera[2] &= ~0x02  # Sin padding
+    info = _parsear_cabecera(bytes(cabecera), 0)
+    return bytes(cabecera) + bytes(info['tamano'] - 4)
+
+
+class Command(BaseCommand):
+    help = 'Empaqueta los audios de un juego en sprites MP3 con mapa de offsets JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--juego',
+            type=str,
+            default='palabra-que-escuches',
+            help='Slug del juego cuya configuración JSON referencia los audios'
+        )
+        parser.add_argument(
+            '--gap-frames',
+            type=int,
+            default=4,
+            help='Frames de silencio entre clips para evitar solapamientos (default: 4)'
+        )
+        parser.add_argument(
+            '--max-kb',
+            type=int,
+            default=1024,
+            help='Tamaño máximo aproximado de cada sprite en KB antes de abrir uno nuevo'
+        )
+
+    def handle(self, *args, **options):
+        slug = options['juego']
+        gap_frames = max(0, options['gap_frames'])
+        max_bytes = options['max_kb'] * 1024
+
+        ruta_config = GAMES_STATIC_DIR / 'data' / f'{slug}.json'
+        if not ruta_config.exists():
+            raise CommandError(f"No existe la configuración del juego: {ruta_config}")
+
+        with open(ruta_config, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+
+        audio_dir = GAMES_STATIC_DIR / 'audio'
+        disponibles = {_normalizar_nombre(p.name): p for p in audio_dir.glob('*.mp3')}
+
+        # Rutas de audio en el orden en que aparecen en los niveles
+        rutas_audio = []
+        for nivel in config.get('levels', []):
+            for pregunta in nivel.get('questions', []):
+                ruta = pregunta.get('audio_path')
+                if ruta and ruta not in rutas_audio:
+                    rutas_audio.append(ruta)
+
+        if not rutas_audio:
+            raise CommandError(f"El juego '{slug}' no referencia ningún audio")
+
+        self.stdout.write(f"🎵 Empaquetando {len(rutas_audio)} audios de '{slug}'...")
+
+        # Agrupar por formato: un sprite solo puede mezclar clips compatibles
+        sprites = []
+        clips = {}
+        for ruta in rutas_audio:
+            archivo = disponibles.get(_normalizar_nombre(os.path.basename(ruta)))
+            if archivo is None:
+                self.stdout.write(self.style.WARNING(f"  ⚠️ Audio no encontrado: {ruta}"))
+                continue
+
+            frames, muestras, sample_rate, canales, retardo, relleno = leer_frames_mp3(archivo)
+            tamano_clip = sum(len(fr) for fr in frames)
+
+            sprite = next(
+                (s for s in sprites
+                 if s['formato'] == (sample_rate, canales)
+                 and s['tamano'] + tamano_clip <= max_bytes),
+                None
+            )
+            if sprite is None:
+                sprite = {
+                    'formato': (sample_rate, canales),
+                    'partes': [],
+                    'tamano': 0,
+                    'muestras': 0,
+                    'silencio': frame_silencio(frames[0]),
+                    'muestras_frame': 1152 if sample_rate >= 32000 else 576,
+                }
+                sprites.append(sprite)
+
+            # Silencio antes de cada clip: también separa el primero del
+            # retardo inicial del decodificador
+            hueco = sprite['silencio'] * gap_frames
+            sprite['partes'].append(hueco)
+            sprite['muestras'] += gap_frames * sprite['muestras_frame']
+
+            # El audio del clip empieza tras el retardo del codificador y el
+            # del decodificador, y acaba antes del relleno del codificador
+            clips[ruta] = {
+                'sprite': sprites.index(sprite),
+                'start': round((sprite['muestras'] + retardo + RETARDO_DECODIFICADOR) / sample_rate, 4),
+                'duration': round((muestras - retardo - relleno) / sample_rate, 4),
+            }
+
+            sprite['partes'].extend(frames)
+            sprite['tamano'] += len(hueco) + tamano_clip
+            sprite['muestras'] += muestras
+
+            self.stdout.write(f"  ✓ {archivo.name}: {clips[ruta]['duration']:.2f}s")
+
+        salida_dir = audio_dir / 'sprites'
+        salida_dir.mkdir(parents=True, exist_ok=True)
+
+        archivos = []
+        for indice, sprite in enumerate(sprites):
+            contenido = b''.join(sprite['partes']) + sprite['silencio'] * gap_frames
+            nombre = f'{slug}-{indice}.mp3'
+            (salida_dir / nombre).write_bytes(contenido)
+
+            version = hashlib.sha1(contenido).hexdigest()[:10]
+            archivos.append({
+                'url': f'/static/audio/sprites/{nombre}?v={version}',
+                'sample_rate': sprite['formato'][0],
+                'channels': sprite['formato'][1],
+                'bytes': len(contenido),
+            })
+            self.stdout.write(f"  📦 {nombre}: {len(contenido) / 1024:.1f} KB")
+
+        mapa = {'version': 1, 'sprites': archivos, 'clips': clips}
+        nombre_mapa = f'{slug}.json'
+        with open(salida_dir / nombre_mapa, 'w', encoding='utf-8') as f:
+            json.dump(mapa, f, ensure_ascii=False, indent=2)
+
+        # La configuración del juego debe referenciar el mapa para que el
+        # cliente use el sprite; no se reescribe para conservar su formato
+        url_mapa = f'/static/audio/sprites/{nombre_mapa}'
+        if config.get('audio_sprite') != url_mapa:
+            self.stdout.write(self.style.WARNING(
+                f"  ⚠️ Añade \"audio_sprite\": \"{url_mapa}\" a data/{slug}.json"
+            ))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {len(clips)} clips empaquetados en {len(archivos)} sprite(s). "
+            f"Mapa: audio/sprites/{nombre_mapa}"
+        ))
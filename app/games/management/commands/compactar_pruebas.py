@@ -0,0 +1,74 @@
+"""
+Comando que compacta las pruebas cognitivas de las evaluaciones
+completadas hace más de PRUEBAS_COMPACTAR_DIAS días (ver
+app/games/utils/compactacion.py).
+
+Uso:
+    python manage.py compactar_pruebas                 # según settings
+    python manage.py compactar_pruebas --dias 90 --dry-run
+    python manage.py compactar_pruebas --evaluacion 42
+"""
+from django.core.management.base import BaseCommand
+
+from app.games.utils import compactacion
+
+
+class Command(BaseCommand):
+    help = 'Empaqueta en SesionJuego las pruebas cognitivas de evaluaciones antiguas y borra las filas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=None,
+            help='Días desde el fin de la evaluación (por defecto: PRUEBAS_COMPACTAR_DIAS)'
+        )
+        parser.add_argument(
+            '--evaluacion',
+            type=int,
+            action='append',
+            help='ID de la evaluación a compactar (se puede repetir)'
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=compactacion.TAMANO_LOTE,
+            help=f'Evaluaciones leídas por consulta (por defecto: {compactacion.TAMANO_LOTE})'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Sólo muestra cuántas evaluaciones se compactarían'
+        )
+
+    def handle(self, *args, **options):
+        evaluaciones = compactacion.evaluaciones_compactables(options['dias'])
+        if options['evaluacion']:
+            evaluaciones = evaluaciones.filter(pk__in=options['evaluacion'])
+        ids = evaluaciones.order_by('pk').values_list('pk', flat=True)
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(
+                f'🔍 DRY-RUN: se compactarían {ids.count()} evaluaciones'
+            ))
+            return
+
+        lote = max(options['lote'], 1)
+        total_evaluaciones = 0
+        total_pruebas = 0
+        ultimo = 0
+        while True:
+            lote_ids = list(ids.filter(pk__gt=ultimo)[:lote])
+            if not lote_ids:
+                break
+            for evaluacion_id in lote_ids:
+                pruebas = compactacion.compactar_evaluacion(evaluacion_id)
+                if pruebas:
+                    total_evaluaciones += 1
+                    total_pruebas += pruebas
+            ultimo = lote_ids[-1]
+            self.stdout.write(f'   🗜️ {total_evaluaciones} evaluaciones / {total_pruebas} pruebas compactadas...')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {total_pruebas} pruebas de {total_evaluaciones} evaluaciones compactadas'
+        ))
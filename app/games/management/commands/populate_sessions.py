@@ -4,6 +4,7 @@ from django.utils import timezone
 from app.core.models import Nino, Profesional, ReporteIA
 from app.games.models import Juego, Evaluacion, SesionJuego, PruebaCognitiva
 from app.games.ml_models.predictor import predecir_dislexia_desde_evaluacion
+from app.games.utils.progreso import recalcular_progreso
 import os
 
 class Command(BaseCommand):
@@ -162,6 +163,7 @@ class Command(BaseCommand):
                 PruebaCognitiva.objects.create(
                     evaluacion=evaluacion,
                     juego=juego,
+                    sesion=sesion,
                     numero_prueba=ejercicio_global,
                     clics=clics,
                     aciertos=aciertos,
@@ -197,6 +199,7 @@ class Command(BaseCommand):
         evaluacion.total_errores = total_errores
         evaluacion.precision_promedio = (total_aciertos / total_clics) * 100 if total_clics > 0 else 0
         evaluacion.save()
+        recalcular_progreso(evaluacion.id)
 
         # ====================================================================
         # RESUMEN FINAL
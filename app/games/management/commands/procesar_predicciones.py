@@ -0,0 +1,67 @@
+"""
+Comando para reintentar las predicciones de IA que no llegaron a guardarse
+(error en la inferencia o proceso terminado a mitad). Con PREDICCION_HILO
+desactivado, en modo --loop es el worker que ejecuta todas las predicciones.
+
+Uso:
+    python manage.py procesar_predicciones               # una pasada (cron)
+    python manage.py procesar_predicciones --loop        # proceso permanente
+    python manage.py procesar_predicciones --limite 20
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.games.models import Evaluacion
+from app.games.utils import prediccion
+
+
+class Command(BaseCommand):
+    help = 'Reintenta las predicciones de IA pendientes, fallidas o abandonadas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Sigue ejecutándose y revisa las predicciones cada --intervalo segundos'
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=int,
+            default=60,
+            help='Segundos entre revisiones en modo --loop (por defecto: 60)'
+        )
+        parser.add_argument(
+            '--limite',
+            type=int,
+            default=None,
+            help='Máximo de evaluaciones por pasada (por defecto: todas)'
+        )
+
+    def handle(self, *args, **options):
+        if not options['loop']:
+            self._pasada(options['limite'])
+            return
+
+        self.stdout.write(f"🔄 Revisando predicciones cada {options['intervalo']}s (Ctrl+C para salir)")
+        try:
+            while True:
+                self._pasada(options['limite'], silencioso=True)
+                time.sleep(options['intervalo'])
+        except KeyboardInterrupt:
+            self.stdout.write('\n👋 Procesamiento detenido')
+
+    def _pasada(self, limite, silencioso=False):
+        total = prediccion.procesar_pendientes(limite=limite)
+
+        if silencioso and not any(total.values()):
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f"🤖 {total['completadas']} predicciones completadas, {total['fallidas']} fallidas"
+        ))
+        if not silencioso:
+            agotadas = Evaluacion.objects.filter(
+                prediccion_estado='fallida', prediccion_intentos__gte=prediccion.MAX_INTENTOS
+            ).count()
+            self.stdout.write(f"❌ Sin reintentos (máximo {prediccion.MAX_INTENTOS} intentos): {agotadas}")
@@ -0,0 +1,76 @@
+"""
+Comando que comprueba que el progreso guardado en cada Evaluacion
+(sesiones_totales, sesiones_completadas, siguiente_ejercicio) coincide con
+sus SesionJuego, y opcionalmente lo corrige.
+
+Uso:
+    python manage.py verificar_progreso                 # sólo informa
+    python manage.py verificar_progreso --corregir
+    python manage.py verificar_progreso --evaluacion 42 --corregir
+"""
+from django.core.management.base import BaseCommand
+
+from app.games.models import Evaluacion
+from app.games.utils import progreso
+
+
+class Command(BaseCommand):
+    help = 'Verifica (y corrige) el progreso de sesiones guardado en las evaluaciones'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--evaluacion',
+            type=int,
+            action='append',
+            help='ID de la evaluación a verificar (se puede repetir). Por defecto, todas'
+        )
+        parser.add_argument(
+            '--corregir',
+            action='store_true',
+            help='Recalcula el progreso de las evaluaciones descuadradas'
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=1000,
+            help='Evaluaciones leídas por consulta (por defecto: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        evaluaciones = Evaluacion.objects.all()
+        if options['evaluacion']:
+            evaluaciones = evaluaciones.filter(pk__in=options['evaluacion'])
+
+        esperados = {f'_{campo}': expresion for campo, expresion in progreso.expresiones().items()}
+        filas = evaluaciones.order_by().annotate(**esperados).values(
+            'pk', *progreso.CAMPOS, *esperados
+        ).iterator(chunk_size=max(options['lote'], 1))
+
+        revisadas = 0
+        descuadradas = []
+        for fila in filas:
+            revisadas += 1
+            diferencias = [
+                f"{campo}={fila[campo]} (real {fila[f'_{campo}']})"
+                for campo in progreso.CAMPOS
+                if fila[campo] != fila[f'_{campo}']
+            ]
+            if diferencias:
+                descuadradas.append(fila['pk'])
+                self.stdout.write(self.style.WARNING(f"⚠️ Evaluación {fila['pk']}: {', '.join(diferencias)}"))
+
+        if not descuadradas:
+            self.stdout.write(self.style.SUCCESS(f'✅ {revisadas} evaluaciones revisadas, todas cuadran'))
+            return
+
+        if not options['corregir']:
+            self.stdout.write(self.style.WARNING(
+                f'⚠️ {len(descuadradas)} de {revisadas} evaluaciones descuadradas. Usa --corregir para recalcularlas'
+            ))
+            return
+
+        corregidas = 0
+        for inicio in range(0, len(descuadradas), options['lote']):
+            ids = descuadradas[inicio:inicio + options['lote']]
+            corregidas += progreso.recalcular_progreso(Evaluacion.objects.filter(pk__in=ids))
+        self.stdout.write(self.style.SUCCESS(f'✅ {corregidas} evaluaciones corregidas'))
@@ -8,6 +8,13 @@ import numpy as np
 from pathlib import Path
 import joblib
 import threading
+import time
+
+from app.core.utils.metricas import (
+    CARGA_MODELO, DURACION_FEATURES, DURACION_INFERENCIA, ERRORES_PREDICCION, MODELO_CARGADO,
+    cronometrar,
+)
+from app.core.utils.trazas import span
 
 # CACHE GLOBAL CON LOCK PARA THREAD-SAFETY
 _MODEL_LOCK = threading.Lock()
@@ -27,6 +34,7 @@ def _get_current_pid():
     return os.getpid()
 
 
+@span('predictor.cargar_modelo', 'predictor')
 def _load_model_once():
     """
     Carga el modelo UNA SOLA VEZ por proceso usando lock
@@ -48,6 +56,7 @@ def _load_model_once():
             _GLOBAL_MODEL_CACHE['loaded'] = False
         
         print(f"🔄 Cargando modelo (PID: {current_pid})...")
+        inicio_carga = time.perf_counter()
         
         try:
             model_dir = Path(__file__).parent / 'v2_2'
@@ -115,11 +124,14 @@ def _load_model_once():
             _GLOBAL_MODEL_CACHE['loaded'] = True
             _GLOBAL_MODEL_CACHE['pid'] = current_pid
             print(f"✅ Modelo cacheado (PID: {current_pid})\n")
+            CARGA_MODELO.observar(time.perf_counter() - inicio_carga, resultado='ok')
+            MODELO_CARGADO.fijar(1)
             
             return _GLOBAL_MODEL_CACHE
             
         except Exception as e:
             print(f"❌ Error al cargar modelo: {e}")
+            CARGA_MODELO.observar(time.perf_counter() - inicio_carga, resultado='error')
             _GLOBAL_MODEL_CACHE['loaded'] = False
             _GLOBAL_MODEL_CACHE['pid'] = None
             raise
@@ -159,6 +171,7 @@ class DyslexiaPredictor:
         self.features_list = cache['features_list']
         self.threshold = cache['threshold']
     
+    @span('predictor.predict', 'predictor')
     def predict(self, features_dict):
         """
         Realiza predicción de dislexia
@@ -182,14 +195,16 @@ class DyslexiaPredictor:
             feature_values = [features_dict.get(name, 0) for name in self.features_list]
             X = np.array([feature_values])
             
-            # Suprimir warning de feature names
-            import warnings
-            with warnings.catch_warnings():
-                warnings.simplefilter("ignore")
-                X_scaled = self.scaler.transform(X)
-            
-            # === PREDICCIÓN (con verbose=0 para silenciar logs) ===
-            probabilidad = float(self.model.predict(X_scaled, verbose=0)[0][0])
+            with cronometrar(DURACION_INFERENCIA):
+                # Suprimir warning de feature names
+                import warnings
+                with warnings.catch_warnings(), span('predictor.scaler', 'predictor'):
+                    warnings.simplefilter("ignore")
+                    X_scaled = self.scaler.transform(X)
+                
+                # === PREDICCIÓN (con verbose=0 para silenciar logs) ===
+                with span('predictor.keras', 'predictor'):
+                    probabilidad = float(self.model.predict(X_scaled, verbose=0)[0][0])
             tiene_dislexia = probabilidad >= self.threshold
             
             # === CALCULAR CONFIANZA ===
@@ -218,6 +233,7 @@ class DyslexiaPredictor:
             
         except Exception as e:
             print(f"❌ Error durante predicción: {e}")
+            ERRORES_PREDICCION.inc()
             import traceback
             traceback.print_exc()
             return {
@@ -323,6 +339,7 @@ class DyslexiaPredictor:
 # ===================================================================
 # FUNCIÓN PRINCIPAL
 # ===================================================================
+@span('predictor.predecir_evaluacion', 'predictor')
 def predecir_dislexia_desde_evaluacion(evaluacion_id):
     """
     Función de alto nivel para predicción desde evaluación
@@ -357,7 +374,8 @@ def predecir_dislexia_desde_evaluacion(evaluacion_id):
         
         # === PASO 2: Preparar features ===
         print("\n🔄 Preparando features...")
-        features = preparar_features_desde_evaluacion(evaluacion_id)
+        with cronometrar(DURACION_FEATURES), span('predictor.features', 'predictor', evaluacion=evaluacion_id):
+            features = preparar_features_desde_evaluacion(evaluacion_id)
         
         # === PASO 3: Validar ===
         print("\n✔️ Validando features...")
@@ -130,6 +130,37 @@ def preparar_features_desde_evaluacion(evaluacion_id):
     return features
 
 
+def preparar_features_tiempo_respuesta(evaluacion_id):
+    """
+    Features de tiempo de reacción por ejercicio, calculadas al finalizar
+    cada sesión desde su línea de tiempo (app/games/utils/linea_tiempo.py).
+    No forman parte de las 196 features del modelo actual.
+
+    Args:
+        evaluacion_id (int): ID de la evaluación
+
+    Returns:
+        dict: MedianRT{i}, IQRRT{i} (segundos) y SlowRatio{i} (ratio 0-1)
+        de los ejercicios que tienen respuestas registradas
+    """
+    sesiones = SesionJuego.objects.filter(
+        evaluacion_id=evaluacion_id,
+        estado='completada',
+        ejercicio_numero__isnull=False,
+        tiempo_respuesta_mediana_ms__isnull=False
+    ).values_list(
+        'ejercicio_numero', 'tiempo_respuesta_mediana_ms',
+        'tiempo_respuesta_iqr_ms', 'porcentaje_respuestas_lentas'
+    )
+
+    features = {}
+    for i, mediana_ms, iqr_ms, lentas in sesiones:
+        features[f'MedianRT{i}'] = mediana_ms / 1000.0
+        features[f'IQRRT{i}'] = (iqr_ms or 0) / 1000.0
+        features[f'SlowRatio{i}'] = float(lentas or 0) / 100.0
+    return features
+
+
 def validar_features(features):
     """
     Valida que el diccionario de features tenga la estructura correcta
@@ -1,8 +1,10 @@
-from django.db import models
+from django.db import models, transaction
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.db.models import Sum
+from django.db.models import F, Sum
 from django.utils import timezone
 
+from app.core.utils.thumbnails import url_miniatura
+
 # Importar constantes globales y específicas
 from config.constants import DIFICULTAD_CHOICES, ESTADO_CHOICES, COLOR_CHOICES, COLOR_GRADIENTE_MAP
 from .constants import (
@@ -11,7 +13,8 @@ from .constants import (
     PUNTUACION_MIN,
     PUNTUACION_MAX,
     PRECISION_MIN,
-    PRECISION_MAX
+    PRECISION_MAX,
+    PREDICCION_ESTADO_CHOICES
 )
 
 class Juego(models.Model):
@@ -44,6 +47,14 @@ class Juego(models.Model):
         help_text="Imagen que se mostrará en la card del juego",
         default='games/default_game_image.png'
     )
+    imagen_hash = models.CharField(
+        max_length=40,
+        blank=True,
+        default='',
+        editable=False,
+        verbose_name="Hash de la imagen",
+        help_text="SHA-1 de la imagen, nombra sus miniaturas (ver app.core.utils.thumbnails)"
+    )
     dificultad = models.CharField(
         max_length=20,
         choices=DIFICULTAD_CHOICES,
@@ -89,6 +100,10 @@ class Juego(models.Model):
     def __str__(self):
         return self.nombre
 
+    def thumbnail_url(self, size='md', formato='webp'):
+        """URL de la miniatura de la imagen del juego (ver app.core.utils.thumbnails)"""
+        return url_miniatura(self.imagen, size, formato)
+
     @property
     def porcentaje_completado(self):
         """Calcula el porcentaje de juegos completados vs jugadas"""
@@ -268,7 +283,7 @@ class Evaluacion(models.Model):
         verbose_name="Niño"
     )
     
-    fecha_hora_inicio = models.DateTimeField(verbose_name="Fecha y Hora de Inicio")
+    fecha_hora_inicio = models.DateTimeField(db_index=True, verbose_name="Fecha y Hora de Inicio")
     fecha_hora_fin = models.DateTimeField(null=True, blank=True, verbose_name="Fecha y Hora de Fin")
     estado = models.CharField(
         max_length=20,
@@ -292,11 +307,43 @@ class Evaluacion(models.Model):
         verbose_name="Precisión Promedio (%)"
     )
     dispositivo = models.CharField(max_length=50, blank=True, verbose_name="Dispositivo")
+
+    # Progreso de las sesiones (ver games/utils/progreso.py)
+    sesiones_totales = models.PositiveIntegerField(default=0, verbose_name="Sesiones Totales")
+    sesiones_completadas = models.PositiveIntegerField(default=0, verbose_name="Sesiones Completadas")
+    siguiente_ejercicio = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name="Siguiente Ejercicio",
+        help_text="Número del primer ejercicio sin completar"
+    )
+
+    # Predicción de IA, fuera de la transacción de fin (ver games/utils/prediccion.py)
+    prediccion_estado = models.CharField(
+        max_length=20,
+        choices=PREDICCION_ESTADO_CHOICES,
+        default='',
+        blank=True,
+        verbose_name="Estado de la Predicción"
+    )
+    prediccion_intentos = models.PositiveSmallIntegerField(default=0, verbose_name="Intentos de Predicción")
+    prediccion_fecha = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Último Intento de Predicción"
+    )
+    prediccion_error = models.TextField(blank=True, verbose_name="Error de Predicción")
     
     class Meta:
         verbose_name = "Evaluación"
         verbose_name_plural = "Evaluaciones"
         ordering = ['-fecha_hora_inicio']
+        indexes = [
+            # Evaluaciones de un niño por estado, más recientes primero
+            models.Index(fields=['nino', 'estado', 'fecha_hora_inicio']),
+            # Historial y resumen de un niño (orden por defecto)
+            models.Index(fields=['nino', 'fecha_hora_inicio']),
+        ]
         
     def __str__(self):
         return f"Evaluación {self.id} - {self.nino.nombre_completo} ({self.estado})"
@@ -337,6 +384,15 @@ class PruebaCognitiva(models.Model):
         related_name='pruebas_realizadas',
         verbose_name="Juego"
     )
+    # Sesión en la que se jugó; compactar_evaluacion empaqueta cada prueba en ella
+    sesion = models.ForeignKey(
+        'SesionJuego',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='pruebas',
+        verbose_name="Sesión de Juego"
+    )
     
     numero_prueba = models.PositiveIntegerField(verbose_name="Número de Prueba")
     clics = models.PositiveIntegerField(default=0, verbose_name="Clics")
@@ -361,13 +417,18 @@ class PruebaCognitiva(models.Model):
         verbose_name="Tiempo de Respuesta (ms)",
         help_text="Tiempo promedio de respuesta en milisegundos"
     )
-    fecha_ejecucion = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Ejecución")
+    fecha_ejecucion = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="Fecha de Ejecución")
     
     class Meta:
         verbose_name = "Prueba Cognitiva"
         verbose_name_plural = "Pruebas Cognitivas"
         ordering = ['evaluacion', 'numero_prueba']
+        # El índice único sirve también a los filtros por (evaluacion, juego)
         unique_together = ['evaluacion', 'juego', 'numero_prueba']
+        indexes = [
+            # Pruebas de una evaluación en el orden por defecto
+            models.Index(fields=['evaluacion', 'numero_prueba']),
+        ]
         
     def __str__(self):
         juego_nombre = self.juego.nombre if self.juego else "Sin Juego Asignado"
@@ -500,12 +561,77 @@ class SesionJuego(models.Model):
         verbose_name="Número de Ejercicio",
         help_text="Posición del minijuego en la secuencia (1-32) para el modelo IA"
     )
+    respuesta_finalizacion = models.JSONField(
+        null=True,
+        blank=True,
+        verbose_name="Respuesta de Finalización",
+        help_text="Respuesta enviada al finalizar la sesión; los reenvíos la reciben sin repetir el trabajo"
+    )
+
+    # === PRUEBAS COMPACTADAS (app/games/utils/compactacion.py) ===
+    pruebas_empaquetadas = models.BinaryField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="Pruebas Empaquetadas",
+        help_text="Pruebas cognitivas del juego en columnas de ancho fijo, tras compactar la evaluación"
+    )
+    pruebas_compactadas = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Pruebas Compactadas",
+        help_text="Número de pruebas cognitivas guardadas en el bloque empaquetado"
+    )
+    tiempo_respuesta_promedio_ms = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name="Tiempo de Respuesta Promedio (ms)",
+        help_text="Promedio de las pruebas compactadas"
+    )
+    fecha_compactacion = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Fecha de Compactación"
+    )
+
+    # === LÍNEA DE TIEMPO DE RESPUESTAS (app/games/utils/linea_tiempo.py) ===
+    linea_tiempo = models.BinaryField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="Línea de Tiempo",
+        help_text="Cada respuesta como registro (pregunta, ms, correcta) de ancho fijo"
+    )
+    tiempo_respuesta_mediana_ms = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name="Mediana del Tiempo de Respuesta (ms)"
+    )
+    tiempo_respuesta_iqr_ms = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name="Rango Intercuartílico del Tiempo de Respuesta (ms)"
+    )
+    porcentaje_respuestas_lentas = models.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(0.00), MaxValueValidator(100.00)],
+        verbose_name="Respuestas Lentas (%)",
+        help_text="Respuestas por encima de Q3 + 1.5 × IQR de la sesión"
+    )
 
     class Meta:
         verbose_name = "Sesión de Juego"
         verbose_name_plural = "Sesiones de Juego"
         ordering = ['-fecha_inicio']
         unique_together = ['evaluacion', 'juego', 'url_sesion']
+        indexes = [
+            # Siguiente ejercicio pendiente de una evaluación
+            models.Index(fields=['evaluacion', 'ejercicio_numero']),
+            # Sesiones de una evaluación por estado, en orden de ejercicio
+            models.Index(fields=['evaluacion', 'estado', 'ejercicio_numero']),
+        ]
     
     def __str__(self):
         return f"Sesión {self.juego.nombre} - Eval {self.evaluacion.id} ({self.estado})"
@@ -565,6 +691,16 @@ class SesionJuego(models.Model):
         Calcula y actualiza las métricas agregadas desde todas las PruebaCognitivas
         asociadas a esta sesión
         """
+        if self.fecha_compactacion is not None:
+            # Las pruebas ya se compactaron: los agregados se guardaron entonces
+            return {
+                'clicks': self.clicks_total,
+                'hits': self.hits_total,
+                'misses': self.misses_total,
+                'score': self.score_total,
+                'accuracy': float(self.accuracy_percent),
+                'missrate': float(self.missrate_percent)
+            }
 
         # Obtener todas las pruebas cognitivas de esta sesión
         pruebas = PruebaCognitiva.objects.filter(
@@ -620,9 +756,57 @@ class SesionJuego(models.Model):
         Crea una nueva sesión de juego para una evaluación específica
         Retorna la sesión creada con URL única
         """
-        sesion = cls.objects.create(
-            evaluacion=evaluacion,
-            juego=juego,
-            nivel_seleccionado=nivel
-        )
+        with transaction.atomic():
+            sesion = cls.objects.create(
+                evaluacion=evaluacion,
+                juego=juego,
+                nivel_seleccionado=nivel
+            )
+            Evaluacion.objects.filter(pk=evaluacion.pk).update(
+                sesiones_totales=F('sesiones_totales') + 1
+            )
         return sesion
+
+
+class EventoCliente(models.Model):
+    """
+    Evento enviado por el cliente de juego (respuesta, nivel o fin de juego)
+    con su número de secuencia. Permite que el cliente reenvíe eventos
+    encolados sin conexión sin que se apliquen dos veces: un reenvío
+    devuelve la respuesta almacenada.
+    """
+
+    TIPO_CHOICES = [
+        ('question_response', 'Respuesta a pregunta'),
+        ('level_complete', 'Nivel completado'),
+        ('finish_game', 'Fin de juego'),
+    ]
+
+    sesion = models.ForeignKey(
+        SesionJuego,
+        on_delete=models.CASCADE,
+        related_name='eventos_cliente',
+        verbose_name="Sesión de Juego"
+    )
+    tipo = models.CharField(max_length=30, choices=TIPO_CHOICES, verbose_name="Tipo de Evento")
+    question_id = models.PositiveIntegerField(
+        default=0,
+        verbose_name="ID de Pregunta",
+        help_text="0 para eventos que no corresponden a una pregunta"
+    )
+    client_seq = models.PositiveBigIntegerField(
+        verbose_name="Secuencia del Cliente",
+        help_text="Número de secuencia monótono asignado por el navegador"
+    )
+    codigo_estado = models.PositiveSmallIntegerField(default=200, verbose_name="Código HTTP")
+    respuesta = models.JSONField(default=dict, verbose_name="Respuesta Almacenada")
+    fecha_recepcion = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Recepción")
+
+    class Meta:
+        verbose_name = "Evento del Cliente"
+        verbose_name_plural = "Eventos del Cliente"
+        ordering = ['sesion', 'client_seq']
+        unique_together = ['sesion', 'question_id', 'client_seq']
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} #{self.client_seq} - {self.sesion.url_sesion}"
@@ -1,4 +1,5 @@
-from django.db.models.signals import post_migrate
+from django.db import transaction
+from django.db.models.signals import post_migrate, post_save
 from django.dispatch import receiver
 from django.apps import apps
 
@@ -128,3 +129,12 @@ def crear_juegos_iniciales(sender, **kwargs):
         total_juegos = Juego.objects.filter(activo=True).count()
         print(f'\n🎮 Juegos inicializados: {created_count} creados, {updated_count} actualizados')
         print(f'📊 Total de juegos activos: {total_juegos}')
+
+
+@receiver(post_save, sender='games.Juego')
+def miniaturas_juego(sender, instance, **kwargs):
+    """Genera las miniaturas de la imagen del juego cuando se confirma la transacción"""
+    from app.core.utils.thumbnails import programar_miniaturas
+
+    if instance.imagen:
+        transaction.on_commit(lambda: programar_miniaturas(instance.imagen))
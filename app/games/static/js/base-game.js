@@ -477,6 +477,41 @@ class BaseGame {
     // API CALLS
     // ============================================
     
+    /**
+     * Envía un evento al servidor a través de la cola persistente
+     * (GameEventQueue) si está disponible, o con fetch directo si no.
+     * Devuelve {ok, status, data}.
+     */
+    async postEvent(url, data, { wait = true } = {}) {
+        if (window.gameEventQueue) {
+            return window.gameEventQueue.send(url, data, { wait });
+        }
+        
+        try {
+            const headers = {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': this.getCsrfToken()
+            };
+            if (data.client_seq !== undefined) {
+                headers['Idempotency-Key'] = String(data.client_seq);
+            }
+            const response = await fetch(url, {
+                method: 'POST',
+                headers,
+                body: JSON.stringify(data)
+            });
+            let result = null;
+            try {
+                result = await response.json();
+            } catch (e) {
+                result = null;
+            }
+            return { ok: response.ok, status: response.status, data: result };
+        } catch (error) {
+            return { ok: false, status: 0, data: null, error };
+        }
+    }
+    
     async sendQuestionResponse(isCorrect, responseTime, selectedOption) {
         const data = {
             session_url: this.sessionData.url_sesion,
@@ -490,22 +525,8 @@ class BaseGame {
             hint_used: this.hintUsed
         };
         
-        try {
-            const response = await fetch(this.sessionData.api_urls.question_response, {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                    'X-CSRFToken': this.getCsrfToken()
-                },
-                body: JSON.stringify(data)
-            });
-            
-            if (!response.ok) {
-                console.error('❌ Error al enviar respuesta');
-            }
-        } catch (error) {
-            console.error('❌ Error de red:', error);
-        }
+        // Se encola y se entrega en segundo plano: el juego no espera a la red
+        this.postEvent(this.sessionData.api_urls.question_response, data, { wait: false });
     }
     
     async sendLevelResults() {
@@ -518,18 +539,7 @@ class BaseGame {
             total_score: this.score
         };
         
-        try {
-            await fetch(this.sessionData.api_urls.level_complete, {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                    'X-CSRFToken': this.getCsrfToken()
-                },
-                body: JSON.stringify(data)
-            });
-        } catch (error) {
-            console.error('❌ Error:', error);
-        }
+        this.postEvent(this.sessionData.api_urls.level_complete, data, { wait: false });
     }
     
     async sendGameResults(totalTimeSeconds) {
@@ -544,42 +554,39 @@ class BaseGame {
             levels_completed: this.currentLevel,
             total_clicks: totalClicks,
             total_hits: this.correctAnswers,
-            total_misses: this.incorrectAnswers
+            total_misses: this.incorrectAnswers,
+            // Misma clave en cada intento de fin de esta partida: el servidor
+            // devuelve la respuesta guardada en lugar de finalizar dos veces
+            client_seq: this.finishSeq ??= Date.now()
         };
         
         console.log(`📤 [${this.gameName}] Enviando resultados finales:`, data);
         
-        try {
-            const response = await fetch(this.sessionData.api_urls.finish_game, {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                    'X-CSRFToken': this.getCsrfToken()
-                },
-                body: JSON.stringify(data)
-            });
-            
-            if (!response.ok) {
-                const errorText = await response.text();
-                console.error('❌ Error del servidor:', errorText);
-                return { 
-                    success: false, 
-                    error: `Error del servidor (${response.status}): ${response.statusText}` 
-                };
-            }
-            
-            const result = await response.json();
-            console.log(`📥 [${this.gameName}] Respuesta del servidor:`, result);
-            
-            if (result.success) {
-                return this.handleGameFinishResponse(result);
-            } else {
-                return { success: false, error: result.error };
-            }
-            
-        } catch (error) {
-            console.error('❌ Error al finalizar juego:', error);
-            return { success: false, error: 'Error de conexión al finalizar el juego' };
+        // Si no hay conexión el evento queda en la cola: avisar y esperar a que se entregue
+        const offlineNotice = setTimeout(() => {
+            GameUtils.showToast('Sin conexión: los resultados se enviarán al recuperar la red', 'warning');
+        }, 3000);
+        
+        const response = await this.postEvent(this.sessionData.api_urls.finish_game, data);
+        clearTimeout(offlineNotice);
+        
+        if (!response.ok) {
+            console.error('❌ Error del servidor:', response.status, response.data);
+            return { 
+                success: false, 
+                error: response.status
+                    ? `Error del servidor (${response.status})`
+                    : 'Error de conexión al finalizar el juego'
+            };
+        }
+        
+        const result = response.data || {};
+        console.log(`📥 [${this.gameName}] Respuesta del servidor:`, result);
+        
+        if (result.success) {
+            return this.handleGameFinishResponse(result);
+        } else {
+            return { success: false, error: result.error };
         }
     }
     
@@ -0,0 +1,243 @@
+/**
+ * Cola persistente de eventos de juego (IndexedDB)
+ *
+ * Cada respuesta, nivel completado y fin de juego se guarda primero en
+ * IndexedDB con un número de secuencia (client_seq) y después se envía
+ * al servidor en estricto orden de llegada. Si la red falla, el evento
+ * queda en la cola y se reenvía cuando vuelve la conexión (evento
+ * "online", reintentos con backoff o Background Sync del service worker).
+ *
+ * El servidor registra cada evento por (url_sesion, question_id, client_seq),
+ * por lo que un reenvío nunca se aplica dos veces.
+ *
+ * Este archivo se usa tanto en la página (window) como en el service
+ * worker (importScripts), por eso no toca el DOM.
+ */
+
+(function (global) {
+    const DB_NAME = 'dislexia-juegos';
+    const DB_VERSION = 1;
+    const STORE = 'eventos';
+    const SYNC_TAG = 'dislexia-eventos';
+
+    const RETRY_MIN_MS = 2000;
+    const RETRY_MAX_MS = 60000;
+
+    function openDb() {
+        return new Promise((resolve, reject) => {
+            const request = indexedDB.open(DB_NAME, DB_VERSION);
+            request.onupgradeneeded = () => {
+                const db = request.result;
+                if (!db.objectStoreNames.contains(STORE)) {
+                    db.createObjectStore(STORE, { keyPath: 'id', autoIncrement: true });
+                }
+            };
+            request.onsuccess = () => resolve(request.result);
+            request.onerror = () => reject(request.error);
+        });
+    }
+
+    function tx(db, mode, fn) {
+        return new Promise((resolve, reject) => {
+            const transaction = db.transaction(STORE, mode);
+            const store = transaction.objectStore(STORE);
+            let result;
+            Promise.resolve(fn(store)).then(value => { result = value; });
+            transaction.oncomplete = () => resolve(result);
+            transaction.onerror = () => reject(transaction.error);
+            transaction.onabort = () => reject(transaction.error);
+        });
+    }
+
+    function requestToPromise(request) {
+        return new Promise((resolve, reject) => {
+            request.onsuccess = () => resolve(request.result);
+            request.onerror = () => reject(request.error);
+        });
+    }
+
+    // Errores de red, 5xx y 429 se reintentan; el resto de 4xx son definitivos
+    function isRetryable(status) {
+        return status === 0 || status === 429 || status >= 500;
+    }
+
+    class GameEventQueue {
+        constructor() {
+            this.dbPromise = null;
+            this.lastSeq = 0;
+            this.flushing = null;
+            this.retryDelay = RETRY_MIN_MS;
+            this.retryTimer = null;
+            this.waiters = new Map();
+            this.listeners = [];
+        }
+
+        db() {
+            if (!this.dbPromise) {
+                this.dbPromise = openDb();
+            }
+            return this.dbPromise;
+        }
+
+        /**
+         * Secuencia monótona basada en el reloj: sigue siendo única aunque
+         * el navegador borre IndexedDB a mitad de una evaluación.
+         */
+        nextSeq() {
+            this.lastSeq = Math.max(Date.now(), this.lastSeq + 1);
+            return this.lastSeq;
+        }
+
+        onDelivered(listener) {
+            this.listeners.push(listener);
+        }
+
+        /**
+         * Encola un evento y lanza el envío.
+         * Devuelve una promesa que se resuelve con {ok, status, data, queued}
+         * cuando el servidor responde; con {queued: true} si se pide no esperar.
+         */
+        async send(url, payload, { wait = true } = {}) {
+            // El llamador puede fijar client_seq como clave de idempotencia
+            // (p. ej. el fin de juego, para que un doble envío use la misma)
+            const body = { ...payload, client_seq: payload.client_seq ?? this.nextSeq() };
+            const record = {
+                url,
+                body,
+                session: body.session_url || null,
+                created: Date.now(),
+                attempts: 0,
+            };
+
+            let id;
+            try {
+                const db = await this.db();
+                id = await tx(db, 'readwrite', store => requestToPromise(store.add(record)));
+            } catch (error) {
+                // Sin IndexedDB (modo privado, cuota): envío directo sin persistencia
+                console.warn('⚠️ IndexedDB no disponible, envío directo:', error);
+                return this.post(url, body);
+            }
+
+            const delivered = new Promise(resolve => this.waiters.set(id, resolve));
+            this.flush();
+            this.requestBackgroundSync();
+
+            return wait ? delivered : { queued: true };
+        }
+
+        async post(url, body) {
+            try {
+                const response = await fetch(url, {
+                    method: 'POST',
+                    credentials: 'same-origin',
+                    headers: {
+                        'Content-Type': 'application/json',
+                        'X-Requested-With': 'XMLHttpRequest'
+                    },
+                    body: JSON.stringify(body)
+                });
+                let data = null;
+                try {
+                    data = await response.json();
+                } catch (e) {
+                    data = null;
+                }
+                const retryAfter = parseInt(response.headers.get('Retry-After'), 10);
+                return {
+                    ok: response.ok,
+                    status: response.status,
+                    data,
+                    retryAfterMs: Number.isFinite(retryAfter) ? retryAfter * 1000 : null
+                };
+            } catch (error) {
+                return { ok: false, status: 0, data: null, error };
+            }
+        }
+
+        async pending() {
+            const db = await this.db();
+            return tx(db, 'readonly', store => requestToPromise(store.getAll()));
+        }
+
+        /**
+         * Envía los eventos pendientes uno a uno en orden de id.
+         * Se detiene en el primer fallo reintentable para no romper el orden.
+         */
+        flush() {
+            if (this.flushing) return this.flushing;
+
+            this.flushing = (async () => {
+                const db = await this.db();
+                const records = await this.pending();
+                records.sort((a, b) => a.id - b.id);
+
+                for (const record of records) {
+                    const result = await this.post(record.url, record.body);
+
+                    if (!result.ok && isRetryable(result.status)) {
+                        record.attempts += 1;
+                        await tx(db, 'readwrite', store => requestToPromise(store.put(record)));
+                        this.scheduleRetry(result.retryAfterMs);
+                        return false;
+                    }
+
+                    if (!result.ok) {
+                        console.error(`❌ Evento descartado (${result.status}):`, record.body, result.data);
+                    }
+
+                    await tx(db, 'readwrite', store => requestToPromise(store.delete(record.id)));
+                    this.resolve(record, result);
+                }
+
+                this.retryDelay = RETRY_MIN_MS;
+                return true;
+            })().finally(() => {
+                this.flushing = null;
+            });
+
+            return this.flushing;
+        }
+
+        resolve(record, result) {
+            this.resolveById(record.id, result);
+            this.listeners.forEach(listener => listener(record, result));
+        }
+
+        // También lo usa la página cuando el service worker entrega el evento
+        resolveById(id, result) {
+            const waiter = this.waiters.get(id);
+            if (waiter) {
+                this.waiters.delete(id);
+                waiter(result);
+            }
+        }
+
+        // Con 429 el servidor indica la espera mínima en Retry-After
+        scheduleRetry(minDelay = null) {
+            if (this.retryTimer) return;
+            const delay = Math.max(this.retryDelay, minDelay || 0);
+            this.retryDelay = Math.min(this.retryDelay * 2, RETRY_MAX_MS);
+            this.retryTimer = setTimeout(() => {
+                this.retryTimer = null;
+                this.flush();
+            }, delay);
+        }
+
+        async requestBackgroundSync() {
+            // Solo disponible en la página con un service worker activo
+            if (typeof navigator === 'undefined' || !navigator.serviceWorker) return;
+            try {
+                const registration = await navigator.serviceWorker.ready;
+                if (registration.sync) {
+                    await registration.sync.register(SYNC_TAG);
+                }
+            } catch (e) {
+                // Background Sync no soportado: quedan los reintentos de la página
+            }
+        }
+    }
+
+    GameEventQueue.SYNC_TAG = SYNC_TAG;
+    global.GameEventQueue = GameEventQueue;
+})(typeof self !== 'undefined' ? self : window);
@@ -314,6 +314,78 @@ const GameUtils = {
                 }
             }
         }
+    },
+    
+    /**
+     * Activa el juego sin conexión: cola persistente de eventos
+     * (GameEventQueue), service worker y precarga de los recursos
+     * de la evaluación en curso.
+     */
+    setupOfflineSupport(sessionData, gameConfig) {
+        if (typeof GameEventQueue === 'undefined' || !('indexedDB' in window)) {
+            return null;
+        }
+        
+        const queue = new GameEventQueue();
+        window.gameEventQueue = queue;
+        
+        // Reenviar lo pendiente de visitas anteriores y al recuperar la red
+        queue.flush();
+        window.addEventListener('online', () => queue.flush());
+        
+        if (!('serviceWorker' in navigator)) {
+            return queue;
+        }
+        
+        // El service worker también entrega eventos (Background Sync)
+        navigator.serviceWorker.addEventListener('message', event => {
+            if (event.data && event.data.type === 'evento-entregado') {
+                queue.resolveById(event.data.id, event.data.result);
+            }
+        });
+        
+        navigator.serviceWorker.register('/sw-juegos.js', { scope: '/' })
+            .then(() => navigator.serviceWorker.ready)
+            .then(registration => {
+                const slugs = (sessionData.juegos || []).map(juego => juego.slug);
+                if (sessionData.juego_slug && !slugs.includes(sessionData.juego_slug)) {
+                    slugs.push(sessionData.juego_slug);
+                }
+                
+                registration.active?.postMessage({
+                    type: 'precache',
+                    urls: [
+                        ...slugs.map(slug => `/static/js/${slug}.js`),
+                        ...this.collectAssetUrls(gameConfig)
+                    ],
+                    configs: slugs.map(slug => `/static/data/${slug}.json`),
+                    pages: [window.location.pathname, ...(sessionData.paginas_siguientes || [])]
+                });
+            })
+            .catch(error => console.warn('⚠️ Service worker no registrado:', error));
+        
+        return queue;
+    },
+    
+    /**
+     * Recorre la configuración de un juego y devuelve las rutas de
+     * recursos estáticos (imágenes, audio, mapas de sprites)
+     */
+    collectAssetUrls(config) {
+        const urls = new Set();
+        const walk = value => {
+            if (typeof value === 'string') {
+                if (/^\/(static|media)\/.+\.(jpe?g|png|webp|gif|svg|mp3|ogg|wav|json)(\?.*)?$/i.test(value)) {
+                    urls.add(value);
+                }
+            } else if (Array.isArray(value)) {
+                value.forEach(walk);
+            } else if (value && typeof value === 'object') {
+                Object.values(value).forEach(walk);
+            }
+        };
+        walk(config);
+        return [...urls];
     }
 };
 
@@ -3,6 +3,92 @@
  * Extiende BaseGame para reutilizar funcionalidad común
  */
 
+/**
+ * Reproductor de sprites de audio con Web Audio API.
+ * Descarga y decodifica cada sprite una sola vez y reproduce las palabras
+ * como segmentos del buffer (ver `manage.py build_audio_sprites`).
+ */
+class AudioSpritePlayer {
+    constructor(mapUrl) {
+        this.mapUrl = mapUrl;
+        this.context = null;
+        this.clips = {};
+        this.buffers = [];
+        this.source = null;
+        this.ready = false;
+    }
+
+    async load() {
+        const AudioContextClass = window.AudioContext || window.webkitAudioContext;
+        if (!this.mapUrl || !AudioContextClass) return false;
+
+        try {
+            const mapResponse = await fetch(this.mapUrl);
+            if (!mapResponse.ok) throw new Error(`HTTP ${mapResponse.status}`);
+            const map = await mapResponse.json();
+
+            this.context = new AudioContextClass();
+            this.buffers = await Promise.all(map.sprites.map(async (sprite) => {
+                const response = await fetch(sprite.url);
+                if (!response.ok) throw new Error(`HTTP ${response.status}`);
+                const data = await response.arrayBuffer();
+                // Forma con callbacks para compatibilidad con Safari antiguo
+                return new Promise((resolve, reject) => {
+                    this.context.decodeAudioData(data, resolve, reject);
+                });
+            }));
+            this.clips = map.clips || {};
+            this.ready = true;
+            console.log(`🎵 Sprites de audio listos (${Object.keys(this.clips).length} clips)`);
+        } catch (error) {
+            console.warn('⚠️ No se pudieron cargar los sprites de audio, se usarán archivos individuales:', error);
+            this.ready = false;
+        }
+        return this.ready;
+    }
+
+    has(audioPath) {
+        return this.ready && Object.prototype.hasOwnProperty.call(this.clips, audioPath);
+    }
+
+    async play(audioPath, onEnded) {
+        const clip = this.clips[audioPath];
+        const buffer = this.buffers[clip.sprite];
+
+        // El contexto arranca suspendido hasta que hay interacción del usuario
+        if (this.context.state === 'suspended') {
+            await this.context.resume();
+        }
+        if (this.context.state !== 'running') {
+            throw new Error('AudioContext suspendido');
+        }
+
+        this.stop();
+        const source = this.context.createBufferSource();
+        source.buffer = buffer;
+        source.connect(this.context.destination);
+        source.onended = () => {
+            if (this.source === source) this.source = null;
+            if (onEnded) onEnded();
+        };
+        source.start(0, clip.start, clip.duration);
+        this.source = source;
+    }
+
+    stop() {
+        if (this.source) {
+            const source = this.source;
+            this.source = null;
+            source.onended = null;
+            try {
+                source.stop();
+            } catch (e) {
+                // Ya detenido
+            }
+        }
+    }
+}
+
 class PalabraQueEscuchesGame extends BaseGame {
     constructor(sessionData, gameConfig) {
         super(sessionData, gameConfig, 'Palabra que Escuches');
@@ -10,6 +96,10 @@ class PalabraQueEscuchesGame extends BaseGame {
         // Estado específico del juego
         this.audioReplays = 0;
         this.audioElement = null;
+
+        // Sprite de audio: se carga en segundo plano desde el inicio
+        this.audioSprite = new AudioSpritePlayer(gameConfig.audio_sprite);
+        this.audioSprite.load();
     }
     
     createGameInterface() {
@@ -178,10 +268,8 @@ class PalabraQueEscuchesGame extends BaseGame {
         this.audioReplays = 0;
         
         // Limpiar audio anterior
-        if (this.audioElement) {
-            this.audioElement.pause();
-            this.audioElement = null;
-        }
+        this.stopAudio();
+        this.audioElement = null;
         
         this.renderQuestion();
         this.startQuestionTimer();
@@ -254,11 +342,6 @@ class PalabraQueEscuchesGame extends BaseGame {
             return;
         }
         
-        // Crear o reproducir audio
-        if (!this.audioElement) {
-            this.audioElement = new Audio(this.currentQuestion.audio_path);
-        }
-        
         this.audioReplays++;
         document.getElementById('replay-counter').textContent = `${this.audioReplays}/${maxReplays}`;
         
@@ -272,9 +355,7 @@ class PalabraQueEscuchesGame extends BaseGame {
         playBtnText.textContent = 'Reproduciendo...';
         audioIcon.classList.add('animate-pulse');
         
-        this.audioElement.play();
-        
-        this.audioElement.onended = () => {
+        const onEnded = () => {
             playBtn.disabled = false;
             playBtn.classList.remove('opacity-75');
             playBtnText.textContent = this.audioReplays >= maxReplays 
@@ -288,13 +369,44 @@ class PalabraQueEscuchesGame extends BaseGame {
             }
         };
         
-        this.audioElement.onerror = () => {
+        const onError = () => {
             playBtn.disabled = false;
             playBtn.classList.remove('opacity-75');
             playBtnText.textContent = 'Error al reproducir';
             audioIcon.classList.remove('animate-pulse');
             GameUtils.showToast('Error al cargar el audio', 'error');
         };
+        
+        const audioPath = this.currentQuestion.audio_path;
+        
+        // Ruta rápida: segmento del sprite ya decodificado (sin latencia de arranque)
+        if (this.audioSprite.has(audioPath)) {
+            this.audioSprite.play(audioPath, onEnded).catch(() => {
+                this.playAudioElement(audioPath, onEnded, onError);
+            });
+            return;
+        }
+        
+        this.playAudioElement(audioPath, onEnded, onError);
+    }
+    
+    // Respaldo: un elemento <audio> por archivo (sprite no disponible)
+    playAudioElement(audioPath, onEnded, onError) {
+        if (!this.audioElement) {
+            this.audioElement = new Audio(audioPath);
+        }
+        
+        this.audioElement.onended = onEnded;
+        this.audioElement.onerror = onError;
+        this.audioElement.currentTime = 0;
+        this.audioElement.play().catch(onError);
+    }
+    
+    stopAudio() {
+        this.audioSprite.stop();
+        if (this.audioElement) {
+            this.audioElement.pause();
+        }
     }
     
     checkAnswer(selectedWord) {
@@ -329,9 +441,7 @@ class PalabraQueEscuchesGame extends BaseGame {
         this.isGameActive = false;
         
         // Detener audio
-        if (this.audioElement) {
-            this.audioElement.pause();
-        }
+        this.stopAudio();
         
         // Calcular puntos con penalización por reproducciones extra
         const timeBonus = Math.max(0, this.currentQuestion.time_limit - Math.floor(responseTime / 1000));
@@ -394,9 +504,7 @@ class PalabraQueEscuchesGame extends BaseGame {
     }
     
     onTimeUp() {
-        if (this.audioElement) {
-            this.audioElement.pause();
-        }
+        this.stopAudio();
         
         this.showResultAudio(false, '');
         GameUtils.showToast('Se acabó el tiempo ⏰', 'warning');
@@ -416,22 +524,7 @@ class PalabraQueEscuchesGame extends BaseGame {
             audio_replays: this.audioReplays
         };
         
-        try {
-            const response = await fetch(this.sessionData.api_urls.question_response, {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                    'X-CSRFToken': this.getCsrfToken()
-                },
-                body: JSON.stringify(data)
-            });
-            
-            if (!response.ok) {
-                console.error('❌ Error al enviar respuesta');
-            }
-        } catch (error) {
-            console.error('❌ Error de red:', error);
-        }
+        this.postEvent(this.sessionData.api_urls.question_response, data, { wait: false });
     }
     
     // Métodos de personalización de UI
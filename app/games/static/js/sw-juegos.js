@@ -0,0 +1,212 @@
+/**
+ * Service Worker de los juegos de DislexIA
+ *
+ * - Guarda en caché el "shell" de las páginas de juego, los scripts, las
+ *   configuraciones JSON, los recursos (imágenes, audio) y las páginas de
+ *   los ejercicios que quedan de la evaluación en curso, para que un corte
+ *   de red no interrumpa al niño. De las imágenes de los juegos se guarda
+ *   la miniatura WebP que usa la página (manage.py generar_miniaturas --static).
+ * - Reenvía en segundo plano (Background Sync) los eventos encolados en
+ *   IndexedDB por GameEventQueue.
+ *
+ * Se sirve desde /sw-juegos.js (ver app/games/views/offline_views.py).
+ */
+
+importScripts('/static/js/game-event-queue.js');
+
+const CACHE_VERSION = 'dislexia-juegos-v1';
+const STATIC_CACHE = `${CACHE_VERSION}-static`;
+const PAGES_CACHE = `${CACHE_VERSION}-paginas`;
+
+const MANIFIESTO_MINIATURAS = '/static/img/miniaturas/manifest.json';
+// Tamaño con el que PlayGameView sustituye las imágenes (ver _usar_miniaturas_estaticas)
+const TAMANO_MINIATURA = 'md';
+
+const SHELL_ASSETS = [
+    '/static/js/game-alerts.js',
+    '/static/js/game-utils.js',
+    '/static/js/game-event-queue.js',
+    '/static/js/base-game.js',
+    '/static/css/games.css',
+];
+
+const queue = new GameEventQueue();
+
+self.addEventListener('install', event => {
+    event.waitUntil(
+        caches.open(STATIC_CACHE)
+            .then(cache => cache.addAll(SHELL_ASSETS).catch(() => null))
+            .then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil(
+        caches.keys()
+            .then(keys => Promise.all(
+                keys.filter(key => !key.startsWith(CACHE_VERSION)).map(key => caches.delete(key))
+            ))
+            .then(() => self.clients.claim())
+    );
+});
+
+/**
+ * La página envía la lista de recursos de la evaluación en curso
+ * (scripts y JSON de cada juego, imágenes, audio, páginas siguientes).
+ */
+self.addEventListener('message', event => {
+    const message = event.data || {};
+
+    if (message.type === 'precache' && Array.isArray(message.urls)) {
+        event.waitUntil(
+            precacheConfigs(message.configs || [])
+                .then(assetUrls => precache([...message.urls, ...assetUrls], message.pages || []))
+        );
+    }
+});
+
+/**
+ * Descarga las configuraciones JSON de los juegos de la evaluación y
+ * devuelve las rutas de sus recursos (imágenes, audio, mapas de sprites).
+ */
+async function precacheConfigs(configUrls) {
+    const assets = new Set(configUrls);
+    const staticCache = await caches.open(STATIC_CACHE);
+
+    await Promise.all(configUrls.map(async url => {
+        try {
+            const response = await fetch(url, { credentials: 'same-origin' });
+            if (!response.ok) return;
+            await staticCache.put(url, response.clone());
+            collectAssets(await response.json(), assets);
+        } catch (e) {
+            // Sin conexión: se precargará en la siguiente visita
+        }
+    }));
+
+    return usarMiniaturas([...assets]);
+}
+
+/**
+ * Cambia cada imagen estática por su miniatura WebP si el manifiesto la
+ * tiene: es la que cargarán las páginas, así que la original no hace falta.
+ */
+async function usarMiniaturas(urls) {
+    let manifiesto = {};
+    try {
+        const response = await fetch(MANIFIESTO_MINIATURAS, { credentials: 'same-origin' });
+        if (response.ok) manifiesto = await response.json();
+    } catch (e) {
+        // Sin manifiesto se precargan las imágenes originales
+    }
+    return urls.map(url => manifiesto[url]?.[TAMANO_MINIATURA]?.webp || url);
+}
+
+function collectAssets(value, assets) {
+    if (typeof value === 'string') {
+        if (/^\/(static|media)\/.+\.(jpe?g|png|webp|gif|svg|mp3|ogg|wav|json)(\?.*)?$/i.test(value)) {
+            assets.add(value);
+        }
+    } else if (Array.isArray(value)) {
+        value.forEach(item => collectAssets(item, assets));
+    } else if (value && typeof value === 'object') {
+        Object.values(value).forEach(item => collectAssets(item, assets));
+    }
+}
+
+async function precache(urls, pages) {
+    const staticCache = await caches.open(STATIC_CACHE);
+    const pagesCache = await caches.open(PAGES_CACHE);
+
+    const addEach = (cache, list, headers = {}) => Promise.all(list.map(async url => {
+        if (await cache.match(url, { ignoreVary: true })) return;
+        try {
+            const response = await fetch(url, { credentials: 'same-origin', headers });
+            if (response.ok && !response.redirected) await cache.put(url, response);
+        } catch (e) {
+            // Recurso no disponible ahora: se intentará en la siguiente visita
+        }
+    }));
+
+    await addEach(staticCache, urls);
+    // X-Precarga: PlayGameView no cuenta la visita como entrada al juego
+    await addEach(pagesCache, pages, { 'X-Precarga': '1' });
+}
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    if (request.method !== 'GET') return;
+
+    const url = new URL(request.url);
+    if (url.origin !== self.location.origin) return;
+
+    // Las peticiones parciales (<audio> con Range) van directas a la red
+    if (request.headers.has('range')) return;
+
+    // Recursos estáticos y media: se sirve la copia en caché y se
+    // actualiza en segundo plano (stale-while-revalidate)
+    if (url.pathname.startsWith('/static/') || url.pathname.startsWith('/media/')) {
+        event.respondWith(staleWhileRevalidate(event, request));
+        return;
+    }
+
+    // Páginas de juego: primero red, caché si no hay conexión
+    if (request.mode === 'navigate' && /\/games\/play\//.test(url.pathname)) {
+        event.respondWith(networkFirst(request));
+    }
+});
+
+async function staleWhileRevalidate(event, request) {
+    const cache = await caches.open(STATIC_CACHE);
+    const cached = await cache.match(request, { ignoreVary: true });
+
+    const update = fetch(request).then(response => {
+        if (response.ok && response.type === 'basic') {
+            cache.put(request, response.clone());
+        }
+        return response;
+    });
+
+    if (cached) {
+        event.waitUntil(update.catch(() => null));
+        return cached;
+    }
+    return update;
+}
+
+async function networkFirst(request) {
+    const cache = await caches.open(PAGES_CACHE);
+    try {
+        const response = await fetch(request);
+        if (response.ok) cache.put(request, response.clone());
+        return response;
+    } catch (error) {
+        // Las páginas precargadas se guardaron sin las cabeceras de la navegación
+        const cached = await cache.match(request, { ignoreVary: true });
+        if (cached) return cached;
+        throw error;
+    }
+}
+
+// Background Sync: reenviar la cola aunque la pestaña esté en segundo plano
+self.addEventListener('sync', event => {
+    if (event.tag === GameEventQueue.SYNC_TAG) {
+        event.waitUntil(flushAndNotify().then(ok => {
+            // Si quedaron eventos, rechazar para que el navegador reintente el sync
+            if (!ok) throw new Error('Eventos pendientes');
+        }));
+    }
+});
+
+function flushAndNotify() {
+    return queue.flush();
+}
+
+queue.onDelivered(async (record, result) => {
+    const clients = await self.clients.matchAll({ includeUncontrolled: true, type: 'window' });
+    clients.forEach(client => client.postMessage({
+        type: 'evento-entregado',
+        id: record.id,
+        result
+    }));
+});
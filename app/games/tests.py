@@ -1,3 +1,265 @@
-from django.test import TestCase
+import json
+import re
+import time
+from io import StringIO
+from datetime import date, datetime, timezone
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.http import JsonResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from app.core.models import Cita, Nino, Profesional, ReporteIA
+from app.core.utils.metricas import RECHAZOS_LIMITE
+from app.games.models import Evaluacion, Juego, PruebaCognitiva, SesionJuego
+from app.games.utils import prediccion, rate_limit
+
+# Tras "SCAN" SQLite indica la tabla (o alias) que recorre entera
+ESCANEO_COMPLETO = re.compile(r'\bSCAN\b')
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN de SQLite')
+class PlanesConsultasCalientesTests(TestCase):
+    """
+    Las consultas de los caminos calientes deben resolverse con índices:
+    falla si el plan de alguna vuelve a recorrer una tabla completa.
+    """
+
+    def consultas(self):
+        inicio = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        fin = datetime(2025, 2, 1, tzinfo=timezone.utc)
+        return {
+            'sesiones por evaluación y estado': SesionJuego.objects.filter(
+                evaluacion_id=1, estado='completada'
+            ).order_by('ejercicio_numero'),
+            'siguiente ejercicio': SesionJuego.objects.filter(
+                evaluacion_id=1, ejercicio_numero=3
+            ),
+            'pruebas por evaluación y juego': PruebaCognitiva.objects.filter(
+                evaluacion_id=1, juego_id=1
+            ),
+            'prueba concreta': PruebaCognitiva.objects.filter(
+                evaluacion_id=1, juego_id=1, numero_prueba=2
+            ),
+            'pruebas de una evaluación': PruebaCognitiva.objects.filter(evaluacion_id=1),
+            'evaluaciones por niño y estado': Evaluacion.objects.filter(
+                nino_id=1, estado='completada'
+            ),
+            'historial de un niño': Evaluacion.objects.filter(nino_id=1),
+            'reportes por rango de fechas': ReporteIA.objects.filter(
+                fecha_generacion__gte=inicio, fecha_generacion__lte=fin
+            ),
+            'citas del día': Cita.objects.filter(usuario_id=1, fecha=date(2025, 1, 15)),
+            'citas pendientes': Cita.objects.filter(
+                usuario_id=1, fecha__gte=date(2025, 1, 15), fecha__lte=date(2025, 1, 16), completada=False
+            ),
+        }
+
+    def test_sin_escaneos_completos(self):
+        for nombre, queryset in self.consultas().items():
+            with self.subTest(consulta=nombre):
+                plan = queryset.explain()
+                self.assertIsNone(
+                    ESCANEO_COMPLETO.search(plan),
+                    f"'{nombre}' recorre una tabla completa:\n{plan}\n\n{queryset.query}"
+                )
+
+
+@override_settings(GAME_RATE_LIMIT_ENABLED=True)
+class LimitarTasaTests(TestCase):
+    """Contadores por ventana de las APIs de juego."""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+        @rate_limit.limitar_tasa(por_sesion=(2, 100), nombre='prueba')
+        def vista(request, url_sesion):
+            return JsonResponse({'success': True})
+        self.vista = vista
+
+    def llamar(self, url_sesion='abc'):
+        return self.vista(RequestFactory().post('/'), url_sesion=url_sesion)
+
+    def test_rechaza_al_superar_el_limite(self):
+        rechazos = RECHAZOS_LIMITE._valores.get(('prueba', 'sesion'), 0)
+        self.assertEqual(self.llamar().status_code, 200)
+        self.assertEqual(self.llamar().status_code, 200)
+        response = self.llamar()
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(RECHAZOS_LIMITE._valores[('prueba', 'sesion')], rechazos + 1)
+        # Otra sesión tiene su propio contador
+        self.assertEqual(self.llamar('otra').status_code, 200)
+
+    def test_nueva_ventana(self):
+        inicio = time.time() // 100 * 100
+        with mock.patch('app.games.utils.rate_limit.time.time', return_value=inicio):
+            self.llamar()
+            self.llamar()
+            self.assertEqual(self.llamar().status_code, 429)
+        with mock.patch('app.games.utils.rate_limit.time.time', return_value=inicio + 100):
+            self.assertEqual(self.llamar().status_code, 200)
+
+
+class PrediccionTrasCommitTests(TestCase):
+    """La predicción se ejecuta tras el commit del fin de juego y se puede reintentar."""
+
+    PREDECIR = 'app.games.ml_models.predictor.predecir_dislexia_desde_evaluacion'
+    LANZAR = 'app.games.utils.prediccion.lanzar_prediccion'
+    RESULTADO = {
+        'success': True,
+        'prediccion': {
+            'clasificacion': 'Sin riesgo', 'probabilidad': 0.2, 'probabilidad_porcentaje': 20,
+            'clasificacion_riesgo': 'Bajo', 'confianza_porcentaje': 80, 'recomendacion': '-',
+        },
+    }
+
+    def setUp(self):
+        profesional = Profesional.objects.create_user('prediccion', 'prediccion@example.com', 'x')
+        nino = Nino.objects.create(
+            profesional=profesional, nombres='Niño', apellidos='Prueba',
+            fecha_nacimiento=date(2016, 1, 1), edad=9, genero='M', idioma_nativo='es'
+        )
+        juego = Juego.objects.first() or Juego.objects.create(nombre='Juego', descripcion='-', categoria='visual')
+        self.evaluacion = Evaluacion.objects.create(nino=nino, fecha_hora_inicio=datetime.now(timezone.utc))
+        self.sesion = SesionJuego.crear_nueva_sesion(self.evaluacion, juego)
+
+    def finalizar(self):
+        # Como el cliente real: con client_seq (cola de IndexedDB)
+        return self.client.post(
+            f'/es/games/api/finish/{self.sesion.url_sesion}/',
+            data={'total_score': 10, 'total_correct': 1, 'total_incorrect': 0, 'client_seq': 7},
+            content_type='application/json', secure=True,
+        )
+
+    def test_prediccion_fuera_de_la_transaccion_y_reintento(self):
+        # El hilo de fondo se sustituye por una llamada directa
+        en_linea = mock.patch(self.LANZAR, side_effect=prediccion.ejecutar_prediccion)
+        with en_linea, mock.patch(self.PREDECIR, side_effect=RuntimeError('modelo no disponible')) as predecir:
+            with self.captureOnCommitCallbacks() as callbacks:
+                response = self.finalizar()
+                # Nada de inferencia mientras la transacción está abierta
+                predecir.assert_not_called()
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.json()['evaluacion_completada'])
+            for callback in callbacks:
+                callback()
+            predecir.assert_called_once_with(self.evaluacion.pk)
+
+        self.evaluacion.refresh_from_db()
+        self.assertEqual(self.evaluacion.estado, 'completada')
+        self.assertEqual(self.evaluacion.prediccion_estado, 'fallida')
+        self.assertFalse(ReporteIA.objects.filter(evaluacion=self.evaluacion).exists())
+
+        # Repetir la finalización (mismo client_seq) no congela el fallo: vuelve a intentarlo
+        with en_linea, mock.patch(self.PREDECIR, return_value=self.RESULTADO):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.finalizar()
+        self.assertEqual(response['X-Idempotent-Replay'], 'true')
+        self.evaluacion.refresh_from_db()
+        self.assertEqual(self.evaluacion.prediccion_estado, 'completada')
+        self.assertEqual(self.evaluacion.prediccion_intentos, 2)
+        self.assertTrue(ReporteIA.objects.filter(evaluacion=self.evaluacion).exists())
+        self.assertTrue(self.finalizar().json()['prediccion_realizada'])
+
+    @override_settings(PREDICCION_HILO=False)
+    def test_sin_hilo_la_recoge_el_comando(self):
+        with mock.patch(self.PREDECIR, return_value=self.RESULTADO) as predecir:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.finalizar()
+            self.assertFalse(response.json()['prediccion_realizada'])
+            predecir.assert_not_called()
+            self.evaluacion.refresh_from_db()
+            self.assertEqual(self.evaluacion.prediccion_estado, 'pendiente')
+
+            call_command('procesar_predicciones', stdout=StringIO())
+        self.evaluacion.refresh_from_db()
+        self.assertEqual(self.evaluacion.prediccion_estado, 'completada')
+
+    def test_comando_reintenta_fallidas(self):
+        Evaluacion.objects.filter(pk=self.evaluacion.pk).update(
+            estado='completada', prediccion_estado='fallida', prediccion_intentos=1
+        )
+        with mock.patch(self.PREDECIR, return_value=self.RESULTADO):
+            call_command('procesar_predicciones', stdout=StringIO())
+        self.evaluacion.refresh_from_db()
+        self.assertEqual(self.evaluacion.prediccion_estado, 'completada')
+        self.assertTrue(ReporteIA.objects.filter(evaluacion=self.evaluacion).exists())
+
+
+class CompactacionPruebasTests(TestCase):
+    """Cada prueba compactada queda en la sesión en la que se jugó."""
+
+    def setUp(self):
+        profesional = Profesional.objects.create_user('compactacion', 'compactacion@example.com', 'x')
+        nino = Nino.objects.create(
+            profesional=profesional, nombres='Niño', apellidos='Prueba',
+            fecha_nacimiento=date(2016, 1, 1), edad=9, genero='M', idioma_nativo='es'
+        )
+        self.juego = Juego.objects.first() or Juego.objects.create(nombre='Juego', descripcion='-', categoria='visual')
+        self.evaluacion = Evaluacion.objects.create(nino=nino, fecha_hora_inicio=datetime.now(timezone.utc))
+        # El mismo juego repetido en dos sesiones
+        self.primera = SesionJuego.crear_nueva_sesion(self.evaluacion, self.juego)
+        self.segunda = SesionJuego.crear_nueva_sesion(self.evaluacion, self.juego)
+
+    def prueba(self, numero, sesion, fecha):
+        prueba = PruebaCognitiva.objects.create(
+            evaluacion=self.evaluacion, juego=self.juego, sesion=sesion,
+            numero_prueba=numero, clics=1, aciertos=1, tiempo_respuesta_ms=1000 * numero
+        )
+        PruebaCognitiva.objects.filter(pk=prueba.pk).update(fecha_ejecucion=fecha)
+
+    def test_pruebas_en_su_sesion(self):
+        from app.games.utils.compactacion import compactar_evaluacion, pruebas_de_sesion
+
+        SesionJuego.objects.filter(pk=self.primera.pk).update(fecha_fin=datetime(2025, 1, 1, 10, 5, tzinfo=timezone.utc))
+        self.prueba(1, self.primera, datetime(2025, 1, 1, 10, 0, tzinfo=timezone.utc))
+        self.prueba(2, self.primera, datetime(2025, 1, 1, 10, 1, tzinfo=timezone.utc))
+        self.prueba(3, self.segunda, datetime(2025, 1, 1, 10, 10, tzinfo=timezone.utc))
+        # Prueba anterior a PruebaCognitiva.sesion: se asigna por fecha
+        self.prueba(4, None, datetime(2025, 1, 1, 10, 11, tzinfo=timezone.utc))
+
+        self.assertEqual(compactar_evaluacion(self.evaluacion.pk), 4)
+        self.assertFalse(PruebaCognitiva.objects.filter(evaluacion=self.evaluacion).exists())
+
+        self.primera.refresh_from_db()
+        self.segunda.refresh_from_db()
+        self.assertEqual([p.numero_prueba for p in pruebas_de_sesion(self.primera)], [1, 2])
+        self.assertEqual([p.numero_prueba for p in pruebas_de_sesion(self.segunda)], [3, 4])
+        self.assertEqual(self.primera.tiempo_respuesta_promedio_ms, 1500)
+        self.assertEqual(self.segunda.tiempo_respuesta_promedio_ms, 3500)
+
+
+class PrecargaPaginasTests(TestCase):
+    """La página de juego lista los ejercicios pendientes para el service worker."""
+
+    def setUp(self):
+        profesional = Profesional.objects.create_user('precarga', 'precarga@example.com', 'x')
+        nino = Nino.objects.create(
+            profesional=profesional, nombres='Niño', apellidos='Prueba',
+            fecha_nacimiento=date(2016, 1, 1), edad=9, genero='M', idioma_nativo='es'
+        )
+        juego = Juego.objects.first() or Juego.objects.create(nombre='Juego', descripcion='-', categoria='visual')
+        evaluacion = Evaluacion.objects.create(nino=nino, fecha_hora_inicio=datetime.now(timezone.utc))
+        self.sesiones = []
+        for numero in range(1, 4):
+            sesion = SesionJuego.crear_nueva_sesion(evaluacion, juego)
+            SesionJuego.objects.filter(pk=sesion.pk).update(ejercicio_numero=numero)
+            self.sesiones.append(sesion)
+        self.client.force_login(profesional)
+
+    def test_precarga_sin_registrar_entrada(self):
+        primera, segunda, tercera = self.sesiones
+        response = self.client.get(
+            f'/es/games/play/{segunda.url_sesion}/', secure=True, headers={'X-Precarga': '1'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            json.loads(response.context['paginas_siguientes_json']),
+            [f'/es/games/play/{primera.url_sesion}/', f'/es/games/play/{tercera.url_sesion}/'],
+        )
+        segunda.refresh_from_db()
+        self.assertIsNone(segunda.fecha_pausa)
@@ -0,0 +1,258 @@
+"""
+Compactación de las pruebas cognitivas de evaluaciones cerradas.
+
+Una vez completada, las filas de PruebaCognitiva de una evaluación sólo se
+leen para agregar los informes (SequentialResultsView, PDF del reporte,
+exportación GDPR), pero son la mayor parte de las filas e índices de games.
+Pasados PRUEBAS_COMPACTAR_DIAS desde el fin de la evaluación,
+`compactar_evaluacion` guarda cada prueba en la SesionJuego en la que se
+jugó (`pruebas_empaquetadas`) y borra las filas en la misma transacción.
+
+El bloque empaquetado es una cabecera `<BI` (versión, nº de pruebas)
+seguida de una columna de ancho fijo por campo (módulo `array`, little
+endian), en el orden de COLUMNAS. precision y tasa_error no se guardan:
+se derivan de clics/aciertos/errores igual que en PruebaCognitiva.save().
+
+Los lectores usan `pruebas_de_evaluacion`, que devuelve las filas que
+queden más las pruebas desempaquetadas, como instancias (sin guardar) de
+PruebaCognitiva.
+
+Uso:
+    python manage.py compactar_pruebas
+"""
+import logging
+import struct
+import sys
+from array import array
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from app.games.models import Evaluacion, PruebaCognitiva, SesionJuego
+
+logger = logging.getLogger('app.games')
+
+VERSION = 1
+CABECERA = struct.Struct('<BI')
+# (campo, typecode de array): enteros de 32 bits y la fecha en microsegundos
+COLUMNAS = [
+    ('numero_prueba', 'I'),
+    ('clics', 'I'),
+    ('aciertos', 'I'),
+    ('errores', 'I'),
+    ('puntaje', 'i'),
+    ('tiempo_respuesta_ms', 'I'),
+    ('fecha_ejecucion', 'q'),
+]
+EPOCA = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+UN_MICROSEGUNDO = timedelta(microseconds=1)
+DIAS_POR_DEFECTO = 30
+TAMANO_LOTE = 100
+
+
+def _a_microsegundos(fecha):
+    return (fecha - EPOCA) // UN_MICROSEGUNDO
+
+
+def empaquetar(registros):
+    """Empaqueta una lista de dicts con los campos de COLUMNAS."""
+    partes = [CABECERA.pack(VERSION, len(registros))]
+    for campo, tipo in COLUMNAS:
+        if campo == 'fecha_ejecucion':
+            valores = array(tipo, (_a_microsegundos(r[campo]) for r in registros))
+        else:
+            valores = array(tipo, (r[campo] for r in registros))
+        if sys.byteorder == 'big':
+            valores.byteswap()
+        partes.append(valores.tobytes())
+    return b''.join(partes)
+
+
+def desempaquetar(bloque):
+    """Inverso de `empaquetar`: lista de dicts ordenada como se guardó."""
+    if not bloque:
+        return []
+    bloque = bytes(bloque)
+    version, total = CABECERA.unpack_from(bloque)
+    if version != VERSION:
+        raise ValueError(f"Versión de bloque de pruebas desconocida: {version}")
+
+    columnas = {}
+    inicio = CABECERA.size
+    for campo, tipo in COLUMNAS:
+        valores = array(tipo)
+        fin = inicio + valores.itemsize * total
+        valores.frombytes(bloque[inicio:fin])
+        if sys.byteorder == 'big':
+            valores.byteswap()
+        columnas[campo] = valores
+        inicio = fin
+
+    columnas['fecha_ejecucion'] = [EPOCA + v * UN_MICROSEGUNDO for v in columnas['fecha_ejecucion']]
+    return [
+        {campo: columnas[campo][i] for campo, _ in COLUMNAS}
+        for i in range(total)
+    ]
+
+
+def pruebas_de_sesion(sesion):
+    """Pruebas compactadas de una sesión como PruebaCognitiva sin guardar."""
+    pruebas = []
+    for registro in desempaquetar(sesion.pruebas_empaquetadas):
+        prueba = PruebaCognitiva(
+            evaluacion_id=sesion.evaluacion_id, juego_id=sesion.juego_id, sesion_id=sesion.pk, **registro
+        )
+        if 'juego' in sesion._state.fields_cache:
+            prueba.juego = sesion.juego
+        if prueba.clics > 0:
+            prueba.precision = Decimal(prueba.aciertos * 100 / prueba.clics).quantize(Decimal('0.01'))
+            prueba.tasa_error = Decimal(prueba.errores * 100 / prueba.clics).quantize(Decimal('0.01'))
+        pruebas.append(prueba)
+    return pruebas
+
+
+def sesiones_compactadas(**filtros):
+    """SesionJuego con pruebas empaquetadas (y su juego) que cumplen `filtros`."""
+    return SesionJuego.objects.filter(
+        fecha_compactacion__isnull=False, **filtros
+    ).select_related('juego').order_by('pk')
+
+
+def pruebas_de_evaluacion(evaluacion):
+    """
+    Todas las pruebas cognitivas de la evaluación, estén en filas o
+    compactadas, ordenadas por número de prueba.
+    """
+    pruebas = list(PruebaCognitiva.objects.filter(evaluacion=evaluacion).select_related('juego'))
+    for sesion in sesiones_compactadas(evaluacion=evaluacion):
+        pruebas.extend(pruebas_de_sesion(sesion))
+    pruebas.sort(key=lambda p: (p.numero_prueba, p.juego_id))
+    return pruebas
+
+
+def estadisticas_por_juego(pruebas):
+    """
+    Totales por juego con las mismas claves que el antiguo
+    values('juego__...').annotate(...) del reporte PDF.
+    """
+    por_juego = OrderedDict()
+    for prueba in sorted(pruebas, key=lambda p: p.juego.nombre):
+        fila = por_juego.setdefault(prueba.juego_id, {
+            'juego__nombre': prueba.juego.nombre,
+            'juego__dificultad': prueba.juego.dificultad,
+            'juego__color_tema': prueba.juego.color_tema,
+            'total_aciertos': 0,
+            'total_errores': 0,
+            'total_puntaje': 0,
+            'total_clics': 0,
+            'suma_precision': Decimal('0'),
+            'veces_jugado': 0,
+        })
+        fila['total_aciertos'] += prueba.aciertos
+        fila['total_errores'] += prueba.errores
+        fila['total_puntaje'] += prueba.puntaje
+        fila['total_clics'] += prueba.clics
+        fila['suma_precision'] += Decimal(prueba.precision)
+        fila['veces_jugado'] += 1
+
+    estadisticas = []
+    for fila in por_juego.values():
+        fila['avg_precision'] = fila.pop('suma_precision') / fila['veces_jugado']
+        estadisticas.append(fila)
+    return estadisticas
+
+
+def evaluaciones_compactables(dias=None):
+    """Evaluaciones completadas hace más de `dias` que aún tienen filas de pruebas."""
+    if dias is None:
+        dias = getattr(settings, 'PRUEBAS_COMPACTAR_DIAS', DIAS_POR_DEFECTO)
+    limite = timezone.now() - timedelta(days=dias)
+    return Evaluacion.objects.filter(
+        estado='completada',
+        fecha_hora_fin__lt=limite,
+    ).filter(Exists(PruebaCognitiva.objects.filter(evaluacion=OuterRef('pk'))))
+
+
+def _sesion_por_fecha(sesiones, fecha):
+    """
+    Sesión de una prueba anterior a PruebaCognitiva.sesion: la primera (de
+    su juego) que terminó después de ejecutarla, o la que sigue abierta.
+    """
+    terminadas = sorted((s for s in sesiones if s.fecha_fin), key=lambda s: (s.fecha_fin, s.pk))
+    for sesion in terminadas:
+        if sesion.fecha_fin >= fecha:
+            return sesion
+    abiertas = [s for s in sesiones if not s.fecha_fin]
+    if abiertas:
+        return abiertas[0]
+    return terminadas[-1] if terminadas else None
+
+
+def compactar_evaluacion(evaluacion_id):
+    """
+    Empaqueta cada prueba de la evaluación en la sesión en la que se jugó y
+    borra las filas, todo en una transacción. Las pruebas sin sesión se
+    dejan como están.
+
+    Returns:
+        Número de pruebas compactadas
+    """
+    campos = [campo for campo, _ in COLUMNAS]
+    with transaction.atomic():
+        filas = list(
+            PruebaCognitiva.objects.filter(evaluacion_id=evaluacion_id)
+            .order_by('numero_prueba')
+            .values('pk', 'juego_id', 'sesion_id', *campos)
+        )
+        if not filas:
+            return 0
+
+        sesiones = {}
+        sesiones_por_juego = {}
+        for sesion in SesionJuego.objects.select_for_update().filter(
+            evaluacion_id=evaluacion_id
+        ).order_by('pk'):
+            sesiones[sesion.pk] = sesion
+            sesiones_por_juego.setdefault(sesion.juego_id, []).append(sesion)
+
+        por_sesion = {}
+        for fila in filas:
+            sesion = sesiones.get(fila['sesion_id'])
+            if sesion is None:
+                sesion = _sesion_por_fecha(sesiones_por_juego.get(fila['juego_id'], []), fila['fecha_ejecucion'])
+            if sesion is None:
+                logger.warning(f"⚠️ Evaluación {evaluacion_id}: prueba {fila['numero_prueba']} del juego {fila['juego_id']} sin sesión, no se compacta")
+                continue
+            por_sesion.setdefault(sesion.pk, []).append(fila)
+
+        ahora = timezone.now()
+        compactadas = []
+        for sesion_id, grupo in por_sesion.items():
+            sesion = sesiones[sesion_id]
+            # Una compactación anterior de la misma sesión se conserva; las filas mandan
+            registros = {r['numero_prueba']: r for r in desempaquetar(sesion.pruebas_empaquetadas)}
+            registros.update((fila['numero_prueba'], fila) for fila in grupo)
+            registros = [registros[numero] for numero in sorted(registros)]
+
+            sesion.pruebas_empaquetadas = empaquetar(registros)
+            sesion.pruebas_compactadas = len(registros)
+            sesion.tiempo_respuesta_promedio_ms = round(
+                sum(r['tiempo_respuesta_ms'] for r in registros) / len(registros)
+            )
+            sesion.fecha_compactacion = ahora
+            sesion.save(update_fields=[
+                'pruebas_empaquetadas', 'pruebas_compactadas',
+                'tiempo_respuesta_promedio_ms', 'fecha_compactacion',
+            ])
+            compactadas.extend(fila['pk'] for fila in grupo)
+
+        if compactadas:
+            PruebaCognitiva.objects.filter(pk__in=compactadas).delete()
+
+    logger.info(f"🗜️ Evaluación {evaluacion_id}: {len(compactadas)} pruebas compactadas")
+    return len(compactadas)
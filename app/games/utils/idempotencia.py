@@ -0,0 +1,102 @@
+"""
+Manejo idempotente de los eventos enviados por el cliente de juego.
+
+El navegador encola en IndexedDB cada respuesta, nivel completado y fin
+de juego con un número de secuencia (`client_seq`) y los reenvía en orden
+cuando vuelve la conexión. Un mismo evento puede llegar varias veces
+(reintentos, service worker y página reenviando a la vez), así que cada
+evento se registra por (url_sesion, question_id, client_seq) y un
+reenvío devuelve la respuesta almacenada sin volver a aplicarlo. El fin de
+juego no pasa por aquí: finish_game_session guarda su propia respuesta en
+la sesión.
+"""
+import json
+import logging
+from functools import wraps
+
+from django.db import IntegrityError, transaction
+from django.http import JsonResponse
+
+from app.games.models import EventoCliente, SesionJuego
+
+logger = logging.getLogger('app.games')
+
+
+def _respuesta_repetida(evento):
+    response = JsonResponse(evento.respuesta, status=evento.codigo_estado)
+    response['X-Idempotent-Replay'] = 'true'
+    return response
+
+
+def evento_idempotente(tipo):
+    """
+    Decorador para vistas JSON que reciben eventos del cliente de juego.
+
+    Si la petición no trae `client_seq` (en el cuerpo o como cabecera
+    numérica Idempotency-Key) la vista se ejecuta normalmente
+    (compatibilidad con clientes antiguos). Si lo trae:
+      - un evento ya registrado devuelve su respuesta almacenada;
+      - uno nuevo se procesa en una transacción junto con su registro,
+        de modo que o se aplican ambos o ninguno. Las respuestas de error
+        no se registran y el cliente puede reintentar.
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            try:
+                data = json.loads(request.body or b'{}')
+            except (ValueError, UnicodeDecodeError):
+                return vista(request, *args, **kwargs)
+
+            # La clave puede venir en el cuerpo o en la cabecera Idempotency-Key
+            client_seq = data.get('client_seq', request.headers.get('Idempotency-Key'))
+            url_sesion = kwargs.get('url_sesion') or data.get('session_url')
+            if client_seq is None or not str(client_seq).isdigit() or not url_sesion:
+                return vista(request, *args, **kwargs)
+
+            sesion_id = (
+                SesionJuego.objects.filter(url_sesion=url_sesion)
+                .values_list('id', flat=True)
+                .first()
+            )
+            if sesion_id is None:
+                return vista(request, *args, **kwargs)
+
+            clave = {
+                'sesion_id': sesion_id,
+                'question_id': int(data.get('question_id') or 0),
+                'client_seq': int(client_seq),
+            }
+
+            previo = EventoCliente.objects.filter(**clave).first()
+            if previo:
+                logger.info(f"🔁 Evento repetido {tipo} #{client_seq} en {url_sesion}")
+                return _respuesta_repetida(previo)
+
+            try:
+                with transaction.atomic():
+                    # Reservar la clave antes de aplicar el evento: un reenvío
+                    # concurrente choca con la restricción única
+                    evento = EventoCliente.objects.create(tipo=tipo, **clave)
+                    response = vista(request, *args, **kwargs)
+
+                    if not 200 <= response.status_code < 300:
+                        transaction.set_rollback(True)
+                        return response
+
+                    try:
+                        evento.respuesta = json.loads(response.content)
+                    except ValueError:
+                        evento.respuesta = {}
+                    evento.codigo_estado = response.status_code
+                    evento.save(update_fields=['respuesta', 'codigo_estado'])
+                    return response
+
+            except IntegrityError:
+                previo = EventoCliente.objects.filter(**clave).first()
+                if previo:
+                    return _respuesta_repetida(previo)
+                raise
+
+        return envoltura
+    return decorador
@@ -0,0 +1,124 @@
+"""
+Línea de tiempo de respuestas de cada sesión de juego.
+
+PruebaCognitiva guarda una fila por pregunta y sólo el tiempo de la
+primera respuesta. Para tener el tiempo de cada clic sin una fila por
+evento, SesionJuego.linea_tiempo guarda registros de ancho fijo
+(REGISTRO: pregunta, ms, correcta; 9 bytes, little endian) uno tras otro:
+
+- `registrar_respuesta` añade un registro bajo select_for_update (lo
+  llama save_question_response). Lee y reescribe el bloque entero, así
+  que cada respuesta cuesta O(n) en el tamaño de la línea: asumible porque
+  una sesión tiene pocas decenas de respuestas (9 bytes cada una). Un
+  append en la propia BD no es portable: SQLite convierte en texto los
+  BLOB concatenados con || y CONCAT de SQL Server devuelve texto;
+- `LineaTiempo` acumula sobre un bytearray y lee los registros como array
+  estructurado de NumPy con np.frombuffer;
+- `guardar_estadisticas` calcula al finalizar la sesión la mediana, el
+  rango intercuartílico y el porcentaje de respuestas lentas (por encima
+  de Q3 + FACTOR_LENTAS * IQR) y los guarda en la sesión.
+"""
+import struct
+
+import numpy as np
+from django.db import transaction
+
+from app.games.models import SesionJuego
+
+REGISTRO = struct.Struct('<IIB')
+DTYPE = np.dtype([('pregunta', '<u4'), ('ms', '<u4'), ('correcta', 'u1')])
+MAX_UINT32 = 2 ** 32 - 1
+FACTOR_LENTAS = 1.5
+CAMPOS_ESTADISTICAS = [
+    'tiempo_respuesta_mediana_ms',
+    'tiempo_respuesta_iqr_ms',
+    'porcentaje_respuestas_lentas',
+]
+
+
+def _acotar(valor):
+    return min(max(int(valor or 0), 0), MAX_UINT32)
+
+
+class LineaTiempo:
+    """Registros (pregunta, ms, correcta) empaquetados en un bytearray."""
+
+    def __init__(self, bloque=None):
+        self._datos = bytearray(bloque or b'')
+
+    def __len__(self):
+        return len(self._datos) // REGISTRO.size
+
+    def __bytes__(self):
+        return bytes(self._datos)
+
+    def agregar(self, pregunta, ms, correcta):
+        self._datos += REGISTRO.pack(_acotar(pregunta), _acotar(ms), 1 if correcta else 0)
+
+    def como_array(self):
+        """Array estructurado de NumPy (dtype DTYPE) con los registros."""
+        # Sobre una copia: una vista bloquearía el bytearray para agregar
+        return np.frombuffer(bytes(self._datos), dtype=DTYPE, count=len(self))
+
+
+def registrar_respuesta(sesion_id, pregunta, ms, correcta):
+    """
+    Añade una respuesta a la línea de tiempo de la sesión. Reescribe el
+    bloque completo (O(n) por respuesta, ver la cabecera del módulo).
+    """
+    with transaction.atomic():
+        bloque = SesionJuego.objects.select_for_update().filter(
+            pk=sesion_id
+        ).values_list('linea_tiempo', flat=True).first()
+        linea = LineaTiempo(bloque)
+        linea.agregar(pregunta, ms, correcta)
+        SesionJuego.objects.filter(pk=sesion_id).update(linea_tiempo=bytes(linea))
+    return len(linea)
+
+
+def estadisticas(linea):
+    """
+    Resumen de los tiempos de respuesta de una LineaTiempo.
+
+    Returns:
+        dict con respuestas, mediana_ms, p25_ms, p75_ms, iqr_ms,
+        porcentaje_lentas, mediana_aciertos_ms y mediana_errores_ms
+        (None si no hay respuestas)
+    """
+    registros = linea.como_array()
+    if not len(registros):
+        return None
+
+    ms = registros['ms'].astype(np.float64)
+    p25, mediana, p75 = np.percentile(ms, [25, 50, 75])
+    iqr = p75 - p25
+    lentas = np.count_nonzero(ms > p75 + FACTOR_LENTAS * iqr)
+    aciertos = registros['correcta'].astype(bool)
+
+    return {
+        'respuestas': int(len(ms)),
+        'mediana_ms': float(mediana),
+        'p25_ms': float(p25),
+        'p75_ms': float(p75),
+        'iqr_ms': float(iqr),
+        'porcentaje_lentas': float(lentas * 100 / len(ms)),
+        'mediana_aciertos_ms': float(np.median(ms[aciertos])) if aciertos.any() else None,
+        'mediana_errores_ms': float(np.median(ms[~aciertos])) if not aciertos.all() else None,
+    }
+
+
+def guardar_estadisticas(sesion):
+    """
+    Calcula las estadísticas de la línea de tiempo de la sesión y las
+    guarda en sus campos (CAMPOS_ESTADISTICAS). Devuelve el dict de
+    `estadisticas` o None si la sesión no tiene respuestas.
+    """
+    resumen = estadisticas(LineaTiempo(sesion.linea_tiempo))
+    if resumen is None:
+        return None
+
+    sesion.tiempo_respuesta_mediana_ms = round(resumen['mediana_ms'])
+    sesion.tiempo_respuesta_iqr_ms = round(resumen['iqr_ms'])
+    sesion.porcentaje_respuestas_lentas = round(resumen['porcentaje_lentas'], 2)
+    sesion.save(update_fields=CAMPOS_ESTADISTICAS)
+    return resumen
@@ -0,0 +1,179 @@
+"""
+Predicción de dislexia de una evaluación completada, fuera de la
+transacción que la completa.
+
+La carga del modelo y la inferencia con Keras pueden tardar segundos.
+Dentro de la transacción de fin de juego (tras el select_for_update de la
+sesión y los UPDATE de Evaluacion y Nino) mantendrían el bloqueo de
+escritura de SQLite y bloquearían a los lectores en SQL Server, y un error
+dejaba la evaluación completada sin reporte y sin forma de reintentarlo.
+Por eso:
+
+- `completar_evaluacion` deja `prediccion_estado='pendiente'` en el mismo
+  UPDATE que cierra la evaluación;
+- `programar_prediccion` la lanza con transaction.on_commit, ya sin
+  bloqueos, en un hilo de fondo del proceso web (PREDICCION_HILO), de modo
+  que la respuesta de fin de juego no espera a la inferencia;
+- `ejecutar_prediccion` la reclama con un UPDATE condicional
+  ('procesando'), guarda el ReporteIA y la deja 'completada' o 'fallida';
+- una finalización repetida vuelve a programarla, y
+  `python manage.py procesar_predicciones` reintenta las pendientes, las
+  fallidas (hasta MAX_INTENTOS) y las que llevan más de
+  BLOQUEO_EXPIRA_MINUTOS 'procesando' (el proceso murió a mitad). Con
+  PREDICCION_HILO desactivado ese comando (--loop) es el único que predice.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from app.core.models import ReporteIA
+from app.core.utils.trazas import span
+from app.games.models import Evaluacion
+
+logger = logging.getLogger('app.games')
+
+MAX_INTENTOS = getattr(settings, 'PREDICCION_MAX_INTENTOS', 5)
+# Una predicción 'procesando' más tiempo que esto se considera abandonada
+BLOQUEO_EXPIRA_MINUTOS = 15
+
+# Un solo hilo: las inferencias de Keras no se solapan dentro del proceso
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='prediccion')
+
+
+def reintentables():
+    """Evaluaciones cuya predicción puede (volver a) ejecutarse ahora."""
+    expirado = timezone.now() - timedelta(minutes=BLOQUEO_EXPIRA_MINUTOS)
+    return Evaluacion.objects.filter(
+        Q(prediccion_estado='pendiente')
+        | Q(prediccion_estado='fallida', prediccion_intentos__lt=MAX_INTENTOS)
+        | Q(prediccion_estado='procesando', prediccion_fecha__lt=expirado)
+    )
+
+
+def reclamar(evaluacion_id):
+    """Pasa la predicción a 'procesando'. Sólo una petición o comando la obtiene."""
+    return bool(reintentables().filter(pk=evaluacion_id).update(
+        prediccion_estado='procesando',
+        prediccion_fecha=timezone.now(),
+        prediccion_intentos=F('prediccion_intentos') + 1,
+    ))
+
+
+def _guardar_reporte(evaluacion, resultado):
+    pred = resultado['prediccion']
+
+    # Características en formato JSON
+    caracteristicas_json = {
+        'total_sesiones': evaluacion.sesiones_totales,
+        'accuracy_promedio': float(evaluacion.precision_promedio),
+        'total_clicks': evaluacion.total_clics,
+        'total_aciertos': evaluacion.total_aciertos,
+        'total_errores': evaluacion.total_errores,
+        'duracion_minutos': evaluacion.duracion_total_minutos,
+        'modelo_version': resultado.get('modelo_info', {}).get('version', 'v2.2'),
+        'umbral_utilizado': pred.get('umbral_utilizado', 0.5)
+    }
+
+    # Métricas relevantes
+    metricas_relevantes = {
+        'probabilidad': pred['probabilidad'],
+        'probabilidad_porcentaje': pred['probabilidad_porcentaje'],
+        'confianza': pred.get('confianza', 0),
+        'confianza_porcentaje': pred.get('confianza_porcentaje', 0),
+        'nivel_riesgo': pred['clasificacion_riesgo'],
+        'simulacion': pred.get('simulacion', False)
+    }
+
+    with span('reporte_ia.guardar', 'db', evaluacion=evaluacion.id):
+        reporte, created = ReporteIA.objects.update_or_create(
+            evaluacion=evaluacion,
+            defaults={
+                'indice_riesgo': pred['probabilidad'] * 100,  # Convertir a escala 0-100
+                'clasificacion_riesgo': pred['clasificacion_riesgo'],
+                'confianza_prediccion': int(pred.get('confianza_porcentaje', 60)),
+                'caracteristicas_json': caracteristicas_json,
+                'recomendaciones': pred['recomendacion'],
+                'metricas_relevantes': metricas_relevantes
+            }
+        )
+    logger.info(f"✅ ReporteIA {'creado' if created else 'actualizado'} con ID: {reporte.id}")
+    return reporte
+
+
+def ejecutar_prediccion(evaluacion_id):
+    """
+    Ejecuta la predicción de la evaluación si está por hacer y guarda su
+    ReporteIA. No debe llamarse dentro de una transacción.
+
+    Returns:
+        True si la predicción se completó en esta llamada
+    """
+    from app.games.ml_models.predictor import predecir_dislexia_desde_evaluacion
+
+    if not reclamar(evaluacion_id):
+        return False
+
+    logger.info(f"🤖 Iniciando predicción de dislexia de la evaluación {evaluacion_id}")
+    try:
+        resultado = predecir_dislexia_desde_evaluacion(evaluacion_id)
+        if not resultado['success']:
+            raise RuntimeError(resultado.get('error', 'Error desconocido'))
+
+        pred = resultado['prediccion']
+        logger.info(
+            f"✅ Predicción exitosa: {pred['clasificacion']} "
+            f"({pred['probabilidad_porcentaje']}%, riesgo {pred['clasificacion_riesgo']})"
+        )
+        with transaction.atomic():
+            _guardar_reporte(Evaluacion.objects.get(pk=evaluacion_id), resultado)
+            Evaluacion.objects.filter(pk=evaluacion_id).update(prediccion_estado='completada', prediccion_error='')
+        return True
+
+    except Exception as e:
+        logger.exception(f"❌ Error en la predicción de la evaluación {evaluacion_id}: {e}")
+        Evaluacion.objects.filter(pk=evaluacion_id).update(prediccion_estado='fallida', prediccion_error=str(e)[:2000])
+        return False
+
+
+def _ejecutar_en_hilo(evaluacion_id):
+    try:
+        ejecutar_prediccion(evaluacion_id)
+    finally:
+        # Las conexiones a BD son por hilo: cerrar las de este hilo
+        connections.close_all()
+
+
+def lanzar_prediccion(evaluacion_id):
+    """
+    Ejecuta la predicción en un hilo de fondo del proceso web. Si
+    PREDICCION_HILO está desactivado la recoge `procesar_predicciones`.
+    """
+    if getattr(settings, 'PREDICCION_HILO', True):
+        _executor.submit(_ejecutar_en_hilo, evaluacion_id)
+
+
+def programar_prediccion(evaluacion_id):
+    """Lanza la predicción cuando se confirme la transacción actual."""
+    transaction.on_commit(lambda: lanzar_prediccion(evaluacion_id))
+
+
+def procesar_pendientes(limite=None):
+    """
+    Reintenta las predicciones pendientes, fallidas o abandonadas.
+
+    Returns:
+        dict con 'completadas' y 'fallidas'
+    """
+    total = {'completadas': 0, 'fallidas': 0}
+    ids = reintentables().order_by('fecha_hora_fin').values_list('pk', flat=True)
+    for evaluacion_id in list(ids[:limite] if limite else ids):
+        if ejecutar_prediccion(evaluacion_id):
+            total['completadas'] += 1
+        elif Evaluacion.objects.filter(pk=evaluacion_id, prediccion_estado='fallida').exists():
+            total['fallidas'] += 1
+    return total
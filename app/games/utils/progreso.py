@@ -0,0 +1,134 @@
+"""
+Progreso de una evaluación guardado en la propia Evaluacion.
+
+Cada fin de ejercicio necesitaba contar las sesiones de la evaluación
+(totales y completadas) y buscar la siguiente pendiente. En su lugar,
+Evaluacion lleva `sesiones_totales`, `sesiones_completadas` y
+`siguiente_ejercicio`:
+
+- `SesionJuego.crear_nueva_sesion` suma la sesión con F() al crearla;
+- `registrar_completada` pasa la sesión a 'completada' con un UPDATE
+  condicional y, sólo si la transición ocurre de verdad (no en un
+  reenvío), suma la completada con F() y avanza `siguiente_ejercicio`,
+  todo dentro de la transacción del llamador;
+- `recalcular_progreso` lo rehace desde SesionJuego (creación en bloque
+  y comando verificar_progreso).
+
+`completar_evaluacion` cierra la evaluación con otro UPDATE condicional,
+de modo que la predicción se lanza una sola vez aunque lleguen varias
+peticiones de fin a la vez.
+
+Con ello el camino caliente lee el progreso con una sola consulta por
+clave primaria y la siguiente sesión por (evaluacion, ejercicio_numero).
+"""
+import logging
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from app.core.utils.consultas import subconsulta_agregada
+from app.games.models import Evaluacion, SesionJuego
+
+logger = logging.getLogger('app.games')
+
+CAMPOS = ['sesiones_totales', 'sesiones_completadas', 'siguiente_ejercicio']
+
+
+def _siguiente_pendiente():
+    """Subconsulta: primer ejercicio sin completar de la evaluación."""
+    pendientes = SesionJuego.objects.filter(
+        evaluacion=OuterRef('pk'), ejercicio_numero__isnull=False
+    ).exclude(estado='completada').order_by('ejercicio_numero')
+    return Subquery(pendientes.values('ejercicio_numero')[:1])
+
+
+def expresiones():
+    """Valores de los campos de progreso calculados desde SesionJuego."""
+    sesiones = SesionJuego.objects.all()
+    return {
+        'sesiones_totales': Coalesce(subconsulta_agregada(sesiones, 'evaluacion', Count('pk')), 0),
+        'sesiones_completadas': Coalesce(subconsulta_agregada(
+            sesiones.filter(estado='completada'), 'evaluacion', Count('pk')
+        ), 0),
+        'siguiente_ejercicio': _siguiente_pendiente(),
+    }
+
+
+def recalcular_progreso(evaluaciones):
+    """
+    Recalcula el progreso de `evaluaciones` (queryset o ID) con un UPDATE.
+    Devuelve el número de evaluaciones actualizadas.
+    """
+    if not hasattr(evaluaciones, 'update'):
+        evaluaciones = Evaluacion.objects.filter(pk=evaluaciones)
+    return evaluaciones.update(**expresiones())
+
+
+def registrar_completada(sesion):
+    """
+    Marca la sesión como completada y actualiza el progreso de su
+    evaluación en la misma transacción.
+
+    Returns:
+        True si la sesión acaba de completarse; False si ya lo estaba
+    """
+    with transaction.atomic():
+        transicion = SesionJuego.objects.filter(pk=sesion.pk).exclude(
+            estado='completada'
+        ).update(estado='completada')
+        sesion.estado = 'completada'
+        if transicion:
+            Evaluacion.objects.filter(pk=sesion.evaluacion_id).update(
+                sesiones_completadas=F('sesiones_completadas') + 1,
+                siguiente_ejercicio=_siguiente_pendiente(),
+            )
+    return bool(transicion)
+
+
+def completar_evaluacion(evaluacion, **campos):
+    """
+    Pasa la evaluación de 'en_proceso' a 'completada' con un UPDATE
+    condicional (todas sus sesiones completadas). Entre peticiones
+    concurrentes sólo una obtiene True: es la que debe lanzar la predicción.
+
+    Args:
+        campos: otros campos a fijar en la misma sentencia (p. ej. duración)
+    """
+    from app.core.utils.resumen_nino import actualizar_resumen
+
+    ahora = timezone.now()
+    hecho = Evaluacion.objects.filter(
+        pk=evaluacion.pk,
+        estado='en_proceso',
+        sesiones_completadas__gte=F('sesiones_totales'),
+    ).update(estado='completada', fecha_hora_fin=ahora, **campos)
+    if not hecho:
+        return False
+
+    evaluacion.estado = 'completada'
+    evaluacion.fecha_hora_fin = ahora
+    for campo, valor in campos.items():
+        setattr(evaluacion, campo, valor)
+    # update() no emite post_save: mantener el resumen del niño aquí
+    actualizar_resumen(evaluacion.nino_id)
+    logger.info(f"✅ Evaluación {evaluacion.pk} completada")
+    return True
+
+
+def leer_progreso(evaluacion):
+    """Refresca los campos de progreso de `evaluacion` (una consulta por PK)."""
+    evaluacion.refresh_from_db(fields=CAMPOS)
+    return evaluacion
+
+
+def siguiente_sesion(evaluacion):
+    """Siguiente sesión pendiente según `siguiente_ejercicio`, o None."""
+    sesiones = SesionJuego.objects.select_related('juego').filter(evaluacion=evaluacion)
+    if evaluacion.siguiente_ejercicio is not None:
+        return sesiones.filter(ejercicio_numero=evaluacion.siguiente_ejercicio).first()
+    if evaluacion.sesiones_completadas < evaluacion.sesiones_totales:
+        # Sesiones sueltas sin número de ejercicio (juego individual)
+        return sesiones.exclude(estado='completada').order_by('fecha_inicio').first()
+    return None
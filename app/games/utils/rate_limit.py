@@ -0,0 +1,130 @@
+"""
+Limitación de tasa (ventana fija) para las APIs de juego.
+
+Las APIs que reciben eventos del cliente de juego son `csrf_exempt` y en su
+mayoría no exigen login: un cliente defectuoso o un bucle de reintentos
+puede inundarlas de escrituras. El decorador `limitar_tasa` aplica, antes
+de tocar la base de datos, un contador por URL de sesión y otro por IP,
+guardados en la caché compartida:
+
+- cada contador admite un número de peticiones por ventana de N segundos;
+  la clave lleva el número de ventana, así que caduca sola (TTL = ventana);
+- se incrementa con `cache.incr`, atómico en Redis, de modo que peticiones
+  simultáneas del mismo cliente (p. ej. un aula detrás de un NAT) cuentan
+  todas sin cerrojos ni esperas: dos viajes a la caché por contador;
+- si algún contador supera su límite se responde 429 con `Retry-After`
+  hasta el fin de la ventana.
+
+La caché tiene que ser compartida entre procesos y no ser la de base de
+datos, donde `incr` no es atómico y cada petición serían varias consultas
+(comprobaciones core.E001 y core.E002).
+
+Los límites se declaran en cada vista y las peticiones rechazadas se
+cuentan por vista y ámbito en la métrica dislexia_rate_limit_rechazos_total
+(app/core/utils/metricas.py).
+"""
+import hashlib
+import json
+import logging
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse
+
+from app.core.middleware.audit_middleware import get_client_ip
+from app.core.utils.metricas import RECHAZOS_LIMITE
+
+logger = logging.getLogger('app.games')
+
+_PREFIJO = 'rate_limit'
+
+
+def _clave_contador(vista, ambito, valor):
+    digest = hashlib.md5(str(valor).encode('utf-8')).hexdigest()
+    return f'{_PREFIJO}:{vista}:{ambito}:{digest}'
+
+
+def _url_sesion(request, kwargs):
+    """URL de sesión de la ruta, del cuerpo JSON o del formulario."""
+    if kwargs.get('url_sesion'):
+        return kwargs['url_sesion']
+    if request.content_type == 'application/json':
+        try:
+            return json.loads(request.body or b'{}').get('session_url')
+        except (ValueError, UnicodeDecodeError, AttributeError):
+            return None
+    return request.POST.get('session_url')
+
+
+def _incrementar(clave, ttl):
+    """Suma una petición al contador y devuelve el total de la ventana."""
+    try:
+        return cache.incr(clave)
+    except ValueError:
+        # Primera petición de la ventana; si otra se adelantó, sumar a la suya
+        if cache.add(clave, 1, ttl):
+            return 1
+        try:
+            return cache.incr(clave)
+        except ValueError:
+            return 1
+
+
+def _respuesta_limitada(espera):
+    segundos = max(1, math.ceil(espera))
+    response = JsonResponse({
+        'success': False,
+        'error': 'Demasiadas peticiones. Inténtalo de nuevo en unos segundos.',
+        'retry_after': segundos,
+    }, status=429)
+    response['Retry-After'] = str(segundos)
+    return response
+
+
+def limitar_tasa(por_sesion=None, por_ip=None, nombre=None):
+    """
+    Decorador de limitación de tasa para vistas de API.
+
+    Args:
+        por_sesion: (peticiones, segundos) por URL de sesión
+        por_ip: (peticiones, segundos) por IP del cliente
+        nombre: nombre de la vista en los contadores (por defecto, la función)
+
+    Ejemplo:
+        @limitar_tasa(por_sesion=(20, 10), por_ip=(200, 10))
+    """
+    def decorador(vista):
+        nombre_vista = nombre or vista.__name__
+
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            if not getattr(settings, 'GAME_RATE_LIMIT_ENABLED', True):
+                return vista(request, *args, **kwargs)
+
+            contadores = []
+            if por_sesion:
+                url_sesion = _url_sesion(request, kwargs)
+                if url_sesion:
+                    contadores.append(('sesion', _clave_contador(nombre_vista, 'sesion', url_sesion), *por_sesion))
+            if por_ip:
+                contadores.append(('ip', _clave_contador(nombre_vista, 'ip', get_client_ip(request)), *por_ip))
+
+            ahora = time.time()
+            for ambito, clave, limite, segundos in contadores:
+                ventana = int(ahora // segundos)
+                if _incrementar(f'{clave}:{ventana}', segundos + 1) > limite:
+                    espera = (ventana + 1) * segundos - ahora
+                    RECHAZOS_LIMITE.inc(vista=nombre_vista, ambito=ambito)
+                    logger.warning(
+                        f"🚦 {nombre_vista}: petición limitada por {ambito} "
+                        f"(IP {get_client_ip(request)}, reintentar en {espera:.1f}s)"
+                    )
+                    return _respuesta_limitada(espera)
+
+            return vista(request, *args, **kwargs)
+
+        return envoltura
+    return decorador
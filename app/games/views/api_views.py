@@ -6,9 +6,14 @@ from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from app.games.models import Juego, SesionJuego, Evaluacion, PruebaCognitiva
 from app.core.models import Nino
+from app.games.utils.idempotencia import evento_idempotente
+from app.games.utils.linea_tiempo import registrar_respuesta
+from app.games.utils.rate_limit import limitar_tasa
 
 @csrf_exempt
 @require_http_methods(["POST"])
+@limitar_tasa(por_sesion=(30, 10), por_ip=(300, 10))
+@evento_idempotente('question_response')
 def save_question_response(request):
     """API endpoint para guardar la respuesta a una pregunta específica"""
     try:
@@ -54,6 +59,7 @@ def save_question_response(request):
             prueba = PruebaCognitiva.objects.create(
                 evaluacion=sesion.evaluacion,
                 juego=sesion.juego,
+                sesion=sesion,
                 numero_prueba=question_id,
                 clics=1,
                 aciertos=1 if is_correct else 0,
@@ -62,12 +68,15 @@ def save_question_response(request):
                 tiempo_respuesta_ms=response_time_ms
             )
             created = True
+
+        # Cada respuesta, también las repetidas, en la línea de tiempo de la sesión
+        registrar_respuesta(sesion.pk, question_id, response_time_ms, is_correct)
         
         # Actualizar estadísticas de la sesión
         sesion.puntaje_total += points_earned if is_correct else 0
         if is_correct:
             sesion.preguntas_respondidas += 1
-        sesion.save()
+        sesion.save(update_fields=['puntaje_total', 'preguntas_respondidas'])
         
         return JsonResponse({
             'success': True,
@@ -95,6 +104,8 @@ def save_question_response(request):
 
 @csrf_exempt
 @require_http_methods(["POST"])
+@limitar_tasa(por_sesion=(10, 20), por_ip=(100, 20))
+@evento_idempotente('level_complete')
 def save_level_complete(request):
     """API endpoint para guardar la finalización de un nivel"""
     try:
@@ -120,7 +131,8 @@ def save_level_complete(request):
         if total_respuestas > 0:
             evaluacion.precision_promedio = (evaluacion.total_aciertos / total_respuestas) * 100
         
-        evaluacion.save()
+        # Sólo las métricas: no pisar el progreso de sesiones (utils/progreso.py)
+        evaluacion.save(update_fields=['total_aciertos', 'total_errores', 'total_clics', 'precision_promedio'])
         
         return JsonResponse({
             'success': True,
@@ -140,6 +152,7 @@ def save_level_complete(request):
 
 @csrf_exempt
 @require_http_methods(["POST"])
+@limitar_tasa(por_ip=(10, 50))
 def asignar_nino(request):
     """Asocia un niño existente con un juego."""
     nino_id = request.POST.get('nino_id')
@@ -2,6 +2,7 @@ import os
 import json
 from django.conf import settings
 from django.shortcuts import get_object_or_404, redirect
+from django.urls import reverse
 from django.utils.decorators import method_decorator
 from django.contrib.auth.decorators import login_required
 from django.views.generic import TemplateView
@@ -9,6 +10,24 @@ from django.utils import timezone
 from django.contrib import messages
 from app.games.models import Juego, SesionJuego, Evaluacion
 from app.core.models import Profesional, Nino
+from app.core.utils.thumbnails import cargar_manifiesto_estatico
+
+
+def _usar_miniaturas_estaticas(game_config, tamano='md'):
+    """
+    Sustituye los `image_path` de las preguntas por su miniatura WebP
+    (ver `manage.py generar_miniaturas --static`) cuando existe.
+    """
+    manifiesto = cargar_manifiesto_estatico(os.path.join(settings.BASE_DIR, 'app', 'games', 'static'))
+    if not manifiesto:
+        return game_config
+
+    for nivel in game_config.get('levels', []):
+        for pregunta in nivel.get('questions', []):
+            derivados = manifiesto.get(pregunta.get('image_path'), {})
+            if tamano in derivados:
+                pregunta['image_path'] = derivados[tamano]['webp']
+    return game_config
 
 @method_decorator(login_required, name='dispatch')
 class GameListView(TemplateView):
@@ -103,7 +122,9 @@ class PlayGameView(TemplateView):
         
         # ⭐ CASO 2: Al entrar al juego, registrar fecha_pausa para detectar salidas inesperadas
         # Si el usuario cierra el navegador sin hacer clic en "Salir", podremos calcular el tiempo pausado
-        if sesion.estado == 'en_proceso' and not sesion.fecha_pausa:
+        # La precarga del service worker (X-Precarga) no es una entrada al juego
+        precarga = self.request.headers.get('X-Precarga') == '1'
+        if sesion.estado == 'en_proceso' and not sesion.fecha_pausa and not precarga:
             sesion.fecha_pausa = timezone.now()
             sesion.save(update_fields=['fecha_pausa'])
             print(f"⏸️ Registrado inicio de sesión para tracking: {sesion.fecha_pausa}")
@@ -131,6 +152,9 @@ class PlayGameView(TemplateView):
                     game_config = json.load(f)
             except:
                 game_config = {"error": "No se pudo cargar la configuración del juego"}
+
+        if game_config and 'levels' in game_config:
+            game_config = _usar_miniaturas_estaticas(game_config)
         
         # Obtener todas las sesiones de esta evaluación ordenadas
         sesiones_evaluacion = SesionJuego.objects.filter(
@@ -147,7 +171,7 @@ class PlayGameView(TemplateView):
             sesion_existente = sesiones_evaluacion.filter(juego=juego).first()
             if sesion_existente:
                 # Usar la URL de la sesión existente
-                init_url = f'/games/play/{sesion_existente.url_sesion}/'
+                init_url = reverse('games:play_game', kwargs={'url_sesion': sesion_existente.url_sesion})
             else:
                 # Si no existe, crear nueva sesión (caso legacy)
                 init_url = f'/games/init/{juego.slug}/?nino_id={sesion.evaluacion.nino.id}'
@@ -158,6 +182,14 @@ class PlayGameView(TemplateView):
                 'nombre': juego.nombre,
                 'init_url': init_url
             })
+
+        # Ejercicios que quedan de la evaluación: el service worker precarga
+        # sus páginas para poder seguir sin conexión
+        paginas_siguientes = [
+            reverse('games:play_game', kwargs={'url_sesion': s.url_sesion})
+            for s in sorted(sesiones_evaluacion, key=lambda s: (s.ejercicio_numero or 0, s.pk))
+            if s.pk != sesion.pk and s.estado != 'completada'
+        ]
         
         context.update({
             'page_title': f'{sesion.juego.nombre} - DislexIA',
@@ -170,6 +202,7 @@ class PlayGameView(TemplateView):
             'game_config_json': json.dumps(game_config, ensure_ascii=False, indent=2) if game_config else '{}',
             'juegos': juegos_con_urls,
             'juegos_json': json.dumps(juegos_con_urls, ensure_ascii=False),
+            'paginas_siguientes_json': json.dumps(paginas_siguientes),
             'es_evaluacion_ia': es_evaluacion_ia,
             'tiempo_pausado_segundos': sesion.tiempo_pausado_segundos,  # ⭐ NUEVO: Para ajustar el timer
         })
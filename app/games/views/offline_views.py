@@ -0,0 +1,33 @@
+import os
+from django.conf import settings
+from django.http import HttpResponse
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_http_methods
+
+SERVICE_WORKER_PATH = os.path.join(settings.BASE_DIR, 'app', 'games', 'static', 'js', 'sw-juegos.js')
+
+
+@never_cache
+@require_http_methods(["GET"])
+def service_worker(request):
+    """
+    Sirve el service worker de los juegos desde la raíz del sitio.
+
+    Un service worker solo controla las URLs bajo la ruta desde la que se
+    sirve, por eso no puede publicarse desde /static/js/: las páginas de
+    juego viven bajo /<idioma>/games/. Se sirve sin caché para que el
+    navegador detecte nuevas versiones.
+    """
+    with open(SERVICE_WORKER_PATH, 'r', encoding='utf-8') as f:
+        contenido = f.read()
+
+    response = HttpResponse(contenido, content_type='application/javascript; charset=utf-8')
+    response['Service-Worker-Allowed'] = '/'
+    return response
+
+
+@never_cache
+@require_http_methods(["GET", "HEAD"])
+def ping(request):
+    """Endpoint mínimo para que el cliente compruebe la conectividad (GameUtils.checkConnection)"""
+    return HttpResponse(status=204)
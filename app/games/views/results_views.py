@@ -2,7 +2,8 @@ from django.shortcuts import get_object_or_404
 from django.utils.decorators import method_decorator
 from django.contrib.auth.decorators import login_required
 from django.views.generic import TemplateView
-from app.games.models import Evaluacion, SesionJuego, Juego, PruebaCognitiva
+from app.games.models import Evaluacion, SesionJuego
+from app.games.utils.compactacion import pruebas_de_evaluacion
 
 @method_decorator(login_required, name='dispatch')
 class SequentialResultsView(TemplateView):
@@ -26,8 +27,8 @@ class SequentialResultsView(TemplateView):
             evaluacion=evaluacion
         ).select_related('juego').order_by('fecha_inicio')
 
-        # Calcular métricas totales desde las pruebas cognitivas
-        pruebas = PruebaCognitiva.objects.filter(evaluacion=evaluacion)
+        # Calcular métricas totales desde las pruebas cognitivas (filas o compactadas)
+        pruebas = pruebas_de_evaluacion(evaluacion)
 
         total_clics = sum(prueba.clics for prueba in pruebas)
         total_aciertos = sum(prueba.aciertos for prueba in pruebas)
@@ -61,7 +62,7 @@ class SequentialResultsView(TemplateView):
             juego_id = sesion.juego.id
             
             # Obtener métricas de este juego en esta sesión
-            pruebas_sesion = pruebas.filter(juego=sesion.juego)
+            pruebas_sesion = [p for p in pruebas if p.juego_id == juego_id]
             
             sesion_clics = sum(p.clics for p in pruebas_sesion)
             sesion_aciertos = sum(p.aciertos for p in pruebas_sesion)
@@ -75,12 +76,12 @@ class SequentialResultsView(TemplateView):
             juegos_agrupados[juego_id]['errores_total'] += sesion_errores
             juegos_agrupados[juego_id]['juego_obj'] = sesion.juego
         
-        juegos_unicos = set(pruebas.values_list('juego', flat=True))
+        juegos_unicos = {p.juego_id for p in pruebas}
 
         juegos_resumen = []
         for juego_id in juegos_unicos:
-            juego_obj = Juego.objects.get(id=juego_id)
-            pruebas_juego = pruebas.filter(juego=juego_obj)
+            pruebas_juego = [p for p in pruebas if p.juego_id == juego_id]
+            juego_obj = pruebas_juego[0].juego  # ya cargado junto a las pruebas
             clics_total = sum(p.clics for p in pruebas_juego)
             aciertos_total = sum(p.aciertos for p in pruebas_juego)
             errores_total = sum(p.errores for p in pruebas_juego)
@@ -89,7 +90,7 @@ class SequentialResultsView(TemplateView):
 
             juegos_resumen.append({
                 'juego': juego_obj,
-                'veces_jugado': sesiones.filter(juego=juego_obj).count(),
+                'veces_jugado': juegos_agrupados[juego_id]['veces_jugado'] if juego_id in juegos_agrupados else 0,
                 'puntaje': puntaje_total,
                 'clics': clics_total,
                 'aciertos': aciertos_total,
@@ -1,4 +1,5 @@
 from django.shortcuts import get_object_or_404, redirect
+from django.urls import reverse
 from django.views import View
 from django.views.generic import TemplateView
 from django.utils.decorators import method_decorator
@@ -9,10 +10,20 @@ from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods, require_POST
 from django.contrib import messages
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
 import json
 from app.core.models import Nino, ReporteIA
+from app.core.utils.consultas import subconsulta_agregada
 from app.games.models import Juego, SesionJuego, Evaluacion
-from app.games.ml_models.predictor import predecir_dislexia_desde_evaluacion
+from app.games.utils.progreso import (
+    completar_evaluacion, leer_progreso, recalcular_progreso, registrar_completada, siguiente_sesion
+)
+from app.games.utils.linea_tiempo import guardar_estadisticas
+from app.games.utils.prediccion import programar_prediccion
+from app.games.utils.rate_limit import limitar_tasa
+from app.core.utils.purga import purgar_evaluacion
 from django.core.management import call_command
 from app.games.forms.forms_populate import PopulateSessionsForm
 
@@ -32,7 +43,7 @@ class GameSessionListView(TemplateView):
         # Query base sin filtros (para estadísticas globales)
         evaluaciones_todas = Evaluacion.objects.filter(
             nino__profesional=profesional
-        ).select_related('nino')
+        ).select_related('nino', 'reporte_ia')
         
         # Calcular estadísticas globales
         total_evaluaciones_global = evaluaciones_todas.count()
@@ -46,22 +57,22 @@ class GameSessionListView(TemplateView):
         if filtro_estado != 'todos':
             evaluaciones = evaluaciones.filter(estado=filtro_estado)
         
-        evaluaciones = evaluaciones.order_by('-fecha_hora_inicio')
+        # Clics y aciertos de las sesiones completadas, en la misma consulta
+        sesiones_comp = SesionJuego.objects.filter(estado='completada')
+        evaluaciones = evaluaciones.annotate(
+            clicks_completadas=Coalesce(subconsulta_agregada(sesiones_comp, 'evaluacion', Sum('clicks_total')), 0),
+            hits_completadas=Coalesce(subconsulta_agregada(sesiones_comp, 'evaluacion', Sum('hits_total')), 0),
+        ).order_by('-fecha_hora_inicio')
 
         # Preparar lista con métricas
         evaluaciones_con_metricas = []
         for evaluacion in evaluaciones:
-            sesiones = SesionJuego.objects.filter(evaluacion=evaluacion)
-            sesiones_completadas = sesiones.filter(estado='completada').count()
-            total_sesiones = sesiones.count()
+            sesiones_completadas = evaluacion.sesiones_completadas
+            total_sesiones = evaluacion.sesiones_totales
             
-            sesiones_comp = sesiones.filter(estado='completada')
-            if sesiones_comp.exists():
-                total_clicks = sum(s.clicks_total or 0 for s in sesiones_comp)
-                total_hits = sum(s.hits_total or 0 for s in sesiones_comp)
-                accuracy_promedio = (total_hits / total_clicks * 100) if total_clicks > 0 else 0
-            else:
-                accuracy_promedio = 0
+            total_clicks = evaluacion.clicks_completadas
+            total_hits = evaluacion.hits_completadas
+            accuracy_promedio = (total_hits / total_clicks * 100) if total_clicks > 0 else 0
             
             evaluaciones_con_metricas.append({
                 'evaluacion': evaluacion,
@@ -180,6 +191,9 @@ class InitSequentialEvaluationView(View):
             messages.error(request, "Error al crear las sesiones de juegos.")
             return redirect('games:game_list')
 
+        # Fijar total y siguiente ejercicio ya con los números asignados
+        recalcular_progreso(evaluacion.id)
+
         primera_sesion = sesiones_creadas[0]
         
         messages.success(
@@ -225,23 +239,13 @@ class ResumeEvaluationView(View):
             )
             return redirect('games:session_list')
 
-        sesion_pendiente = SesionJuego.objects.filter(
-            evaluacion=evaluacion
-        ).exclude(
-            estado='completada'
-        ).order_by('ejercicio_numero').first()
-
-        total_sesiones = SesionJuego.objects.filter(evaluacion=evaluacion).count()
-        sesiones_completadas = SesionJuego.objects.filter(
-            evaluacion=evaluacion, 
-            estado='completada'
-        ).count()
+        sesion_pendiente = siguiente_sesion(evaluacion)
+        total_sesiones = evaluacion.sesiones_totales
+        sesiones_completadas = evaluacion.sesiones_completadas
 
         if not sesion_pendiente:
             if total_sesiones > 0 and sesiones_completadas == total_sesiones:
-                evaluacion.estado = 'completada'
-                evaluacion.fecha_hora_fin = timezone.now()
-                evaluacion.save()
+                completar_evaluacion(evaluacion)
                 messages.success(request, "¡Evaluación completada! Todas las sesiones han sido finalizadas.")
             else:
                 messages.info(request, "No hay sesiones pendientes en esta evaluación.")
@@ -270,209 +274,172 @@ class ResumeEvaluationView(View):
 
 @csrf_exempt
 @require_http_methods(["POST"])
+@limitar_tasa(por_sesion=(5, 25), por_ip=(60, 30))
 def finish_game_session(request, url_sesion):
     """
     API endpoint para finalizar una sesión de juego COMPLETADA
     Este endpoint se llama cuando el usuario COMPLETA el juego normalmente
+
+    No usa evento_idempotente: la sesión bloqueada y su
+    respuesta_finalizacion ya hacen idempotente cada reenvío, tenga o no
+    client_seq, y así un reenvío siempre reprograma la predicción.
     """
     try:
-        # Obtener la sesión
-        sesion = get_object_or_404(SesionJuego, url_sesion=url_sesion)
-        
-        # ⭐ IMPORTANTE: Si hay fecha_pausa registrada, calcular y acumular tiempo pausado
-        if sesion.fecha_pausa:
-            tiempo_pausa_actual = (timezone.now() - sesion.fecha_pausa).total_seconds()
-            sesion.tiempo_pausado_segundos += int(tiempo_pausa_actual)
-            print(f"⏸️ Tiempo pausado detectado: {int(tiempo_pausa_actual)}s")
-            print(f"   Tiempo pausado total acumulado: {sesion.tiempo_pausado_segundos}s")
-        
-        # Parsear datos del POST
-        data = json.loads(request.body)
-        puntaje_final = data.get('total_score', sesion.puntaje_total)
-        total_correct = data.get('total_correct', 0)
-        total_incorrect = data.get('total_incorrect', 0)
-        preguntas_contestadas = total_correct + total_incorrect
-        tiempo_total = data.get('total_time_seconds', 0)
+        with transaction.atomic():
+            # Bloquear la sesión: un doble envío, un reintento o una segunda
+            # pestaña esperan aquí y reciben la respuesta ya guardada
+            sesion = get_object_or_404(SesionJuego.objects.select_for_update(), url_sesion=url_sesion)
+            repetida = sesion.respuesta_finalizacion is not None
+            if repetida:
+                print(f"🔁 Finalización repetida de {url_sesion}: se devuelve la respuesta guardada")
+                datos = dict(sesion.respuesta_finalizacion)
+                if datos.get('evaluacion_completada'):
+                    # Si la predicción quedó pendiente o falló, se reintenta
+                    programar_prediccion(datos['evaluacion_id'])
+            else:
+                datos = json.loads(_finalizar_sesion(sesion, json.loads(request.body)).content)
+                sesion.respuesta_finalizacion = datos
+                sesion.save(update_fields=['respuesta_finalizacion'])
+
+        # La predicción corre en segundo plano tras el commit: el estado
+        # del reporte se consulta ahora y no se guarda en la respuesta
+        if datos.get('evaluacion_completada'):
+            datos['prediccion_realizada'] = ReporteIA.objects.filter(evaluacion_id=datos['evaluacion_id']).exists()
+        response = JsonResponse(datos)
+        if repetida:
+            response['X-Idempotent-Replay'] = 'true'
+        return response
 
-        # === CALCULAR MÉTRICAS AGREGADAS ===
-        # Opción 1: Si el frontend envía las métricas directamente
-        clicks_total = data.get('total_clicks', preguntas_contestadas)
-        hits_total = data.get('total_hits', total_correct)
-        misses_total = data.get('total_misses', total_incorrect)
-
-        # Opción 2: Si no las envía, calcularlas desde PruebaCognitiva
-        if clicks_total == 0 or hits_total == 0:
-            metricas = sesion.calcular_metricas_desde_pruebas()
-            clicks_total = metricas['clicks']
-            hits_total = metricas['hits']
-            misses_total = metricas['misses']
-            print(f"📊 Métricas calculadas desde PruebaCognitiva: {metricas}")
-
-        # Finalizar sesión con métricas agregadas
-        sesion.finalizar_sesion(
-            puntaje_final=puntaje_final,
-            preguntas_contestadas=preguntas_contestadas,
-            tiempo_total=tiempo_total,
-            clicks=clicks_total,
-            hits=hits_total,
-            misses=misses_total
-        )
-        
-        # Limpiar fecha_pausa al completar
-        sesion.fecha_pausa = None
-        sesion.save(update_fields=['fecha_pausa'])
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=400)
 
-        print(f"✅ Sesión finalizada - Ejercicio #{sesion.ejercicio_numero}: Clicks={clicks_total}, Hits={hits_total}, Misses={misses_total}")
-        
-        # Verificar si debemos finalizar la evaluación completa
-        evaluacion = sesion.evaluacion
-        total_sesiones = SesionJuego.objects.filter(evaluacion=evaluacion).count()
-        sesiones_completadas = SesionJuego.objects.filter(evaluacion=evaluacion, estado='completada').count()
 
-        print(f"📊 Progreso: {sesiones_completadas}/{total_sesiones} sesiones completadas")
+def _finalizar_sesion(sesion, data):
+    """
+    Aplica el fin de juego a la sesión (ya bloqueada) y, si era la última,
+    finaliza la evaluación y programa la predicción para después del commit
+    (ver games/utils/prediccion.py).
+    """
+    # ⭐ IMPORTANTE: Si hay fecha_pausa registrada, calcular y acumular tiempo pausado
+    if sesion.fecha_pausa:
+        tiempo_pausa_actual = (timezone.now() - sesion.fecha_pausa).total_seconds()
+        sesion.tiempo_pausado_segundos += int(tiempo_pausa_actual)
+        print(f"⏸️ Tiempo pausado detectado: {int(tiempo_pausa_actual)}s")
+        print(f"   Tiempo pausado total acumulado: {sesion.tiempo_pausado_segundos}s")
+    
+    # Datos del POST
+    puntaje_final = data.get('total_score', sesion.puntaje_total)
+    total_correct = data.get('total_correct', 0)
+    total_incorrect = data.get('total_incorrect', 0)
+    preguntas_contestadas = total_correct + total_incorrect
+    tiempo_total = data.get('total_time_seconds', 0)
+
+    # === CALCULAR MÉTRICAS AGREGADAS ===
+    # Opción 1: Si el frontend envía las métricas directamente
+    clicks_total = data.get('total_clicks', preguntas_contestadas)
+    hits_total = data.get('total_hits', total_correct)
+    misses_total = data.get('total_misses', total_incorrect)
+
+    # Opción 2: Si no las envía, calcularlas desde PruebaCognitiva
+    if clicks_total == 0 or hits_total == 0:
+        metricas = sesion.calcular_metricas_desde_pruebas()
+        clicks_total = metricas['clicks']
+        hits_total = metricas['hits']
+        misses_total = metricas['misses']
+        print(f"📊 Métricas calculadas desde PruebaCognitiva: {metricas}")
+
+    # Transición a 'completada' y progreso de la evaluación (misma transacción)
+    registrar_completada(sesion)
+
+    # Finalizar sesión con métricas agregadas
+    sesion.finalizar_sesion(
+        puntaje_final=puntaje_final,
+        preguntas_contestadas=preguntas_contestadas,
+        tiempo_total=tiempo_total,
+        clicks=clicks_total,
+        hits=hits_total,
+        misses=misses_total
+    )
+    
+    # Limpiar fecha_pausa al completar
+    sesion.fecha_pausa = None
+    sesion.save(update_fields=['fecha_pausa'])
+
+    # Mediana, IQR y respuestas lentas desde la línea de tiempo
+    tiempos = guardar_estadisticas(sesion)
+    if tiempos:
+        print(f"⏱️ Tiempos: mediana={tiempos['mediana_ms']:.0f}ms, IQR={tiempos['iqr_ms']:.0f}ms, lentas={tiempos['porcentaje_lentas']:.1f}%")
 
-        # Si todas las sesiones están completadas, finalizar la evaluación
-        if sesiones_completadas == total_sesiones:
-            evaluacion.fecha_hora_fin = timezone.now()
-            evaluacion.estado = 'completada'
-            evaluacion.duracion_total_minutos = tiempo_total // 60
-            evaluacion.save()
-            
+    print(f"✅ Sesión finalizada - Ejercicio #{sesion.ejercicio_numero}: Clicks={clicks_total}, Hits={hits_total}, Misses={misses_total}")
+    
+    # Verificar si debemos finalizar la evaluación completa
+    evaluacion = leer_progreso(sesion.evaluacion)
+    total_sesiones = evaluacion.sesiones_totales
+    sesiones_completadas = evaluacion.sesiones_completadas
+
+    print(f"📊 Progreso: {sesiones_completadas}/{total_sesiones} sesiones completadas")
+
+    # Si todas las sesiones están completadas, finalizar la evaluación.
+    # La transición es un UPDATE condicional: aunque lleguen varias
+    # peticiones a la vez, sólo una la hace y programa la predicción.
+    if sesiones_completadas >= total_sesiones:
+        if completar_evaluacion(
+            evaluacion, duracion_total_minutos=tiempo_total // 60, prediccion_estado='pendiente'
+        ):
             print(f"✅ ¡EVALUACIÓN COMPLETA! Total: {total_sesiones} sesiones")
-            
-            # === REALIZAR PREDICCIÓN CON MODELO IA ===
-            print("\n🤖 Iniciando predicción de dislexia...")
-            
-            try:
-                
-                # Realizar predicción
-                resultado_prediccion = predecir_dislexia_desde_evaluacion(evaluacion.id)
-                
-                if resultado_prediccion['success']:
-                    pred = resultado_prediccion['prediccion']
-                    
-                    print(f"✅ Predicción exitosa:")
-                    print(f"   - Clasificación: {pred['clasificacion']}")
-                    print(f"   - Probabilidad: {pred['probabilidad_porcentaje']}%")
-                    print(f"   - Nivel de riesgo: {pred['clasificacion_riesgo']}")
-                    
-                    # === GUARDAR RESULTADO EN ReporteIA ===
-                    try:
-                        # Preparar características en formato JSON
-                        caracteristicas_json = {
-                            'total_sesiones': total_sesiones,
-                            'accuracy_promedio': float(evaluacion.precision_promedio),
-                            'total_clicks': evaluacion.total_clics,
-                            'total_aciertos': evaluacion.total_aciertos,
-                            'total_errores': evaluacion.total_errores,
-                            'duracion_minutos': evaluacion.duracion_total_minutos,
-                            'modelo_version': resultado_prediccion.get('modelo_info', {}).get('version', 'v2.2'),
-                            'umbral_utilizado': pred.get('umbral_utilizado', 0.5)
-                        }
-                        
-                        # Preparar métricas relevantes
-                        metricas_relevantes = {
-                            'probabilidad': pred['probabilidad'],
-                            'probabilidad_porcentaje': pred['probabilidad_porcentaje'],
-                            'confianza': pred.get('confianza', 0),
-                            'confianza_porcentaje': pred.get('confianza_porcentaje', 0),
-                            'nivel_riesgo': pred['clasificacion_riesgo'],
-                            'simulacion': pred.get('simulacion', False)
-                        }
-                        
-                        # Mapear nivel de riesgo a clasificación
-                        if pred['clasificacion_riesgo'] == 'ALTO':
-                            clasificacion_riesgo = 'alto'
-                        elif pred['clasificacion_riesgo'] == 'MEDIO':
-                            clasificacion_riesgo = 'medio'
-                        else:
-                            clasificacion_riesgo = 'bajo'
-                        
-                        # Crear o actualizar ReporteIA
-                        reporte, created = ReporteIA.objects.update_or_create(
-                            evaluacion=evaluacion,
-                            defaults={
-                                'indice_riesgo': pred['probabilidad'] * 100,  # Convertir a escala 0-100
-                                'clasificacion_riesgo': pred['clasificacion_riesgo'],
-                                'confianza_prediccion': int(pred.get('confianza_porcentaje', 60)),
-                                'caracteristicas_json': caracteristicas_json,
-                                'recomendaciones': pred['recomendacion'],
-                                'metricas_relevantes': metricas_relevantes
-                            }
-                        )
-                        
-                        if created:
-                            print(f"✅ ReporteIA creado con ID: {reporte.id}")
-                        else:
-                            print(f"✅ ReporteIA actualizado con ID: {reporte.id}")
-                        
-                    except Exception as e:
-                        print(f"⚠️ Error al guardar ReporteIA: {e}")
-                        import traceback
-                        traceback.print_exc()
-                
-                else:
-                    print(f"⚠️ Error en predicción: {resultado_prediccion.get('error', 'Error desconocido')}")
-            
-            except Exception as e:
-                print(f"❌ Error al ejecutar predicción: {e}")
-                import traceback
-                traceback.print_exc()
-            
-            # === RETORNAR RESPUESTA ===
+            # === PREDICCIÓN CON MODELO IA, TRAS EL COMMIT ===
+            programar_prediccion(evaluacion.id)
+        else:
+            print(f"🔒 Evaluación {evaluacion.id} ya finalizada por otra petición: no se repite la predicción")
+            evaluacion.refresh_from_db(fields=['duracion_total_minutos'])
+        
+        # === RETORNAR RESPUESTA ===
+        return JsonResponse({
+            'success': True,
+            'message': '¡Evaluación completa! Generando la predicción de IA.',
+            'evaluacion_completada': True,
+            'redirect_url': f'/games/results/{evaluacion.id}/',
+            'sesion_id': sesion.id,
+            'evaluacion_id': evaluacion.id,
+            'final_stats': {
+                'puntaje_total': sesion.puntaje_total,
+                'preguntas_respondidas': sesion.preguntas_respondidas,
+                'tiempo_total_minutos': evaluacion.duracion_total_minutos,
+                'precision_promedio': float(evaluacion.precision_promedio),
+                'sesiones_completadas': sesiones_completadas,
+                'sesiones_totales': total_sesiones
+            }
+        })
+    else:
+        # Buscar la siguiente sesión pendiente
+        siguiente = siguiente_sesion(evaluacion)
+        
+        if siguiente:
+            print(f"➡️ Siguiente juego: {siguiente.juego.nombre} (Ejercicio #{siguiente.ejercicio_numero})")
             return JsonResponse({
                 'success': True,
-                'message': '¡Evaluación completa! Predicción de IA realizada.',
-                'evaluacion_completada': True,
-                'redirect_url': f'/games/results/{evaluacion.id}/',
-                'sesion_id': sesion.id,
-                'evaluacion_id': evaluacion.id,
-                'prediccion_realizada': resultado_prediccion['success'] if 'resultado_prediccion' in locals() else False,
-                'final_stats': {
-                    'puntaje_total': sesion.puntaje_total,
-                    'preguntas_respondidas': sesion.preguntas_respondidas,
-                    'tiempo_total_minutos': evaluacion.duracion_total_minutos,
-                    'precision_promedio': float(evaluacion.precision_promedio),
-                    'sesiones_completadas': sesiones_completadas,
-                    'sesiones_totales': total_sesiones
-                }
+                'message': f'Juego completado. Avanzando al siguiente...',
+                'evaluacion_completada': False,
+                'siguiente_url': reverse('games:play_game', kwargs={'url_sesion': siguiente.url_sesion}),
+                'progreso': {
+                    'completadas': sesiones_completadas,
+                    'totales': total_sesiones,
+                    'porcentaje': round((sesiones_completadas / total_sesiones) * 100, 1)
+                },
+                'sesion_id': sesion.id
             })
         else:
-            # Buscar la siguiente sesión pendiente
-            siguiente_sesion = SesionJuego.objects.filter(
-                evaluacion=evaluacion,
-                estado='en_proceso'
-            ).order_by('ejercicio_numero').first()
-            
-            if siguiente_sesion:
-                print(f"➡️ Siguiente juego: {siguiente_sesion.juego.nombre} (Ejercicio #{siguiente_sesion.ejercicio_numero})")
-                return JsonResponse({
-                    'success': True,
-                    'message': f'Juego completado. Avanzando al siguiente...',
-                    'evaluacion_completada': False,
-                    'siguiente_url': f'/games/play/{siguiente_sesion.url_sesion}/',
-                    'progreso': {
-                        'completadas': sesiones_completadas,
-                        'totales': total_sesiones,
-                        'porcentaje': round((sesiones_completadas / total_sesiones) * 100, 1)
-                    },
-                    'sesion_id': sesion.id
-                })
-            else:
-                # No hay siguiente sesión (caso raro)
-                return JsonResponse({
-                    'success': True,
-                    'message': 'Sesión finalizada correctamente',
-                    'evaluacion_completada': False,
-                    'redirect_url': f'/games/results/{evaluacion.id}/',
-                    'sesion_id': sesion.id
-                })
-
-    except Exception as e:
-        return JsonResponse({
-            'success': False,
-            'error': str(e)
-        }, status=400)
+            # No hay siguiente sesión (caso raro)
+            return JsonResponse({
+                'success': True,
+                'message': 'Sesión finalizada correctamente',
+                'evaluacion_completada': False,
+                'redirect_url': f'/games/results/{evaluacion.id}/',
+                'sesion_id': sesion.id
+            })
 
 @login_required
 @csrf_exempt
@@ -498,20 +465,17 @@ def finish_evaluation_game(request, url_sesion):
         sesion.fecha_pausa = None  # ❌ NO guardar fecha_pausa (no es temporal)
         sesion.puntaje_total = puntaje_final
         sesion.tiempo_total_segundos = tiempo_total
-        sesion.save()
+        sesion.save(update_fields=['estado', 'fecha_fin', 'fecha_pausa', 'puntaje_total', 'tiempo_total_segundos'])
         
         # Marcar la evaluación como interrumpida
         evaluacion = sesion.evaluacion
         evaluacion.estado = 'interrumpida'
         evaluacion.fecha_hora_fin = timezone.now()
-        evaluacion.save()
+        evaluacion.save(update_fields=['estado', 'fecha_hora_fin'])
         
-        # Calcular progreso para mostrar al usuario
-        sesiones_completadas = SesionJuego.objects.filter(
-            evaluacion=evaluacion, 
-            estado='completada'
-        ).count()
-        total_sesiones = SesionJuego.objects.filter(evaluacion=evaluacion).count()
+        # Progreso para mostrar al usuario (ya guardado en la evaluación)
+        sesiones_completadas = evaluacion.sesiones_completadas
+        total_sesiones = evaluacion.sesiones_totales
         
         print(f"❌ Evaluación INTERRUMPIDA DEFINITIVAMENTE por el usuario: {sesion.juego.nombre}")
         print(f"   Evaluación ID: {evaluacion.id} marcada como 'interrumpida'")
@@ -552,11 +516,13 @@ def finish_individual_game(request, url_sesion):
         tiempo_total = data.get('total_time_seconds', 0)
         
         # Marcar como completada
-        sesion.estado = 'completada'
-        sesion.fecha_fin = timezone.now()
-        sesion.puntaje_total = puntaje_final
-        sesion.tiempo_total_segundos = tiempo_total
-        sesion.save()
+        with transaction.atomic():
+            registrar_completada(sesion)
+            sesion.fecha_fin = timezone.now()
+            sesion.puntaje_total = puntaje_final
+            sesion.tiempo_total_segundos = tiempo_total
+            sesion.save(update_fields=['fecha_fin', 'puntaje_total', 'tiempo_total_segundos'])
+            guardar_estadisticas(sesion)
         
         print(f"✅ Juego individual finalizado: {sesion.juego.nombre}")
         print(f"   Puntaje: {puntaje_final}, Tiempo: {tiempo_total}s")
@@ -592,7 +558,7 @@ def delete_evaluacion(request, evaluacion_id):
         if estado_actual == 'en_proceso':
             evaluacion.estado = 'interrumpida'
             evaluacion.fecha_hora_fin = timezone.now()
-            evaluacion.save()
+            evaluacion.save(update_fields=['estado', 'fecha_hora_fin'])
             
             messages.warning(
                 request, 
@@ -607,8 +573,9 @@ def delete_evaluacion(request, evaluacion_id):
                 'estado_final': evaluacion.estado
             })
         else:
+            # Borrado por lotes de las hojas a la raíz, sin cargar los objetos
+            purgar_evaluacion(evaluacion.id)
             messages.success(request, f'Evaluación de {nino_nombre} eliminada correctamente')
-            evaluacion.delete()
             
             return JsonResponse({
                 'success': True,
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 from dotenv import load_dotenv
 from django.utils.translation import gettext_lazy as _
 
@@ -51,6 +52,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Métricas de peticiones para /metrics (primero, para medir el resto de middleware)
+    'app.core.middleware.MetricasMiddleware',
+    # Presupuesto de consultas y N+1 (sólo con PRESUPUESTO_CONSULTAS_ACTIVO). Al
+    # principio, como las métricas, para contar también las consultas de sesión,
+    # autenticación y auditoría (las mismas que miden los tests de presupuesto)
+    'app.core.middleware.PresupuestoConsultasMiddleware',
+    # Trazas por petición (sólo con TRAZAS_ACTIVAS)
+    'app.core.middleware.TrazasMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
@@ -200,6 +209,13 @@ EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'noreply@dislexia.com')
 
+# Bandeja de salida de correos (app/core/utils/email_outbox.py)
+# Con EMAIL_OUTBOX_HILO el proceso web envía los correos en un hilo tras el
+# commit; en despliegues con varios workers se puede desactivar y usar
+# `python manage.py procesar_outbox --loop` como proceso aparte.
+EMAIL_OUTBOX_HILO = os.getenv('EMAIL_OUTBOX_HILO', 'True').lower() in ('true', '1', 'yes')
+EMAIL_OUTBOX_LOTE = int(os.getenv('EMAIL_OUTBOX_LOTE', 50))
+
 # ============================================
 # CONFIGURACIONES DE SEGURIDAD GDPR
 # ============================================
@@ -236,12 +252,86 @@ else:
     CSRF_COOKIE_SECURE = False
     X_FRAME_OPTIONS = 'SAMEORIGIN'
 
+# Caché (sesiones, límite de login, límite de tasa de los juegos, miniaturas,
+# PDFs). Con REDIS_URL se usa Redis (requiere el paquete `redis`); si no,
+# LocMem, que es por proceso y sólo sirve con un único proceso web. Con
+# varios (WEB_CONCURRENCY, la variable que lee gunicorn) los contadores
+# tienen que ser comunes y la comprobación core.E001 exige REDIS_URL. No se
+# usa la caché en base de datos: cada operación sería otra consulta.
+REDIS_URL = os.getenv('REDIS_URL', '')
+PROCESOS_WEB = int(os.getenv('WEB_CONCURRENCY', 1))
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 # Configuración de sesiones
 SESSION_COOKIE_HTTPONLY = True  # No accesible desde JavaScript
 SESSION_COOKIE_SAMESITE = 'Lax'  # Protección CSRF
 SESSION_COOKIE_AGE = 1209600  # 2 semanas
 SESSION_SAVE_EVERY_REQUEST = False
 SESSION_EXPIRE_AT_BROWSER_CLOSE = False
+# Motor de sesiones: con Redis, cached_db sirve las lecturas desde la caché
+# compartida y sólo escribe en django_session cuando la sesión cambia; sin
+# Redis se usa db
+SESSION_ENGINE = os.getenv(
+    'SESSION_ENGINE',
+    'django.contrib.sessions.backends.cached_db' if REDIS_URL else 'django.contrib.sessions.backends.db'
+)
+SESSION_INACTIVITY_TIMEOUT = 1800  # Cierre por inactividad (30 minutos)
+SESSION_ACTIVITY_GRANULARITY = int(os.getenv('SESSION_ACTIVITY_GRANULARITY', 60))  # Segundos entre escrituras de last_activity
+
+# Proxies inversos cuyo X-Forwarded-For es fiable (IPs o redes CIDR separadas
+# por comas, p. ej. "10.0.0.0/8,127.0.0.1"). Vacío: se usa REMOTE_ADDR, y la
+# cabecera (que el cliente puede falsificar) se ignora
+PROXIES_CONFIABLES = [p.strip() for p in os.getenv('PROXIES_CONFIABLES', '').split(',') if p.strip()]
+
+# Límite de intentos de login (app/core/utils/login_throttle.py, en la caché;
+# con varios procesos web el arranque falla si no es Redis)
+LOGIN_THROTTLE_VENTANA = 30 * 60  # Ventana deslizante en segundos
+LOGIN_THROTTLE_MAX_USUARIO = 5  # Fallos por usuario antes del bloqueo
+LOGIN_THROTTLE_MAX_IP = int(os.getenv('LOGIN_THROTTLE_MAX_IP', 20))  # Fallos por IP antes del bloqueo
+LOGIN_ATTEMPTS_RETENCION_DIAS = 30  # Días que se guardan los LoginAttempt (purge_login_attempts)
+
+# Limitación de tasa de las APIs de juego (app/games/utils/rate_limit.py). Cuenta
+# con cache.incr: atómico en Redis y, con un solo proceso, en LocMem
+GAME_RATE_LIMIT_ENABLED = os.getenv('GAME_RATE_LIMIT_ENABLED', 'True').lower() in ('true', '1', 'yes')
+
+# Presupuesto de consultas por vista (app/core/utils/presupuesto_consultas.py)
+PRESUPUESTO_CONSULTAS_ACTIVO = os.getenv('PRESUPUESTO_CONSULTAS_ACTIVO', 'False').lower() in ('true', '1', 'yes')
+PRESUPUESTO_CONSULTAS_REPETICIONES = 5  # Misma consulta N veces en una petición = posible N+1
+PRESUPUESTO_CONSULTAS = {  # Máximo de consultas por nombre de URL
+    'core:lista_ninos': 8,
+    'core:historico_nino': 12,
+    'games:session_list': 12,
+    'games:sequential_results': 12,
+}
+
+# Métricas en formato Prometheus (app/core/utils/metricas.py, servidas en /metrics)
+METRICAS_ACTIVAS = os.getenv('METRICAS_ACTIVAS', 'True').lower() in ('true', '1', 'yes')
+METRICAS_DIR = os.getenv('METRICAS_DIR', os.path.join(tempfile.gettempdir(), 'dislexia_metricas'))  # Un JSON por proceso; vaciar al desplegar
+METRICAS_INTERVALO_SEGUNDOS = int(os.getenv('METRICAS_INTERVALO_SEGUNDOS', 5))  # Volcado a disco de cada proceso
+METRICAS_TOKEN = os.getenv('METRICAS_TOKEN', '')  # Bearer opcional para Prometheus (sin sesión de staff)
+
+# Trazas dentro del proceso (app/core/utils/trazas.py; python manage.py exportar_trazas)
+TRAZAS_ACTIVAS = os.getenv('TRAZAS_ACTIVAS', 'False').lower() in ('true', '1', 'yes')
+TRAZAS_ARCHIVO = os.getenv('TRAZAS_ARCHIVO', os.path.join(BASE_DIR, 'logs', 'trazas.jsonl'))
+TRAZAS_MUESTREO = float(os.getenv('TRAZAS_MUESTREO', 0.01))  # Fracción de trazas que se guardan siempre
+TRAZAS_UMBRAL_MS = int(os.getenv('TRAZAS_UMBRAL_MS', 1000))  # Guardar también toda traza más lenta (0 = no)
+TRAZAS_MAX_SPANS = 2000  # Spans por traza; el resto se cuentan como descartados
+TRAZAS_MAX_MB = 50  # Al superarlo el archivo se rota a <archivo>.1
+
+# Compactación de pruebas cognitivas (python manage.py compactar_pruebas)
+PRUEBAS_COMPACTAR_DIAS = int(os.getenv('PRUEBAS_COMPACTAR_DIAS', 30))  # Días tras el fin de la evaluación
 
 # Configuración de CSRF
 CSRF_COOKIE_HTTPONLY = True
@@ -322,6 +412,11 @@ LOGGING = {
             'level': 'DEBUG' if DEBUG else 'INFO',
             'propagate': False,
         },
+        'app.games': {
+            'handlers': ['console', 'file'],
+            'level': 'DEBUG' if DEBUG else 'INFO',
+            'propagate': False,
+        },
     },
 }
 
@@ -344,6 +439,34 @@ DATA_RETENTION_POLICIES = {
     'usuario_inactivo': 1095,  # 3 años sin actividad
 }
 
+# Aplicación por lotes de las políticas (python manage.py aplicar_retencion)
+RETENCION_TAMANO_LOTE = 500  # Registros por lote/transacción
+RETENCION_PAUSA_SEGUNDOS = 0.5  # Pausa entre lotes para liberar bloqueos
+
+# Exportación completa en ZIP (python manage.py procesar_exportaciones)
+GDPR_EXPORT_PDF_CONCURRENCIA = int(os.getenv('GDPR_EXPORT_PDF_CONCURRENCIA', 3))  # Páginas de Chromium simultáneas
+GDPR_EXPORT_PDF_LOTE = 20  # Reportes renderizados por lote
+GDPR_EXPORT_DIAS_VALIDEZ = 7  # Días que se conserva el ZIP generado
+
+# Eliminación de cuentas por lotes (app/core/utils/purga.py)
+# Con PURGA_HILO la purga empieza en un hilo del proceso web; si no, la
+# recoge `python manage.py procesar_purgas`.
+PURGA_HILO = os.getenv('PURGA_HILO', 'True').lower() in ('true', '1', 'yes')
+PURGA_TAMANO_LOTE = 1000  # Registros por sentencia DELETE
+
+# Predicción de IA tras el commit del fin de evaluación (app/games/utils/prediccion.py)
+# Con PREDICCION_HILO se ejecuta en un hilo del proceso web; si no, la
+# recoge `python manage.py procesar_predicciones --loop`. Las fallidas se
+# reintentan al repetir la finalización o con ese mismo comando.
+PREDICCION_HILO = os.getenv('PREDICCION_HILO', 'True').lower() in ('true', '1', 'yes')
+PREDICCION_MAX_INTENTOS = 5
+
+# Archivo de auditoría (python manage.py archivar_auditoria)
+# Los meses cerrados de AuditoriaAcceso se mueven a ficheros JSONL comprimidos
+AUDITORIA_ARCHIVO_DIR = os.getenv('AUDITORIA_ARCHIVO_DIR', os.path.join(BASE_DIR, 'auditoria_archivo'))
+AUDITORIA_MESES_ACTIVOS = 3  # Meses que se quedan en la tabla (incluido el actual)
+AUDITORIA_ARCHIVO_LOTE = 5000  # Filas por lote al leer y borrar
+
 # Anonimización automática
 AUTO_ANONYMIZE_INACTIVE_USERS = True
 INACTIVE_USER_THRESHOLD_DAYS = 1095  # 3 años
@@ -22,9 +22,19 @@ from django.conf.urls.i18n import i18n_patterns
 
 from django.views.generic.base import RedirectView
 
+from app.core.views import views_misc
+from app.games.views import offline_views
+
 urlpatterns = [
     # Cambio de idioma
     path('i18n/', include('django.conf.urls.i18n')),
+
+    # Juego sin conexión: service worker (en la raíz para controlar /<idioma>/games/) y ping
+    path('sw-juegos.js', offline_views.service_worker, name='service_worker_juegos'),
+    path('ping', offline_views.ping, name='ping'),
+
+    # Métricas para Prometheus (sólo staff o METRICAS_TOKEN)
+    path('metrics', views_misc.metricas, name='metricas'),
 ]
 
 urlpatterns += i18n_patterns(